@@ -0,0 +1,119 @@
+"""
+Canonical Cache Keys for Trip Plans
+
+This module turns a validated PlanTripSerializer payload into a compact,
+versioned Redis key. Every field that changes the generated itinerary is part
+of the key, and fields are normalized first so that equivalent requests
+(different casing, list order, spacing) share one cache entry.
+
+Key Features:
+- Covers every PlanTripSerializer field (new fields are picked up automatically)
+- Sorted, de-duplicated, case-folded list fields
+- Unicode/whitespace/punctuation normalized destination strings
+- Long free text replaced by a digest inside the canonical form
+- Versioned prefix so a format change never serves stale entries
+"""
+
+import hashlib
+import json
+import re
+import unicodedata
+from datetime import date
+
+TRIP_KEY_VERSION = 2
+TRIP_KEY_PREFIX = f"trip:v{TRIP_KEY_VERSION}"
+
+# Free text longer than this is represented by its digest in the canonical form.
+FREE_TEXT_HASH_THRESHOLD = 64
+
+LIST_FIELDS = {"tripStyle", "interests", "travelWith"}
+FREE_TEXT_FIELDS = {"mustSeeAttractions"}
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_DESTINATION_SEPARATOR_RE = re.compile(r"\s*([,/;-])\s*")
+
+
+def normalize_text(value) -> str:
+    """NFKC-normalize, case-fold and collapse whitespace."""
+    if value is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(value)).casefold()
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+
+def normalize_destination(value) -> str:
+    """Normalize a destination string ("  Paris ,France." -> "paris, france")."""
+    text = normalize_text(value).strip(" .,;")
+    return _DESTINATION_SEPARATOR_RE.sub(lambda m: ", " if m.group(1) == "," else m.group(1), text)
+
+
+def normalize_list(values) -> list:
+    """Sort and de-duplicate a list of free-form labels."""
+    return sorted({normalize_text(v) for v in (values or []) if normalize_text(v)})
+
+
+def normalize_free_text(value) -> str:
+    """Normalize free text, replacing long values with a short digest."""
+    text = normalize_text(value)
+    if len(text) > FREE_TEXT_HASH_THRESHOLD:
+        return "sha256:" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+    return text
+
+
+def _normalize_date(value) -> str:
+    if isinstance(value, date):
+        return value.isoformat()
+    return normalize_text(value)
+
+
+def canonical_trip_request(data: dict) -> dict:
+    """
+    Build the canonical form of a trip request.
+
+    Args:
+        data (dict): validated_data from PlanTripSerializer
+
+    Returns:
+        dict: One normalized entry per serializer field
+    """
+    from .serializers import PlanTripSerializer
+
+    canonical = {}
+    for field in PlanTripSerializer().fields:
+        value = data.get(field)
+        if field == "destination":
+            canonical[field] = normalize_destination(value)
+        elif field in ("startDate", "endDate"):
+            canonical[field] = _normalize_date(value)
+        elif field in LIST_FIELDS or isinstance(value, (list, tuple, set)):
+            canonical[field] = normalize_list(value)
+        elif field in FREE_TEXT_FIELDS:
+            canonical[field] = normalize_free_text(value)
+        else:
+            canonical[field] = normalize_text(value)
+    return canonical
+
+
+def make_trip_cache_key(data: dict) -> str:
+    """
+    Return the Redis key for a trip request, e.g. "trip:v2:3f1c...".
+
+    Args:
+        data (dict): validated_data from PlanTripSerializer
+
+    Returns:
+        str: Versioned key with a 32 hex character digest
+    """
+    canonical = json.dumps(canonical_trip_request(data), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return f"{TRIP_KEY_PREFIX}:{hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:32]}"
+
+
+def legacy_trip_cache_key(data: dict) -> str:
+    """The pre-v2 key format (make_key), kept for hit-rate comparisons."""
+    trip_style_str = ','.join(map(str, data.get('tripStyle', [])))
+    interests_str = ','.join(map(str, data.get('interests', [])))
+
+    return (
+        f"trip:{data.get('destination', '')}:{data.get('startDate', '')}:{data.get('endDate', '')}:"
+        f"{data.get('pace', '')}:{trip_style_str}:{interests_str}"
+    ).lower().replace(" ", "_")
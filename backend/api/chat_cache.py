@@ -0,0 +1,126 @@
+"""
+Short-Lived Cache for Chat Activity Suggestions
+
+chat_replace_activity and chat_add_activity send a new Gemini prompt on every
+click, even when the same edit is repeated (retries, double clicks, undo/redo).
+Answers are cached under a canonical hash of everything the prompt is built
+from, so a repeated edit returns without an LLM round trip.
+
+Key Features:
+- Key = endpoint + model + canonical JSON of the prompt inputs (sorted keys,
+  normalized message text), so key order or spacing in the payload does not matter
+- Short TTL (CHAT_CACHE_TTL) since suggestions are tied to an editing session
+- `"regenerate": true` in the request skips the lookup ("give me something
+  different"); the new answer replaces the cached one
+- Sync and async accessors; a Redis outage only disables the cache
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .cache_keys import normalize_text
+from .utils.redis_client import async_redis_client, redis_client
+
+CHAT_CACHE_PREFIX = "chat:v1"
+CHAT_CACHE_STATS_KEY = f"{CHAT_CACHE_PREFIX}:stats"
+
+
+def wants_fresh_suggestions(payload) -> bool:
+    """True if the client asked to skip the cache (regenerate)."""
+    value = payload.get("regenerate", False)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+
+def chat_cache_key(endpoint: str, model: str, inputs: dict, message_field: str) -> str:
+    """
+    Return the Redis key for a chat suggestion, e.g. "chat:v1:replace:9b2e...".
+
+    Args:
+        endpoint (str): "replace" or "add"
+        model (str): Gemini model answering the prompt
+        inputs (dict): Every payload value the prompt is built from
+        message_field (str): The user's free-text field, normalized before hashing
+    """
+    canonical = dict(inputs, **{message_field: normalize_text(inputs.get(message_field))})
+    encoded = json.dumps({"model": model, "inputs": canonical}, sort_keys=True, separators=(",", ":"),
+                         ensure_ascii=False, default=str)
+    return f"{CHAT_CACHE_PREFIX}:{endpoint}:{hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]}"
+
+
+def _decode(cached) -> list | None:
+    if not cached:
+        return None
+    try:
+        activities = json.loads(cached)
+    except json.JSONDecodeError:
+        return None
+    return activities if isinstance(activities, list) and activities else None
+
+
+def get_cached_suggestions(key: str, fresh: bool = False) -> list | None:
+    """Return cached activities for key (None on a miss, bypass or Redis error). Never raises."""
+    if not settings.CHAT_CACHE_ENABLED:
+        return None
+    try:
+        if fresh:
+            redis_client.hincrby(CHAT_CACHE_STATS_KEY, "bypassed", 1)
+            return None
+        activities = _decode(redis_client.get(key))
+        redis_client.hincrby(CHAT_CACHE_STATS_KEY, "hits" if activities else "misses", 1)
+    except RedisError as e:
+        print(f"⚠️ Chat cache unavailable: {e}")
+        return None
+    if activities:
+        print(f"✔️ Chat suggestion served from cache ({key})")
+    return activities
+
+
+def store_suggestions(key: str, activities: list) -> None:
+    """Cache activities for CHAT_CACHE_TTL seconds. Never raises."""
+    if not settings.CHAT_CACHE_ENABLED:
+        return
+    try:
+        redis_client.setex(key, settings.CHAT_CACHE_TTL, json.dumps(activities))
+    except RedisError as e:
+        print(f"⚠️ Could not cache chat suggestion: {e}")
+
+
+async def get_cached_suggestions_async(key: str, fresh: bool = False) -> list | None:
+    """Async variant of get_cached_suggestions."""
+    if not settings.CHAT_CACHE_ENABLED:
+        return None
+    try:
+        if fresh:
+            await async_redis_client.hincrby(CHAT_CACHE_STATS_KEY, "bypassed", 1)
+            return None
+        activities = _decode(await async_redis_client.get(key))
+        await async_redis_client.hincrby(CHAT_CACHE_STATS_KEY, "hits" if activities else "misses", 1)
+    except RedisError as e:
+        print(f"⚠️ Chat cache unavailable: {e}")
+        return None
+    if activities:
+        print(f"✔️ Chat suggestion served from cache ({key})")
+    return activities
+
+
+async def store_suggestions_async(key: str, activities: list) -> None:
+    """Async variant of store_suggestions."""
+    if not settings.CHAT_CACHE_ENABLED:
+        return
+    try:
+        await async_redis_client.setex(key, settings.CHAT_CACHE_TTL, json.dumps(activities))
+    except RedisError as e:
+        print(f"⚠️ Could not cache chat suggestion: {e}")
+
+
+def chat_cache_stats() -> dict:
+    """Return hits/misses/bypassed counters."""
+    try:
+        return {field: int(value) for field, value in redis_client.hgetall(CHAT_CACHE_STATS_KEY).items()}
+    except RedisError as e:
+        return {"error": str(e)}
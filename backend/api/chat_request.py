@@ -6,7 +6,14 @@ trip plans and handling chat interactions.
 
 Key Features:
 - Gemini AI model integration
+- Model registry: one reused client per model with timeouts, concurrency limits
+  and generation configs, plus searchMode routes (cascade in api/model_router.py)
+- Per-model latency/outcome stats in Redis (api/utils/model_stats.py)
+- Per-call token, latency and cost ledger in Postgres (api/llm_usage.py)
+- "gemini" and "json_parse" request stages (Server-Timing, api/utils/request_timing.py)
+- System instructions with Gemini context caching for static prompt prefixes
 - Safety settings configuration
+- Structured JSON output (response_mime_type + response_schema), parsed once
 - JSON response extraction
 - Error handling
 - Response validation
@@ -15,10 +22,30 @@ Key Features:
 import requests
 import os
 import json
+import asyncio
+import contextlib
+import hashlib
+import threading
+import time
+import weakref
+import datetime
 from django.conf import settings
 import re
 import traceback 
 import google.generativeai as genai
+from google.generativeai import caching
+from redis.exceptions import RedisError
+from google.generativeai.types import generation_types
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+from .llm_usage import get_llm_context, usage_ledger
+from .utils.model_stats import model_stats
+from .utils.redis_client import redis_client
+from .utils.request_timing import timed
 
 # ─────────────────────────── Environment Variables / Settings ─────────────────────────── #
 
@@ -41,112 +68,834 @@ except Exception as config_error:
 model_name = 'gemini-2.5-pro-exp-03-25'
 print(f"Using model: {model_name}")
 
+SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
+]
 
-# ─────────────────────────── GEMINI Model Function ─────────────────────────── #
-def ask_gemini(prompt: str, model_to_use: str) -> str | None:
+
+class GeminiStreamError(Exception):
+    """Raised when a streaming Gemini call is blocked or fails mid-stream."""
+
+    def __init__(self, message, finish_reason=None):
+        super().__init__(message)
+        self.finish_reason = finish_reason  # e.g. "MAX_TOKENS" when the model stopped early
+
+
+class GeminiBusyError(Exception):
+    """Raised when no concurrency slot for a model frees up within its timeout."""
+
+
+class GeminiCancelledError(Exception):
+    """Raised when a sync call is cancelled (e.g. a hedge that lost) before its request starts."""
+
+
+SLOT_POLL_INTERVAL = 0.25  # seconds between cancellation checks while waiting for a slot
+
+
+# ─────────────────────────── Model Registry ─────────────────────────── #
+class GeminiModelConfig:
     """
-    Send a prompt to the specified Gemini model and get the response.
-    
-    Features:
-    - Safety settings configuration
-    - Response validation
-    - Error handling
-    - Detailed logging
-    
+    Settings for one Gemini model.
+
     Args:
-        prompt (str): The input prompt for the model
-        model_to_use (str): The specific Gemini model to use
-        
-    Returns:
-        str | None: The model's response text or None if error/blocked
+        name (str): Gemini model name
+        timeout (float): Seconds a call may take, waiting for a free slot included
+        max_concurrency (int): Calls allowed in flight per process (sync callers) and per event loop (async callers)
+        generation_config (dict, optional): Passed to GenerativeModel
     """
-    print(f"\n🤖 Sending prompt to model: {model_to_use}...")
-    try:
-        model = genai.GenerativeModel(model_to_use)
-        safety_settings = [
-            {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-            {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
-        ]
-        response = model.generate_content(prompt, safety_settings=safety_settings)
-
-        # Check for safety blocks
-        prompt_feedback = getattr(response, 'prompt_feedback', None)
-        if prompt_feedback and getattr(prompt_feedback, 'block_reason', None):
-             block_reason_value = getattr(prompt_feedback, 'block_reason', 'UNKNOWN')
-             reason_name = getattr(block_reason_value, 'name', str(block_reason_value))
-             print(f"⚠️ Prompt blocked: {reason_name}")
-             safety_ratings = getattr(prompt_feedback, 'safety_ratings', [])
-             if safety_ratings:
-                  print(f"   Safety Ratings (Prompt): {safety_ratings}")
-             return None
-
-        # Handle empty response
-        if not response.candidates:
-            print("⚠️ No candidates returned in the response.")
-            if hasattr(response, 'text') and response.text:
-                 print("   ℹ️ Found text directly on response object.")
-                 return response.text
-            return None
-
-        # Process response
-        candidate = response.candidates[0]
-        finish_reason_value = getattr(candidate, 'finish_reason', None) 
-
-        if finish_reason_value == 1:  # Normal completion
-            content = getattr(candidate, 'content', None)
-            parts = getattr(content, 'parts', []) if content else []
-
-            if parts:
-                full_text = "".join(part.text for part in parts if hasattr(part, 'text'))
-                print("   ✅ Model finished normally (STOP) and returned content.")
-                return full_text
-            else:
-                print("   ⚠️ Model finished normally (STOP) but returned no content parts.")
-                safety_ratings = getattr(candidate, 'safety_ratings', [])
-                if safety_ratings:
-                    print(f"   Safety Ratings (Response): {safety_ratings}")
-                if finish_reason_value == 4: 
-                     print("   Reason details: FINISH_REASON_RECITATION")
-                return "" 
 
+    def __init__(self, name, timeout=120, max_concurrency=8, generation_config=None):
+        self.name = name
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.generation_config = generation_config or {}
+
+
+MODEL_CONFIGS = {config.name: config for config in (
+    GeminiModelConfig('gemini-2.0-flash', timeout=60, max_concurrency=16),
+    GeminiModelConfig('gemini-2.5-flash-preview-05-20', timeout=120, max_concurrency=8),
+    GeminiModelConfig('gemini-2.5-pro-preview-05-06', timeout=240, max_concurrency=4),
+    GeminiModelConfig('gemini-1.5-flash', timeout=45, max_concurrency=16),
+)}
+
+class ModelRoute:
+    """
+    How a searchMode picks its models (used by api/model_router.py).
+
+    Args:
+        primary (str): Model tried first
+        fallbacks (tuple[str]): Models tried in order after an error, block or timeout
+        budget (float): Seconds the whole cascade may take
+        hedge_after (float, optional): Start the first fallback in parallel if the
+            primary has not answered after this many seconds
+    """
+
+    def __init__(self, primary, fallbacks=(), budget=120, hedge_after=None):
+        self.primary = primary
+        self.fallbacks = tuple(fallbacks)
+        self.budget = budget
+        self.hedge_after = hedge_after
+
+    @property
+    def models(self) -> tuple:
+        return (self.primary, *self.fallbacks)
+
+
+# searchMode -> trip planning route; anything else gets the "pro" route.
+# Budgets/hedge delays come from the model stats in /api/metrics/ (p95 of the primary).
+SEARCH_MODE_ROUTES = {
+    "quick": ModelRoute('gemini-2.0-flash', fallbacks=('gemini-2.5-flash-preview-05-20',), budget=90),
+    "normal": ModelRoute(
+        'gemini-2.5-flash-preview-05-20', fallbacks=('gemini-2.0-flash',), budget=150, hedge_after=45,
+    ),
+    "pro": ModelRoute(
+        'gemini-2.5-pro-preview-05-06',
+        fallbacks=('gemini-2.5-flash-preview-05-20', 'gemini-2.0-flash'),
+        budget=240,
+        hedge_after=90,
+    ),
+}
+DEFAULT_SEARCH_MODE = "pro"
+CHAT_MODEL = 'gemini-1.5-flash'
+
+
+def route_for_search_mode(search_mode: str | None) -> ModelRoute:
+    """Return the model route for the given searchMode."""
+    return SEARCH_MODE_ROUTES.get(search_mode) or SEARCH_MODE_ROUTES[DEFAULT_SEARCH_MODE]
+
+
+def model_for_search_mode(search_mode: str | None) -> str:
+    """Return the primary Gemini model for the given searchMode."""
+    return route_for_search_mode(search_mode).primary
+
+
+class GeminiModelSlot:
+    """
+    Per-process state for one model: reused GenerativeModel clients and concurrency limits.
+
+    Clients are keyed by their system instruction (or context cache), so the
+    safety settings and generation config are converted once, not per call.
+    """
+
+    MAX_CLIENTS = 8
+
+    def __init__(self, config: GeminiModelConfig):
+        self.config = config
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._semaphore = threading.BoundedSemaphore(config.max_concurrency)
+        # asyncio primitives belong to one event loop; async_to_sync, asyncio.run and
+        # the ASGI server each run their own, so async slots are kept per loop.
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    def client(self, system_instruction: str | None = None):
+        """Return the GenerativeModel for this model and system instruction."""
+        cached = None
+        if system_instruction and settings.GEMINI_CONTEXT_CACHE_ENABLED:
+            cached = _get_context_cache(self.config.name, system_instruction)
+        if cached is not None:
+            key = ("cached", cached.name)
         else:
-            # Handle other completion reasons
-            reason_name = "UNKNOWN"
-            if finish_reason_value is not None:
-                 reason_name = getattr(genai.types.FinishReason(finish_reason_value), 'name', str(finish_reason_value))
+            key = ("inline", hashlib.sha256(system_instruction.encode("utf-8")).hexdigest() if system_instruction else None)
+
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                if len(self._clients) >= self.MAX_CLIENTS:
+                    self._clients.clear()  # expired context caches leave stale entries behind
+                if cached is not None:
+                    client = genai.GenerativeModel.from_cached_content(
+                        cached,
+                        safety_settings=SAFETY_SETTINGS,
+                        generation_config=self.config.generation_config,
+                    )
+                else:
+                    client = genai.GenerativeModel(
+                        self.config.name,
+                        safety_settings=SAFETY_SETTINGS,
+                        generation_config=self.config.generation_config,
+                        system_instruction=system_instruction,
+                    )
+                self._clients[key] = client
+            return client
+
+    def _call_deadline(self, deadline: float | None) -> float:
+        end = time.monotonic() + self.config.timeout
+        return end if deadline is None else min(end, deadline)
+
+    def _remaining(self, end: float) -> float:
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            raise GeminiBusyError(f"No free slot for {self.config.name} in time")
+        return remaining
+
+    @contextlib.contextmanager
+    def limit(self, deadline: float | None = None, cancelled: threading.Event | None = None):
+        """
+        Hold one of the model's concurrency slots (sync callers).
+
+        The wait for the slot counts against the call, so wait plus request
+        never exceed config.timeout (or `deadline`, if earlier).
+
+        Args:
+            deadline (float, optional): time.monotonic() by which the call must be over
+            cancelled (threading.Event, optional): Give up waiting once it is set
+
+        Yields:
+            float: Seconds left for the request itself (its request timeout)
+        """
+        end = self._call_deadline(deadline)
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                raise GeminiCancelledError(f"Call to {self.config.name} cancelled")
+            wait = self._remaining(end)
+            if self._semaphore.acquire(timeout=min(wait, SLOT_POLL_INTERVAL) if cancelled is not None else wait):
+                break
+        try:
+            yield self._remaining(end)
+        finally:
+            self._semaphore.release()
+
+    @contextlib.asynccontextmanager
+    async def limit_async(self, deadline: float | None = None):
+        """Async variant of limit (max_concurrency per event loop); cancel the task to cancel the wait."""
+        semaphore = self._async_semaphore()
+        end = self._call_deadline(deadline)
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self._remaining(end))
+        except asyncio.TimeoutError:
+            raise GeminiBusyError(f"No free slot for {self.config.name} in time")
+        try:
+            yield self._remaining(end)
+        finally:
+            semaphore.release()
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.config.max_concurrency)
+            return semaphore
+
+
+class ModelRegistry:
+    """Create and reuse one GeminiModelSlot per model name."""
+
+    def __init__(self, configs: dict):
+        self.configs = configs
+        self._slots = {}
+        self._lock = threading.Lock()
+
+    def slot(self, model_name: str) -> GeminiModelSlot:
+        slot = self._slots.get(model_name)
+        if slot is None:
+            with self._lock:
+                slot = self._slots.get(model_name)
+                if slot is None:
+                    config = self.configs.get(model_name) or GeminiModelConfig(model_name)
+                    slot = self._slots[model_name] = GeminiModelSlot(config)
+        return slot
+
+
+model_registry = ModelRegistry(MODEL_CONFIGS)
+
+
+class GeminiResult:
+    """
+    Outcome of one Gemini call.
+
+    Attributes:
+        text (str | None): Response text ("" for an empty STOP, None if blocked/failed)
+        model (str): Model name
+        finish_reason (str | None): e.g. "STOP", "MAX_TOKENS", "SAFETY"
+        usage (dict): prompt_tokens, output_tokens, cached_tokens, thoughts_tokens, total_tokens
+        latency (float): Seconds from request to response
+        error (str | None): Exception message if the call failed
+        data (dict | list | None): Parsed JSON for JSON-mode calls
+        parse_error (str | None): Why the JSON-mode response could not be parsed
+        partial_text (str | None): Text generated before a MAX_TOKENS cut-off (text is None then)
+    """
+
+    def __init__(self, text, model, finish_reason=None, usage=None, latency=0.0, error=None):
+        self.text = text
+        self.model = model
+        self.finish_reason = finish_reason
+        self.usage = usage or {}
+        self.latency = latency
+        self.error = error
+        self.data = None
+        self.parse_error = None
+        self.partial_text = None
+        self.route = None  # set by api/model_router.py: mode, attempts, hedged
+        self.cancelled = False  # never sent: cancelled while waiting for a slot
+
+    @property
+    def truncated(self) -> bool:
+        return self.finish_reason == "MAX_TOKENS"
+
+    @property
+    def outcome(self) -> str:
+        """ok, empty, blocked, truncated, invalid_json, error or cancelled (recorded in model stats)."""
+        if self.cancelled:
+            return "cancelled"
+        if self.error:
+            return "error"
+        if self.truncated:
+            return "truncated"
+        if self.text is None:
+            return "blocked"
+        if self.text == "":
+            return "empty"
+        if self.parse_error:
+            return "invalid_json"
+        return "ok"
+
+    @property
+    def ok(self) -> bool:
+        return self.text is not None
+
+
+# ─────────────────────────── Model Construction / Context Caching ─────────────────────────── #
+CONTEXT_CACHE_REFRESH_MARGIN = 300  # seconds before expiry at which a cache is no longer reused
+CONTEXT_CACHE_RETRY_AFTER = 3600  # seconds to wait before retrying a model that refused caching
+CONTEXT_CACHE_ERROR_RETRY_AFTER = 60  # seconds to wait after any other failure (network, quota, Redis)
+# Error messages with which Gemini refuses to cache a prompt for good (model or prompt size).
+CONTEXT_CACHE_REFUSALS = ("too small", "min_total_token_count", "not supported", "does not support")
+
+_context_caches = {}  # (model, digest) -> CachedContent
+_context_cache_unavailable = {}  # (model, digest) -> monotonic time when caching may be retried
+
+
+def _context_cache_key(model_name: str, digest: str) -> str:
+    return f"gemini:ctxcache:{model_name}:{digest}"
+
+
+def _is_caching_refused(error: Exception) -> bool:
+    """True if Gemini will never cache this prompt for this model (unsupported model, too few tokens)."""
+    message = str(error).lower()
+    return any(refusal in message for refusal in CONTEXT_CACHE_REFUSALS)
+
+
+def _get_context_cache(model_name: str, system_instruction: str):
+    """
+    Return a CachedContent holding system_instruction for model_name, or None.
+
+    The cache is created once and its name is shared through Redis, so all
+    workers reuse one cached prefix until shortly before it expires. Models
+    that reject caching (unsupported model, prompt below the minimum size) are
+    not retried for CONTEXT_CACHE_RETRY_AFTER seconds; other failures
+    (network, quota, Redis) only for CONTEXT_CACHE_ERROR_RETRY_AFTER seconds.
+    """
+    digest = hashlib.sha256(system_instruction.encode("utf-8")).hexdigest()[:16]
+    local_key = (model_name, digest)
+    if _context_cache_unavailable.get(local_key, 0) > time.monotonic():
+        return None
+
+    cached = _context_caches.get(local_key)
+    now = datetime.datetime.now(datetime.timezone.utc)
+    margin = datetime.timedelta(seconds=CONTEXT_CACHE_REFRESH_MARGIN)
+    if cached is not None and cached.expire_time - now > margin:
+        return cached
+
+    try:
+        shared_name = redis_client.get(_context_cache_key(model_name, digest))
+        if shared_name:
+            try:
+                cached = caching.CachedContent.get(shared_name)
+            except Exception as e:
+                # Deleted or expired early; another worker's cache is simply replaced.
+                print(f"⚠️ Shared context cache {shared_name} unavailable ({e}); creating a new one.")
+                cached = None
+            if cached is not None and cached.expire_time - now > margin:
+                _context_caches[local_key] = cached
+                return cached
+
+        ttl = settings.GEMINI_CONTEXT_CACHE_TTL
+        cached = caching.CachedContent.create(
+            model=model_name,
+            display_name=f"trip-prompt-{digest}",
+            system_instruction=system_instruction,
+            ttl=datetime.timedelta(seconds=ttl),
+        )
+        try:
+            redis_client.set(_context_cache_key(model_name, digest), cached.name, ex=max(ttl - CONTEXT_CACHE_REFRESH_MARGIN, 60))
+        except RedisError as e:
+            print(f"⚠️ Could not share context cache {cached.name} ({e}); using it in this process only.")
+        print(f"🗄️ Created Gemini context cache {cached.name} for {model_name}")
+        _context_caches[local_key] = cached
+        return cached
+    except Exception as e:
+        retry_after = CONTEXT_CACHE_RETRY_AFTER if _is_caching_refused(e) else CONTEXT_CACHE_ERROR_RETRY_AFTER
+        print(f"⚠️ Context caching unavailable for {model_name} ({e}). Sending the system instruction inline, retrying in {retry_after}s.")
+        _context_cache_unavailable[local_key] = time.monotonic() + retry_after
+        return None
+
+
+_json_generation_configs = {}
+
+
+def json_generation_config(response_schema: dict | None = None) -> dict:
+    """
+    Per-call generation config that makes Gemini answer with bare JSON.
+
+    Configs are cached by the schema's canonical JSON, so module-level schemas
+    and per-call ones built from the same parts (repair requests) are converted
+    to their proto form once; with GEMINI_JSON_MODE_ENABLED off this returns {}
+    and the prompt alone asks for JSON.
+
+    Args:
+        response_schema (dict, optional): Schema from api.itinerary_schema
+
+    Returns:
+        dict: generation_config overrides for generate_content
+    """
+    if not settings.GEMINI_JSON_MODE_ENABLED:
+        return {}
+    key = json.dumps(response_schema, sort_keys=True)
+    config = _json_generation_configs.get(key)
+    if config is None:
+        config = {"response_mime_type": "application/json"}
+        if response_schema is not None:
+            config["response_schema"] = response_schema
+        config = _json_generation_configs[key] = generation_types.to_generation_config_dict(config)
+    return config
+
+
+def get_generative_model(model_name: str, system_instruction: str | None = None):
+    """
+    Return the reused GenerativeModel for a model, with a context-cached system instruction when possible.
+
+    Args:
+        model_name (str): Gemini model name
+        system_instruction (str, optional): Static instruction shared across requests
+
+    Returns:
+        genai.GenerativeModel
+    """
+    return model_registry.slot(model_name).client(system_instruction)
+
+
+# ─────────────────────────── Response Processing ─────────────────────────── #
+def _process_response(response) -> str | None:
+    """
+    Validate a Gemini response and return its text.
 
-            print(f"⚠️ Model finished for reason: {reason_name} (Value: {finish_reason_value})")
+    Shared by the sync and async call paths.
+
+    Args:
+        response: GenerateContentResponse returned by the SDK
+
+    Returns:
+        str | None: The model's response text, "" for an empty STOP, or None if blocked/aborted
+    """
+    # Check for safety blocks
+    prompt_feedback = getattr(response, 'prompt_feedback', None)
+    if prompt_feedback and getattr(prompt_feedback, 'block_reason', None):
+         block_reason_value = getattr(prompt_feedback, 'block_reason', 'UNKNOWN')
+         reason_name = getattr(block_reason_value, 'name', str(block_reason_value))
+         print(f"⚠️ Prompt blocked: {reason_name}")
+         safety_ratings = getattr(prompt_feedback, 'safety_ratings', [])
+         if safety_ratings:
+              print(f"   Safety Ratings (Prompt): {safety_ratings}")
+         return None
+
+    # Handle empty response
+    if not response.candidates:
+        print("⚠️ No candidates returned in the response.")
+        if hasattr(response, 'text') and response.text:
+             print("   ℹ️ Found text directly on response object.")
+             return response.text
+        return None
+
+    # Process response
+    candidate = response.candidates[0]
+    finish_reason_value = getattr(candidate, 'finish_reason', None) 
+
+    if finish_reason_value == 1:  # Normal completion
+        content = getattr(candidate, 'content', None)
+        parts = getattr(content, 'parts', []) if content else []
+
+        if parts:
+            full_text = "".join(part.text for part in parts if hasattr(part, 'text'))
+            print("   ✅ Model finished normally (STOP) and returned content.")
+            return full_text
+        else:
+            print("   ⚠️ Model finished normally (STOP) but returned no content parts.")
             safety_ratings = getattr(candidate, 'safety_ratings', [])
             if safety_ratings:
                 print(f"   Safety Ratings (Response): {safety_ratings}")
-
-            if finish_reason_value == 2: 
-                 print("   Reason details: FINISH_REASON_SAFETY")
-            elif finish_reason_value == 4:
+            if finish_reason_value == 4: 
                  print("   Reason details: FINISH_REASON_RECITATION")
-            elif finish_reason_value == 3:
-                 print("   Reason details: FINISH_REASON_MAX_TOKENS")
+            return "" 
+
+    else:
+        # Handle other completion reasons
+        reason_name = "UNKNOWN"
+        if finish_reason_value is not None:
+             reason_name = getattr(finish_reason_value, 'name', str(finish_reason_value))
+
+        print(f"⚠️ Model finished for reason: {reason_name} (Value: {finish_reason_value})")
+        safety_ratings = getattr(candidate, 'safety_ratings', [])
+        if safety_ratings:
+            print(f"   Safety Ratings (Response): {safety_ratings}")
+
+        if finish_reason_value == 2: 
+             print("   Reason details: FINISH_REASON_SAFETY")
+        elif finish_reason_value == 4:
+             print("   Reason details: FINISH_REASON_RECITATION")
+        elif finish_reason_value == 3:
+             print("   Reason details: FINISH_REASON_MAX_TOKENS")
+
+
+        return None 
+
+
+def _finish_reason_name(response) -> str | None:
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return None
+    value = getattr(candidates[0], 'finish_reason', None)
+    return getattr(value, 'name', None) or (str(value) if value is not None else None)
+
+
+def _candidate_text(response) -> str:
+    candidates = getattr(response, 'candidates', None)
+    if not candidates:
+        return ""
+    content = getattr(candidates[0], 'content', None)
+    parts = getattr(content, 'parts', []) if content else []
+    return "".join(part.text for part in parts if hasattr(part, 'text'))
+
+
+def _build_result(response, model_to_use: str, started: float, json_output: bool) -> GeminiResult:
+    """Wrap an SDK response in a GeminiResult (shared by the sync and async paths)."""
+    result = GeminiResult(
+        _process_response(response),
+        model_to_use,
+        finish_reason=_finish_reason_name(response),
+        usage=_usage(response),
+        latency=time.perf_counter() - started,
+    )
+    if result.text is None and result.truncated:
+        # Keep what was generated so callers can salvage and repair it.
+        result.partial_text = _candidate_text(response)
+    if json_output:
+        with timed("json_parse"):
+            _parse_result_json(result)
+    return result
+
+
+def _usage(response) -> dict:
+    metadata = getattr(response, 'usage_metadata', None)
+    if metadata is None:
+        return {}
+    return {
+        "prompt_tokens": getattr(metadata, 'prompt_token_count', 0) or 0,
+        "output_tokens": getattr(metadata, 'candidates_token_count', 0) or 0,
+        "cached_tokens": getattr(metadata, 'cached_content_token_count', 0) or 0,
+        "thoughts_tokens": getattr(metadata, 'thoughts_token_count', 0) or 0,
+        "total_tokens": getattr(metadata, 'total_token_count', 0) or 0,
+    }
+
 
+# ─────────────────────────── GEMINI Model Function ─────────────────────────── #
+def generate(
+    prompt: str,
+    model_to_use: str,
+    system_instruction: str | None = None,
+    json_output: bool = False,
+    response_schema: dict | None = None,
+    deadline: float | None = None,
+    cancelled: threading.Event | None = None,
+) -> GeminiResult:
+    """
+    Send a prompt to a Gemini model through the model registry.
+
+    Features:
+    - Reused client per model (safety settings and generation config built once)
+    - Per-model timeout (slot wait included) and concurrency limit
+    - Response validation, finish reason, token usage and latency
 
-            return None 
-        # --- END OF CORRECTED FINISH REASON LOGIC ---
+    Args:
+        prompt (str): The input prompt for the model
+        model_to_use (str): The specific Gemini model to use
+        system_instruction (str, optional): Static instruction (context-cached when possible)
+        json_output (bool): Ask for bare JSON and parse it into result.data
+        response_schema (dict, optional): Schema the JSON must follow (implies json_output)
+        deadline (float, optional): time.monotonic() by which the call must be over (e.g. a cascade budget)
+        cancelled (threading.Event, optional): Once set, the call is not started (result.cancelled)
+
+    Returns:
+        GeminiResult: text is None if the call failed, was blocked or was cancelled
+    """
+    result = _generate(prompt, model_to_use, system_instruction, json_output, response_schema, deadline, cancelled)
+    if not result.cancelled:  # never sent: says nothing about the model and cost nothing
+        model_stats.record(model_to_use, result.latency, result.outcome)
+        usage_ledger.record(model_to_use, result.latency, result.outcome, result.finish_reason, result.usage)
+    return result
+
+
+def _generate(prompt, model_to_use, system_instruction, json_output, response_schema, deadline=None, cancelled=None) -> GeminiResult:
+    slot = model_registry.slot(model_to_use)
+    json_output = json_output or response_schema is not None
+    request_kwargs = {}
+    if json_output:
+        request_kwargs["generation_config"] = json_generation_config(response_schema)
+    started = time.perf_counter()
+    try:
+        with slot.limit(deadline, cancelled) as timeout:
+            print(f"\n🤖 Sending prompt to model: {model_to_use}...")
+            model = slot.client(system_instruction)
+            with timed("gemini", model=model_to_use):
+                response = model.generate_content(prompt, request_options={"timeout": timeout}, **request_kwargs)
+        return _build_result(response, model_to_use, started, json_output)
+
+    except GeminiCancelledError as e:
+        result = GeminiResult(None, model_to_use, latency=time.perf_counter() - started, error=str(e))
+        result.cancelled = True
+        return result
 
     except AttributeError as ae:
          print(f"❌ AttributeError during Gemini API processing: {ae}")
          print(f"   This often means an incompatibility between the code and the installed library version regarding response structure.")
          print("Traceback:")
          traceback.print_exc()
-         return None
+         return GeminiResult(None, model_to_use, latency=time.perf_counter() - started, error=str(ae))
     except Exception as e:
         print(f"❌ Unexpected error during Gemini API call: {e}")
         print("Traceback:")
         traceback.print_exc()
-        return None
+        return GeminiResult(None, model_to_use, latency=time.perf_counter() - started, error=str(e))
+
+
+def ask_gemini(prompt: str, model_to_use: str, system_instruction: str | None = None) -> str | None:
+    """
+    Send a prompt to the specified Gemini model and get the response text.
+
+    Args:
+        prompt (str): The input prompt for the model
+        model_to_use (str): The specific Gemini model to use
+        system_instruction (str, optional): Static instruction (context-cached when possible)
+        
+    Returns:
+        str | None: The model's response text or None if error/blocked
+    """
+    return generate(prompt, model_to_use, system_instruction).text
+
+
+# ─────────────────────────── GEMINI Async Model Function ─────────────────────────── #
+async def generate_async(
+    prompt: str,
+    model_to_use: str,
+    system_instruction: str | None = None,
+    json_output: bool = False,
+    response_schema: dict | None = None,
+) -> GeminiResult:
+    """
+    Async counterpart of generate for views served through ASGI.
+
+    The request is awaited on the event loop (grpc.aio) instead of blocking a
+    worker thread, so a single process can hold many in-flight calls.
+
+    Args:
+        prompt (str): The input prompt for the model
+        model_to_use (str): The specific Gemini model to use
+        system_instruction (str, optional): Static instruction (context-cached when possible)
+        json_output (bool): Ask for bare JSON and parse it into result.data
+        response_schema (dict, optional): Schema the JSON must follow (implies json_output)
+
+    Returns:
+        GeminiResult: text is None if the call failed or was blocked
+    """
+    result = await _generate_async(prompt, model_to_use, system_instruction, json_output, response_schema)
+    await model_stats.record_async(model_to_use, result.latency, result.outcome)
+    usage_ledger.record(model_to_use, result.latency, result.outcome, result.finish_reason, result.usage)
+    return result
+
+
+async def _generate_async(prompt, model_to_use, system_instruction, json_output, response_schema) -> GeminiResult:
+    print(f"\n🤖 Sending prompt to model (async): {model_to_use}...")
+    slot = model_registry.slot(model_to_use)
+    json_output = json_output or response_schema is not None
+    request_kwargs = {}
+    if json_output:
+        request_kwargs["generation_config"] = json_generation_config(response_schema)
+    started = time.perf_counter()
+    try:
+        async with slot.limit_async() as timeout:
+            # Creating a context cache is a blocking HTTP call (about once an hour).
+            model = await asyncio.to_thread(slot.client, system_instruction)
+            with timed("gemini", model=model_to_use):
+                response = await model.generate_content_async(prompt, request_options={"timeout": timeout}, **request_kwargs)
+        return _build_result(response, model_to_use, started, json_output)
+
+    except Exception as e:
+        print(f"❌ Unexpected error during async Gemini API call: {e}")
+        print("Traceback:")
+        traceback.print_exc()
+        return GeminiResult(None, model_to_use, latency=time.perf_counter() - started, error=str(e))
+
+
+async def ask_gemini_async(prompt: str, model_to_use: str, system_instruction: str | None = None) -> str | None:
+    """Async counterpart of ask_gemini; returns the response text or None."""
+    return (await generate_async(prompt, model_to_use, system_instruction)).text
+
+
+def ask_gemini_json(prompt: str, model_to_use: str, system_instruction: str | None = None, response_schema: dict | None = None):
+    """Like ask_gemini, but in JSON mode; returns the parsed object or None."""
+    return generate(prompt, model_to_use, system_instruction, json_output=True, response_schema=response_schema).data
+
+
+async def ask_gemini_json_async(prompt: str, model_to_use: str, system_instruction: str | None = None, response_schema: dict | None = None):
+    """Async counterpart of ask_gemini_json."""
+    result = await generate_async(prompt, model_to_use, system_instruction, json_output=True, response_schema=response_schema)
+    return result.data
+
+
+# ─────────────────────────── GEMINI Streaming Function ─────────────────────────── #
+def ask_gemini_stream(prompt: str, model_to_use: str, system_instruction: str | None = None, response_schema: dict | None = None):
+    """
+    Send a prompt to the specified Gemini model and yield the response as it arrives.
+
+    Features:
+    - Incremental delivery of text chunks (stream=True)
+    - Safety block detection on the first chunk
+    - Finish reason validation on the final chunk
+    - Token usage and wall time recorded in the usage ledger, also for aborted streams
+
+    Args:
+        prompt (str): The input prompt for the model
+        model_to_use (str): The specific Gemini model to use
+        system_instruction (str, optional): Static instruction (context-cached when possible)
+        response_schema (dict, optional): Stream bare JSON following this schema
+
+    Yields:
+        str: Text chunks in the order the model produced them
+
+    Raises:
+        GeminiStreamError: If the prompt is blocked or the model stops abnormally
+    """
+    print(f"\n🤖 Streaming prompt to model: {model_to_use}...")
+    slot = model_registry.slot(model_to_use)
+    request_kwargs = {}
+    if response_schema is not None:
+        request_kwargs["generation_config"] = json_generation_config(response_schema)
+    # Generators resume in their consumer's context, so capture the caller's attribution now.
+    llm_context = get_llm_context()
+    started = time.perf_counter()
+    response, outcome, reason_name = None, "error", None
+    try:
+        with contextlib.ExitStack() as stack:
+            try:
+                timeout = stack.enter_context(slot.limit())
+                model = slot.client(system_instruction)
+                response = model.generate_content(prompt, stream=True, request_options={"timeout": timeout}, **request_kwargs)
+            except Exception as e:
+                raise GeminiStreamError(f"Gemini stream could not be started: {e}") from e
+
+            finish_reason_value = yield from _iter_stream(response)
+
+        # Enum values compare equal to their ints; 0 means the final chunk carried no reason.
+        if finish_reason_value not in (None, 0, 1):
+            reason_name = getattr(finish_reason_value, 'name', str(finish_reason_value))
+            outcome = "truncated" if reason_name == "MAX_TOKENS" else "blocked"
+            print(f"⚠️ Model stream finished for reason: {reason_name}")
+            raise GeminiStreamError(f"Model stopped early: {reason_name}", finish_reason=reason_name)
+        outcome, reason_name = "ok", "STOP"
+        print("   ✅ Model stream finished normally (STOP).")
+    except GeneratorExit:
+        outcome = "cancelled"
+        raise
+    finally:
+        usage_ledger.record(
+            model_to_use, time.perf_counter() - started, outcome, reason_name,
+            _usage(response) if response is not None else None, streamed=True, context=llm_context,
+        )
+
+
+def _iter_stream(response):
+    """Yield text from a streaming response and return the last finish reason."""
+    finish_reason_value = None
+    try:
+        for chunk in response:
+            prompt_feedback = getattr(chunk, 'prompt_feedback', None)
+            if prompt_feedback and getattr(prompt_feedback, 'block_reason', None):
+                block_reason_value = getattr(prompt_feedback, 'block_reason', 'UNKNOWN')
+                reason_name = getattr(block_reason_value, 'name', str(block_reason_value))
+                print(f"⚠️ Prompt blocked: {reason_name}")
+                raise GeminiStreamError(f"Prompt blocked: {reason_name}")
+
+            for candidate in getattr(chunk, 'candidates', None) or []:
+                content = getattr(candidate, 'content', None)
+                parts = getattr(content, 'parts', []) if content else []
+                text = "".join(part.text for part in parts if hasattr(part, 'text'))
+                if text:
+                    yield text
+                if getattr(candidate, 'finish_reason', None):
+                    finish_reason_value = candidate.finish_reason
+                break
+    except GeminiStreamError:
+        raise
+    except Exception as e:
+        print(f"❌ Unexpected error during Gemini stream: {e}")
+        traceback.print_exc()
+        raise GeminiStreamError(f"Gemini stream failed: {e}") from e
+    return finish_reason_value
 
 
 # ─────────────────────────── JSON Extraction Utility ─────────────────────────── #
+def parse_json_response(response: str | None):
+    """
+    Parse a model response as JSON with exactly one decode.
+
+    JSON-mode responses are bare JSON and are decoded as-is. Otherwise a
+    surrounding ```json fence or text around the outermost braces is sliced
+    off first, without trial decodes.
+
+    Args:
+        response (str | None): The model response
+
+    Returns:
+        dict | list: The parsed JSON
+
+    Raises:
+        ValueError: If the response is empty or not valid JSON (json.JSONDecodeError is a ValueError)
+    """
+    if not response:
+        raise ValueError("Empty response cannot be parsed as JSON")
+
+    text = response.strip()
+    if text[:1] not in ("{", "["):
+        if text.startswith("```") and text.endswith("```"):
+            # ```json ... ``` -> drop the fence without scanning the body
+            text = text[3:-3]
+            if text[:4].lower() == "json":
+                text = text[4:]
+            text = text.strip()
+        else:
+            first_brace = text.find('{')
+            last_brace = text.rfind('}')
+            if first_brace != -1 and last_brace > first_brace:
+                text = text[first_brace:last_brace + 1]
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
+
+
+def _parse_result_json(result: GeminiResult) -> None:
+    """Fill result.data (or result.parse_error) from result.text."""
+    if not result.text:
+        return
+    try:
+        result.data = parse_json_response(result.text)
+    except ValueError as e:
+        result.parse_error = str(e)
+        print(f"❌ Gemini JSON response could not be parsed ({len(result.text)} chars, finish reason {result.finish_reason}): {e}")
+
 
 def extract_json_from_response(response: str | None) -> str:
     """
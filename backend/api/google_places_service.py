@@ -6,35 +6,147 @@ It handles place searches, details retrieval, and photo management.
 
 Key Features:
 - Place search and details retrieval
-- Photo URL generation
-- Response caching
+- Signed photo proxy URL generation
+- Response caching in the shared Redis-backed Django cache
+- Stampede guard so concurrent misses for one place cost one API call
+- One client per process with a pooled keep-alive HTTP session
 - Error handling
 - Data processing and formatting
 """
 
+import contextvars
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
 from googlemaps import Client
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from django.conf import settings
 from django.core.cache import cache
 
+from .cache_keys import normalize_text
+from .utils.photo_signing import build_photo_proxy_url, proxy_legacy_photo_urls
+from .utils.redis_client import redis_client
+from .utils.request_timing import timed
+from .utils.single_flight import SingleFlight
+
+# v2: photo URLs point at the signed photo proxy instead of Google (no API key)
+PLACE_CACHE_VERSION = 2
+PLACE_CACHE_PREFIX = f"places:v{PLACE_CACHE_VERSION}"
+
+# Stored for queries Google has no result for, so they are not re-billed on every lookup.
+PLACE_NOT_FOUND = {"__not_found__": True}
+PLACE_NOT_FOUND_TTL = 60 * 60 * 6  # 6 hours
+
+place_single_flight = SingleFlight(
+    redis_client,
+    namespace="places:singleflight",
+    lock_ttl=30,
+    wait_timeout=15,
+    poll_interval=0.1,
+)
+
+
+def make_place_cache_key(query, location=None) -> str:
+    """
+    Return the cache key for a place lookup, e.g. "places:v2:9b2e..." (PLACE_CACHE_PREFIX).
+
+    The query is normalized (case, whitespace) and hashed, so keys are short,
+    safe for any cache backend and shared by equivalent queries.
+    """
+    raw = normalize_text(query)
+    if location:
+        raw += "|" + ",".join(f"{float(c):.4f}" for c in location)
+    return f"{PLACE_CACHE_PREFIX}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]}"
+
+
+def _cache_get(key):
+    try:
+        return proxy_legacy_photo_urls(cache.get(key))
+    except Exception as e:
+        print(f"⚠️ Cache Error: {e}. Proceeding without cache.")
+        return None
+
+
+def _cache_get_many(keys):
+    try:
+        return {key: proxy_legacy_photo_urls(value) for key, value in cache.get_many(keys).items()}
+    except Exception as e:
+        print(f"⚠️ Cache Error: {e}. Proceeding without cache.")
+        return {}
+
+
+def _cache_set(key, value, timeout):
+    try:
+        cache.set(key, value, timeout)
+    except Exception as e:
+        print(f"⚠️ Cache Set Error: {e}. Could not cache result.")
+
+def build_places_session() -> requests.Session:
+    """
+    Build the HTTP session shared by all Places API calls in this process.
+
+    Connections are kept alive and pooled, so warm lookups skip the TCP/TLS
+    handshake. Connection errors and 502/503/504 responses are retried with
+    exponential backoff; googlemaps handles quota (OVER_QUERY_LIMIT) retries.
+    """
+    retry = Retry(
+        total=settings.GOOGLE_PLACES_MAX_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.GOOGLE_PLACES_POOL_SIZE,
+        pool_maxsize=settings.GOOGLE_PLACES_POOL_SIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def build_places_client(**kwargs) -> Client:
+    """Create a googlemaps Client on a pooled session with the configured timeouts."""
+    return Client(
+        key=settings.GOOGLE_API_KEY,
+        connect_timeout=settings.GOOGLE_PLACES_CONNECT_TIMEOUT,
+        read_timeout=settings.GOOGLE_PLACES_READ_TIMEOUT,
+        retry_timeout=settings.GOOGLE_PLACES_RETRY_TIMEOUT,
+        queries_per_second=settings.GOOGLE_PLACES_QPS,
+        requests_session=build_places_session(),
+        **kwargs,
+    )
+
+
 class GooglePlacesService:
     """
     Service class for interacting with Google Places API.
     
     Features:
     - Place search and details retrieval
-    - Photo URL generation
-    - Response caching (72 hours)
+    - Signed photo proxy URL generation
+    - Response caching (72 hours, shared across workers)
     - Error handling
     - Data processing
     """
     
-    def __init__(self):
+    def __init__(self, client=None):
         """
         Initialize the Google Places service.
         
-        Sets up the Google Maps client and cache duration.
+        Sets up the Google Maps client and cache duration. Views should use
+        get_places_service() instead, so the client and its connection pool
+        are reused across requests.
+
+        Args:
+            client (googlemaps.Client, optional): Client to use instead of a new pooled one
         """
-        self.client = Client(key=settings.GOOGLE_API_KEY)
+        self.client = client or build_places_client()
         self.cache_duration = 60 * 60 * 72  # 72 hours in seconds
 
     def search_place(self, query, location=None):
@@ -48,46 +160,117 @@ class GooglePlacesService:
         Returns:
             dict: Processed place details or None if not found/error
         """
-        cache_key = f"place_details_{query}"
-        cached_result = cache.get(cache_key)
-        
-        if cached_result:
+        cache_key = make_place_cache_key(query, location)
+        with timed("places_cache"):
+            cached_result = _cache_get(cache_key)
+
+        if cached_result is None:
+            cached_result = self._resolve_miss(query, location, cache_key)
+        else:
             print("📦 Returning cached result for:", query)
-            return cached_result
 
+        if cached_result == PLACE_NOT_FOUND:
+            return None
+        return cached_result
+
+    def search_places(self, queries, location=None):
+        """
+        Look up many places at once.
+
+        Queries are de-duplicated by cache key, cache hits are read with one
+        get_many (a single Redis MGET) and misses are fetched concurrently on
+        a bounded, process-wide thread pool.
+
+        Args:
+            queries (list[str]): Search queries (duplicates allowed)
+            location (tuple, optional): (latitude, longitude) applied to every query
+
+        Returns:
+            tuple[dict, dict]: ({query: details or None}, {"unique", "cache_hits", "fetched"})
+        """
+        keys = {query: make_place_cache_key(query, location) for query in queries}
+        unique_keys = {}
+        for query, key in keys.items():
+            unique_keys.setdefault(key, query)
+
+        with timed("places_cache"):
+            resolved = _cache_get_many(list(unique_keys))
+        misses = [key for key in unique_keys if key not in resolved]
+        print(f"📦 Batch place lookup: {len(unique_keys)} unique, {len(resolved)} cached, {len(misses)} to fetch")
+
+        if misses:
+            # Each fetch runs in a copy of the caller's context so its timing reaches the request.
+            futures = {
+                key: _get_batch_executor().submit(
+                    contextvars.copy_context().run, self._resolve_miss, unique_keys[key], location, key
+                )
+                for key in misses
+            }
+            for key, future in futures.items():
+                try:
+                    resolved[key] = future.result()
+                except Exception as e:
+                    print(f"❌ Error fetching '{unique_keys[key]}' in batch: {e}")
+                    resolved[key] = None
+
+        results = {}
+        for query, key in keys.items():
+            value = resolved.get(key)
+            results[query] = None if value == PLACE_NOT_FOUND else value
+        stats = {"unique": len(unique_keys), "cache_hits": len(unique_keys) - len(misses), "fetched": len(misses)}
+        return results, stats
+
+    def _resolve_miss(self, query, location, cache_key):
+        """Fetch a cache miss once across concurrent callers (see place_single_flight)."""
+        return place_single_flight.run(
+            cache_key,
+            compute=lambda: self._fetch_place(query, location, cache_key),
+            load=lambda: _cache_get(cache_key),
+        )
+
+    def _fetch_place(self, query, location, cache_key):
+        """
+        Fetch a place from the Google Places API and cache the outcome.
+
+        Returns:
+            dict | None: Processed place details, PLACE_NOT_FOUND, or None on error
+        """
         try:
             print(f"🔍 Searching for place: {query}")
             
-            places_result = self.client.places(
-                query,
-                location=location,
-            )
+            with timed("places_api"):
+                places_result = self.client.places(
+                    query,
+                    location=location,
+                )
 
             if not places_result.get('results'):
                 print("❌ No results found")
-                return None
+                _cache_set(cache_key, PLACE_NOT_FOUND, PLACE_NOT_FOUND_TTL)
+                return PLACE_NOT_FOUND
 
             # Get full details
             place_id = places_result['results'][0]['place_id']
-            place_details = self.client.place(
-                place_id,
-                fields=[
-                    'name',
-                    'formatted_address',
-                    'rating',
-                    'user_ratings_total',
-                    'photo',
-                    'formatted_phone_number',
-                    'opening_hours',
-                    'website',
-                    'price_level',
-                    'reviews',
-                    'geometry'
-                ],
-            )
+            with timed("places_api"):
+                place_details = self.client.place(
+                    place_id,
+                    fields=[
+                        'name',
+                        'formatted_address',
+                        'rating',
+                        'user_ratings_total',
+                        'photo',
+                        'formatted_phone_number',
+                        'opening_hours',
+                        'website',
+                        'price_level',
+                        'reviews',
+                        'geometry'
+                    ],
+                )
 
             result = self._process_place_details(place_details['result'])
-            cache.set(cache_key, result, self.cache_duration)
+            _cache_set(cache_key, result, self.cache_duration)
             
             print("✅ Successfully fetched place details")
             return result
@@ -154,10 +337,48 @@ class GooglePlacesService:
         """
         Generate a photo URL from a photo reference.
         
+        The URL points at our photo proxy and is HMAC-signed, so the API key
+        never reaches the client and every photo request is cacheable.
+
         Args:
             photo_reference (str): Google Places photo reference
             
         Returns:
-            str: Complete photo URL with API key
+            str: Signed proxy URL, e.g. "/api/place-photo/?photoreference=...&maxwidth=800&sig=..."
         """
-        return f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photoreference={photo_reference}&key={settings.GOOGLE_API_KEY}"
+        return build_photo_proxy_url(photo_reference, 800)
+
+
+_places_service = None
+_places_service_lock = threading.Lock()
+
+
+def get_places_service() -> GooglePlacesService:
+    """
+    Return the process-wide GooglePlacesService, creating it on first use.
+
+    Returns:
+        GooglePlacesService: Shared instance (thread-safe; the session pools connections)
+    """
+    global _places_service
+    if _places_service is None:
+        with _places_service_lock:
+            if _places_service is None:
+                _places_service = GooglePlacesService()
+    return _places_service
+
+
+_batch_executor = None
+
+
+def _get_batch_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by all batch lookups, so concurrent batches stay bounded."""
+    global _batch_executor
+    if _batch_executor is None:
+        with _places_service_lock:
+            if _batch_executor is None:
+                _batch_executor = ThreadPoolExecutor(
+                    max_workers=settings.PLACE_BATCH_MAX_WORKERS,
+                    thread_name_prefix="places-batch",
+                )
+    return _batch_executor
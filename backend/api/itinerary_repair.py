@@ -0,0 +1,312 @@
+"""
+Itinerary Validation and Partial Repair
+
+When a generated itinerary comes back incomplete (missing `summary` or other
+top-level fields, fewer days than the trip has, empty days, or JSON cut off
+by MAX_TOKENS), the complete parts are kept and the model is asked to
+generate only what is missing. This is cheaper than regenerating the whole plan.
+
+Key Features:
+- Gap detection against the requested trip length
+- Salvage of completed days from truncated JSON (IncrementalDaysParser)
+- Repair prompt and response schema covering only the missing fragments
+- Merge of repaired days/fields into the partial plan, up to TRIP_REPAIR_MAX_ROUNDS
+- repair_plan for plans assembled elsewhere (fan-out days that failed)
+- Days that stay broken become placeholders in a plan flagged "incomplete": true,
+  which is returned to the client but never cached
+"""
+
+from datetime import date
+
+from django.conf import settings
+
+from .chat_request import generate, generate_async, parse_json_response
+from .itinerary_schema import DAY, TRIP_RESPONSE_SCHEMA
+from .utils.stream_parser import IncrementalDaysParser
+
+# Top-level fields besides `days` that a finished plan must have.
+REQUIRED_PLAN_FIELDS = ("summary", "destination_info", "total_cost_estimate")
+
+
+# ─────────────────────────── Gap Detection ─────────────────────────── #
+class ItineraryGaps:
+    """
+    What a partial itinerary is missing.
+
+    Attributes:
+        missing_fields (list[str]): Top-level fields to regenerate
+        missing_days (list[int]): 0-based indices of days to regenerate
+    """
+
+    def __init__(self, missing_fields, missing_days):
+        self.missing_fields = missing_fields
+        self.missing_days = missing_days
+
+    def __bool__(self):
+        return bool(self.missing_fields or self.missing_days)
+
+    def __str__(self):
+        days = [index + 1 for index in self.missing_days]
+        return f"fields={self.missing_fields or '-'} days={days or '-'}"
+
+
+def expected_day_count(data: dict) -> int | None:
+    """Number of days the request covers (PlanTripSerializer data), or None if unknown."""
+    start, end = data.get("startDate"), data.get("endDate")
+    if isinstance(start, date) and isinstance(end, date) and end >= start:
+        return (end - start).days + 1
+    if isinstance(start, date):
+        return 1
+    return None
+
+
+def is_complete_day(day) -> bool:
+    """A day is usable if it has a title and at least one described activity."""
+    if not isinstance(day, dict) or not day.get("title"):
+        return False
+    activities = day.get("activities")
+    return (
+        isinstance(activities, list)
+        and bool(activities)
+        and all(isinstance(activity, dict) and activity.get("description") for activity in activities)
+    )
+
+
+def find_itinerary_gaps(plan: dict, expected_days: int | None = None) -> ItineraryGaps:
+    """
+    List the fields and days a plan is missing.
+
+    Args:
+        plan (dict): Parsed (possibly partial) itinerary
+        expected_days (int, optional): Trip length; extra days are left alone
+
+    Returns:
+        ItineraryGaps: Falsy if the plan is complete
+    """
+    days = plan.get("days") if isinstance(plan.get("days"), list) else []
+    missing_days = [index for index, day in enumerate(days) if not is_complete_day(day)]
+    if expected_days:
+        missing_days = [index for index in missing_days if index < expected_days]
+        missing_days += list(range(len(days), expected_days))
+    elif not days:
+        missing_days = [0]
+    missing_fields = [field for field in REQUIRED_PLAN_FIELDS if not plan.get(field)]
+    return ItineraryGaps(missing_fields, missing_days)
+
+
+def salvage_itinerary(text: str | None) -> dict:
+    """
+    Recover what can be used from a model answer that may be cut off.
+
+    Returns:
+        dict: The parsed plan, or {"days": [...completed days...]} for truncated JSON
+    """
+    if not text:
+        return {}
+    try:
+        parsed = parse_json_response(text)
+        if isinstance(parsed, dict):
+            return parsed
+    except ValueError:
+        pass
+    days = []
+    for index, day in IncrementalDaysParser().feed_indexed(text):
+        days.extend([None] * (index - len(days)))  # unparsable days stay missing at their position
+        days.append(day)
+    return {"days": days}
+
+
+def _result_plan(result) -> dict:
+    if isinstance(result.data, dict):
+        return result.data
+    return salvage_itinerary(result.text or result.partial_text)
+
+
+# ─────────────────────────── Repair Request ─────────────────────────── #
+def build_repair_request(user_prompt: str, plan: dict, gaps: ItineraryGaps) -> tuple[str, dict]:
+    """
+    Build the prompt and response schema for regenerating only the missing parts.
+
+    Args:
+        user_prompt (str): The original per-request trip prompt (user preferences)
+        plan (dict): The partial plan
+        gaps (ItineraryGaps): What to regenerate
+
+    Returns:
+        tuple[str, dict]: Repair prompt and its response schema
+    """
+    properties = {field: TRIP_RESPONSE_SCHEMA["properties"][field] for field in gaps.missing_fields}
+    lines = [
+        user_prompt,
+        "",
+        "**Repair Task:** A previous answer for this trip was incomplete. Keep everything that already exists "
+        "and generate ONLY the missing parts listed below, consistent with the existing days.",
+    ]
+
+    existing = [
+        f"- {day.get('title')} "
+        f"({', '.join(str(a.get('place_name_for_lookup') or a.get('description')) for a in day['activities'])})"
+        for index, day in enumerate(plan.get("days") or [])
+        if index not in gaps.missing_days and is_complete_day(day)
+    ]
+    if existing:
+        lines += ["", "Existing days (do not repeat their activities):", *existing]
+
+    # Placeholders for missing days may carry their planned outline (api/trip_fanout.py skeleton days).
+    days = plan.get("days") or []
+    outline = [
+        f"- {days[index]['title']}: {days[index].get('theme') or '-'} ({days[index].get('area') or '-'})"
+        for index in gaps.missing_days
+        if index < len(days) and isinstance(days[index], dict) and days[index].get("title")
+    ]
+    if outline:
+        lines += ["", "Planned outline of the missing days (keep these titles):", *outline]
+
+    if gaps.missing_days:
+        properties["days"] = {"type": "array", "items": DAY}
+        numbers = ", ".join(str(index + 1) for index in gaps.missing_days)
+        lines += ["", f"- `days`: exactly {len(gaps.missing_days)} day object(s), for day number(s) {numbers} "
+                      "in that order, with titles starting \"Day <number>:\"."]
+    for field in gaps.missing_fields:
+        lines.append(f"- `{field}`: for the whole trip, as described in the output format.")
+    if "summary" not in gaps.missing_fields and plan.get("summary"):
+        lines += ["", f"Trip summary for context: {plan['summary']}"]
+
+    lines += ["", "Return ONLY a JSON object with exactly these keys: " + ", ".join(properties) + "."]
+    schema = {"type": "object", "properties": properties, "required": list(properties)}
+    return "\n".join(lines), schema
+
+
+def merge_repair(plan: dict, gaps: ItineraryGaps, repaired: dict) -> dict:
+    """
+    Merge a repair answer into the partial plan.
+
+    Repaired days fill the missing indices in order; missing fields are copied
+    over. Anything the repair did not provide stays missing for the next round.
+    """
+    merged = dict(plan)
+    days = list(merged.get("days") or []) if isinstance(merged.get("days"), list) else []
+    new_days = [day for day in (repaired.get("days") or []) if is_complete_day(day)]
+    for index, day in zip(gaps.missing_days, new_days):
+        days.extend([None] * (index + 1 - len(days)))
+        days[index] = day
+    merged["days"] = days
+    for field in gaps.missing_fields:
+        if repaired.get(field):
+            merged[field] = repaired[field]
+    return merged
+
+
+def placeholder_day(index: int) -> dict:
+    """Stand-in for a day that could not be generated, so later days keep their position."""
+    return {"title": f"Day {index + 1}: Plan unavailable", "activities": [], "incomplete": True}
+
+
+def mark_missing_days(plan: dict, expected_days: int | None) -> dict:
+    """
+    Keep a plan at the requested length.
+
+    Days that are missing or unusable are replaced by placeholders and the plan
+    is flagged "incomplete": true, which keeps it out of the trip cache.
+
+    Returns:
+        dict: The plan itself if no day is missing, else a flagged copy
+    """
+    gaps = find_itinerary_gaps(plan, expected_days)
+    if not gaps.missing_days:
+        return plan
+    days = list(plan["days"]) if isinstance(plan.get("days"), list) else []
+    days.extend([None] * (max(gaps.missing_days) + 1 - len(days)))
+    for index in gaps.missing_days:
+        days[index] = placeholder_day(index)
+    return {**plan, "days": days, "incomplete": True}
+
+
+def _finalize(plan: dict, gaps: ItineraryGaps, expected_days: int | None) -> dict | None:
+    """Flag days that could not be repaired; give up if nothing usable is left."""
+    if not any(is_complete_day(day) for day in plan.get("days") or []) or not plan.get("summary"):
+        return None
+    if gaps:
+        print(f"⚠️ Itinerary still incomplete after repair ({gaps}); returning it without caching.")
+    return mark_missing_days(plan, expected_days)
+
+
+def _start_repair(result, expected_days):
+    plan = _result_plan(result)
+    if not any(is_complete_day(day) for day in plan.get("days") or []):
+        print("❌ Nothing usable to repair in the model answer.")
+        return plan, None
+    return plan, find_itinerary_gaps(plan, expected_days)
+
+
+def _merge_round(plan, gaps, repair_result, expected_days):
+    repaired = _result_plan(repair_result)
+    print(f"🩹 Repair round ({gaps}) returned {len(repaired.get('days') or [])} day(s), "
+          f"{repair_result.latency:.1f}s, usage {repair_result.usage}")
+    plan = merge_repair(plan, gaps, repaired)
+    return plan, find_itinerary_gaps(plan, expected_days)
+
+
+# ─────────────────────────── Repair Entry Points ─────────────────────────── #
+def repair_itinerary(result, expected_days: int | None, user_prompt: str, system_instruction: str, model_name: str) -> dict | None:
+    """
+    Complete a partial itinerary by regenerating only its missing parts.
+
+    Args:
+        result (GeminiResult): The original (incomplete or truncated) answer
+        expected_days (int, optional): Trip length from the request
+        user_prompt (str): Original per-request prompt
+        system_instruction (str): Trip system instruction (context-cached)
+        model_name (str): Model used for the original call
+
+    Returns:
+        dict | None: The repaired plan, or None if nothing could be salvaged
+    """
+    plan, gaps = _start_repair(result, expected_days)
+    if gaps is None:
+        return None
+    return repair_plan(plan, expected_days, user_prompt, system_instruction, model_name, gaps)
+
+
+def repair_plan(plan: dict, expected_days: int | None, user_prompt: str, system_instruction: str, model_name: str,
+                gaps: ItineraryGaps | None = None) -> dict | None:
+    """
+    Complete an already parsed partial plan (e.g. fan-out days that failed).
+
+    Missing days may be None or an incomplete day dict in plan["days"].
+
+    Returns:
+        dict | None: The repaired plan (flagged "incomplete" if days are still missing),
+        or None if it has no usable day or summary
+    """
+    if gaps is None:
+        gaps = find_itinerary_gaps(plan, expected_days)
+    for _ in range(settings.TRIP_REPAIR_MAX_ROUNDS):
+        if not gaps:
+            break
+        prompt, schema = build_repair_request(user_prompt, plan, gaps)
+        repair_result = generate(prompt, model_name, system_instruction=system_instruction, response_schema=schema)
+        plan, gaps = _merge_round(plan, gaps, repair_result, expected_days)
+    return _finalize(plan, gaps, expected_days)
+
+
+async def repair_itinerary_async(result, expected_days: int | None, user_prompt: str, system_instruction: str, model_name: str) -> dict | None:
+    """Async variant of repair_itinerary."""
+    plan, gaps = _start_repair(result, expected_days)
+    if gaps is None:
+        return None
+    return await repair_plan_async(plan, expected_days, user_prompt, system_instruction, model_name, gaps)
+
+
+async def repair_plan_async(plan: dict, expected_days: int | None, user_prompt: str, system_instruction: str, model_name: str,
+                            gaps: ItineraryGaps | None = None) -> dict | None:
+    """Async variant of repair_plan."""
+    if gaps is None:
+        gaps = find_itinerary_gaps(plan, expected_days)
+    for _ in range(settings.TRIP_REPAIR_MAX_ROUNDS):
+        if not gaps:
+            break
+        prompt, schema = build_repair_request(user_prompt, plan, gaps)
+        repair_result = await generate_async(prompt, model_name, system_instruction=system_instruction, response_schema=schema)
+        plan, gaps = _merge_round(plan, gaps, repair_result, expected_days)
+    return _finalize(plan, gaps, expected_days)
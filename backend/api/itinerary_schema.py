@@ -0,0 +1,152 @@
+"""
+Response Schemas for Gemini Structured Output
+
+OpenAPI-style schemas (the subset Gemini accepts) describing the JSON the trip
+and chat prompts ask for. They are sent as `response_schema` together with
+`response_mime_type="application/json"`, so the model returns bare JSON in the
+itinerary shape instead of free text that has to be searched for a JSON block.
+
+Key Features:
+- Trip itinerary schema mirroring the format in TRIP_SYSTEM_INSTRUCTION
+- Activities schema for the chat replace/add endpoints
+- Skeleton and single-day schemas for parallel per-day generation
+- Only fields the frontend reads are required; optional fields stay nullable
+"""
+
+# ─────────────────────────── Building Blocks ─────────────────────────── #
+def _object(properties: dict, required: list | None = None, nullable: bool = False) -> dict:
+    schema = {"type": "object", "properties": properties}
+    if required:
+        schema["required"] = required
+    if nullable:
+        schema["nullable"] = True
+    return schema
+
+
+def _array(items: dict) -> dict:
+    return {"type": "array", "items": items}
+
+
+STRING = {"type": "string"}
+NULLABLE_STRING = {"type": "string", "nullable": True}
+NUMBER = {"type": "number"}
+
+MIN_MAX = _object({"min": NUMBER, "max": NUMBER}, required=["min", "max"])
+COST_ESTIMATE = _object(
+    {"min": NUMBER, "max": NUMBER, "currency": STRING},
+    required=["min", "max", "currency"],
+)
+
+PLACE_DETAILS = _object(
+    {
+        "name": STRING,
+        "category": STRING,
+        "price_level": {"type": "integer", "nullable": True},
+    },
+    nullable=True,
+)
+
+ACTIVITY = _object(
+    {
+        "time": STRING,
+        "description": STRING,
+        "place_name_for_lookup": NULLABLE_STRING,
+        "place_details": PLACE_DETAILS,
+        "cost_estimate": COST_ESTIMATE,
+        "ticket_url": NULLABLE_STRING,
+    },
+    required=["time", "description", "place_name_for_lookup"],
+)
+
+DAY = _object(
+    {
+        "title": STRING,
+        "activities": _array(ACTIVITY),
+        "day_cost_estimate": COST_ESTIMATE,
+    },
+    required=["title", "activities"],
+)
+
+DESTINATION_INFO = _object(
+    {
+        "country": STRING,
+        "city": STRING,
+        "language": STRING,
+        "currency": STRING,
+        "exchange_rate": NUMBER,
+        "budget_tips": _array(STRING),
+        "transportation_options": _array(_object(
+            {
+                "name": STRING,
+                "description": STRING,
+                "cost_range": STRING,
+                "app_name": NULLABLE_STRING,
+                "app_link": NULLABLE_STRING,
+            },
+            required=["name", "description", "cost_range"],
+        )),
+        "discount_options": _array(_object(
+            {
+                "name": STRING,
+                "description": STRING,
+                "price": STRING,
+                "link": NULLABLE_STRING,
+            },
+            required=["name", "description", "price"],
+        )),
+        "emergency_info": _object(
+            {"police": STRING, "ambulance": STRING, "fire": STRING, "tourist_police": NULLABLE_STRING},
+            nullable=True,
+        ),
+    },
+    required=["country", "city", "currency"],
+)
+
+TOTAL_COST_ESTIMATE = _object(
+    {
+        "min": NUMBER,
+        "max": NUMBER,
+        "currency": STRING,
+        "accommodations": MIN_MAX,
+        "food": MIN_MAX,
+        "attractions": MIN_MAX,
+        "transportation": MIN_MAX,
+        "other": MIN_MAX,
+    },
+    required=["min", "max", "currency"],
+)
+
+# ─────────────────────────── Response Schemas ─────────────────────────── #
+TRIP_RESPONSE_SCHEMA = _object(
+    {
+        "summary": STRING,
+        "days": _array(DAY),
+        "destination_info": DESTINATION_INFO,
+        "total_cost_estimate": TOTAL_COST_ESTIMATE,
+    },
+    required=["summary", "days", "destination_info", "total_cost_estimate"],
+)
+
+# Chat replace/add: always a list, so a single suggestion is a one-item array.
+ACTIVITIES_RESPONSE_SCHEMA = _object(
+    {"activities": _array(ACTIVITY)},
+    required=["activities"],
+)
+
+# Parallel per-day generation: a light skeleton first, then one DAY per call.
+SKELETON_DAY = _object(
+    {"title": STRING, "theme": STRING, "area": STRING},
+    required=["title", "theme", "area"],
+)
+
+SKELETON_RESPONSE_SCHEMA = _object(
+    {
+        "summary": STRING,
+        "days": _array(SKELETON_DAY),
+        "destination_info": DESTINATION_INFO,
+        "total_cost_estimate": TOTAL_COST_ESTIMATE,
+    },
+    required=["summary", "days", "destination_info", "total_cost_estimate"],
+)
+
+DAY_RESPONSE_SCHEMA = DAY
@@ -0,0 +1,224 @@
+"""
+LLM Usage Ledger
+
+Every Gemini call (generate, generate_async and ask_gemini_stream in
+api/chat_request.py) is recorded with its model, token usage, wall time,
+finish reason, context-cache status and estimated cost. Records are buffered
+in-process and written to the LLMCallRecord table in bulk, so the request
+path never waits for the database.
+
+Attribution:
+- Entry points (views, trip worker, background refresh, warm-up) call
+  set_llm_context(endpoint, search_mode, user or user_id) first; the context is a
+  ContextVar, copied into the model-router and fan-out threads
+- Calls made without a context are recorded with a blank endpoint
+
+Buffering:
+- Flushed when LLM_LEDGER_BATCH_SIZE records are waiting, every
+  LLM_LEDGER_FLUSH_INTERVAL seconds by a daemon thread, and at exit
+- A failed flush drops its batch (logged) instead of growing without bound
+
+Reports: usage_report() groups calls by model, searchMode or endpoint with
+p50/p95 latency, tokens and cost (GET /api/metrics/llm-usage/ and
+`python manage.py llm_usage_report`).
+"""
+
+import atexit
+import contextvars
+import threading
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .utils.model_stats import percentile
+
+# USD per 1M tokens: (input, cached input, output incl. thinking). Unknown models cost 0.
+MODEL_PRICING_PER_MILLION = {
+    "gemini-2.0-flash": (0.10, 0.025, 0.40),
+    "gemini-2.5-flash-preview-05-20": (0.15, 0.0375, 0.60),
+    "gemini-2.5-pro-preview-05-06": (1.25, 0.31, 10.00),
+    "gemini-1.5-flash": (0.075, 0.01875, 0.30),
+}
+
+GROUP_FIELDS = {"model": "model", "searchMode": "search_mode", "endpoint": "endpoint"}
+
+_llm_context = contextvars.ContextVar("llm_context", default=None)
+
+
+def set_llm_context(endpoint: str, search_mode: str | None = None, user=None, user_id: int | None = None):
+    """
+    Attribute the following Gemini calls in this context to an endpoint (and user).
+
+    Args:
+        endpoint (str): Entry point name, e.g. "plan_trip"
+        search_mode (str, optional): Trip searchMode
+        user (User, optional): Request user; anonymous users are not stored
+        user_id (int, optional): User id when there is no request (e.g. background jobs)
+    """
+    if getattr(user, "is_authenticated", False):
+        user_id = user.pk
+    _llm_context.set({"endpoint": endpoint, "search_mode": search_mode or "", "user_id": user_id})
+
+
+def get_llm_context() -> dict:
+    return _llm_context.get() or {}
+
+
+def estimate_cost(model: str, usage: dict) -> Decimal:
+    """Estimated USD cost of one call from its token usage."""
+    prices = MODEL_PRICING_PER_MILLION.get(model)
+    if not prices or not usage:
+        return Decimal(0)
+    input_price, cached_price, output_price = prices
+    cached = usage.get("cached_tokens", 0)
+    uncached = max(usage.get("prompt_tokens", 0) - cached, 0)
+    output = usage.get("output_tokens", 0) + usage.get("thoughts_tokens", 0)
+    cost = (uncached * input_price + cached * cached_price + output * output_price) / 1_000_000
+    return Decimal(str(round(cost, 6)))
+
+
+class UsageLedger:
+    """
+    In-process buffer of LLM call records, flushed to the database in bulk.
+
+    Args:
+        batch_size (int): Records that trigger a flush
+        flush_interval (float): Max seconds a record waits in the buffer
+    """
+
+    def __init__(self, batch_size=50, flush_interval=10.0):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def record(self, model: str, latency: float | None, outcome: str, finish_reason: str | None = None,
+               usage: dict | None = None, streamed: bool = False, context: dict | None = None):
+        """Buffer one call. Cheap and never raises, so it can run on the request path."""
+        if not settings.LLM_LEDGER_ENABLED:
+            return
+        usage = usage or {}
+        context = context if context is not None else get_llm_context()
+        row = {
+            "created_at": timezone.now(),
+            "endpoint": context.get("endpoint", ""),
+            "search_mode": context.get("search_mode", ""),
+            "user_id": context.get("user_id"),
+            "model": model,
+            "outcome": outcome,
+            "finish_reason": finish_reason or "",
+            "latency_ms": int((latency or 0) * 1000),
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "output_tokens": usage.get("output_tokens", 0),
+            "cached_tokens": usage.get("cached_tokens", 0),
+            "thoughts_tokens": usage.get("thoughts_tokens", 0),
+            "total_tokens": usage.get("total_tokens", 0),
+            "context_cache_hit": usage.get("cached_tokens", 0) > 0,
+            "streamed": streamed,
+            "cost_usd": estimate_cost(model, usage),
+        }
+        with self._lock:
+            self._buffer.append(row)
+            pending = len(self._buffer)
+        self._ensure_flusher()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_flusher(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._flush_loop, name="llm-ledger", daemon=True)
+                    self._thread.start()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """
+        Write buffered records to the database.
+
+        Returns:
+            int: Number of records written
+        """
+        from .models import LLMCallRecord
+
+        with self._flush_lock:
+            with self._lock:
+                rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            try:
+                close_old_connections()
+                LLMCallRecord.objects.bulk_create([LLMCallRecord(**row) for row in rows], batch_size=500)
+            except Exception as e:
+                print(f"⚠️ Could not write {len(rows)} LLM usage records: {e}")
+                return 0
+            finally:
+                close_old_connections()
+            return len(rows)
+
+
+usage_ledger = UsageLedger(
+    batch_size=settings.LLM_LEDGER_BATCH_SIZE,
+    flush_interval=settings.LLM_LEDGER_FLUSH_INTERVAL,
+)
+atexit.register(usage_ledger.flush)
+
+
+# ─────────────────────────── Reports ─────────────────────────── #
+def usage_report(hours: float = 24, group_by: str = "model") -> list:
+    """
+    Aggregate recorded calls of the last `hours` hours.
+
+    Args:
+        hours (float): Look-back window
+        group_by (str): "model", "searchMode" or "endpoint"
+
+    Returns:
+        list[dict]: One row per group: calls, errors, p50_ms, p95_ms, tokens, cost_usd, cost_per_call
+    """
+    from .models import LLMCallRecord
+
+    field = GROUP_FIELDS[group_by]
+    since = timezone.now() - timedelta(hours=hours)
+    rows = LLMCallRecord.objects.filter(created_at__gte=since).values_list(
+        field, "outcome", "latency_ms", "prompt_tokens", "output_tokens", "cached_tokens", "cost_usd",
+    )
+    groups = {}
+    for group, outcome, latency_ms, prompt_tokens, output_tokens, cached_tokens, cost in rows.iterator():
+        entry = groups.setdefault(group or "(none)", {
+            "latencies": [], "errors": 0, "prompt_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cost": Decimal(0),
+        })
+        entry["latencies"].append(latency_ms)
+        entry["errors"] += outcome != "ok"
+        entry["prompt_tokens"] += prompt_tokens
+        entry["output_tokens"] += output_tokens
+        entry["cached_tokens"] += cached_tokens
+        entry["cost"] += cost
+
+    report = []
+    for group, entry in sorted(groups.items(), key=lambda item: -item[1]["cost"]):
+        calls = len(entry["latencies"])
+        report.append({
+            group_by: group,
+            "calls": calls,
+            "not_ok": entry["errors"],
+            "p50_ms": percentile(entry["latencies"], 50),
+            "p95_ms": percentile(entry["latencies"], 95),
+            "prompt_tokens": entry["prompt_tokens"],
+            "output_tokens": entry["output_tokens"],
+            "cached_tokens": entry["cached_tokens"],
+            "cost_usd": float(round(entry["cost"], 4)),
+            "cost_per_call_usd": float(round(entry["cost"] / calls, 6)),
+        })
+    return report
@@ -0,0 +1,134 @@
+"""
+Replay a request log through the near-duplicate itinerary cache.
+
+Requests are replayed in order against an in-memory index (nothing is read
+from or written to the shared index). A request is an exact hit if an earlier
+request had the same cache key, and a similar hit at threshold T if the best
+compatible earlier request scores at least T. Every request that misses both
+is indexed, as it would have been generated.
+
+Quality of the similar hits is reported from the request features (same city,
+interest overlap, same pace/budget) and, with --with-cache, from the cached
+itineraries themselves: the overlap of place names between the served
+itinerary and the one generated for the request, when both are still cached.
+
+Usage:
+    python manage.py evaluate_similar_cache requests.jsonl --thresholds 0.8 0.85 0.9 0.95
+"""
+
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache_keys import make_trip_cache_key
+from api.management.commands.replay_cache_keys import extract_payload
+from api.serializers import PlanTripSerializer
+from api.similar_trip_cache import TripVectorIndex, np, trip_features
+from api.trip_cache import get_cached_itinerary
+
+
+def jaccard(a, b) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a | b else 1.0
+
+
+def itinerary_places(itinerary: dict) -> set:
+    """Lower-cased place names of every activity in an itinerary."""
+    places = set()
+    for day in itinerary.get("days") or []:
+        for activity in day.get("activities") or []:
+            name = activity.get("place_name_for_lookup") or activity.get("description")
+            if name:
+                places.add(name.strip().lower())
+    return places
+
+
+class Command(BaseCommand):
+    help = "Compare near-duplicate cache hit rate and match quality across similarity thresholds."
+
+    def add_arguments(self, parser):
+        parser.add_argument("log_path", help="Path to a JSONL file of /plantrip/ payloads")
+        parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.95],
+                            help="Similarity thresholds to evaluate")
+        parser.add_argument("--with-cache", action="store_true",
+                            help="Compare place overlap of matched itineraries still in the trip cache")
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError("numpy is required for the similarity cache (pip install numpy).")
+        try:
+            handle = open(options["log_path"], encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['log_path']}: {e}")
+
+        requests = []
+        skipped = invalid = 0
+        with handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    payload = extract_payload(json.loads(line))
+                except json.JSONDecodeError:
+                    payload = None
+                if payload is None:
+                    skipped += 1
+                    continue
+                serializer = PlanTripSerializer(data=payload)
+                if not serializer.is_valid():
+                    invalid += 1
+                    continue
+                data = serializer.validated_data
+                requests.append((make_trip_cache_key(data), trip_features(data)))
+
+        if not requests:
+            raise CommandError("No valid trip payloads found in the log.")
+
+        self.stdout.write(f"Requests replayed: {len(requests)} (skipped {skipped}, invalid {invalid})\n")
+        self.stdout.write(
+            f"  {'threshold':>9} {'exact':>7} {'similar':>8} {'hit rate':>9} {'avg score':>10} "
+            f"{'same city':>10} {'interests':>10} {'same pace':>10} {'same budget':>12} {'places':>8}"
+        )
+        for threshold in sorted(options["thresholds"]):
+            self.report(requests, threshold, options["with_cache"])
+
+    def report(self, requests, threshold, with_cache):
+        index = TripVectorIndex()
+        seen = set()
+        exact = 0
+        matches = []
+        for key, features in requests:
+            if key in seen:
+                exact += 1
+                continue
+            found = index.search(features, threshold, limit=1)
+            if found:
+                matches.append((key, features, *found[0]))
+                continue
+            seen.add(key)
+            index.add(key, features)
+
+        total = len(requests)
+        similar = len(matches)
+        quality = {"score": [], "city": [], "interests": [], "pace": [], "budget": [], "places": []}
+        by_key = {key: features for key, features in zip(index.keys, index.features)}
+        for key, features, matched_key, score in matches:
+            matched = by_key[matched_key]
+            quality["score"].append(score)
+            quality["city"].append(features["city"] == matched["city"])
+            quality["interests"].append(jaccard(features["interests"], matched["interests"]))
+            quality["pace"].append(features["pace"] == matched["pace"])
+            quality["budget"].append(features["budget"] == matched["budget"])
+            if with_cache:
+                own, served = get_cached_itinerary(key), get_cached_itinerary(matched_key)
+                if own and served:
+                    quality["places"].append(jaccard(itinerary_places(own), itinerary_places(served)))
+
+        def mean(values):
+            return f"{sum(values) / len(values):.2f}" if values else "-"
+
+        self.stdout.write(
+            f"  {threshold:>9.2f} {exact:>7} {similar:>8} {(exact + similar) / total:>8.1%} {mean(quality['score']):>10} "
+            f"{mean(quality['city']):>10} {mean(quality['interests']):>10} {mean(quality['pace']):>10} "
+            f"{mean(quality['budget']):>12} {mean(quality['places']):>8}"
+        )
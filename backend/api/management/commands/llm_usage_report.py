@@ -0,0 +1,45 @@
+"""
+Report LLM calls from the usage ledger: latency percentiles, tokens and cost.
+
+Rows are grouped by model (default), searchMode or endpoint and sorted by
+cost. The same report is served to staff at GET /api/metrics/llm-usage/.
+
+Usage:
+    python manage.py llm_usage_report
+    python manage.py llm_usage_report --hours 168 --by searchMode
+"""
+
+from django.core.management.base import BaseCommand
+
+from api.llm_usage import GROUP_FIELDS, usage_ledger, usage_report
+
+
+class Command(BaseCommand):
+    help = "Show p50/p95 latency, tokens and cost of LLM calls per model, searchMode or endpoint."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=float, default=24, help="Look-back window in hours")
+        parser.add_argument("--by", choices=sorted(GROUP_FIELDS), default="model", help="Grouping")
+
+    def handle(self, *args, **options):
+        # Calls made by this process (none, usually) are written before reading.
+        usage_ledger.flush()
+        group_by = options["by"]
+        rows = usage_report(options["hours"], group_by)
+        if not rows:
+            self.stdout.write(f"No LLM calls recorded in the last {options['hours']:g} hours.")
+            return
+
+        self.stdout.write(f"LLM calls in the last {options['hours']:g} hours by {group_by}\n")
+        self.stdout.write(
+            f"  {group_by:<32} {'calls':>7} {'not ok':>7} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'prompt tok':>11} {'output tok':>11} {'cached tok':>11} {'cost $':>10} {'$/call':>9}"
+        )
+        for row in rows:
+            self.stdout.write(
+                f"  {row[group_by][:32]:<32} {row['calls']:>7} {row['not_ok']:>7} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+                f"{row['prompt_tokens']:>11} {row['output_tokens']:>11} {row['cached_tokens']:>11} "
+                f"{row['cost_usd']:>10.4f} {row['cost_per_call_usd']:>9.6f}"
+            )
+        total_cost = sum(row["cost_usd"] for row in rows)
+        self.stdout.write(f"\nTotal: {sum(row['calls'] for row in rows)} calls, ${total_cost:.4f}")
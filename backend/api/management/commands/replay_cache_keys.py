@@ -0,0 +1,99 @@
+"""
+Replay a request log and report itinerary cache hit rates.
+
+Each line of the log is a JSON object holding a /plantrip/ payload, either
+directly or under a "data", "payload" or "request" key. Lines that are not
+trip payloads (for example backlog entries with only a title/body) are skipped
+and counted.
+
+The cache is simulated as unbounded, so the hit rate is the share of requests
+whose key was already produced by an earlier request. Both the legacy key
+format and the canonical v2 key are replayed, and legacy keys shared by
+requests that differ once every field is considered are reported as collisions
+(requests that would have been served someone else's itinerary).
+
+Usage:
+    python manage.py replay_cache_keys requests.jsonl
+"""
+
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.cache_keys import legacy_trip_cache_key, make_trip_cache_key
+from api.serializers import PlanTripSerializer
+
+PAYLOAD_KEYS = ("data", "payload", "request")
+
+
+def extract_payload(entry):
+    """Return the trip payload inside a log entry, or None."""
+    if not isinstance(entry, dict):
+        return None
+    for key in PAYLOAD_KEYS:
+        if isinstance(entry.get(key), dict):
+            return entry[key]
+    return entry if "destination" in entry else None
+
+
+class Command(BaseCommand):
+    help = "Replay a JSONL request log and compare legacy vs canonical cache-key hit rates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("log_path", help="Path to a JSONL file of /plantrip/ payloads")
+
+    def handle(self, *args, **options):
+        try:
+            handle = open(options["log_path"], encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Cannot read {options['log_path']}: {e}")
+
+        total = skipped = invalid = 0
+        seen_legacy, seen_canonical = set(), set()
+        legacy_hits = canonical_hits = wrong_hits = 0
+        canonical_by_legacy = defaultdict(set)
+        first_canonical_for_legacy = {}
+
+        with handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                try:
+                    payload = extract_payload(json.loads(line))
+                except json.JSONDecodeError:
+                    payload = None
+                if payload is None:
+                    skipped += 1
+                    continue
+
+                serializer = PlanTripSerializer(data=payload)
+                if not serializer.is_valid():
+                    invalid += 1
+                    continue
+                data = serializer.validated_data
+                total += 1
+
+                legacy_key = legacy_trip_cache_key(data)
+                canonical_key = make_trip_cache_key(data)
+                if legacy_key in seen_legacy:
+                    legacy_hits += 1
+                    wrong_hits += first_canonical_for_legacy[legacy_key] != canonical_key
+                else:
+                    first_canonical_for_legacy[legacy_key] = canonical_key
+                canonical_hits += canonical_key in seen_canonical
+                seen_legacy.add(legacy_key)
+                seen_canonical.add(canonical_key)
+                canonical_by_legacy[legacy_key].add(canonical_key)
+
+        collisions = sum(1 for keys in canonical_by_legacy.values() if len(keys) > 1)
+
+        self.stdout.write(f"Replayed requests:      {total}")
+        self.stdout.write(f"Skipped (not a plan):   {skipped}")
+        self.stdout.write(f"Invalid payloads:       {invalid}")
+        if not total:
+            return
+        self.stdout.write(f"Legacy key hit rate:    {legacy_hits / total:.1%} ({len(seen_legacy)} distinct keys, "
+                          f"{wrong_hits} hits served another request's itinerary)")
+        self.stdout.write(f"Canonical key hit rate: {canonical_hits / total:.1%} ({len(seen_canonical)} distinct keys)")
+        self.stdout.write(f"Legacy key collisions:  {collisions} keys shared by differing requests")
@@ -0,0 +1,68 @@
+"""
+Run the background trip generation worker.
+
+Takes trip jobs queued by POST /api/plantrip/ (with `Prefer: respond-async`
+or `"background": true`) off the Redis queue, generates and caches the
+itinerary, and publishes the job status for polling and SSE clients.
+Run as many worker processes as generation needs; they share the queue.
+
+On start (and every --requeue-interval seconds) jobs that have been running
+longer than the slowest possible generation (or TRIP_JOB_STALE_AFTER seconds)
+are put back on the queue, which recovers jobs of a worker that died
+mid-generation. A job is failed after TRIP_JOB_MAX_ATTEMPTS starts.
+
+Usage:
+    python manage.py run_trip_worker --concurrency 4
+"""
+
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from redis.exceptions import RedisError
+
+from api.trip_jobs import requeue_stale_jobs, run_worker
+from api.views import run_trip_job
+
+
+class Command(BaseCommand):
+    help = "Process background trip generation jobs from the Redis queue."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=settings.TRIP_WORKER_CONCURRENCY,
+                            help="Jobs processed in parallel by this process")
+        parser.add_argument("--poll-timeout", type=float, default=5,
+                            help="Seconds to block on the queue before checking for shutdown")
+        parser.add_argument("--requeue-interval", type=float, default=60,
+                            help="Seconds between stale-job checks (0 disables)")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        stop_event = threading.Event()
+        if options["requeue_interval"] > 0:
+            threading.Thread(
+                target=self.requeue_loop, args=(options["requeue_interval"], stop_event),
+                name="trip-worker-requeue", daemon=True,
+            ).start()
+
+        self.stdout.write(f"🧳 Trip worker started with {options['concurrency']} slot(s).")
+        run_worker(
+            run_trip_job,
+            concurrency=options["concurrency"],
+            poll_timeout=options["poll_timeout"],
+            stop_event=stop_event,
+        )
+        self.stdout.write("Trip worker stopped.")
+
+    def requeue_loop(self, interval, stop_event):
+        while not stop_event.is_set():
+            try:
+                requeued = requeue_stale_jobs()
+            except RedisError as e:
+                self.stderr.write(f"⚠️ Stale-job check failed: {e}")
+            else:
+                if requeued:
+                    self.stdout.write(f"♻️ Requeued {requeued} stale trip job(s).")
+            stop_event.wait(interval)
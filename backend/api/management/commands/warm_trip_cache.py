@@ -0,0 +1,162 @@
+"""
+Pre-generate itineraries for the most requested trip shapes.
+
+Shapes (destination x trip length x pace x budget) are mined from the request
+counts the plan views record in Redis, or from a JSONL request log with
+--log. Missing itineraries and itineraries that expire within
+--refresh-within seconds are generated, at most --max-generations per pass,
+--concurrency at a time.
+
+Shapes whose representative request has already started are only warmed
+when the near-duplicate cache is enabled (SIMILAR_TRIP_CACHE_ENABLED): the
+pass moves them to tomorrow, and only that cache serves the result to
+requests for other dates. Otherwise they are reported as skipped.
+
+Without --schedule one pass runs immediately (for cron); --off-peak-only
+makes it exit outside the off-peak window. With --schedule the command keeps
+running, does a pass every --interval seconds inside the window
+(TRIP_WARMUP_WINDOW, server time zone) and sleeps outside it.
+
+Usage:
+    python manage.py warm_trip_cache --dry-run
+    python manage.py warm_trip_cache --log requests.jsonl --max-generations 20
+    python manage.py warm_trip_cache --schedule
+"""
+
+import json
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from redis.exceptions import RedisError
+
+from api.management.commands.replay_cache_keys import extract_payload
+from api.serializers import PlanTripSerializer
+from api.trip_warmup import (
+    acquire_warmup_lock,
+    in_window,
+    parse_window,
+    release_warmup_lock,
+    request_shape,
+    run_warmup_pass,
+    top_shapes,
+)
+
+
+def shapes_from_log(path: str, limit: int, min_requests: int) -> list:
+    """Count request shapes in a JSONL log; the last payload of a shape represents it."""
+    counts, payloads = Counter(), {}
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            try:
+                payload = extract_payload(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+            serializer = PlanTripSerializer(data=payload) if payload else None
+            if serializer is None or not serializer.is_valid():
+                continue
+            shape = request_shape(serializer.validated_data)
+            counts[shape] += 1
+            payloads[shape] = serializer.data
+    return [(shape, count, payloads[shape]) for shape, count in counts.most_common(limit) if count >= min_requests]
+
+
+def generate_itinerary(data, key):
+    """Generate through the same single-flight/cache path as the plan views."""
+    from api.llm_usage import set_llm_context
+    from api.trip_cache import get_cached_itinerary, trip_single_flight
+    from api.views import generate_and_cache_itinerary
+
+    set_llm_context("trip_warmup", data.get("searchMode"))
+    trip_single_flight.run(
+        key,
+        compute=lambda: generate_and_cache_itinerary(data, key),
+        load=lambda: get_cached_itinerary(key),
+    )
+
+
+class Command(BaseCommand):
+    help = "Pre-generate and refresh cached itineraries for the most requested trip shapes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", help="Mine shapes from this JSONL request log instead of Redis")
+        parser.add_argument("--days", type=int, default=settings.TRIP_SHAPE_LOG_DAYS,
+                            help="Days of Redis request counts to consider")
+        parser.add_argument("--top", type=int, default=settings.TRIP_WARMUP_TOP, help="Shapes to consider")
+        parser.add_argument("--min-requests", type=int, default=settings.TRIP_WARMUP_MIN_REQUESTS,
+                            help="Skip shapes requested fewer times")
+        parser.add_argument("--max-generations", type=int, default=settings.TRIP_WARMUP_MAX_GENERATIONS,
+                            help="Spend cap: LLM generations per pass")
+        parser.add_argument("--concurrency", type=int, default=settings.TRIP_WARMUP_CONCURRENCY,
+                            help="Generations run in parallel")
+        parser.add_argument("--refresh-within", type=int, default=settings.TRIP_WARMUP_REFRESH_WITHIN,
+                            help="Regenerate cached itineraries expiring within this many seconds")
+        parser.add_argument("--window", default=settings.TRIP_WARMUP_WINDOW, help="Off-peak window HH:MM-HH:MM")
+        parser.add_argument("--off-peak-only", action="store_true", help="Exit without a pass outside the window")
+        parser.add_argument("--schedule", action="store_true", help="Keep running and warm inside the window")
+        parser.add_argument("--interval", type=int, default=3600, help="Seconds between scheduled passes")
+        parser.add_argument("--dry-run", action="store_true", help="Only list what would be generated")
+
+    def handle(self, *args, **options):
+        try:
+            parse_window(options["window"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if options["concurrency"] < 1:
+            raise CommandError("--concurrency must be at least 1.")
+
+        if not options["schedule"]:
+            if options["off_peak_only"] and not in_window(options["window"]):
+                self.stdout.write(f"Outside the off-peak window {options['window']}; nothing to do.")
+                return
+            self.run_pass(options)
+            return
+
+        self.stdout.write(f"🕒 Warm-up scheduler started (window {options['window']}, every {options['interval']}s).")
+        try:
+            while True:
+                if in_window(options["window"]):
+                    self.run_pass(options)
+                time.sleep(options["interval"] if in_window(options["window"]) else 60)
+        except KeyboardInterrupt:
+            self.stdout.write("Warm-up scheduler stopped.")
+
+    def load_shapes(self, options) -> list:
+        if options["log"]:
+            try:
+                return shapes_from_log(options["log"], options["top"], options["min_requests"])
+            except OSError as e:
+                raise CommandError(f"Cannot read {options['log']}: {e}")
+        return top_shapes(options["days"], options["top"], options["min_requests"])
+
+    def run_pass(self, options):
+        try:
+            token = None if options["dry_run"] else acquire_warmup_lock(ttl=max(options["interval"], 3600))
+            if not options["dry_run"] and token is None:
+                self.stdout.write("Another warm-up pass is running; skipping.")
+                return
+            try:
+                shapes = self.load_shapes(options)
+                summary = run_warmup_pass(
+                    shapes,
+                    generate_itinerary,
+                    concurrency=options["concurrency"],
+                    refresh_within=options["refresh_within"],
+                    max_generations=options["max_generations"],
+                    dry_run=options["dry_run"],
+                    log=self.stdout.write,
+                )
+            finally:
+                if token:
+                    release_warmup_lock(token)
+        except RedisError as e:
+            self.stderr.write(f"⚠️ Warm-up pass failed, Redis unavailable: {e}")
+            return
+        self.stdout.write(
+            "Warm-up pass: {shapes} shapes, {fresh} fresh, {planned} planned, {generated} generated, "
+            "{failed} failed, {over_budget} over the spend cap, {invalid} invalid, "
+            "{past_dates} skipped for past dates (similar-trip cache off)".format(**summary)
+        )
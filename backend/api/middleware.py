@@ -0,0 +1,87 @@
+"""
+Request middleware for the Trip Planner API.
+
+ServerTimingMiddleware collects the stages timed during a request (see
+api/utils/request_timing.py), adds them as a `Server-Timing` header and
+records them per route for the staff metrics endpoint. It works for sync
+(WSGI) and async (ASGI) requests alike.
+"""
+
+import contextlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .utils.request_timing import (
+    end_request_timings,
+    get_tracer,
+    stage_stats,
+    start_request_timings,
+)
+
+
+def _route_name(request) -> str:
+    match = getattr(request, "resolver_match", None)
+    return match.url_name if match and match.url_name else "unresolved"
+
+
+class ServerTimingMiddleware:
+    """
+    Features:
+    - Server-Timing header with every timed stage plus total
+    - Per-route stage samples in Redis, only for requests that timed a stage
+    - A request span (named after the route) around the stage spans when
+      OpenTelemetry is enabled
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not settings.REQUEST_TIMING_ENABLED:
+            return self.get_response(request)
+        timings, token = start_request_timings()
+        try:
+            with self._request_span(request) as span:
+                response = self.get_response(request)
+                self._name_span(span, request)
+        finally:
+            end_request_timings(token)
+        response["Server-Timing"] = timings.header()
+        if timings.stages:
+            stage_stats.record(_route_name(request), timings)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.REQUEST_TIMING_ENABLED:
+            return await self.get_response(request)
+        timings, token = start_request_timings()
+        try:
+            with self._request_span(request) as span:
+                response = await self.get_response(request)
+                self._name_span(span, request)
+        finally:
+            end_request_timings(token)
+        response["Server-Timing"] = timings.header()
+        if timings.stages:
+            await stage_stats.record_async(_route_name(request), timings)
+        return response
+
+    def _request_span(self, request):
+        tracer = get_tracer()
+        if tracer is None:
+            return contextlib.nullcontext()
+        return tracer.start_as_current_span(request.method, attributes={"http.method": request.method})
+
+    def _name_span(self, span, request):
+        # The route is only known once the URL has been resolved.
+        if span is not None:
+            span.update_name(f"{request.method} {_route_name(request)}")
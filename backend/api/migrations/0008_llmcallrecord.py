@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 01:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_activitynote_is_done'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCallRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('endpoint', models.CharField(blank=True, default='', max_length=64)),
+                ('search_mode', models.CharField(blank=True, default='', max_length=16)),
+                ('model', models.CharField(max_length=64)),
+                ('outcome', models.CharField(max_length=16)),
+                ('finish_reason', models.CharField(blank=True, default='', max_length=32)),
+                ('latency_ms', models.PositiveIntegerField(default=0)),
+                ('prompt_tokens', models.PositiveIntegerField(default=0)),
+                ('output_tokens', models.PositiveIntegerField(default=0)),
+                ('cached_tokens', models.PositiveIntegerField(default=0)),
+                ('thoughts_tokens', models.PositiveIntegerField(default=0)),
+                ('total_tokens', models.PositiveIntegerField(default=0)),
+                ('context_cache_hit', models.BooleanField(default=False)),
+                ('streamed', models.BooleanField(default=False)),
+                ('cost_usd', models.DecimalField(decimal_places=6, default=0, max_digits=12)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='llm_calls', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['model', 'created_at'], name='api_llmcall_model_ca071d_idx'), models.Index(fields=['search_mode', 'created_at'], name='api_llmcall_search__b31a61_idx'), models.Index(fields=['endpoint', 'created_at'], name='api_llmcall_endpoin_939a2c_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,212 @@
+"""
+Model Cascade with Latency Budgets
+
+Runs a trip prompt through the route of its searchMode (SEARCH_MODE_ROUTES in
+api/chat_request.py) instead of a single fixed model:
+
+- Hedging: if the primary has not answered after `hedge_after` seconds, the
+  first fallback (a faster model) starts in parallel and the first usable
+  answer wins.
+- Fallback: an error, safety block, empty or invalid answer moves on to the
+  next model in the route.
+- Budget: the whole cascade gives up after `budget` seconds.
+
+Every call is recorded in the per-model stats (api/utils/model_stats.py),
+plus hedged / hedge_won / budget_exceeded events, so budgets and hedge delays
+can be tuned from the p50/p95 latencies and success rates in /api/metrics/.
+"""
+
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from .chat_request import GeminiResult, generate, generate_async, route_for_search_mode
+from .utils.model_stats import model_stats
+
+_router_executor = None
+_router_executor_lock = threading.Lock()
+
+
+def _get_router_executor() -> ThreadPoolExecutor:
+    """Threads for cascade attempts; a losing hedge keeps its thread until the model's own timeout."""
+    global _router_executor
+    if _router_executor is None:
+        with _router_executor_lock:
+            if _router_executor is None:
+                _router_executor = ThreadPoolExecutor(
+                    max_workers=settings.MODEL_ROUTER_MAX_WORKERS,
+                    thread_name_prefix="model-router",
+                )
+    return _router_executor
+
+
+def is_usable(result: GeminiResult) -> bool:
+    """An answer the caller can work with; truncated output is kept for the repair stage."""
+    return result.outcome == "ok" or (result.truncated and bool(result.partial_text))
+
+
+class _Cascade:
+    """Bookkeeping shared by the sync and async cascade loops."""
+
+    def __init__(self, search_mode):
+        self.search_mode = search_mode
+        self.route = route_for_search_mode(search_mode)
+        self.queue = list(self.route.models)
+        self.attempts = []
+        self.hedged = False
+        self.started = time.monotonic()
+        self.deadline = self.started + self.route.budget
+        self.last_result = None
+
+    def next_model(self, reason):
+        model = self.queue.pop(0)
+        self.attempts.append(model)
+        if reason != "primary":
+            print(f"🔀 Routing {self.search_mode or 'default'} trip to {model} ({reason})")
+        return model
+
+    def wait_timeout(self) -> float:
+        """Seconds until the next hedge or the end of the budget."""
+        now = time.monotonic()
+        timeout = self.deadline - now
+        if self.can_hedge():
+            timeout = min(timeout, self.started + self.route.hedge_after - now)
+        return max(timeout, 0)
+
+    def can_hedge(self) -> bool:
+        return bool(self.route.hedge_after) and not self.hedged and len(self.attempts) == 1 and bool(self.queue)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def finish(self, result: GeminiResult | None) -> GeminiResult:
+        if result is None:
+            result = self.last_result or GeminiResult(
+                None, self.route.primary, error=f"Latency budget of {self.route.budget}s exceeded",
+            )
+        result.route = {
+            "mode": self.search_mode,
+            "attempts": self.attempts,
+            "hedged": self.hedged,
+            "elapsed": round(time.monotonic() - self.started, 3),
+        }
+        return result
+
+    def events_for_win(self, model):
+        return [(model, "hedge_won")] if self.hedged and model != self.route.primary else []
+
+
+# ─────────────────────────── Entry Points ─────────────────────────── #
+def generate_routed(prompt: str, search_mode: str | None, system_instruction: str | None = None,
+                    response_schema: dict | None = None) -> GeminiResult:
+    """
+    Generate with the searchMode's model cascade (hedging, fallback, latency budget).
+
+    Args:
+        prompt (str): Per-request prompt
+        search_mode (str | None): quick, normal or pro
+        system_instruction (str, optional): Static instruction (context-cached when possible)
+        response_schema (dict, optional): JSON response schema
+
+    Returns:
+        GeminiResult: The first usable answer (result.model says which model),
+                      otherwise the last failure; result.route describes the cascade
+    """
+    cascade = _Cascade(search_mode)
+    if not settings.MODEL_ROUTER_ENABLED:
+        return generate(prompt, cascade.next_model("primary"), system_instruction, response_schema=response_schema)
+
+    executor = _get_router_executor()
+    pending = {}
+    # Threads can't be killed: losers still queued or waiting for a slot see this flag and
+    # never start, and calls already sent time out at the cascade deadline.
+    abandoned = threading.Event()
+
+    def launch(reason):
+        model = cascade.next_model(reason)
+        # Run in a copy of the caller's context so the usage ledger attributes the call.
+        call = contextvars.copy_context().run
+        pending[executor.submit(call, generate, prompt, model, system_instruction, response_schema=response_schema,
+                                deadline=cascade.deadline, cancelled=abandoned)] = model
+
+    try:
+        return _run_cascade(cascade, pending, launch)
+    finally:
+        abandoned.set()
+
+
+def _run_cascade(cascade: _Cascade, pending: dict, launch) -> GeminiResult:
+    launch("primary")
+    while pending:
+        done, _ = wait(pending, timeout=cascade.wait_timeout(), return_when=FIRST_COMPLETED)
+        if not done:
+            if cascade.expired():
+                break
+            cascade.hedged = True
+            model_stats.record(cascade.route.primary, None, "hedged")
+            launch(f"hedge, no answer after {cascade.route.hedge_after}s")
+            continue
+        for future in done:
+            model = pending.pop(future)
+            result = future.result()
+            if is_usable(result):
+                for event_model, event in cascade.events_for_win(model):
+                    model_stats.record(event_model, None, event)
+                return cascade.finish(result)
+            cascade.last_result = result
+        if not pending and cascade.queue and not cascade.expired():
+            launch(f"fallback after {cascade.last_result.outcome}")
+
+    if pending:
+        print(f"⏱️ Trip generation exceeded its {cascade.route.budget}s budget ({cascade.attempts}).")
+        model_stats.record(cascade.route.primary, None, "budget_exceeded")
+    return cascade.finish(None)
+
+
+async def generate_routed_async(prompt: str, search_mode: str | None, system_instruction: str | None = None,
+                                response_schema: dict | None = None) -> GeminiResult:
+    """Async variant of generate_routed; losing attempts are cancelled."""
+    cascade = _Cascade(search_mode)
+    if not settings.MODEL_ROUTER_ENABLED:
+        return await generate_async(prompt, cascade.next_model("primary"), system_instruction, response_schema=response_schema)
+
+    pending = {}
+
+    def launch(reason):
+        model = cascade.next_model(reason)
+        task = asyncio.create_task(generate_async(prompt, model, system_instruction, response_schema=response_schema))
+        pending[task] = model
+
+    launch("primary")
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, timeout=cascade.wait_timeout(), return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if cascade.expired():
+                    break
+                cascade.hedged = True
+                await model_stats.record_async(cascade.route.primary, None, "hedged")
+                launch(f"hedge, no answer after {cascade.route.hedge_after}s")
+                continue
+            for task in done:
+                model = pending.pop(task)
+                result = task.result()
+                if is_usable(result):
+                    for event_model, event in cascade.events_for_win(model):
+                        await model_stats.record_async(event_model, None, event)
+                    return cascade.finish(result)
+                cascade.last_result = result
+            if not pending and cascade.queue and not cascade.expired():
+                launch(f"fallback after {cascade.last_result.outcome}")
+
+        if pending:
+            print(f"⏱️ Trip generation exceeded its {cascade.route.budget}s budget ({cascade.attempts}).")
+            await model_stats.record_async(cascade.route.primary, None, "budget_exceeded")
+        return cascade.finish(None)
+    finally:
+        for task in pending:
+            task.cancel()
@@ -3,11 +3,12 @@ Django Models for Trip Planner Application
 
 This module contains the database models for the Trip Planner application.
 It defines the structure for user profiles, visited countries, saved trips,
-and activity notes.
+and activity notes, plus the per-call LLM usage ledger.
 """
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 class UserProfile(models.Model):
     """
@@ -95,4 +96,50 @@ class ActivityNote(models.Model):
         unique_together = ['user', 'trip', 'day_index', 'activity_index']
 
     def __str__(self):
-        return f"Note for trip {self.trip.id} day {self.day_index} activity {self.activity_index} by {self.user.username}"
\ No newline at end of file
+        return f"Note for trip {self.trip.id} day {self.day_index} activity {self.activity_index} by {self.user.username}"
+
+class LLMCallRecord(models.Model):
+    """
+    One Gemini call, written in batches by the usage ledger (api/llm_usage.py).
+
+    Attributes:
+        created_at (DateTimeField): When the call finished
+        endpoint (CharField): Entry point that made the call (plan_trip, chat_replace_activity, ...)
+        search_mode (CharField): Trip searchMode (quick/normal/pro), blank for chat calls
+        model (CharField): Gemini model name
+        user (ForeignKey): Authenticated user, if any
+        outcome (CharField): ok, truncated, blocked, empty, invalid_json or error
+        finish_reason (CharField): Model finish reason (STOP, MAX_TOKENS, ...)
+        latency_ms (PositiveIntegerField): Wall time of the call
+        prompt_tokens, output_tokens, cached_tokens, thoughts_tokens, total_tokens: Token usage
+        context_cache_hit (BooleanField): Part of the prompt was served from Gemini context caching
+        streamed (BooleanField): The call used the streaming API
+        cost_usd (DecimalField): Estimated cost from the ledger's price table
+    """
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    endpoint = models.CharField(max_length=64, blank=True, default="")
+    search_mode = models.CharField(max_length=16, blank=True, default="")
+    model = models.CharField(max_length=64)
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='llm_calls')
+    outcome = models.CharField(max_length=16)
+    finish_reason = models.CharField(max_length=32, blank=True, default="")
+    latency_ms = models.PositiveIntegerField(default=0)
+    prompt_tokens = models.PositiveIntegerField(default=0)
+    output_tokens = models.PositiveIntegerField(default=0)
+    cached_tokens = models.PositiveIntegerField(default=0)
+    thoughts_tokens = models.PositiveIntegerField(default=0)
+    total_tokens = models.PositiveIntegerField(default=0)
+    context_cache_hit = models.BooleanField(default=False)
+    streamed = models.BooleanField(default=False)
+    cost_usd = models.DecimalField(max_digits=12, decimal_places=6, default=0)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['model', 'created_at']),
+            models.Index(fields=['search_mode', 'created_at']),
+            models.Index(fields=['endpoint', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.model} {self.outcome} {self.latency_ms}ms ({self.endpoint or 'unknown'})"
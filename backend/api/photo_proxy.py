@@ -0,0 +1,484 @@
+"""
+Streaming, Cached Proxy for Google Places Photos
+
+Photos are served through our own endpoint so the browser never talks to the
+Places Photo API directly. Each (photo_reference, maxwidth) pair is fetched
+from Google at most once per cache lifetime; later requests are served from
+Redis, or answered with 304 when the browser already has the image.
+
+Key Features:
+- Upstream bytes streamed to the client in fixed-size chunks (bounded memory)
+- Redis byte cache with an LRU index and a total size budget, kept exact by one
+  Lua script per store (overwrites count their size difference, expired entries
+  are subtracted); one of several concurrent misses fills it (NX guard)
+- Strong ETag derived from the photo identity, so revalidation needs no upstream call
+- Long-lived Cache-Control headers (a photo reference always maps to the same image)
+- Timeouts and connection reuse on the upstream session
+- Derivative tier (needs Pillow): one master per photo, resized WebP/AVIF/JPEG
+  variants at fixed widths, negotiated from the Accept header; prewarming of the
+  other widths runs on its own bounded pool so it never delays a request
+"""
+
+import hashlib
+import io
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from redis.exceptions import RedisError
+
+from .google_places_service import build_places_session
+from .utils.redis_client import redis_binary_client, redis_client
+from .utils.request_timing import timed
+from .utils.single_flight import SingleFlight
+
+try:
+    from PIL import Image, ImageOps, features as pil_features
+except ImportError:  # optional dependency; without it photos are proxied as-is
+    Image = None
+
+PHOTO_CACHE_PREFIX = "photo:v1"
+PHOTO_LRU_KEY = f"{PHOTO_CACHE_PREFIX}:lru"
+PHOTO_SIZES_KEY = f"{PHOTO_CACHE_PREFIX}:sizes"
+PHOTO_TOTAL_KEY = f"{PHOTO_CACHE_PREFIX}:total_bytes"
+PHOTO_STATS_KEY = f"{PHOTO_CACHE_PREFIX}:stats"
+
+PHOTO_CHUNK_SIZE = 64 * 1024
+PHOTO_MAX_WIDTH = 1600  # Google's upper bound
+PHOTO_CACHE_CONTROL = "public, max-age=604800, immutable"
+
+# Requested widths are rounded up to one of these, so each photo has a bounded set of variants.
+PHOTO_VARIANT_WIDTHS = (200, 400, 800, 1600)
+PHOTO_VARIANT_FORMATS = {
+    # format: (content type, Pillow save options)
+    "avif": ("image/avif", {"quality": 55, "speed": 8}),
+    "webp": ("image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+PHOTO_MASTER_WIDTH = PHOTO_MAX_WIDTH
+PHOTO_TRANSCODE_TIMEOUT = 20
+PHOTO_PREWARM_MAX_PENDING = 32  # prewarm jobs queued or running; more are skipped, not queued
+
+photo_single_flight = SingleFlight(
+    redis_client,
+    namespace="photo:singleflight",
+    lock_ttl=30,
+    wait_timeout=20,
+    poll_interval=0.1,
+)
+
+_transcode_executor = None
+_prewarm_executor = None
+_prewarm_slots = threading.BoundedSemaphore(PHOTO_PREWARM_MAX_PENDING)
+
+_photo_session = None
+_lazy_init_lock = threading.Lock()
+
+
+def _get_photo_session():
+    global _photo_session
+    if _photo_session is None:
+        with _lazy_init_lock:
+            if _photo_session is None:
+                _photo_session = build_places_session()
+    return _photo_session
+
+
+def _get_transcode_executor():
+    """Pool for transcodes a request is waiting on."""
+    global _transcode_executor
+    if _transcode_executor is None:
+        with _lazy_init_lock:
+            if _transcode_executor is None:
+                _transcode_executor = ThreadPoolExecutor(
+                    max_workers=settings.PHOTO_TRANSCODE_WORKERS,
+                    thread_name_prefix="photo-transcode",
+                )
+    return _transcode_executor
+
+
+def _get_prewarm_executor():
+    """Single-thread pool for prewarming, so request transcodes never queue behind it."""
+    global _prewarm_executor
+    if _prewarm_executor is None:
+        with _lazy_init_lock:
+            if _prewarm_executor is None:
+                _prewarm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="photo-prewarm")
+    return _prewarm_executor
+
+
+def parse_max_width(value, default=800) -> int:
+    """Clamp the requested width to Google's 1..1600 range."""
+    try:
+        width = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(width, PHOTO_MAX_WIDTH))
+
+
+def photo_cache_key(photo_reference: str, max_width: int) -> str:
+    """Return the Redis key for one photo variant, e.g. "photo:v1:5c1f...:800"."""
+    digest = hashlib.sha256(photo_reference.encode("utf-8")).hexdigest()[:32]
+    return f"{PHOTO_CACHE_PREFIX}:{digest}:{max_width}"
+
+
+def photo_etag(cache_key: str) -> str:
+    return '"' + hashlib.sha1(cache_key.encode("utf-8")).hexdigest() + '"'
+
+
+def _etag_matches(request, etag: str) -> bool:
+    header = request.META.get("HTTP_IF_NONE_MATCH", "")
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+def _incr_stat(field):
+    try:
+        redis_binary_client.hincrby(PHOTO_STATS_KEY, field, 1)
+    except RedisError:
+        pass
+
+
+def photo_cache_stats() -> dict:
+    """Return hit/miss/not_modified/master_fetches counters and the cached byte total."""
+    try:
+        raw = redis_binary_client.hgetall(PHOTO_STATS_KEY)
+        total = redis_binary_client.get(PHOTO_TOTAL_KEY)
+    except RedisError as e:
+        return {"error": str(e)}
+    stats = {field.decode(): int(value) for field, value in raw.items()}
+    stats["cached_bytes"] = int(total or 0)
+    return stats
+
+
+def get_cached_photo(cache_key: str):
+    """Return (content_type, body) from the byte cache and mark it recently used, or None."""
+    try:
+        cached = redis_binary_client.hmget(cache_key, "content_type", "body")
+        if cached[1] is None:
+            return None
+        # The TTL runs from the last use, like the LRU score, so expired entries are the oldest ones.
+        pipe = redis_binary_client.pipeline(transaction=False)
+        pipe.zadd(PHOTO_LRU_KEY, {cache_key: time.time()})
+        pipe.expire(cache_key, settings.PHOTO_CACHE_TTL)
+        pipe.execute()
+        return cached[0].decode(), cached[1]
+    except RedisError as e:
+        print(f"⚠️ Photo cache error: {e}. Fetching from Google.")
+        return None
+
+
+# Stores a photo and keeps the byte total exact: an overwrite only adds its size
+# difference, entries that expired unused (LRU score older than the TTL) are
+# subtracted, then the least recently used photos are evicted down to the budget.
+# KEYS: photo, lru, sizes, total. ARGV: content_type, body, ttl, now, max_total.
+STORE_PHOTO_SCRIPT = """
+local key, lru, sizes, total_key = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local ttl, now, max_total = tonumber(ARGV[3]), tonumber(ARGV[4]), tonumber(ARGV[5])
+
+local expired = redis.call('ZRANGEBYSCORE', lru, '-inf', now - ttl, 'LIMIT', 0, 100)
+for _, old in ipairs(expired) do
+    redis.call('ZREM', lru, old)
+    redis.call('DECRBY', total_key, tonumber(redis.call('HGET', sizes, old)) or 0)
+    redis.call('HDEL', sizes, old)
+    redis.call('DEL', old)
+end
+
+local size = string.len(ARGV[2])
+local previous = tonumber(redis.call('HGET', sizes, key)) or 0
+redis.call('HSET', key, 'content_type', ARGV[1], 'body', ARGV[2])
+redis.call('EXPIRE', key, ttl)
+redis.call('ZADD', lru, now, key)
+redis.call('HSET', sizes, key, size)
+local total = redis.call('INCRBY', total_key, size - previous)
+
+while total > max_total do
+    local oldest = redis.call('ZPOPMIN', lru)
+    if #oldest == 0 then
+        break
+    end
+    total = redis.call('DECRBY', total_key, tonumber(redis.call('HGET', sizes, oldest[1])) or 0)
+    redis.call('HDEL', sizes, oldest[1])
+    redis.call('DEL', oldest[1])
+end
+return total
+"""
+_store_photo_script = redis_binary_client.register_script(STORE_PHOTO_SCRIPT)
+
+
+def store_photo(cache_key: str, content_type: str, body: bytes) -> None:
+    """Cache a photo and evict least recently used photos beyond PHOTO_CACHE_MAX_TOTAL_BYTES (atomic)."""
+    try:
+        _store_photo_script(
+            keys=[cache_key, PHOTO_LRU_KEY, PHOTO_SIZES_KEY, PHOTO_TOTAL_KEY],
+            args=[content_type, body, settings.PHOTO_CACHE_TTL, time.time(), settings.PHOTO_CACHE_MAX_TOTAL_BYTES],
+        )
+    except RedisError as e:
+        print(f"⚠️ Photo cache set error: {e}. Photo not cached.")
+
+
+def _claim_fill(cache_key: str) -> bool:
+    """Only one of several concurrent misses for a photo keeps a copy for the cache."""
+    try:
+        return bool(redis_binary_client.set(f"{cache_key}:filling", 1, nx=True, ex=60))
+    except RedisError:
+        return False
+
+
+def _release_fill(cache_key: str) -> None:
+    try:
+        redis_binary_client.delete(f"{cache_key}:filling")
+    except RedisError:
+        pass
+
+
+def _stream_and_cache(upstream, cache_key: str, content_type: str):
+    """Yield upstream chunks, keeping a copy for the cache only while it stays under the per-photo limit."""
+    buffer = bytearray()
+    filling = cacheable = _claim_fill(cache_key)
+    completed = False
+    try:
+        for chunk in upstream.iter_content(chunk_size=PHOTO_CHUNK_SIZE):
+            if cacheable:
+                if len(buffer) + len(chunk) <= settings.PHOTO_CACHE_MAX_BYTES:
+                    buffer.extend(chunk)
+                else:
+                    cacheable = False
+                    buffer = bytearray()
+            yield chunk
+        completed = True
+    finally:
+        upstream.close()
+        if completed and cacheable and buffer:
+            store_photo(cache_key, content_type, bytes(buffer))
+        if filling:
+            _release_fill(cache_key)
+
+
+# ──────────────────────────────── Derivative Tier ──────────────────────────────── #
+
+def transcoding_enabled() -> bool:
+    """True if Pillow is installed and the variant tier is switched on."""
+    return Image is not None and settings.PHOTO_TRANSCODE_ENABLED
+
+
+def snap_width(max_width: int) -> int:
+    """Round a requested width up to the nearest variant width."""
+    for width in PHOTO_VARIANT_WIDTHS:
+        if max_width <= width:
+            return width
+    return PHOTO_VARIANT_WIDTHS[-1]
+
+
+def negotiate_format(accept: str) -> str:
+    """Pick the best variant format the client accepts (AVIF, then WebP, then JPEG)."""
+    accept = accept or ""
+    if "image/avif" in accept and pil_features.check("avif"):
+        return "avif"
+    if "image/webp" in accept and pil_features.check("webp"):
+        return "webp"
+    return "jpeg"
+
+
+def render_variant(master: bytes, width: int, fmt: str) -> bytes:
+    """
+    Resize a master image to at most `width` pixels wide and encode it.
+
+    Args:
+        master (bytes): Original image bytes
+        width (int): Target width (images are never upscaled)
+        fmt (str): Key of PHOTO_VARIANT_FORMATS
+
+    Returns:
+        bytes: Encoded variant
+    """
+    _, save_options = PHOTO_VARIANT_FORMATS[fmt]
+    with Image.open(io.BytesIO(master)) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.width > width:
+            image.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        if fmt == "jpeg" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        elif image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        out = io.BytesIO()
+        image.save(out, format=fmt.upper(), **save_options)
+        return out.getvalue()
+
+
+def _fetch_master(photo_reference: str, master_key: str):
+    """Download the full master image (bounded by PHOTO_MASTER_MAX_BYTES) and cache it."""
+    upstream = _get_photo_session().get(
+        "https://maps.googleapis.com/maps/api/place/photo",
+        params={"maxwidth": PHOTO_MASTER_WIDTH, "photoreference": photo_reference, "key": settings.GOOGLE_API_KEY},
+        stream=True,
+        timeout=(settings.GOOGLE_PLACES_CONNECT_TIMEOUT, settings.GOOGLE_PLACES_READ_TIMEOUT),
+    )
+    try:
+        if not upstream.ok:
+            print(f"❌ Google returned {upstream.status_code} for photo master")
+            return None
+        body = bytearray()
+        for chunk in upstream.iter_content(chunk_size=PHOTO_CHUNK_SIZE):
+            body.extend(chunk)
+            if len(body) > settings.PHOTO_MASTER_MAX_BYTES:
+                print("⚠️ Photo master exceeds PHOTO_MASTER_MAX_BYTES; not transcoding.")
+                return None
+    finally:
+        upstream.close()
+    master = (upstream.headers.get("Content-Type", "image/jpeg"), bytes(body))
+    store_photo(master_key, *master)
+    return master
+
+
+def get_photo_master(photo_reference: str):
+    """Return (content_type, body) of the master image, fetching it once across workers."""
+    master_key = f"{photo_cache_key(photo_reference, PHOTO_MASTER_WIDTH)}:master"
+    cached = get_cached_photo(master_key)
+    if cached:
+        return cached
+    _incr_stat("master_fetches")
+    return photo_single_flight.run(
+        master_key,
+        compute=lambda: _fetch_master(photo_reference, master_key),
+        load=lambda: get_cached_photo(master_key),
+    )
+
+
+def _build_variant(master: bytes, photo_reference: str, width: int, fmt: str) -> bytes:
+    key = f"{photo_cache_key(photo_reference, width)}:{fmt}"
+    variant = render_variant(master, width, fmt)
+    store_photo(key, PHOTO_VARIANT_FORMATS[fmt][0], variant)
+    return variant
+
+
+def _prewarm_variants(master: bytes, photo_reference: str, fmt: str, skip_width: int) -> None:
+    """
+    Queue the other widths of this format so the next size a page asks for is already cached.
+
+    Prewarming is best effort: once PHOTO_PREWARM_MAX_PENDING jobs are waiting,
+    further widths are skipped and get built on first request instead.
+    """
+    for width in PHOTO_VARIANT_WIDTHS:
+        key = f"{photo_cache_key(photo_reference, width)}:{fmt}"
+        if width == skip_width:
+            continue
+        try:
+            if redis_binary_client.exists(key):
+                continue
+        except RedisError:
+            return
+        if not _prewarm_slots.acquire(blocking=False):
+            _incr_stat("prewarm_skipped")
+            return
+        future = _get_prewarm_executor().submit(_build_variant, master, photo_reference, width, fmt)
+        future.add_done_callback(lambda _: _prewarm_slots.release())
+
+
+def serve_photo_variant(request, photo_reference: str, max_width: int):
+    """
+    Serve a resized, re-encoded variant of a place photo.
+
+    Returns:
+        HttpResponse | JsonResponse | None: None if the master cannot be transcoded
+        (the caller then falls back to proxying Google's image as-is)
+    """
+    fmt = negotiate_format(request.META.get("HTTP_ACCEPT", ""))
+    width = snap_width(max_width)
+    cache_key = f"{photo_cache_key(photo_reference, width)}:{fmt}"
+    etag = photo_etag(cache_key)
+    content_type = PHOTO_VARIANT_FORMATS[fmt][0]
+
+    if _etag_matches(request, etag):
+        _incr_stat("not_modified")
+        response = HttpResponseNotModified()
+    else:
+        with timed("photo_cache"):
+            cached = get_cached_photo(cache_key)
+        if cached:
+            _incr_stat("hits")
+            response = HttpResponse(cached[1], content_type=content_type)
+        else:
+            _incr_stat("misses")
+            with timed("photo_fetch"):
+                master = get_photo_master(photo_reference)
+            if not master:
+                return None
+            try:
+                with timed("transcode"):
+                    body = _get_transcode_executor().submit(
+                        _build_variant, master[1], photo_reference, width, fmt
+                    ).result(timeout=PHOTO_TRANSCODE_TIMEOUT)
+            except Exception as e:
+                print(f"⚠️ Could not transcode photo ({e}); serving the master image.")
+                _incr_stat("transcode_errors")
+                # The master is already in the byte cache; its ETag keeps it apart from the variant.
+                content_type, body = master
+                etag = photo_etag(f"{photo_cache_key(photo_reference, PHOTO_MASTER_WIDTH)}:master")
+            else:
+                _prewarm_variants(master[1], photo_reference, fmt, width)
+            response = HttpResponse(body, content_type=content_type)
+
+    response["ETag"] = etag
+    response["Cache-Control"] = PHOTO_CACHE_CONTROL
+    response["Vary"] = "Accept"
+    return response
+
+
+def serve_place_photo(request, photo_reference: str, max_width: int):
+    """
+    Return a response for one place photo (cache hit, 304 or streamed miss).
+
+    Uses the derivative tier when Pillow is available; otherwise, or if the
+    master cannot be fetched for transcoding, Google's image is proxied as-is.
+
+    Args:
+        request: Django request (used for If-None-Match)
+        photo_reference (str): Google Places photo reference
+        max_width (int): Width passed to the Places Photo API
+
+    Returns:
+        HttpResponse | StreamingHttpResponse | JsonResponse
+    """
+    if transcoding_enabled():
+        response = serve_photo_variant(request, photo_reference, max_width)
+        if response is not None:
+            return response
+
+    cache_key = photo_cache_key(photo_reference, max_width)
+    etag = photo_etag(cache_key)
+
+    if _etag_matches(request, etag):
+        _incr_stat("not_modified")
+        response = HttpResponseNotModified()
+    else:
+        with timed("photo_cache"):
+            cached = get_cached_photo(cache_key)
+        if cached:
+            _incr_stat("hits")
+            content_type, body = cached
+            response = HttpResponse(body, content_type=content_type)
+        else:
+            _incr_stat("misses")
+            google_url = "https://maps.googleapis.com/maps/api/place/photo"
+            # Only the time to the response headers; the body streams after Server-Timing is sent.
+            with timed("photo_fetch"):
+                upstream = _get_photo_session().get(
+                    google_url,
+                    params={"maxwidth": max_width, "photoreference": photo_reference, "key": settings.GOOGLE_API_KEY},
+                    stream=True,
+                    timeout=(settings.GOOGLE_PLACES_CONNECT_TIMEOUT, settings.GOOGLE_PLACES_READ_TIMEOUT),
+                )
+            if not upstream.ok:
+                upstream.close()
+                return JsonResponse({"error": "Failed to fetch image from Google"}, status=upstream.status_code)
+
+            content_type = upstream.headers.get("Content-Type", "image/jpeg")
+            response = StreamingHttpResponse(_stream_and_cache(upstream, cache_key, content_type), content_type=content_type)
+            if upstream.headers.get("Content-Length"):
+                response["Content-Length"] = upstream.headers["Content-Length"]
+
+    response["ETag"] = etag
+    response["Cache-Control"] = PHOTO_CACHE_CONTROL
+    return response
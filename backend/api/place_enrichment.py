@@ -0,0 +1,118 @@
+"""
+Place Enrichment for Generated Itineraries
+
+Optional pipeline stage that runs after an itinerary has been parsed: every
+activity's `place_name_for_lookup` is resolved through GooglePlacesService in
+one batch and the result is attached to the activity, so the client gets a
+render-ready plan without a place-details call per activity.
+
+Key Features:
+- One batched lookup per plan (deduplicated, MGET for hits, parallel misses)
+- Compact place summary (coordinates, photos, rating) merged into place_details
+- Enriched plans cached under their own key next to the plain itinerary
+- Failures leave the plan unenriched instead of failing the request
+"""
+
+import copy
+
+from .google_places_service import PLACE_CACHE_PREFIX, get_places_service
+from .trip_cache import get_cached_itinerary, get_cached_itinerary_async, store_itinerary
+
+# Tied to the place cache version so enriched plans are rebuilt when place data changes shape.
+ENRICHED_KEY_SUFFIX = f"enriched:{PLACE_CACHE_PREFIX}"
+
+# Fields copied from GooglePlacesService results; reviews and opening hours stay
+# with the on-demand place-details endpoint to keep plans small.
+ENRICHED_PLACE_FIELDS = ("name", "address", "location", "rating", "total_ratings", "price_level", "website")
+ENRICHED_PHOTO_LIMIT = 3
+
+
+def enriched_cache_key(key: str) -> str:
+    """Cache key of the enriched variant of an itinerary key."""
+    return f"{key}:{ENRICHED_KEY_SUFFIX}"
+
+
+def collect_plan_place_queries(plan: dict) -> list[tuple[int, int, str]]:
+    """
+    List the place lookups an itinerary needs, built like the frontend does.
+
+    Args:
+        plan (dict): Itinerary with days[].activities[].place_name_for_lookup
+
+    Returns:
+        list[tuple[int, int, str]]: (day_index, activity_index, "<place> <city> <country>")
+    """
+    info = plan.get("destination_info") or {}
+    suffix = [str(info.get(field)) for field in ("city", "country") if info.get(field)]
+    lookups = []
+    for day_index, day in enumerate(plan.get("days") or []):
+        if not isinstance(day, dict):
+            continue
+        for activity_index, activity in enumerate(day.get("activities") or []):
+            name = activity.get("place_name_for_lookup") if isinstance(activity, dict) else None
+            if name and str(name).strip():
+                lookups.append((day_index, activity_index, " ".join([str(name).strip(), *suffix])))
+    return lookups
+
+
+def summarize_place(details: dict) -> dict:
+    """Reduce full place details to the fields an itinerary view renders."""
+    summary = {field: details.get(field) for field in ENRICHED_PLACE_FIELDS if details.get(field) is not None}
+    summary["photos"] = (details.get("photos") or [])[:ENRICHED_PHOTO_LIMIT]
+    return summary
+
+
+def enrich_itinerary(plan: dict) -> dict:
+    """
+    Return a copy of the plan with Google place data attached to each activity.
+
+    Args:
+        plan (dict): Parsed itinerary
+
+    Returns:
+        dict: Copy of the plan; matched activities get their place_details
+              updated, and `places_enriched` is set on the plan
+    """
+    enriched = copy.deepcopy(plan)
+    lookups = collect_plan_place_queries(enriched)
+    results, stats = get_places_service().search_places([query for _, _, query in lookups])
+
+    matched = 0
+    for day_index, activity_index, query in lookups:
+        details = results.get(query)
+        if not details:
+            continue
+        activity = enriched["days"][day_index]["activities"][activity_index]
+        place_details = activity.get("place_details") if isinstance(activity.get("place_details"), dict) else {}
+        activity["place_details"] = {**place_details, **summarize_place(details)}
+        matched += 1
+
+    enriched["places_enriched"] = True
+    print(f"📍 Enriched {matched}/{len(lookups)} activities with place data ({stats})")
+    return enriched
+
+
+def get_cached_enriched_itinerary(key: str, refresh=None) -> dict | None:
+    """Return the cached enriched variant of an itinerary key, if any (refresh: see get_cached_itinerary)."""
+    return get_cached_itinerary(enriched_cache_key(key), refresh=refresh, refresh_key=key)
+
+
+async def get_cached_enriched_itinerary_async(key: str, refresh=None) -> dict | None:
+    """Async variant of get_cached_enriched_itinerary."""
+    return await get_cached_itinerary_async(enriched_cache_key(key), refresh=refresh, refresh_key=key)
+
+
+def enrich_and_cache_itinerary(plan: dict, key: str) -> dict:
+    """
+    Enrich a plan and cache it under the enriched key. Never raises.
+
+    Returns:
+        dict: The enriched plan, or the original plan if enrichment failed
+    """
+    try:
+        enriched = enrich_itinerary(plan)
+    except Exception as e:
+        print(f"⚠️ Place enrichment failed: {e}. Returning the plan without place data.")
+        return plan
+    store_itinerary(enriched_cache_key(key), enriched)
+    return enriched
@@ -24,6 +24,7 @@ from django.db import transaction
 from rest_framework import serializers
 from django.db import transaction 
 from .models import ActivityNote
+from .utils.photo_signing import proxy_legacy_photo_urls
 
 class RegisterSerializer(serializers.ModelSerializer):
     """
@@ -238,7 +239,7 @@ class SavedTripSerializer(serializers.ModelSerializer):
     - Trip data storage
     - User association
     - Destination images
-    - Plan JSON storage
+    - Plan JSON storage (Google photo URLs of older trips are served through the photo proxy)
     """
     user_email = serializers.EmailField(source='user.username', read_only=True)
     
@@ -258,6 +259,11 @@ class SavedTripSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'user', 'saved_at', 'user_email']
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        data['plan_json'] = proxy_legacy_photo_urls(data.get('plan_json'))
+        return data
+
 class ActivityNoteSerializer(serializers.ModelSerializer):
     """
     Serializer for activity notes.
@@ -0,0 +1,414 @@
+"""
+Near-Duplicate Itinerary Cache
+
+Exact keys (api/cache_keys.py) miss when two requests differ only in wording
+or dates: "Paris" vs "Paris, France", or the same 4-day trip in early vs late May.
+This module embeds the normalized request features and, on an exact-key miss,
+serves the most similar cached itinerary above SIMILAR_TRIP_CACHE_THRESHOLD.
+
+Embedding (feature hashing, cosine similarity = weighted sum of block similarities):
+- destination: character trigrams of the city (first comma-separated part)
+- interests:   interests + tripStyle + travelWith labels
+- pace, budget, transport: categorical values
+
+Hard constraints (never served across):
+- trip length in days (itineraries are written day by day)
+- season of the start date (plans mention seasonal events, opening times and weather)
+- budget and pace (a luxury plan is never served to a budget traveler)
+- searchMode (a quick-model plan is never served for a "pro" request)
+- the region qualifier ("Paris, France" vs "Paris, Texas") when both requests give one
+- mustSeeAttractions (explicit requirements)
+
+Index:
+- Entries live in Redis (trip:similar:index) so every process shares them
+- Every add/remove also scores the key with its time in trip:similar:changes
+- Each process keeps an in-memory NumPy matrix and brute-forces the search;
+  it is loaded once, then only the keys changed since the last check are
+  re-read and embedded, so a refresh costs a few embeddings, not a rebuild
+- Only freshly generated itineraries are indexed, so near-duplicates never chain
+
+NumPy is optional; without it the similarity cache is disabled.
+`python manage.py evaluate_similar_cache <log>` replays logged requests to
+compare hit rate and match quality across thresholds.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+from .cache_keys import canonical_trip_request
+from .itinerary_repair import expected_day_count
+from .trip_cache import TRIP_CACHE_TTL, get_cached_itinerary, store_itinerary
+from .utils.redis_client import async_redis_client, redis_client
+
+INDEX_KEY = "trip:similar:index"
+CHANGES_KEY = "trip:similar:changes"
+STATS_KEY = "trip:similar:stats"
+
+# Changes are re-read this far back, so an add committed just after a check
+# (with an earlier timestamp, or from a host with a slightly different clock) is not missed.
+CHANGES_OVERLAP = 30.0
+
+DIMENSIONS = 512
+BLOCK_WEIGHTS = {
+    "destination": 0.55,
+    "interests": 0.2,
+    "pace": 0.1,
+    "budget": 0.1,
+    "transport": 0.05,
+}
+EMPTY_TOKEN = "<none>"
+
+
+# ─────────────────────────── Features ─────────────────────────── #
+def trip_features(data: dict) -> dict:
+    """
+    Normalized, JSON-safe features of a trip request.
+
+    Args:
+        data (dict): validated_data from PlanTripSerializer
+
+    Returns:
+        dict: city, region, days, season, must_see, search_mode and the token lists of every block
+    """
+    canonical = canonical_trip_request(data)
+    city, _, region = canonical["destination"].partition(", ")
+    padded = f"  {city} "
+    return {
+        "city": city,
+        "region": region,
+        "days": expected_day_count(data) or 0,
+        "season": trip_season(data),
+        "must_see": canonical.get("mustSeeAttractions", ""),
+        "search_mode": canonical.get("searchMode", ""),
+        "destination": sorted({padded[i:i + 3] for i in range(len(padded) - 2)}),
+        "interests": sorted(set(canonical.get("interests", []) + canonical.get("tripStyle", []) + canonical.get("travelWith", []))),
+        "pace": [canonical.get("pace", "")],
+        "budget": [canonical.get("budget", "")],
+        "transport": [canonical.get("transportationMode", "")],
+    }
+
+
+def trip_season(data: dict) -> str:
+    """Meteorological season of the start date ("dec-feb", "mar-may", ...), "" if undated."""
+    start = data.get("startDate")
+    if not isinstance(start, date):
+        return ""
+    return ("dec-feb", "mar-may", "jun-aug", "sep-nov")[start.month % 12 // 3]
+
+
+def _bucket(block: str, token: str) -> tuple[int, float]:
+    digest = hashlib.blake2b(f"{block}:{token}".encode("utf-8"), digest_size=8).digest()
+    value = int.from_bytes(digest, "big")
+    return value % DIMENSIONS, 1.0 if value >> 63 else -1.0
+
+
+def embed(features: dict):
+    """Unit-length vector whose dot products are the weighted block cosine similarities."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for block, weight in BLOCK_WEIGHTS.items():
+        block_vector = np.zeros(DIMENSIONS, dtype=np.float32)
+        for token in [t for t in features[block] if t] or [EMPTY_TOKEN]:
+            index, sign = _bucket(block, token)
+            block_vector[index] += sign
+        block_vector *= np.sqrt(weight) / np.linalg.norm(block_vector)
+        vector += block_vector
+    return vector
+
+
+def is_compatible(a: dict, b: dict) -> bool:
+    """Hard constraints: same length, season, budget, pace, searchMode and must-see list, no conflicting region."""
+    return (
+        a["days"] == b["days"]
+        and a.get("season", "") == b.get("season", "")
+        and a["budget"] == b["budget"]
+        and a["pace"] == b["pace"]
+        and a.get("search_mode") == b.get("search_mode")
+        and a["must_see"] == b["must_see"]
+        and (not a["region"] or not b["region"] or a["region"] == b["region"])
+    )
+
+
+# ─────────────────────────── In-Memory Index ─────────────────────────── #
+class TripVectorIndex:
+    """
+    Brute-force cosine index over trip feature vectors.
+
+    Candidates are filtered by the hard constraints before scoring; at the
+    index sizes of a trip cache (tens of thousands) one matrix-vector product
+    is faster than maintaining an approximate index. Rows are preallocated
+    (doubling), so adding one entry embeds only that entry; removed rows are
+    left empty until there are more of them than live rows.
+    """
+
+    def __init__(self):
+        self.keys = []  # None for removed rows
+        self.features = []
+        self.matrix = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self._days = np.zeros(0, dtype=np.int32)  # -1 for removed and unused rows
+        self._rows = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, key):
+        return key in self._rows
+
+    def add(self, key: str, features: dict):
+        """Add an entry, or replace the entry of an existing key."""
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.matrix):
+                self._grow(max(64, 2 * row))
+            self.keys.append(key)
+            self.features.append(features)
+            self._rows[key] = row
+        else:
+            self.features[row] = features
+        self.matrix[row] = embed(features)
+        self._days[row] = features["days"]
+
+    def remove(self, key: str):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        self.keys[row] = None
+        self.features[row] = None
+        self._days[row] = -1
+        if len(self.keys) - len(self._rows) > max(64, len(self._rows)):
+            self._compact()
+
+    def _grow(self, capacity: int):
+        matrix = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        matrix[:len(self.matrix)] = self.matrix
+        days = np.full(capacity, -1, dtype=np.int32)
+        days[:len(self._days)] = self._days
+        self.matrix, self._days = matrix, days
+
+    def _compact(self):
+        live = [row for row, key in enumerate(self.keys) if key is not None]
+        self.keys = [self.keys[row] for row in live]
+        self.features = [self.features[row] for row in live]
+        self.matrix = self.matrix[live]
+        self._days = self._days[live]
+        self._rows = {key: row for row, key in enumerate(self.keys)}
+
+    @classmethod
+    def build(cls, entries: list) -> "TripVectorIndex":
+        """Build an index from (key, features) pairs in one pass."""
+        index = cls()
+        if entries:
+            index.keys = [key for key, _ in entries]
+            index.features = [features for _, features in entries]
+            index.matrix = np.stack([embed(features) for features in index.features])
+            index._days = np.array([features["days"] for features in index.features], dtype=np.int32)
+            index._rows = {key: row for row, key in enumerate(index.keys)}
+        return index
+
+    def search(self, features: dict, threshold: float, limit: int = 3, exclude_key: str | None = None) -> list:
+        """
+        Most similar compatible entries.
+
+        Returns:
+            list[tuple[str, float]]: (key, score) pairs with score >= threshold, best first
+        """
+        if not self._rows:
+            return []
+        candidates = np.flatnonzero(self._days[:len(self.keys)] == features["days"])
+        candidates = [i for i in candidates if is_compatible(features, self.features[i]) and self.keys[i] != exclude_key]
+        if not candidates:
+            return []
+        scores = self.matrix[candidates] @ embed(features)
+        order = np.argsort(-scores)[:limit]
+        return [(self.keys[candidates[i]], float(scores[i])) for i in order if scores[i] >= threshold]
+
+
+# ─────────────────────────── Shared Cache ─────────────────────────── #
+class SimilarTripCache:
+    """
+    Redis-backed registry of generated itineraries with a per-process vector index.
+
+    Args:
+        refresh_interval (float): Seconds between checks for changed entries
+        max_age (int): Entries older than this (the itinerary cache TTL) are dropped
+    """
+
+    def __init__(self, refresh_interval=5.0, max_age=3600 * 24 * 3):
+        self.refresh_interval = refresh_interval
+        self.max_age = max_age
+        self._index = None
+        self._added_at = {}  # key -> added_at of the indexed entry
+        self._changes_seen = 0.0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.SIMILAR_TRIP_CACHE_ENABLED and np is not None
+
+    def _entry(self, data: dict) -> str:
+        return json.dumps({"features": trip_features(data), "added_at": time.time()})
+
+    def _queue_change(self, pipe, key: str):
+        now = time.time()
+        pipe.zadd(CHANGES_KEY, {key: now})
+        pipe.zremrangebyscore(CHANGES_KEY, "-inf", now - self.max_age)
+
+    def add(self, data: dict, key: str):
+        """Register a freshly generated itinerary. Never raises."""
+        if not self.enabled:
+            return
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hset(INDEX_KEY, key, self._entry(data))
+            self._queue_change(pipe, key)
+            pipe.execute()
+        except RedisError as e:
+            print(f"⚠️ Could not index itinerary for similarity lookups: {e}")
+
+    async def add_async(self, data: dict, key: str):
+        """Async variant of add."""
+        if not self.enabled:
+            return
+        try:
+            pipe = async_redis_client.pipeline()
+            pipe.hset(INDEX_KEY, key, self._entry(data))
+            self._queue_change(pipe, key)
+            await pipe.execute()
+        except RedisError as e:
+            print(f"⚠️ Could not index itinerary for similarity lookups: {e}")
+
+    def remove(self, key: str):
+        """Drop an entry whose itinerary has left the cache."""
+        try:
+            pipe = redis_client.pipeline()
+            pipe.hdel(INDEX_KEY, key)
+            self._queue_change(pipe, key)
+            pipe.execute()
+        except RedisError:
+            pass
+
+    def _refresh(self):
+        """Bring the in-memory index up to date; callers hold self._lock."""
+        now = time.monotonic()
+        if self._index is None:
+            self._load_index()
+        elif now - self._checked_at >= self.refresh_interval:
+            self._apply_changes()
+        else:
+            return
+        self._checked_at = now
+
+    def _load_index(self):
+        """Full load of the shared registry (first use in this process)."""
+        changes_seen = time.time()
+        entries, expired = [], []
+        cutoff = time.time() - self.max_age
+        self._added_at = {}
+        for key, raw in redis_client.hgetall(INDEX_KEY).items():
+            entry = json.loads(raw)
+            if entry["added_at"] < cutoff:
+                expired.append(key)
+            else:
+                entries.append((key, entry["features"]))
+                self._added_at[key] = entry["added_at"]
+        if expired:
+            redis_client.hdel(INDEX_KEY, *expired)
+        self._index = TripVectorIndex.build(entries)
+        self._changes_seen = changes_seen
+
+    def _apply_changes(self):
+        """Re-read only the keys added or removed since the last check."""
+        changes = redis_client.zrangebyscore(CHANGES_KEY, self._changes_seen - CHANGES_OVERLAP, "+inf", withscores=True)
+        cutoff = time.time() - self.max_age
+        expired = [key for key, added_at in self._added_at.items() if added_at < cutoff]
+        for key in expired:
+            self._index.remove(key)
+            del self._added_at[key]
+        if not changes:
+            return
+        keys = [key for key, _ in changes]
+        for key, raw in zip(keys, redis_client.hmget(INDEX_KEY, keys)):
+            entry = json.loads(raw) if raw else None
+            if entry is None or entry["added_at"] < cutoff:
+                self._index.remove(key)
+                self._added_at.pop(key, None)
+            elif self._added_at.get(key) != entry["added_at"]:
+                self._index.add(key, entry["features"])
+                self._added_at[key] = entry["added_at"]
+        self._changes_seen = max(self._changes_seen, changes[-1][1])
+
+    def find(self, data: dict, exclude_key: str | None = None) -> list:
+        """
+        Cached trips similar enough to serve for this request.
+
+        Returns:
+            list[tuple[str, float]]: (cache key, similarity) pairs, best first
+        """
+        if not self.enabled:
+            return []
+        features = trip_features(data)
+        with self._lock:
+            try:
+                self._refresh()
+            except RedisError as e:
+                print(f"⚠️ Similarity index unavailable: {e}")
+                return []
+            return self._index.search(features, settings.SIMILAR_TRIP_CACHE_THRESHOLD, exclude_key=exclude_key)
+
+    def record(self, field: str):
+        try:
+            redis_client.hincrby(STATS_KEY, field, 1)
+        except RedisError:
+            pass
+
+    def stats(self) -> dict:
+        """Return hits/misses/stale counters, the shared entry count and the threshold."""
+        try:
+            stats = {field: int(value) for field, value in redis_client.hgetall(STATS_KEY).items()}
+            stats["entries"] = redis_client.hlen(INDEX_KEY)
+        except RedisError as e:
+            return {"error": str(e)}
+        stats["enabled"] = self.enabled
+        stats["threshold"] = settings.SIMILAR_TRIP_CACHE_THRESHOLD
+        return stats
+
+
+similar_trip_cache = SimilarTripCache(max_age=TRIP_CACHE_TTL)
+
+
+def get_similar_itinerary(data: dict, key: str) -> dict | None:
+    """
+    Serve a near-duplicate cached itinerary for a request whose exact key missed.
+
+    The match is copied to the request's own key, so repeats are exact hits.
+    It is not indexed itself, so near-duplicates never chain.
+
+    Returns:
+        dict | None: The itinerary, or None if nothing is similar enough
+    """
+    if not similar_trip_cache.enabled:
+        return None
+    for similar_key, score in similar_trip_cache.find(data, exclude_key=key):
+        itinerary = get_cached_itinerary(similar_key)
+        if itinerary is None:
+            similar_trip_cache.remove(similar_key)
+            similar_trip_cache.record("stale")
+            continue
+        print(f"🪞 Serving near-duplicate itinerary {similar_key} (similarity {score:.3f})")
+        similar_trip_cache.record("hits")
+        store_itinerary(key, itinerary)
+        return itinerary
+    similar_trip_cache.record("misses")
+    return None
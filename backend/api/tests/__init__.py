@@ -0,0 +1,7 @@
+"""
+Unit tests for the api app.
+
+Run from backend/:  python manage.py test -t . api/tests
+Redis-backed tests use fakeredis (and lupa for Lua scripts) and are skipped
+when it is not installed.
+"""
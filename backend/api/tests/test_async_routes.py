@@ -0,0 +1,43 @@
+import asyncio
+import importlib
+import json
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api import urls, views
+
+
+def route_views():
+    importlib.reload(urls)
+    return {pattern.name: pattern.callback for pattern in urls.urlpatterns}
+
+
+class AsyncLlmRouteTests(SimpleTestCase):
+    def tearDown(self):
+        importlib.reload(urls)
+
+    @override_settings(ASYNC_LLM_VIEWS=True)
+    def test_frontend_llm_routes_use_async_views_under_asgi(self):
+        routes = route_views()
+        self.assertIs(routes["plan_trip"], views.plan_trip_async_view)
+        self.assertIs(routes["chat_replace_activity"], views.chat_replace_activity_async)
+        self.assertIs(routes["chat_add_activity"], views.chat_add_activity_async)
+
+    @override_settings(ASYNC_LLM_VIEWS=False)
+    def test_frontend_llm_routes_use_sync_views_under_wsgi(self):
+        routes = route_views()
+        self.assertIsNot(routes["plan_trip"], views.plan_trip_async_view)
+        self.assertIs(routes["plan_trip_async"], views.plan_trip_async_view)
+
+
+class AsyncChatErrorTests(SimpleTestCase):
+    def test_unexpected_errors_do_not_leak_tracebacks(self):
+        request = RequestFactory().post("/api/chat-add-activity/", data=json.dumps({}), content_type="application/json")
+        with mock.patch.object(views, "_authenticate_jwt", return_value=None), \
+                mock.patch.object(views, "build_add_activity_prompt", side_effect=KeyError("secret detail")):
+            response = asyncio.run(views.chat_add_activity_async(request))
+        self.assertEqual(response.status_code, 500)
+        body = json.loads(response.content)
+        self.assertEqual(set(body), {"error"})
+        self.assertNotIn("secret detail", response.content.decode())
@@ -0,0 +1,62 @@
+import json
+import unittest
+
+from django.test import SimpleTestCase
+
+from api.utils import cache_codec
+from api.utils.cache_codec import CacheCodecError, CompressedRedisSerializer, decode_value, get_codec
+
+ITINERARY = {
+    "summary": "Three days in Lisbon – miradouros & pastéis",
+    "days": [{"title": f"Day {n}", "activities": [{"description": f"Walk {n} " * 50}]} for n in range(1, 4)],
+}
+
+
+class CacheCodecTests(SimpleTestCase):
+    def test_round_trip_with_every_codec(self):
+        for name in ("zlib", "zstd"):
+            with self.subTest(codec=name):
+                codec = get_codec(name)
+                encoded = codec.encode(ITINERARY)
+                self.assertLess(len(encoded), len(json.dumps(ITINERARY)))
+                self.assertEqual(decode_value(encoded), ITINERARY)
+
+    def test_values_stay_readable_after_the_codec_changes(self):
+        zlib_value = get_codec("zlib").encode(ITINERARY)
+        self.assertEqual(decode_value(zlib_value), decode_value(get_codec("zstd").encode(ITINERARY)))
+
+    def test_legacy_plain_json(self):
+        self.assertEqual(decode_value(json.dumps(ITINERARY)), ITINERARY)
+        self.assertEqual(decode_value(json.dumps(ITINERARY).encode("utf-8")), ITINERARY)
+
+    def test_corrupt_values_raise_codec_errors(self):
+        for raw in (b"", b"\x01not zlib", b"\x02not zstd", b"{truncated"):
+            with self.subTest(raw=raw), self.assertRaises(CacheCodecError):
+                decode_value(raw)
+
+    def test_unknown_codec(self):
+        with self.assertRaises(CacheCodecError):
+            get_codec("brotli")
+
+    @unittest.skipIf(cache_codec.zstandard is None, "zstandard is not installed")
+    def test_zstd_is_the_default(self):
+        self.assertEqual(get_codec().name, "zstd")
+
+
+class CompressedRedisSerializerTests(SimpleTestCase):
+    def setUp(self):
+        self.serializer = CompressedRedisSerializer(min_size=512)
+
+    def test_integers_stay_raw_for_incr(self):
+        self.assertEqual(self.serializer.dumps(42), 42)
+        self.assertEqual(self.serializer.loads(b"42"), 42)
+
+    def test_small_values_are_plain_pickles(self):
+        data = self.serializer.dumps({"a": 1})
+        self.assertEqual(data[:1], b"\x80")
+        self.assertEqual(self.serializer.loads(data), {"a": 1})
+
+    def test_large_values_are_compressed(self):
+        data = self.serializer.dumps(ITINERARY)
+        self.assertIn(data[:1], (b"\x01", b"\x02"))
+        self.assertEqual(self.serializer.loads(data), ITINERARY)
@@ -0,0 +1,64 @@
+from datetime import date
+
+from django.test import SimpleTestCase
+
+from api.cache_keys import (
+    TRIP_KEY_PREFIX,
+    canonical_trip_request,
+    make_trip_cache_key,
+    normalize_destination,
+    normalize_free_text,
+)
+from api.serializers import PlanTripSerializer
+
+
+def validated(**overrides):
+    payload = {
+        "destination": "Paris, France",
+        "startDate": "2030-05-03",
+        "endDate": "2030-05-06",
+        "interests": ["Food", "Museums"],
+        "searchMode": "fast",
+        **overrides,
+    }
+    serializer = PlanTripSerializer(data=payload)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+class CanonicalKeyTests(SimpleTestCase):
+    def test_equivalent_requests_share_a_key(self):
+        key = make_trip_cache_key(validated())
+        self.assertTrue(key.startswith(f"{TRIP_KEY_PREFIX}:"))
+        self.assertEqual(key, make_trip_cache_key(validated(destination="  PARIS ,France. ")))
+        self.assertEqual(key, make_trip_cache_key(validated(interests=["museums", "food", "Food "])))
+
+    def test_every_serializer_field_changes_the_key(self):
+        base = make_trip_cache_key(validated())
+        changes = {
+            "destination": "Lyon, France",
+            "endDate": "2030-05-07",
+            "pace": "relaxed",
+            "budget": "Luxury",
+            "transportationMode": "Car",
+            "travelWith": ["Kids"],
+            "mustSeeAttractions": "Louvre",
+            "searchMode": "deep",
+        }
+        self.assertLessEqual(set(changes) | {"startDate", "interests", "tripStyle"}, set(PlanTripSerializer().fields))
+        for field, value in changes.items():
+            with self.subTest(field=field):
+                self.assertNotEqual(base, make_trip_cache_key(validated(**{field: value})))
+
+    def test_canonical_form(self):
+        canonical = canonical_trip_request(validated(tripStyle=["Culture", "culture"]))
+        self.assertEqual(canonical["destination"], "paris, france")
+        self.assertEqual(canonical["startDate"], date(2030, 5, 3).isoformat())
+        self.assertEqual(canonical["tripStyle"], ["culture"])
+
+    def test_normalizers(self):
+        self.assertEqual(normalize_destination("New  York ;USA"), "new york;usa")
+        self.assertEqual(normalize_free_text("  Eiffel   Tower "), "eiffel tower")
+        long_text = normalize_free_text("x" * 100)
+        self.assertTrue(long_text.startswith("sha256:"))
+        self.assertEqual(long_text, normalize_free_text("X" * 100))
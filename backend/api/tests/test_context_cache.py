@@ -0,0 +1,45 @@
+import datetime
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import chat_request
+
+INSTRUCTION = "You are a trip planner." * 10
+
+
+class ContextCacheBackoffTests(SimpleTestCase):
+    def setUp(self):
+        chat_request._context_caches.clear()
+        chat_request._context_cache_unavailable.clear()
+        self.addCleanup(chat_request._context_caches.clear)
+        self.addCleanup(chat_request._context_cache_unavailable.clear)
+        patcher = mock.patch.object(chat_request, "redis_client")
+        self.redis = patcher.start()
+        self.redis.get.return_value = None
+        self.addCleanup(patcher.stop)
+
+    def retry_in(self):
+        (until,) = chat_request._context_cache_unavailable.values()
+        return until - time.monotonic()
+
+    def create_failing_with(self, error):
+        with mock.patch.object(chat_request.caching.CachedContent, "create", side_effect=error):
+            self.assertIsNone(chat_request._get_context_cache("gemini-2.0-flash", INSTRUCTION))
+
+    def test_refusals_back_off_for_the_full_period(self):
+        self.create_failing_with(ValueError("400 Cached content is too small. total_token_count=900, min_total_token_count=32768"))
+        self.assertGreater(self.retry_in(), chat_request.CONTEXT_CACHE_RETRY_AFTER - 5)
+
+    def test_other_failures_retry_soon(self):
+        self.create_failing_with(ConnectionError("503 Service Unavailable"))
+        self.assertLessEqual(self.retry_in(), chat_request.CONTEXT_CACHE_ERROR_RETRY_AFTER)
+
+    def test_missing_shared_cache_is_replaced(self):
+        self.redis.get.return_value = "cachedContents/gone"
+        created = mock.Mock(expire_time=datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1))
+        with mock.patch.object(chat_request.caching.CachedContent, "get", side_effect=ValueError("404 not found")), \
+                mock.patch.object(chat_request.caching.CachedContent, "create", return_value=created):
+            self.assertIs(chat_request._get_context_cache("gemini-2.0-flash", INSTRUCTION), created)
+        self.assertEqual(chat_request._context_cache_unavailable, {})
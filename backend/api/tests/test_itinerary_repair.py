@@ -0,0 +1,118 @@
+import json
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api import itinerary_repair, trip_cache
+from api.chat_request import GeminiResult
+from api.utils.stream_parser import IncrementalDaysParser
+from api.itinerary_repair import (
+    build_repair_request,
+    expected_day_count,
+    find_itinerary_gaps,
+    merge_repair,
+    salvage_itinerary,
+)
+
+
+def day(n, activities=1):
+    return {"title": f"Day {n}: Part {n}", "activities": [{"description": f"activity {n}"}] * activities}
+
+
+def plan(*days, **fields):
+    return {"summary": "Lisbon", "destination_info": {"currency": "EUR"}, "total_cost_estimate": "€600", "days": list(days), **fields}
+
+
+class GapDetectionTests(SimpleTestCase):
+    def test_expected_day_count(self):
+        self.assertEqual(expected_day_count({"startDate": date(2030, 5, 1), "endDate": date(2030, 5, 3)}), 3)
+        self.assertEqual(expected_day_count({"startDate": date(2030, 5, 1)}), 1)
+        self.assertIsNone(expected_day_count({}))
+
+    def test_complete_plan_has_no_gaps(self):
+        self.assertFalse(find_itinerary_gaps(plan(day(1), day(2)), 2))
+
+    def test_missing_empty_and_extra_days(self):
+        gaps = find_itinerary_gaps(plan(day(1), day(2, activities=0)), 4)
+        self.assertEqual(gaps.missing_days, [1, 2, 3])
+        self.assertFalse(find_itinerary_gaps(plan(day(1), day(2), day(3)), 2))  # extra days are left alone
+
+    def test_missing_fields(self):
+        gaps = find_itinerary_gaps(plan(day(1), summary="", total_cost_estimate=None), 1)
+        self.assertEqual(gaps.missing_fields, ["summary", "total_cost_estimate"])
+
+
+class RepairRequestTests(SimpleTestCase):
+    def test_prompt_and_schema_cover_only_the_gaps(self):
+        partial = plan(day(1), None, summary="")
+        gaps = find_itinerary_gaps(partial, 3)
+        prompt, schema = build_repair_request("Plan Lisbon", partial, gaps)
+        self.assertEqual(sorted(schema["properties"]), ["days", "summary"])
+        self.assertIn("for day number(s) 2, 3 in that order", prompt)
+        self.assertIn("activity 1", prompt)
+
+    def test_merge_fills_missing_indices_in_order(self):
+        partial = plan(day(1), None)
+        gaps = find_itinerary_gaps(partial, 3)
+        merged = merge_repair(partial, gaps, {"days": [day(2), day(3, activities=0)]})
+        self.assertEqual([d and d["title"] for d in merged["days"]], ["Day 1: Part 1", "Day 2: Part 2"])
+        self.assertEqual(find_itinerary_gaps(merged, 3).missing_days, [2])
+
+    def test_truncated_json_keeps_completed_days(self):
+        text = json.dumps(plan(day(1), day(2), day(3)))
+        salvaged = salvage_itinerary(text[: text.index("Day 3")])
+        self.assertEqual([d["title"] for d in salvaged["days"]], ["Day 1: Part 1", "Day 2: Part 2"])
+
+    def test_unparsable_day_keeps_its_position(self):
+        broken = '{"title": "Day 2", "activities": [{"description": "x",}]}'
+        text = '{"days": [' + json.dumps(day(1)) + ", " + broken + ", " + json.dumps(day(3)) + ", {"
+        parser = IncrementalDaysParser()
+        self.assertEqual([index for index, _ in parser.feed_indexed(text)], [0, 2])
+        salvaged = salvage_itinerary(text)
+        self.assertEqual([d and d["title"] for d in salvaged["days"]], ["Day 1: Part 1", None, "Day 3: Part 3"])
+        self.assertEqual(find_itinerary_gaps(salvaged, 3).missing_days, [1])
+
+
+@override_settings(TRIP_REPAIR_MAX_ROUNDS=2)
+class RepairItineraryTests(SimpleTestCase):
+    def test_truncated_answer_is_completed_by_repair_rounds(self):
+        text = json.dumps(plan(day(1), day(2), day(3)))
+        truncated = GeminiResult(None, "test-model", finish_reason="MAX_TOKENS")
+        truncated.partial_text = text[: text.index("Day 2")]
+
+        # Salvaged truncated JSON keeps only the completed days, so the top-level fields are repaired too.
+        fields = {"summary": "Lisbon", "destination_info": {"currency": "EUR"}, "total_cost_estimate": "€600"}
+        answers = iter([{"days": [day(2)], **fields}, {"days": [day(3)]}])
+
+        def fake_generate(prompt, model_name, system_instruction=None, response_schema=None):
+            result = GeminiResult("{}", model_name, finish_reason="STOP")
+            result.data = next(answers)
+            return result
+
+        with mock.patch.object(itinerary_repair, "generate", side_effect=fake_generate) as generate:
+            repaired = itinerary_repair.repair_itinerary(truncated, 3, "Plan Lisbon", "system", "test-model")
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual([d["title"] for d in repaired["days"]], ["Day 1: Part 1", "Day 2: Part 2", "Day 3: Part 3"])
+        self.assertEqual(repaired["summary"], "Lisbon")
+
+    def test_days_that_stay_broken_become_placeholders(self):
+        def fake_generate(prompt, model_name, system_instruction=None, response_schema=None):
+            result = GeminiResult("{}", model_name, finish_reason="STOP")
+            result.data = {"days": []}
+            return result
+
+        partial = plan(day(1), None)
+        with mock.patch.object(itinerary_repair, "generate", side_effect=fake_generate):
+            repaired = itinerary_repair.repair_plan(partial, 3, "Plan Lisbon", "system", "test-model")
+        self.assertTrue(repaired["incomplete"])
+        self.assertEqual(len(repaired["days"]), 3)
+        self.assertEqual(repaired["days"][0]["title"], "Day 1: Part 1")
+        self.assertEqual([d.get("incomplete") for d in repaired["days"]], [None, True, True])
+
+    def test_incomplete_plans_are_not_cached(self):
+        flagged = itinerary_repair.mark_missing_days(plan(day(1)), 2)
+        with mock.patch.object(trip_cache, "redis_binary_client") as client:
+            trip_cache.store_itinerary("trip:v2:short", flagged)
+        client.pipeline.assert_not_called()
+        self.assertIs(itinerary_repair.mark_missing_days(plan(day(1)), 1).get("incomplete"), None)
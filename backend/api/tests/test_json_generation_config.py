@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase, override_settings
+
+from api.chat_request import _json_generation_configs, json_generation_config
+from api.itinerary_schema import ACTIVITIES_RESPONSE_SCHEMA, TRIP_RESPONSE_SCHEMA
+
+
+def object_schema(*fields):
+    return {"type": "object", "properties": {field: {"type": "string"} for field in fields}, "required": list(fields)}
+
+
+@override_settings(GEMINI_JSON_MODE_ENABLED=True)
+class JsonGenerationConfigTests(SimpleTestCase):
+    def test_equal_schemas_share_one_config(self):
+        first = json_generation_config(object_schema("summary"))
+        size = len(_json_generation_configs)
+        second = json_generation_config(object_schema("summary"))
+        self.assertIs(first, second)
+        self.assertEqual(len(_json_generation_configs), size)
+
+    def test_temporary_schemas_never_get_another_schemas_config(self):
+        # Per-call schemas are garbage-collected and their id() reused; the config must follow the content.
+        for fields in [("summary",), ("destination_info",), ("summary", "total_cost_estimate")]:
+            config = json_generation_config(object_schema(*fields))
+            self.assertEqual(sorted(config["response_schema"].properties), sorted(fields))
+
+    def test_module_schemas(self):
+        trip = json_generation_config(TRIP_RESPONSE_SCHEMA)
+        activities = json_generation_config(ACTIVITIES_RESPONSE_SCHEMA)
+        self.assertIsNot(trip, activities)
+        self.assertEqual(trip["response_mime_type"], "application/json")
+        self.assertNotIn("response_schema", json_generation_config(None))
+
+    @override_settings(GEMINI_JSON_MODE_ENABLED=False)
+    def test_disabled(self):
+        self.assertEqual(json_generation_config(TRIP_RESPONSE_SCHEMA), {})
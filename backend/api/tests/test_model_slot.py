@@ -0,0 +1,65 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import chat_request
+from api.chat_request import GeminiBusyError, GeminiModelConfig, GeminiModelSlot
+
+
+class GeminiModelSlotAsyncTests(SimpleTestCase):
+    def setUp(self):
+        self.slot = GeminiModelSlot(GeminiModelConfig("test-model", timeout=0.2, max_concurrency=1))
+
+    async def hold(self, seconds=0.0):
+        async with self.slot.limit_async():
+            await asyncio.sleep(seconds)
+
+    async def contend(self):
+        holder = asyncio.ensure_future(self.hold(1.0))
+        await asyncio.sleep(0.01)
+        try:
+            with self.assertRaises(GeminiBusyError):
+                await self.hold()
+        finally:
+            holder.cancel()
+
+    def test_limit_applies_within_each_event_loop(self):
+        # Each asyncio.run (like each async_to_sync call) has its own loop; waiting
+        # on a semaphore bound to an earlier loop would raise RuntimeError.
+        for _ in range(3):
+            asyncio.run(self.contend())
+
+
+class GeminiModelSlotSyncTests(SimpleTestCase):
+    def setUp(self):
+        self.slot = GeminiModelSlot(GeminiModelConfig("test-model", timeout=0.5, max_concurrency=1))
+
+    def test_slot_wait_counts_against_the_call_timeout(self):
+        release = threading.Timer(0.2, self.slot._semaphore.release)
+        self.slot._semaphore.acquire()
+        release.start()
+        self.addCleanup(release.cancel)
+        with self.slot.limit() as timeout:
+            self.assertLessEqual(timeout, 0.31)
+
+    def test_deadline_caps_the_call_timeout(self):
+        with self.slot.limit(deadline=time.monotonic() + 0.1) as timeout:
+            self.assertLessEqual(timeout, 0.1)
+        with self.assertRaises(GeminiBusyError):
+            with self.slot.limit(deadline=time.monotonic()):
+                pass
+
+    def test_cancelled_calls_are_never_sent(self):
+        cancelled = threading.Event()
+        cancelled.set()
+        with mock.patch.object(chat_request.model_registry, "slot", return_value=self.slot), \
+                mock.patch.object(self.slot, "client") as client, \
+                mock.patch.object(chat_request.model_stats, "record") as record:
+            result = chat_request.generate("prompt", "test-model", cancelled=cancelled)
+        self.assertTrue(result.cancelled)
+        self.assertEqual(result.outcome, "cancelled")
+        client.assert_not_called()
+        record.assert_not_called()
@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from api import photo_proxy
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401  (fakeredis needs it for Lua scripts)
+except ImportError:  # optional test dependency
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis and lupa are not installed")
+@override_settings(PHOTO_CACHE_TTL=3600, PHOTO_CACHE_MAX_TOTAL_BYTES=1000)
+class PhotoCacheAccountingTests(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeStrictRedis()
+        patches = [
+            mock.patch.object(photo_proxy, "redis_binary_client", self.redis),
+            mock.patch.object(photo_proxy, "_store_photo_script", self.redis.register_script(photo_proxy.STORE_PHOTO_SCRIPT)),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def total(self) -> int:
+        return int(self.redis.get(photo_proxy.PHOTO_TOTAL_KEY) or 0)
+
+    def sizes_sum(self) -> int:
+        return sum(int(size) for size in self.redis.hvals(photo_proxy.PHOTO_SIZES_KEY))
+
+    def test_overwrite_counts_only_the_size_difference(self):
+        photo_proxy.store_photo("photo:a", "image/jpeg", b"x" * 300)
+        photo_proxy.store_photo("photo:a", "image/jpeg", b"x" * 300)
+        photo_proxy.store_photo("photo:a", "image/jpeg", b"x" * 100)
+        self.assertEqual(self.total(), 100)
+        self.assertEqual(self.sizes_sum(), 100)
+
+    def test_evicts_least_recently_used_down_to_the_budget(self):
+        for name in "abc":
+            photo_proxy.store_photo(f"photo:{name}", "image/jpeg", b"x" * 400)
+            time.sleep(0.01)
+        self.assertEqual(self.total(), 800)
+        self.assertFalse(self.redis.exists("photo:a"))
+        self.assertTrue(self.redis.exists("photo:b") and self.redis.exists("photo:c"))
+
+    def test_hit_protects_a_photo_from_eviction(self):
+        photo_proxy.store_photo("photo:a", "image/jpeg", b"x" * 400)
+        photo_proxy.store_photo("photo:b", "image/jpeg", b"x" * 400)
+        time.sleep(0.01)
+        self.assertEqual(photo_proxy.get_cached_photo("photo:a"), ("image/jpeg", b"x" * 400))
+        photo_proxy.store_photo("photo:c", "image/jpeg", b"x" * 400)
+        self.assertTrue(self.redis.exists("photo:a"))
+        self.assertFalse(self.redis.exists("photo:b"))
+
+    def test_expired_entries_are_subtracted(self):
+        photo_proxy.store_photo("photo:a", "image/jpeg", b"x" * 400)
+        # Simulate "a" expiring unused: Redis dropped the key and its LRU score is older than the TTL.
+        self.redis.delete("photo:a")
+        self.redis.zadd(photo_proxy.PHOTO_LRU_KEY, {"photo:a": time.time() - 7200})
+        photo_proxy.store_photo("photo:b", "image/jpeg", b"x" * 400)
+        self.assertEqual(self.total(), 400)
+        self.assertEqual(self.redis.zcard(photo_proxy.PHOTO_LRU_KEY), 1)
+        self.assertEqual(self.sizes_sum(), 400)
+
+    def test_only_one_concurrent_miss_fills_the_cache(self):
+        class Upstream:
+            def iter_content(self, chunk_size):
+                yield b"x" * 50
+
+            def close(self):
+                pass
+
+        first = photo_proxy._stream_and_cache(Upstream(), "photo:a", "image/jpeg")
+        second = photo_proxy._stream_and_cache(Upstream(), "photo:a", "image/jpeg")
+        self.assertEqual(next(first), b"x" * 50)
+        self.assertEqual(b"".join(second), b"x" * 50)  # streamed, not cached
+        self.assertFalse(self.redis.exists("photo:a"))
+        self.assertEqual(list(first), [])
+        self.assertTrue(self.redis.exists("photo:a"))
+        self.assertFalse(self.redis.exists("photo:a:filling"))
+        self.assertEqual(self.total(), 50)
+
+
+@unittest.skipIf(photo_proxy.Image is None, "Pillow is not installed")
+class PhotoVariantTests(SimpleTestCase):
+    def setUp(self):
+        self.request = RequestFactory().get("/api/place-photo/", HTTP_ACCEPT="image/webp")
+        patches = [
+            mock.patch.object(photo_proxy, "get_cached_photo", return_value=None),
+            mock.patch.object(photo_proxy, "get_photo_master", return_value=("image/jpeg", b"master")),
+            mock.patch.object(photo_proxy, "_incr_stat"),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_master_fallback_keeps_cache_headers(self):
+        with mock.patch.object(photo_proxy, "_build_variant", side_effect=OSError("cannot identify image")):
+            response = photo_proxy.serve_photo_variant(self.request, "ref", 400)
+        self.assertEqual((response.content, response["Content-Type"]), (b"master", "image/jpeg"))
+        self.assertEqual(response["Cache-Control"], photo_proxy.PHOTO_CACHE_CONTROL)
+        master_key = f"{photo_proxy.photo_cache_key('ref', photo_proxy.PHOTO_MASTER_WIDTH)}:master"
+        self.assertEqual(response["ETag"], photo_proxy.photo_etag(master_key))
+
+    def test_prewarm_does_not_use_the_request_pool(self):
+        release = threading.Event()
+        with mock.patch.object(photo_proxy, "redis_binary_client", mock.Mock(exists=mock.Mock(return_value=False))), \
+                mock.patch.object(photo_proxy, "_build_variant", side_effect=lambda *args: release.wait(5) and b"v"):
+            request_pool = photo_proxy._get_transcode_executor()
+            with mock.patch.object(request_pool, "submit", wraps=request_pool.submit) as submit:
+                photo_proxy._prewarm_variants(b"master", "ref", "webp", skip_width=400)
+            release.set()
+        submit.assert_not_called()
+
+    def test_prewarm_is_skipped_when_its_queue_is_full(self):
+        with mock.patch.object(photo_proxy, "redis_binary_client", mock.Mock(exists=mock.Mock(return_value=False))), \
+                mock.patch.object(photo_proxy, "_prewarm_slots", threading.BoundedSemaphore(1)), \
+                mock.patch.object(photo_proxy, "_get_prewarm_executor") as executor:
+            photo_proxy._prewarm_variants(b"master", "ref", "webp", skip_width=400)
+        self.assertEqual(executor.return_value.submit.call_count, 1)
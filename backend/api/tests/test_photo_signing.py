@@ -0,0 +1,48 @@
+from urllib.parse import parse_qs, urlsplit
+
+from django.test import SimpleTestCase, override_settings
+
+from api.utils.photo_signing import (
+    _signature,
+    build_photo_proxy_url,
+    proxy_legacy_photo_urls,
+    sign_photo,
+    verify_photo_signature,
+)
+
+LEGACY_URL = "https://maps.googleapis.com/maps/api/place/photo?maxwidth=400&photoreference=REF123&key=SECRET"
+
+
+def query(url):
+    return {name: values[0] for name, values in parse_qs(urlsplit(url).query).items()}
+
+
+@override_settings(PHOTO_URL_SIGNING_KEY="test-signing-key")
+class PhotoSigningTests(SimpleTestCase):
+    def test_signature_does_not_depend_on_the_width(self):
+        signatures = {query(build_photo_proxy_url("REF123", width))["sig"] for width in (200, 800, 1600)}
+        self.assertEqual(len(signatures), 1)
+        self.assertTrue(verify_photo_signature("REF123", signatures.pop()))
+
+    def test_forged_or_missing_signatures_are_rejected(self):
+        sig = sign_photo("REF123")
+        self.assertFalse(verify_photo_signature("OTHER", sig))
+        self.assertFalse(verify_photo_signature("REF123", sig[:-1] + ("A" if sig[-1] != "A" else "B")))
+        self.assertFalse(verify_photo_signature("REF123", None))
+        self.assertFalse(verify_photo_signature("REF123", _signature("REF123:400")))  # width-bound signatures were never issued
+
+    def test_legacy_google_urls_are_rewritten_to_the_proxy(self):
+        plan = {"days": [{"place_details": {"photos": [LEGACY_URL, "/api/place-photo/?x=1"]}}], "summary": "s"}
+        rewritten = proxy_legacy_photo_urls(plan)
+        photos = rewritten["days"][0]["place_details"]["photos"]
+        self.assertNotIn("SECRET", str(rewritten))
+        self.assertEqual(query(photos[0])["photoreference"], "REF123")
+        self.assertEqual(query(photos[0])["maxwidth"], "400")
+        self.assertTrue(verify_photo_signature("REF123", query(photos[0])["sig"]))
+        self.assertEqual(photos[1], "/api/place-photo/?x=1")
+        self.assertIn("SECRET", LEGACY_URL)  # the input is not modified
+
+    def test_values_without_legacy_urls_are_returned_as_is(self):
+        plan = {"days": [{"photos": ["/api/place-photo/?x=1"]}], "summary": "s", "count": 3}
+        self.assertIs(proxy_legacy_photo_urls(plan), plan)
+        self.assertIsNone(proxy_legacy_photo_urls(None))
@@ -0,0 +1,42 @@
+from unittest import mock
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import views
+
+
+class User:
+    pk = id = 7
+    is_authenticated = True
+
+
+@override_settings(PLACE_BATCH_MAX_QUERIES=2)
+class PlaceBatchViewTests(SimpleTestCase):
+    def setUp(self):
+        cache = LocMemCache("place-batch-tests", {})
+        cache.clear()
+        patch = mock.patch.object(views.PlaceBatchThrottle, "cache", cache)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def post(self, queries, user=User()):
+        request = APIRequestFactory().post("/api/place-details/batch/", {"queries": queries}, format="json")
+        if user is not None:
+            force_authenticate(request, user=user)
+        return views.get_place_details_batch_view(request)
+
+    def test_requires_authentication(self):
+        self.assertEqual(self.post(["Louvre"], user=None).status_code, 401)
+
+    def test_query_cap(self):
+        self.assertEqual(self.post(["a", "b", "c"]).status_code, 400)
+
+    def test_requests_are_throttled_per_user(self):
+        service = mock.Mock()
+        service.search_places.return_value = ({}, {})
+        with mock.patch.object(views, "get_places_service", return_value=service), \
+                mock.patch.object(views.PlaceBatchThrottle, "get_rate", return_value="2/min"):
+            statuses = [self.post(["Louvre"]).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
@@ -0,0 +1,59 @@
+import contextlib
+import json
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import views
+
+DATA = {"destination": "Lisbon", "startDate": date(2030, 5, 3), "endDate": date(2030, 5, 3), "searchMode": "fast"}
+PLAN = {
+    "summary": "A day in Lisbon",
+    "days": [{"title": "Day 1: Alfama", "activities": [{"description": "Walk"}], "day_cost_estimate": "€50"}],
+    "destination_info": {"currency": "EUR"},
+    "total_cost_estimate": "€50",
+}
+
+
+@contextlib.contextmanager
+def leading(value):
+    yield value
+
+
+class PlanTripStreamTests(SimpleTestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(views, "get_cached_itinerary", return_value=None),
+            mock.patch.object(views, "get_similar_itinerary", return_value=None),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_generated_plan_is_cached_and_indexed_for_similar_requests(self):
+        text = json.dumps(PLAN)
+        with mock.patch.object(views.trip_single_flight, "lead", return_value=leading(True)), \
+                mock.patch.object(views, "ask_gemini_stream", return_value=iter([text[:40], text[40:]])), \
+                mock.patch.object(views, "store_itinerary") as store, \
+                mock.patch.object(views.similar_trip_cache, "add") as add:
+            frames = list(views.stream_trip_events(DATA, "trip:v2:stream"))
+        self.assertTrue(frames[-1].startswith("event: complete"))
+        self.assertEqual(sum(frame.startswith("event: day") for frame in frames), 1)
+        store.assert_called_once_with("trip:v2:stream", mock.ANY)
+        add.assert_called_once_with(DATA, "trip:v2:stream")
+
+    def test_identical_stream_replays_the_in_flight_generation(self):
+        with mock.patch.object(views.trip_single_flight, "lead", return_value=leading(False)), \
+                mock.patch.object(views, "ask_gemini_stream") as stream, \
+                mock.patch.object(views, "plan_trip_for_request", return_value=PLAN) as wait:
+            frames = list(views.stream_trip_events(DATA, "trip:v2:stream"))
+        stream.assert_not_called()
+        wait.assert_called_once_with(DATA, "trip:v2:stream", False)
+        self.assertEqual([frame.split("\n")[0] for frame in frames], ["event: meta", "event: day", "event: complete"])
+
+    def test_unexpected_errors_end_the_stream_with_an_error_event(self):
+        with mock.patch.object(views.trip_single_flight, "lead", return_value=leading(True)), \
+                mock.patch.object(views, "build_trip_prompt", side_effect=KeyError("destination")):
+            frames = list(views.stream_trip_events(DATA, "trip:v2:stream"))
+        self.assertTrue(frames[-1].startswith("event: error"))
@@ -0,0 +1,106 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api import similar_trip_cache as similar
+from api.cache_keys import make_trip_cache_key
+
+try:
+    import fakeredis
+except ImportError:  # optional test dependency
+    fakeredis = None
+
+
+def trip(destination="Lisbon", start=date(2030, 5, 3), days=3, interests=("food",), **overrides):
+    return {
+        "destination": destination,
+        "startDate": start,
+        "endDate": date.fromordinal(start.toordinal() + days - 1),
+        "interests": list(interests),
+        "pace": "moderate",
+        "budget": "Mid-range",
+        "searchMode": "fast",
+        **overrides,
+    }
+
+
+@unittest.skipIf(similar.np is None, "numpy is not installed")
+class TripVectorIndexTests(SimpleTestCase):
+    def test_add_replace_and_remove(self):
+        index = similar.TripVectorIndex()
+        features = {key: similar.trip_features(trip(start=date(2030, 5, day))) for key, day in (("a", 3), ("b", 10))}
+        for key, value in features.items():
+            index.add(key, value)
+        index.add("a", features["a"])  # replacing keeps one row per key
+        self.assertEqual(len(index), 2)
+        self.assertEqual([key for key, _ in index.search(features["a"], 0.9)], ["a", "b"])
+        index.remove("a")
+        self.assertEqual([key for key, _ in index.search(features["a"], 0.9)], ["b"])
+
+    def test_removed_rows_are_compacted(self):
+        index = similar.TripVectorIndex()
+        features = similar.trip_features(trip())
+        for n in range(200):
+            index.add(f"k{n}", features)
+        for n in range(150):
+            index.remove(f"k{n}")
+        self.assertLess(len(index.keys), 200)
+        self.assertEqual({key for key, _ in index.search(features, 0.9, limit=100)}, {f"k{n}" for n in range(150, 200)})
+
+    def test_budget_pace_and_search_mode_are_hard_constraints(self):
+        base = similar.trip_features(trip())
+        index = similar.TripVectorIndex()
+        for n, overrides in enumerate([{"budget": "Luxury"}, {"pace": "fast-paced"}, {"searchMode": "pro"}]):
+            other = similar.trip_features(trip(**overrides))
+            self.assertFalse(similar.is_compatible(base, other), overrides)
+            index.add(f"k{n}", other)
+        # Not served at any threshold, not just because of rounding below 0.9.
+        self.assertEqual(index.search(base, threshold=0.0), [])
+
+    def test_season_is_a_hard_constraint(self):
+        may = similar.trip_features(trip(start=date(2030, 5, 3)))
+        self.assertTrue(similar.is_compatible(may, similar.trip_features(trip(start=date(2030, 5, 24)))))
+        self.assertFalse(similar.is_compatible(may, similar.trip_features(trip(start=date(2030, 8, 2)))))
+        self.assertEqual(similar.trip_season({"startDate": date(2030, 12, 20)}), similar.trip_season({"startDate": date(2031, 2, 1)}))
+
+
+@unittest.skipIf(fakeredis is None or similar.np is None, "fakeredis or numpy is not installed")
+@override_settings(SIMILAR_TRIP_CACHE_ENABLED=True, SIMILAR_TRIP_CACHE_THRESHOLD=0.9)
+class SimilarTripCacheTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(similar, "redis_client", fakeredis.FakeStrictRedis(decode_responses=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Two processes sharing Redis; refresh on every lookup.
+        self.writer = similar.SimilarTripCache(refresh_interval=0)
+        self.reader = similar.SimilarTripCache(refresh_interval=0)
+
+    def add(self, data):
+        key = make_trip_cache_key(data)
+        self.writer.add(data, key)
+        return key
+
+    def test_additions_reach_other_processes_incrementally(self):
+        first = self.add(trip(start=date(2030, 5, 3)))
+        request = trip(start=date(2030, 5, 17))
+        self.assertEqual([key for key, _ in self.reader.find(request)], [first])
+
+        with mock.patch.object(similar.TripVectorIndex, "build") as build, \
+                mock.patch.object(similar, "embed", wraps=similar.embed) as embed:
+            second = self.add(trip(start=date(2030, 5, 10)))
+            found = [key for key, _ in self.reader.find(request)]
+        build.assert_not_called()
+        self.assertEqual(sorted(found), sorted([first, second]))
+        self.assertEqual(embed.call_count, 2)  # the new entry and the query, not the whole index
+
+    def test_removals_reach_other_processes(self):
+        key = self.add(trip())
+        self.assertTrue(self.reader.find(trip(start=date(2030, 5, 20))))
+        self.writer.remove(key)
+        self.assertEqual(self.reader.find(trip(start=date(2030, 5, 20))), [])
+
+    def test_other_seasons_are_not_served(self):
+        self.add(trip(start=date(2030, 5, 3)))
+        self.assertEqual(self.reader.find(trip(start=date(2030, 8, 2))), [])
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from django.test import SimpleTestCase
+
+from api.utils.single_flight import LeaderFailed, SingleFlight
+
+try:
+    import fakeredis
+    import fakeredis.aioredis
+except ImportError:  # optional test dependency
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class SingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        self.client = fakeredis.FakeStrictRedis(server=server, decode_responses=True)
+        self.async_client = fakeredis.aioredis.FakeRedis(server=server, decode_responses=True)
+        # A lock TTL far shorter than the computation: only renewal keeps followers waiting.
+        self.flight = SingleFlight(self.client, async_client=self.async_client, namespace="test",
+                                   lock_ttl=0.3, wait_timeout=5, poll_interval=0.02)
+        self.cache = {}
+        self.calls = 0
+        self.calls_lock = threading.Lock()
+
+    def compute(self, delay=1.0):
+        with self.calls_lock:
+            self.calls += 1
+        time.sleep(delay)
+        self.cache["key"] = "value"
+        return "value"
+
+    def test_followers_wait_for_a_leader_slower_than_the_lock_ttl(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(self.flight.run("key", self.compute, lambda: self.cache.get("key"))))
+            for _ in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.05)
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, ["value"] * 4)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(self.flight.stats(), {"leaders": 1, "deduplicated": 3})
+
+    def test_follower_takes_over_when_the_leader_fails(self):
+        def failing():
+            time.sleep(0.2)
+            raise RuntimeError("boom")
+
+        errors, results = [], []
+
+        def leader():
+            try:
+                self.flight.run("key", failing, lambda: self.cache.get("key"))
+            except RuntimeError as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        time.sleep(0.05)
+        results.append(self.flight.run("key", lambda: self.compute(0), lambda: self.cache.get("key")))
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(results, ["value"])
+        self.assertEqual(self.calls, 1)
+
+    def test_async_followers_wait_for_a_slow_leader(self):
+        async def compute():
+            self.calls += 1
+            await asyncio.sleep(1.0)
+            self.cache["key"] = "value"
+            return "value"
+
+        async def load():
+            return self.cache.get("key")
+
+        async def main():
+            return await asyncio.gather(*(self.flight.run_async("key", compute, load) for _ in range(3)))
+
+        self.assertEqual(asyncio.run(main()), ["value"] * 3)
+        self.assertEqual(self.calls, 1)
+
+    def test_published_leader_error_reaches_followers(self):
+        flight = SingleFlight(self.client, namespace="errors", lock_ttl=5, wait_timeout=5,
+                              poll_interval=0.02, publish_errors=True)
+
+        class QuotaError(Exception):
+            payload = {"error": "Quota exceeded"}
+            status_code = 429
+
+        def failing():
+            time.sleep(0.2)
+            raise QuotaError("quota")
+
+        thread = threading.Thread(target=lambda: self.assertRaises(QuotaError, flight.run, "key", failing, lambda: None))
+        thread.start()
+        time.sleep(0.05)
+        with self.assertRaises(LeaderFailed) as failure:
+            flight.run("key", lambda: self.compute(0), lambda: self.cache.get("key"))
+        thread.join()
+        self.assertEqual((failure.exception.payload, failure.exception.status_code), ({"error": "Quota exceeded"}, 429))
+        self.assertEqual(self.calls, 0)
+
+    def test_capped_wait_calls_on_timeout_instead_of_computing(self):
+        thread = threading.Thread(target=lambda: self.flight.run("key", lambda: self.compute(0.5), lambda: self.cache.get("key")))
+        thread.start()
+        time.sleep(0.05)
+        result = self.flight.run("key", lambda: self.compute(0), lambda: self.cache.get("key"),
+                                 wait_timeout=0.1, on_timeout=lambda: "pending")
+        thread.join()
+        self.assertEqual(result, "pending")
+        self.assertEqual(self.calls, 1)
+
+    def test_lead_holds_leadership_for_the_block(self):
+        flight = SingleFlight(self.client, namespace="lead", lock_ttl=5, publish_errors=True)
+        with flight.lead("key") as first:
+            with flight.lead("key") as second:
+                self.assertEqual((first, second), (True, False))
+        with self.assertRaises(ValueError), flight.lead("key"):
+            raise ValueError("stream broke")
+        self.assertTrue(self.client.exists("lead:error:key"))
+        with flight.lead("key") as again:
+            self.assertTrue(again)
+            self.assertFalse(self.client.exists("lead:error:key"))
@@ -0,0 +1,90 @@
+import asyncio
+import json
+from datetime import date
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from api import itinerary_repair, trip_fanout
+from api.chat_request import GeminiResult
+
+DATA = {"startDate": date(2030, 5, 1), "endDate": date(2030, 5, 3)}
+
+
+def result(data):
+    result = GeminiResult(json.dumps(data) if data is not None else None, "test-model", finish_reason="STOP")
+    result.data = data
+    return result
+
+
+def skeleton():
+    return {
+        "summary": "Three days in Lisbon",
+        "days": [{"title": f"Day {n}: Part {n}", "theme": f"theme {n}", "area": f"area {n}"} for n in (1, 2, 3)],
+        "destination_info": {"currency": "EUR"},
+        "total_cost_estimate": "€600",
+    }
+
+
+def day(n):
+    return {"title": f"Day {n}: Part {n}", "activities": [{"description": f"activity {n}"}], "day_cost_estimate": "€100"}
+
+
+class FakeGemini:
+    """Answers skeleton, day and repair prompts; the day numbers in `failing` fail."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.repair_prompts = []
+
+    def __call__(self, prompt, model_name, system_instruction=None, response_schema=None):
+        if "**Skeleton Task:**" in prompt:
+            return result(skeleton())
+        if "**Repair Task:**" in prompt:
+            self.repair_prompts.append(prompt)
+            return result({"days": [day(n) for n in sorted(self.failing)]})
+        n = int(prompt.split("Write ONLY day ")[1].split(" ")[0])
+        return result(None if n in self.failing else day(n))
+
+    async def call_async(self, *args, **kwargs):
+        return self(*args, **kwargs)
+
+
+@override_settings(TRIP_REPAIR_ENABLED=True, TRIP_REPAIR_MAX_ROUNDS=2, TRIP_FANOUT_MAX_WORKERS=3)
+class TripFanoutTests(SimpleTestCase):
+    def run_fanout(self, gemini):
+        with mock.patch.object(trip_fanout, "generate", gemini), mock.patch.object(itinerary_repair, "generate", gemini):
+            return trip_fanout.generate_itinerary_fanout(DATA, "Plan Lisbon", "system", "test-model")
+
+    def test_all_days_succeed(self):
+        gemini = FakeGemini()
+        plan = self.run_fanout(gemini)
+        self.assertEqual([d["title"] for d in plan["days"]], [f"Day {n}: Part {n}" for n in (1, 2, 3)])
+        self.assertEqual(gemini.repair_prompts, [])
+
+    def test_failed_day_is_repaired_keeping_the_others(self):
+        gemini = FakeGemini(failing=[2])
+        plan = self.run_fanout(gemini)
+        self.assertEqual([d["activities"][0]["description"] for d in plan["days"]], ["activity 1", "activity 2", "activity 3"])
+        self.assertEqual(plan["summary"], "Three days in Lisbon")
+        self.assertEqual(len(gemini.repair_prompts), 1)
+        prompt = gemini.repair_prompts[0]
+        self.assertIn("for day number(s) 2 in that order", prompt)
+        self.assertIn("Day 2: Part 2: theme 2 (area 2)", prompt)
+        self.assertIn("activity 1", prompt)  # successful days are context, not regenerated
+
+    @override_settings(TRIP_REPAIR_ENABLED=False)
+    def test_without_repair_a_failed_day_falls_back(self):
+        self.assertIsNone(self.run_fanout(FakeGemini(failing=[3])))
+
+    def test_async_failed_day_is_repaired(self):
+        gemini = FakeGemini(failing=[1, 3])
+        with mock.patch.object(trip_fanout, "generate_async", gemini.call_async), \
+                mock.patch.object(itinerary_repair, "generate_async", gemini.call_async):
+            plan = asyncio.run(trip_fanout.generate_itinerary_fanout_async(DATA, "Plan Lisbon", "system", "test-model"))
+        self.assertEqual([d["activities"][0]["description"] for d in plan["days"]], ["activity 1", "activity 2", "activity 3"])
+        self.assertIn("for day number(s) 1, 3 in that order", gemini.repair_prompts[0])
+
+    @override_settings(TRIP_FANOUT_MIN_DAYS=0)
+    def test_fanout_is_off_by_default(self):
+        self.assertFalse(trip_fanout.wants_fanout(DATA))
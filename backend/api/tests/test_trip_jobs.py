@@ -0,0 +1,144 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from django.test import SimpleTestCase
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api import trip_jobs, views
+from api.llm_usage import get_llm_context
+
+try:
+    import fakeredis
+except ImportError:  # optional test dependency
+    fakeredis = None
+
+PAYLOAD = {"destination": "Lisbon", "startDate": "2030-05-03", "endDate": "2030-05-05", "searchMode": "fast"}
+PLAN = {"summary": "Three days in Lisbon", "days": []}
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TripJobUserTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(trip_jobs, "redis_client", fakeredis.FakeStrictRedis(decode_responses=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_user_id_is_stored_and_attributed(self):
+        job_id, created = trip_jobs.enqueue_trip_job(PAYLOAD, "trip:v2:test", user_id=42)
+        job = trip_jobs.get_job(job_id)
+        self.assertEqual(job["user_id"], 42)
+
+        seen = {}
+        with mock.patch.object(views, "plan_trip_for_request", lambda *args: seen.update(get_llm_context())):
+            views.run_trip_job(job)
+        self.assertEqual((seen["endpoint"], seen["user_id"]), ("plan_trip_job", 42))
+
+    def test_anonymous_jobs_have_no_user(self):
+        job_id, _ = trip_jobs.enqueue_trip_job(PAYLOAD, "trip:v2:anonymous")
+        self.assertIsNone(trip_jobs.get_job(job_id)["user_id"])
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class StaleJobTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(trip_jobs, "redis_client", fakeredis.FakeStrictRedis(decode_responses=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def claim_and_start(self, started_ago):
+        job_id = trip_jobs.claim_next_job(0.1)
+        trip_jobs.start_job(job_id)
+        trip_jobs.redis_client.hset(trip_jobs.job_key(job_id), "started_at", time.time() - started_ago)
+        return job_id
+
+    def test_stale_timeout_outlasts_the_slowest_generation(self):
+        self.assertGreater(trip_jobs.stale_after_seconds(), trip_jobs.TRIP_GENERATION_MAX_SECONDS)
+
+    def test_running_generation_is_not_requeued(self):
+        trip_jobs.enqueue_trip_job(PAYLOAD, "trip:v2:slow")
+        self.claim_and_start(started_ago=trip_jobs.TRIP_GENERATION_MAX_SECONDS)
+        self.assertEqual(trip_jobs.requeue_stale_jobs(), 0)
+
+    def test_stale_job_is_failed_after_max_attempts(self):
+        job_id, _ = trip_jobs.enqueue_trip_job(PAYLOAD, "trip:v2:crashy")
+        for attempt in range(1, 3):
+            self.assertEqual(self.claim_and_start(started_ago=3600), job_id)
+            self.assertEqual(trip_jobs.requeue_stale_jobs(max_attempts=2), 1 if attempt < 2 else 0)
+        job = trip_jobs.get_job(job_id)
+        self.assertEqual((job["status"], job["attempts"], job["status_code"]), (trip_jobs.STATUS_FAILED, 2, 503))
+        self.assertEqual(trip_jobs.redis_client.llen(trip_jobs.PROCESSING_KEY), 0)
+
+
+@unittest.skipIf(fakeredis is None, "fakeredis is not installed")
+class TripJobAccessTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(trip_jobs, "redis_client", fakeredis.FakeStrictRedis(decode_responses=True))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.job_id, _ = trip_jobs.enqueue_trip_job(PAYLOAD, "trip:v2:private", user_id=42)
+
+    def poll(self, user=None, **params):
+        request = APIRequestFactory().get(f"/api/plantrip/jobs/{self.job_id}/", params)
+        if user is not None:
+            force_authenticate(request, user=user)
+        return views.plan_trip_job_view(request, self.job_id)
+
+    def test_job_id_alone_is_not_enough(self):
+        self.assertEqual(self.poll().status_code, 404)
+        self.assertEqual(self.poll(token="guess").status_code, 404)
+        self.assertEqual(self.poll(user=mock.Mock(pk=7, is_authenticated=True)).status_code, 404)
+
+    def test_owner_and_token_holders_can_read_the_job(self):
+        self.assertEqual(self.poll(user=mock.Mock(pk=42, is_authenticated=True)).status_code, 200)
+        token = trip_jobs.grant_job_access(self.job_id)
+        response = self.poll(token=token)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data["status_url"].endswith(f"?token={token}"))
+
+
+class TripWorkerTests(SimpleTestCase):
+    def test_redis_errors_do_not_kill_the_worker_thread(self):
+        stop_event = threading.Event()
+        job_ids = iter(["job-1", "job-2"])
+
+        def claim(timeout):
+            job_id = next(job_ids, None)
+            if job_id is None:
+                stop_event.set()
+            return job_id
+
+        with mock.patch.object(trip_jobs, "claim_next_job", side_effect=claim), \
+                mock.patch.object(trip_jobs, "run_job", side_effect=[RedisConnectionError("down"), True]) as run_job:
+            trip_jobs.run_worker(lambda job: None, poll_timeout=0, stop_event=stop_event)
+        self.assertEqual([c.args[0] for c in run_job.call_args_list], ["job-1", "job-2"])
+
+
+class PlanTripJobFallbackTests(SimpleTestCase):
+    def test_capped_wait_for_an_identical_generation_answers_with_a_job(self):
+        request = APIRequestFactory().post("/api/plantrip/", PAYLOAD, format="json")
+        with mock.patch.object(views, "get_cached_itinerary", return_value=None), \
+                mock.patch.object(views, "get_similar_itinerary", return_value=None), \
+                mock.patch.object(views, "record_request_shape"), \
+                mock.patch.object(views, "plan_trip_for_request", side_effect=views.GenerationPending("trip:v2:x")), \
+                mock.patch.object(views, "enqueue_trip_job", return_value=("job-1", False)), \
+                mock.patch.object(views, "grant_job_access", return_value="token"), \
+                mock.patch.object(views, "get_job", return_value={"status": trip_jobs.STATUS_QUEUED}):
+            response = views.plan_trip_view(request)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data["job_id"], "job-1")
+
+
+    def test_redis_failure_falls_back_to_synchronous_generation(self):
+        request = APIRequestFactory().post("/api/plantrip/", {**PAYLOAD, "background": True}, format="json")
+        with mock.patch.object(views, "enqueue_trip_job", side_effect=RedisConnectionError("down")), \
+                mock.patch.object(views, "get_cached_itinerary", return_value=None), \
+                mock.patch.object(views, "get_similar_itinerary", return_value=None), \
+                mock.patch.object(views, "record_request_shape"), \
+                mock.patch.object(views, "plan_trip_for_request", return_value=PLAN) as generate:
+            response = views.plan_trip_view(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, PLAN)
+        generate.assert_called_once()
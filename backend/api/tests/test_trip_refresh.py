@@ -0,0 +1,27 @@
+import asyncio
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from api import place_enrichment, trip_cache
+
+PLAN = {"summary": "Lisbon", "days": []}
+
+
+class EnrichedRefreshTests(SimpleTestCase):
+    """A stale enriched entry refreshes under the plain key's lock, so both variants share one regeneration."""
+
+    def test_sync_refresh_locks_the_plain_key(self):
+        client = mock.Mock(mget=mock.Mock(return_value=[trip_cache.trip_codec.encode(PLAN), b"0"]))
+        with mock.patch.object(trip_cache, "redis_binary_client", client), \
+                mock.patch.object(trip_cache, "schedule_refresh") as schedule:
+            place_enrichment.get_cached_enriched_itinerary("trip:v2:abc", refresh=mock.sentinel.refresh)
+        schedule.assert_called_once_with("trip:v2:abc", mock.sentinel.refresh)
+
+    def test_async_refresh_locks_the_plain_key(self):
+        client = mock.Mock(mget=mock.AsyncMock(return_value=[trip_cache.trip_codec.encode(PLAN), b"0"]))
+        with mock.patch.object(trip_cache, "async_redis_binary_client", client), \
+                mock.patch.object(trip_cache, "schedule_refresh_async", new_callable=mock.AsyncMock) as schedule:
+            cached = asyncio.run(place_enrichment.get_cached_enriched_itinerary_async("trip:v2:abc", refresh=mock.sentinel.refresh))
+        self.assertEqual(cached, PLAN)
+        schedule.assert_awaited_once_with("trip:v2:abc", mock.sentinel.refresh)
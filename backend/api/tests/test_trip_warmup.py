@@ -0,0 +1,53 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from api import trip_warmup
+from api.similar_trip_cache import SimilarTripCache
+
+
+def payload(start_in_days: int, length: int = 3) -> dict:
+    start = timezone.localdate() + timedelta(days=start_in_days)
+    return {
+        "destination": "Lisbon",
+        "startDate": start.isoformat(),
+        "endDate": (start + timedelta(days=length - 1)).isoformat(),
+        "searchMode": "fast",
+    }
+
+
+class ShiftDatesTests(SimpleTestCase):
+    def test_past_trip_moves_to_tomorrow_keeping_its_length(self):
+        today = date(2030, 6, 10)
+        shifted = trip_warmup.shift_dates({"startDate": "2030-06-01", "endDate": "2030-06-04"}, today)
+        self.assertEqual((shifted["startDate"], shifted["endDate"]), ("2030-06-11", "2030-06-14"))
+
+    def test_upcoming_trip_is_unchanged(self):
+        original = {"startDate": "2030-06-20", "endDate": "2030-06-22"}
+        self.assertIs(trip_warmup.shift_dates(original, date(2030, 6, 10)), original)
+
+
+class WarmupPlanTests(SimpleTestCase):
+    def consider(self, shape_payload, similar_enabled):
+        plan = trip_warmup.WarmupPlan(refresh_within=3600, max_generations=10)
+        with mock.patch.object(trip_warmup, "redis_binary_client") as redis, \
+                mock.patch.object(SimilarTripCache, "enabled", new_callable=mock.PropertyMock, return_value=similar_enabled), \
+                mock.patch.object(SimilarTripCache, "find", return_value=[]):
+            redis.ttl.return_value = -2  # not cached
+            plan.consider("lisbon|3|moderate|mid-range", 5, shape_payload)
+        return plan
+
+    def test_past_shapes_are_skipped_without_the_similar_cache(self):
+        plan = self.consider(payload(-10), similar_enabled=False)
+        self.assertEqual((len(plan.jobs), plan.past_dates), (0, 1))
+
+    def test_past_shapes_are_warmed_with_the_similar_cache(self):
+        plan = self.consider(payload(-10), similar_enabled=True)
+        self.assertEqual((len(plan.jobs), plan.past_dates), (1, 0))
+        self.assertEqual(plan.jobs[0][2]["startDate"], timezone.localdate() + timedelta(days=1))
+
+    def test_upcoming_shapes_are_warmed_either_way(self):
+        plan = self.consider(payload(5), similar_enabled=False)
+        self.assertEqual((len(plan.jobs), plan.past_dates), (1, 0))
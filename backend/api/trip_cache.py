@@ -0,0 +1,269 @@
+"""
+Redis Cache for Generated Itineraries
+
+This module owns reading and writing itineraries produced by the planning
+views, so the sync, async and streaming paths share one cache format.
+
+Key Features:
+- Compressed binary values with a format-version byte (see utils/cache_codec.py)
+- Structure check on every cache read (bad entries are dropped)
+- Sync and async (redis.asyncio) accessors
+- Single-flight coalescing of concurrent identical generations
+- Stale-while-revalidate: past TRIP_CACHE_SOFT_TTL an entry is still served,
+  while one background refresh per key (Redis lock) regenerates it;
+  TRIP_CACHE_TTL stays the hard expiry
+
+The soft expiry is a timestamp in a sidecar key ("<key>:soft") written with the
+itinerary. Entries without one (written before soft TTLs) are treated as fresh.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .utils.cache_codec import CacheCodecError, decode_value, get_codec
+from .utils.photo_signing import proxy_legacy_photo_urls
+from .utils.redis_client import (
+    redis_client,
+    async_redis_client,
+    redis_binary_client,
+    async_redis_binary_client,
+)
+from .utils.single_flight import SingleFlight
+
+TRIP_CACHE_TTL = 3600 * 24 * 3  # 3 days
+
+trip_codec = get_codec(settings.TRIP_CACHE_CODEC)
+
+
+def max_generation_seconds() -> int:
+    """Worst case for one itinerary: the slowest route's budget plus every repair round at its slowest model's timeout."""
+    from .chat_request import MODEL_CONFIGS, SEARCH_MODE_ROUTES
+
+    budget = max(route.budget for route in SEARCH_MODE_ROUTES.values())
+    slowest_call = max(MODEL_CONFIGS[model].timeout for route in SEARCH_MODE_ROUTES.values() for model in route.models)
+    return int(max(300, budget + settings.TRIP_REPAIR_MAX_ROUNDS * slowest_call))
+
+
+TRIP_GENERATION_MAX_SECONDS = max_generation_seconds()
+
+# The leader renews its lock while generating, so followers wait as long as a
+# generation can take but take over within a minute if the leader dies. A
+# generation that fails is reported to its followers rather than retried N times.
+trip_single_flight = SingleFlight(
+    redis_client,
+    async_client=async_redis_client,
+    namespace="trip:singleflight",
+    lock_ttl=60,
+    wait_timeout=TRIP_GENERATION_MAX_SECONDS,
+    publish_errors=True,
+)
+
+
+REFRESH_STATS_KEY = "trip:refresh:stats"
+REFRESH_LOCK_TTL = TRIP_GENERATION_MAX_SECONDS + 60  # longer than the slowest generation
+
+_refresh_executor = None
+_refresh_executor_lock = threading.Lock()
+
+
+def soft_expiry_key(key: str) -> str:
+    return f"{key}:soft"
+
+
+def refresh_lock_key(key: str) -> str:
+    return f"trip:refresh:lock:{key}"
+
+
+def _soft_expiry_value() -> str:
+    return str(int(time.time() + settings.TRIP_CACHE_SOFT_TTL))
+
+
+def is_stale(soft_expiry: bytes | None) -> bool:
+    """True if an entry's soft TTL has passed (entries without one never are)."""
+    return soft_expiry is not None and float(soft_expiry) <= time.time()
+
+
+def load_cached_itinerary(cached: bytes | None) -> dict | None:
+    """
+    Decode a cached itinerary and check its structure.
+
+    Returns:
+        dict | None: The itinerary, or None if it is missing or unusable
+    """
+    if not cached:
+        return None
+    print("✔️ Found in Redis cache!")
+    try:
+        cached_data = decode_value(cached)
+    except CacheCodecError as e:
+        print(f"⚠️ Invalid data found in cache ({e}). Re-generating...")
+        return None
+    if isinstance(cached_data, dict) and "days" in cached_data and "summary" in cached_data:
+        print("   Cached data seems valid.")
+        return proxy_legacy_photo_urls(cached_data)
+    print("⚠️ Cached data has incorrect structure. Re-generating...")
+    return None
+
+
+def get_cached_itinerary(key: str, refresh=None, refresh_key: str | None = None) -> dict | None:
+    """
+    Return the cached itinerary for key, dropping unusable entries. Never raises.
+
+    Args:
+        key (str): Itinerary cache key
+        refresh (callable, optional): Regenerates and stores the itinerary; given,
+            a stale entry is returned and refresh() runs in the background
+        refresh_key (str, optional): Key the refresh is locked on (defaults to key)
+    """
+    try:
+        cached, soft_expiry = redis_binary_client.mget(key, soft_expiry_key(key))
+        cached_data = load_cached_itinerary(cached)
+        if cached and cached_data is None:
+            redis_binary_client.delete(key)
+        if cached_data is not None and refresh is not None and is_stale(soft_expiry):
+            schedule_refresh(refresh_key or key, refresh)
+        return cached_data
+    except Exception as e:
+        print(f"⚠️ Redis Error: {e}. Proceeding without cache.")
+        return None
+
+
+def store_itinerary(key: str, itinerary: dict) -> None:
+    """Cache an itinerary for TRIP_CACHE_TTL seconds (fresh for TRIP_CACHE_SOFT_TTL). Never raises."""
+    if itinerary.get("incomplete"):
+        print("⚠️ Not caching an incomplete itinerary.")
+        return
+    try:
+        pipe = redis_binary_client.pipeline()
+        pipe.setex(key, TRIP_CACHE_TTL, trip_codec.encode(itinerary))
+        pipe.setex(soft_expiry_key(key), TRIP_CACHE_TTL, _soft_expiry_value())
+        pipe.execute()
+        print("💾 Successfully cached itinerary in Redis!")
+    except Exception as e:
+        print(f"⚠️ Redis Set Error: {e}. Could not cache result.")
+
+
+async def get_cached_itinerary_async(key: str, refresh=None, refresh_key: str | None = None) -> dict | None:
+    """Async variant of get_cached_itinerary (refresh is a sync callable, run in a worker thread)."""
+    try:
+        cached, soft_expiry = await async_redis_binary_client.mget(key, soft_expiry_key(key))
+        cached_data = load_cached_itinerary(cached)
+        if cached and cached_data is None:
+            await async_redis_binary_client.delete(key)
+        if cached_data is not None and refresh is not None and is_stale(soft_expiry):
+            await schedule_refresh_async(refresh_key or key, refresh)
+        return cached_data
+    except Exception as e:
+        print(f"⚠️ Redis Error: {e}. Proceeding without cache.")
+        return None
+
+
+async def store_itinerary_async(key: str, itinerary: dict) -> None:
+    """Async variant of store_itinerary."""
+    if itinerary.get("incomplete"):
+        print("⚠️ Not caching an incomplete itinerary.")
+        return
+    try:
+        pipe = async_redis_binary_client.pipeline()
+        pipe.setex(key, TRIP_CACHE_TTL, trip_codec.encode(itinerary))
+        pipe.setex(soft_expiry_key(key), TRIP_CACHE_TTL, _soft_expiry_value())
+        await pipe.execute()
+        print("💾 Successfully cached itinerary in Redis!")
+    except Exception as e:
+        print(f"⚠️ Redis Set Error: {e}. Could not cache result.")
+
+
+# ─────────────────────────── Background Refresh ─────────────────────────── #
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    if _refresh_executor is None:
+        with _refresh_executor_lock:
+            if _refresh_executor is None:
+                _refresh_executor = ThreadPoolExecutor(
+                    max_workers=settings.TRIP_CACHE_REFRESH_WORKERS,
+                    thread_name_prefix="trip-refresh",
+                )
+    return _refresh_executor
+
+
+def _release_refresh_lock(key: str, token: str):
+    try:
+        if redis_client.get(refresh_lock_key(key)) == token:
+            redis_client.delete(refresh_lock_key(key))
+    except RedisError:
+        pass
+
+
+def _record_refresh(field: str):
+    try:
+        redis_client.hincrby(REFRESH_STATS_KEY, field, 1)
+    except RedisError:
+        pass
+
+
+def refresh_stats() -> dict:
+    """Return stale_served/refreshed/refresh_failed counters."""
+    try:
+        return {field: int(value) for field, value in redis_client.hgetall(REFRESH_STATS_KEY).items()}
+    except RedisError as e:
+        return {"error": str(e)}
+
+
+def _submit_refresh(key: str, token: str, refresh):
+    print(f"♻️ Serving stale itinerary {key}; refreshing in the background...")
+    _record_refresh("stale_served")
+
+    def run():
+        try:
+            refresh()
+            _record_refresh("refreshed")
+        except Exception as e:
+            print(f"⚠️ Background refresh of {key} failed: {e}")
+            _record_refresh("refresh_failed")
+        finally:
+            _release_refresh_lock(key, token)
+
+    _get_refresh_executor().submit(run)
+
+
+def schedule_refresh(key: str, refresh) -> bool:
+    """
+    Regenerate a stale itinerary in the background, at most once at a time per key.
+
+    Args:
+        key (str): Itinerary key the refresh is locked on
+        refresh (callable): Regenerates and stores the itinerary (runs in a worker thread)
+
+    Returns:
+        bool: True if this call started the refresh
+    """
+    token = uuid.uuid4().hex
+    try:
+        if not redis_client.set(refresh_lock_key(key), token, nx=True, ex=REFRESH_LOCK_TTL):
+            return False
+    except RedisError:
+        return False
+    _submit_refresh(key, token, refresh)
+    return True
+
+
+async def schedule_refresh_async(key: str, refresh) -> bool:
+    """
+    Async variant of schedule_refresh.
+
+    The refresh still runs in the worker threads rather than as a task, so it
+    survives event loops that end with the request (async views under WSGI).
+    """
+    token = uuid.uuid4().hex
+    try:
+        if not await async_redis_client.set(refresh_lock_key(key), token, nx=True, ex=REFRESH_LOCK_TTL):
+            return False
+    except RedisError:
+        return False
+    _submit_refresh(key, token, refresh)
+    return True
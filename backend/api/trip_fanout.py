@@ -0,0 +1,197 @@
+"""
+Parallel Per-Day Itinerary Generation (fan-out / fan-in)
+
+A single trip call has to write every day in one response, so latency grows
+with trip length and long trips run into the output token limit. For trips of
+TRIP_FANOUT_MIN_DAYS or more, the plan is built in two steps instead:
+
+1. Skeleton: one short call for the summary, destination info, cost totals
+   and a title/theme/area per day.
+2. Days: one call per day for its activities, run concurrently in a bounded
+   pool (TRIP_FANOUT_MAX_WORKERS), then merged into the usual itinerary shape.
+
+Key Features:
+- Same output shape as the single-call path (days[].title/activities/day_cost_estimate)
+- Skeleton themes shared with every day call to avoid overlapping days
+- Failed days are regenerated together by api/itinerary_repair.py, keeping the
+  skeleton and the successful days; only a failed skeleton (or a plan with
+  no usable day) makes the caller fall back to the single call
+- Sync (thread pool) and async (asyncio.gather + semaphore) variants
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+from .chat_request import generate, generate_async
+from .itinerary_repair import expected_day_count, is_complete_day, repair_plan, repair_plan_async
+from .itinerary_schema import DAY_RESPONSE_SCHEMA, SKELETON_RESPONSE_SCHEMA
+
+_fanout_executor = None
+_fanout_executor_lock = threading.Lock()
+
+
+def wants_fanout(data: dict) -> bool:
+    """True if the trip is long enough for parallel per-day generation."""
+    day_count = expected_day_count(data)
+    return bool(settings.TRIP_FANOUT_MIN_DAYS) and bool(day_count) and day_count >= settings.TRIP_FANOUT_MIN_DAYS
+
+
+def _get_fanout_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by all fan-out requests, so concurrent trips stay bounded."""
+    global _fanout_executor
+    if _fanout_executor is None:
+        with _fanout_executor_lock:
+            if _fanout_executor is None:
+                _fanout_executor = ThreadPoolExecutor(
+                    max_workers=settings.TRIP_FANOUT_MAX_WORKERS,
+                    thread_name_prefix="trip-fanout",
+                )
+    return _fanout_executor
+
+
+# ─────────────────────────── Prompts ─────────────────────────── #
+def build_skeleton_prompt(user_prompt: str, day_count: int) -> str:
+    """Prompt for the trip skeleton: everything except the daily activities."""
+    return (
+        f"{user_prompt}\n\n"
+        f"**Skeleton Task:** Do NOT write activities yet. Plan the outline of the {day_count}-day trip: "
+        f"exactly {day_count} entries in `days`, each with a `title` (\"Day <number>: ...\"), the day's `theme` "
+        f"and the main `area` or neighbourhood it covers, so the days together cover the destination without overlap. "
+        f"Also return `summary`, `destination_info` and `total_cost_estimate` for the whole trip.\n"
+        f"Return ONLY a JSON object with keys: summary, days, destination_info, total_cost_estimate."
+    )
+
+
+def build_day_prompt(user_prompt: str, skeleton: dict, index: int) -> str:
+    """Prompt for the activities of one skeleton day."""
+    days = skeleton["days"]
+    outline = "\n".join(
+        f"- {day.get('title')}: {day.get('theme')} ({day.get('area')})" for day in days
+    )
+    day = days[index]
+    return (
+        f"{user_prompt}\n\n"
+        f"Trip summary: {skeleton.get('summary')}\n"
+        f"Trip outline (each day is written separately):\n{outline}\n\n"
+        f"**Day Task:** Write ONLY day {index + 1} of {len(days)}, \"{day.get('title')}\": "
+        f"theme \"{day.get('theme')}\", area \"{day.get('area')}\". Keep its activities within this theme and area "
+        f"and do not use places that belong to other days of the outline.\n"
+        f"Return ONLY one JSON day object with keys: title, activities, day_cost_estimate."
+    )
+
+
+def _skeleton_from_result(result, day_count: int) -> dict | None:
+    skeleton = result.data
+    if not isinstance(skeleton, dict) or not isinstance(skeleton.get("days"), list) or not skeleton.get("summary"):
+        print(f"❌ Trip skeleton unusable ({result.parse_error or result.finish_reason or 'missing fields'}).")
+        return None
+    if len(skeleton["days"]) < day_count:
+        print(f"❌ Trip skeleton has {len(skeleton['days'])} of {day_count} days.")
+        return None
+    skeleton["days"] = skeleton["days"][:day_count]
+    return skeleton
+
+
+def _day_from_result(result, skeleton: dict, index: int) -> dict | None:
+    day = result.data
+    if not is_complete_day(day):
+        return None
+    day["title"] = skeleton["days"][index].get("title") or day["title"]
+    return day
+
+
+def _merge(skeleton: dict, days: list) -> dict:
+    """Assemble the itinerary; failed days keep their skeleton entry (title/theme/area) as a placeholder."""
+    days = [day if day is not None else dict(skeleton["days"][index]) for index, day in enumerate(days)]
+    return {
+        "summary": skeleton["summary"],
+        "days": days,
+        "destination_info": skeleton.get("destination_info"),
+        "total_cost_estimate": skeleton.get("total_cost_estimate"),
+    }
+
+
+# ─────────────────────────── Entry Points ─────────────────────────── #
+def generate_itinerary_fanout(data: dict, user_prompt: str, system_instruction: str, model_name: str) -> dict | None:
+    """
+    Build an itinerary from a skeleton call plus one concurrent call per day.
+
+    Args:
+        data (dict): PlanTripSerializer validated_data (for the trip length)
+        user_prompt (str): Rendered per-request trip prompt
+        system_instruction (str): Trip system instruction (context-cached)
+        model_name (str): Gemini model for all calls
+
+    Returns:
+        dict | None: The merged itinerary, or None if the skeleton failed or nothing could be repaired
+    """
+    day_count = expected_day_count(data)
+    skeleton_result = generate(
+        build_skeleton_prompt(user_prompt, day_count), model_name,
+        system_instruction=system_instruction, response_schema=SKELETON_RESPONSE_SCHEMA,
+    )
+    skeleton = _skeleton_from_result(skeleton_result, day_count)
+    if skeleton is None:
+        return None
+    print(f"🦴 Trip skeleton ready in {skeleton_result.latency:.1f}s; generating {day_count} days in parallel...")
+
+    def generate_day(index):
+        result = generate(
+            build_day_prompt(user_prompt, skeleton, index), model_name,
+            system_instruction=system_instruction, response_schema=DAY_RESPONSE_SCHEMA,
+        )
+        day = _day_from_result(result, skeleton, index)
+        if day is None:
+            print(f"⚠️ Day {index + 1} generation failed ({result.parse_error or result.finish_reason}).")
+        return day
+
+    executor = _get_fanout_executor()
+    # One context copy per day keeps the caller's usage-ledger attribution in the pool threads.
+    futures = [executor.submit(contextvars.copy_context().run, generate_day, index) for index in range(day_count)]
+    days = [future.result() for future in futures]
+    plan = _merge(skeleton, days)
+    if all(days):
+        return plan
+    if not settings.TRIP_REPAIR_ENABLED:
+        return None
+    print(f"🩹 Repairing failed days {[i + 1 for i, day in enumerate(days) if day is None]}...")
+    return repair_plan(plan, day_count, user_prompt, system_instruction, model_name)
+
+
+async def generate_itinerary_fanout_async(data: dict, user_prompt: str, system_instruction: str, model_name: str) -> dict | None:
+    """Async variant of generate_itinerary_fanout."""
+    day_count = expected_day_count(data)
+    skeleton_result = await generate_async(
+        build_skeleton_prompt(user_prompt, day_count), model_name,
+        system_instruction=system_instruction, response_schema=SKELETON_RESPONSE_SCHEMA,
+    )
+    skeleton = _skeleton_from_result(skeleton_result, day_count)
+    if skeleton is None:
+        return None
+    print(f"🦴 Trip skeleton ready in {skeleton_result.latency:.1f}s; generating {day_count} days in parallel...")
+
+    semaphore = asyncio.Semaphore(settings.TRIP_FANOUT_MAX_WORKERS)
+
+    async def generate_day(index):
+        async with semaphore:
+            result = await generate_async(
+                build_day_prompt(user_prompt, skeleton, index), model_name,
+                system_instruction=system_instruction, response_schema=DAY_RESPONSE_SCHEMA,
+            )
+        day = _day_from_result(result, skeleton, index)
+        if day is None:
+            print(f"⚠️ Day {index + 1} generation failed ({result.parse_error or result.finish_reason}).")
+        return day
+
+    days = list(await asyncio.gather(*(generate_day(index) for index in range(day_count))))
+    plan = _merge(skeleton, days)
+    if all(days):
+        return plan
+    if not settings.TRIP_REPAIR_ENABLED:
+        return None
+    print(f"🩹 Repairing failed days {[i + 1 for i, day in enumerate(days) if day is None]}...")
+    return await repair_plan_async(plan, day_count, user_prompt, system_instruction, model_name)
@@ -0,0 +1,344 @@
+"""
+Background Jobs for Trip Generation
+
+Long generations (pro model, long trips) can outlive proxy timeouts and tie up
+web workers. With a background job, POST /api/plantrip/ answers 202 with a
+job id right away. A separate worker process (`python manage.py run_trip_worker`)
+does the Gemini call, parsing and caching, and clients poll the job or
+subscribe to its events.
+
+Redis layout:
+- trip:jobs:queue            list of queued job ids (LPUSH in, BLMOVE out)
+- trip:jobs:processing       job ids claimed by a worker (for stale-job recovery)
+- trip:job:<id>              hash: status, key, payload, enrich, attempts, error, timestamps
+- trip:job:bykey:<key>       id of the in-flight job for an itinerary cache key (dedupe)
+- trip:job:tokens:<id>       set of access tokens handed to the requesters of a job
+- trip:job:events:<id>       pub/sub channel announcing status changes
+
+Results are not copied into the job; finished jobs point at the itinerary
+cache entry (plain or enriched) written by the worker.
+"""
+
+import json
+import secrets
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .trip_cache import TRIP_GENERATION_MAX_SECONDS
+from .utils.redis_client import redis_client
+
+QUEUE_KEY = "trip:jobs:queue"
+PROCESSING_KEY = "trip:jobs:processing"
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+FINAL_STATUSES = (STATUS_DONE, STATUS_FAILED)
+
+STALE_MARGIN_SECONDS = 120  # queueing for a model slot, parsing and caching on top of the generation itself
+
+
+class TripJobError(Exception):
+    """Raised by a job handler with the error payload and HTTP status to report."""
+
+    def __init__(self, payload: dict, status_code: int = 500):
+        super().__init__(payload.get("error"))
+        self.payload = payload
+        self.status_code = status_code
+
+
+def job_key(job_id: str) -> str:
+    return f"trip:job:{job_id}"
+
+
+def job_channel(job_id: str) -> str:
+    return f"trip:job:events:{job_id}"
+
+
+def _bykey_key(cache_key: str) -> str:
+    return f"trip:job:bykey:{cache_key}"
+
+
+def _tokens_key(job_id: str) -> str:
+    return f"trip:job:tokens:{job_id}"
+
+
+def stale_after_seconds() -> int:
+    """Seconds a running job may take before it counts as abandoned (TRIP_JOB_STALE_AFTER, or derived)."""
+    return settings.TRIP_JOB_STALE_AFTER or TRIP_GENERATION_MAX_SECONDS + STALE_MARGIN_SECONDS
+
+
+# ─────────────────────────── Producer Side ─────────────────────────── #
+def enqueue_trip_job(payload: dict, cache_key: str, enrich: bool = False, user_id: int | None = None) -> tuple[str, bool]:
+    """
+    Queue a trip generation, reusing the in-flight job for the same itinerary.
+
+    Args:
+        payload (dict): JSON-safe PlanTripSerializer data (re-validated by the worker)
+        cache_key (str): Itinerary cache key the worker will fill
+        enrich (bool): Also build the place-enriched variant
+        user_id (int, optional): Requesting user, for LLM usage attribution
+
+    Returns:
+        tuple[str, bool]: (job_id, created) - created is False for a deduplicated request
+    """
+    job_id = uuid.uuid4().hex
+    ttl = settings.TRIP_JOB_TTL
+    if not redis_client.set(_bykey_key(cache_key), job_id, nx=True, ex=ttl):
+        existing_id = redis_client.get(_bykey_key(cache_key))
+        existing = get_job(existing_id) if existing_id else None
+        if existing and existing["status"] not in FINAL_STATUSES and (existing["enrich"] or not enrich):
+            return existing_id, False
+        redis_client.set(_bykey_key(cache_key), job_id, ex=ttl)
+
+    pipe = redis_client.pipeline()
+    pipe.hset(job_key(job_id), mapping={
+        "status": STATUS_QUEUED,
+        "key": cache_key,
+        "payload": json.dumps(payload),
+        "enrich": int(bool(enrich)),
+        "user_id": user_id or "",
+        "created_at": time.time(),
+    })
+    pipe.expire(job_key(job_id), ttl)
+    pipe.lpush(QUEUE_KEY, job_id)
+    pipe.execute()
+    print(f"📬 Queued trip job {job_id} for {cache_key}")
+    return job_id, True
+
+
+def get_job(job_id: str) -> dict | None:
+    """Return a job as a dict (payload/error decoded), or None if unknown or expired."""
+    raw = redis_client.hgetall(job_key(job_id))
+    if not raw:
+        return None
+    job = {
+        "id": job_id,
+        "status": raw.get("status"),
+        "key": raw.get("key"),
+        "payload": json.loads(raw.get("payload") or "{}"),
+        "enrich": raw.get("enrich") == "1",
+        "attempts": int(raw.get("attempts") or 0),
+        "user_id": int(raw["user_id"]) if raw.get("user_id") else None,
+        "error": json.loads(raw["error"]) if raw.get("error") else None,
+        "status_code": int(raw["status_code"]) if raw.get("status_code") else None,
+    }
+    for field in ("created_at", "started_at", "finished_at"):
+        job[field] = float(raw[field]) if raw.get(field) else None
+    return job
+
+
+def grant_job_access(job_id: str) -> str:
+    """
+    Issue an access token for a job to one requester.
+
+    Deduplicated requests share a job, so every requester gets a token of its
+    own; job ids alone are not enough to read a job.
+    """
+    token = secrets.token_urlsafe(16)
+    pipe = redis_client.pipeline()
+    pipe.sadd(_tokens_key(job_id), token)
+    pipe.expire(_tokens_key(job_id), settings.TRIP_JOB_TTL)
+    pipe.execute()
+    return token
+
+
+def has_job_access(job_id: str, token: str | None) -> bool:
+    return bool(token) and bool(redis_client.sismember(_tokens_key(job_id), token))
+
+
+def queue_position(job_id: str) -> int | None:
+    """1-based position of a queued job (1 = next to run), or None if not queued."""
+    try:
+        index = redis_client.lpos(QUEUE_KEY, job_id)
+        length = redis_client.llen(QUEUE_KEY)
+    except RedisError:
+        return None
+    return None if index is None else length - index
+
+
+# ─────────────────────────── Worker Side ─────────────────────────── #
+def claim_next_job(timeout: float) -> str | None:
+    """Block up to `timeout` seconds for the next job id and mark it as processing."""
+    return redis_client.blmove(QUEUE_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+
+
+def _set_status(job_id: str, status: str, **fields):
+    pipe = redis_client.pipeline()
+    pipe.hset(job_key(job_id), mapping={"status": status, **fields})
+    pipe.expire(job_key(job_id), settings.TRIP_JOB_TTL)
+    pipe.publish(job_channel(job_id), json.dumps({"status": status}))
+    pipe.execute()
+
+
+def start_job(job_id: str):
+    redis_client.hincrby(job_key(job_id), "attempts", 1)
+    _set_status(job_id, STATUS_RUNNING, started_at=time.time())
+
+
+def finish_job(job_id: str, cache_key: str, error: dict | None = None, status_code: int | None = None):
+    """Mark a job done (or failed with an error payload) and release its dedupe slot."""
+    fields = {"finished_at": time.time()}
+    if error is not None:
+        fields["error"] = json.dumps(error)
+        fields["status_code"] = status_code or 500
+    _set_status(job_id, STATUS_FAILED if error is not None else STATUS_DONE, **fields)
+    pipe = redis_client.pipeline()
+    pipe.lrem(PROCESSING_KEY, 0, job_id)
+    pipe.execute()
+    # Only release the dedupe slot if it still points at this job.
+    if redis_client.get(_bykey_key(cache_key)) == job_id:
+        redis_client.delete(_bykey_key(cache_key))
+
+
+def requeue_stale_jobs(stale_after: float | None = None, max_attempts: int | None = None) -> int:
+    """
+    Put jobs back on the queue whose worker died mid-generation.
+
+    A job that has already been started `max_attempts` times is failed instead,
+    so a request that kills its worker every time does not loop forever.
+
+    Args:
+        stale_after (float, optional): Seconds before a running job is abandoned (default: stale_after_seconds())
+        max_attempts (int, optional): Starts before a stale job is failed (default: TRIP_JOB_MAX_ATTEMPTS)
+
+    Returns:
+        int: Number of requeued jobs
+    """
+    stale_after = stale_after or stale_after_seconds()
+    max_attempts = max_attempts or settings.TRIP_JOB_MAX_ATTEMPTS
+    requeued = 0
+    now = time.time()
+    for job_id in redis_client.lrange(PROCESSING_KEY, 0, -1):
+        job = get_job(job_id)
+        if job is None or job["status"] in FINAL_STATUSES:
+            redis_client.lrem(PROCESSING_KEY, 0, job_id)
+            continue
+        started = job["started_at"] or job["created_at"] or 0
+        if now - started <= stale_after:
+            continue
+        if job["attempts"] >= max_attempts:
+            print(f"❌ Trip job {job_id} abandoned after {job['attempts']} attempt(s)")
+            finish_job(job_id, job["key"], error={"error": "Trip generation did not finish. Please try again."}, status_code=503)
+        else:
+            pipe = redis_client.pipeline()
+            pipe.lrem(PROCESSING_KEY, 0, job_id)
+            pipe.hset(job_key(job_id), "status", STATUS_QUEUED)
+            pipe.rpush(QUEUE_KEY, job_id)  # next to run
+            pipe.execute()
+            requeued += 1
+    return requeued
+
+
+def run_job(job_id: str, handler) -> bool:
+    """
+    Run one claimed job through `handler(job)`; the handler fills the itinerary cache.
+
+    Returns:
+        bool: True if the job succeeded
+    """
+    job = get_job(job_id)
+    if job is None:
+        redis_client.lrem(PROCESSING_KEY, 0, job_id)
+        return False
+
+    start_job(job_id)
+    started = time.perf_counter()
+    try:
+        handler(job)
+    except TripJobError as e:
+        print(f"❌ Trip job {job_id} failed: {e}")
+        finish_job(job_id, job["key"], error=e.payload, status_code=e.status_code)
+        return False
+    except Exception as e:
+        print(f"❌ Trip job {job_id} crashed: {e}")
+        finish_job(job_id, job["key"], error={"error": f"An unexpected error occurred: {e}"}, status_code=500)
+        return False
+    finish_job(job_id, job["key"])
+    print(f"✅ Trip job {job_id} done in {time.perf_counter() - started:.1f}s")
+    return True
+
+
+def run_worker(handler, concurrency: int = 1, poll_timeout: float = 5, stop_event: threading.Event | None = None):
+    """
+    Process jobs until `stop_event` is set, with `concurrency` threads.
+
+    Args:
+        handler (callable): Called with the job dict; raises TripJobError on failure
+        concurrency (int): Jobs processed in parallel by this process
+        poll_timeout (float): Seconds each BLMOVE waits before re-checking stop_event
+        stop_event (threading.Event, optional): Set to stop after the current jobs
+    """
+    stop_event = stop_event or threading.Event()
+
+    def loop():
+        while not stop_event.is_set():
+            try:
+                job_id = claim_next_job(poll_timeout)
+            except RedisError as e:
+                print(f"⚠️ Trip worker could not reach Redis: {e}")
+                stop_event.wait(poll_timeout)
+                continue
+            if not job_id:
+                continue
+            try:
+                run_job(job_id, handler)
+            except RedisError as e:
+                # The job stays in the processing list; requeue_stale_jobs picks it up again.
+                print(f"⚠️ Trip job {job_id} lost its Redis connection: {e}")
+                stop_event.wait(poll_timeout)
+
+    threads = [threading.Thread(target=loop, name=f"trip-worker-{index}", daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(timeout=1)
+    except KeyboardInterrupt:
+        print("🛑 Stopping trip worker after the current jobs...")
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+
+
+# ─────────────────────────── Subscriptions ─────────────────────────── #
+def iter_job_updates(job_id: str, timeout: float, heartbeat: float = 15):
+    """
+    Yield the job dict on every status change until it finishes or `timeout` passes.
+
+    Yields None every `heartbeat` seconds without a change, so SSE responses
+    can send keep-alive comments.
+    """
+    pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(job_channel(job_id))
+    try:
+        # Subscribe first, then read, so a change between the two is not missed.
+        job = get_job(job_id)
+        if job is None:
+            return
+        yield job
+        if job["status"] in FINAL_STATUSES:
+            return
+        deadline = time.monotonic() + timeout
+        last_status = job["status"]
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=min(heartbeat, max(deadline - time.monotonic(), 0)))
+            if message is None:
+                yield None
+                continue
+            job = get_job(job_id)
+            if job is None:
+                return
+            if job["status"] != last_status:
+                last_status = job["status"]
+                yield job
+            if job["status"] in FINAL_STATUSES:
+                return
+    finally:
+        pubsub.close()
@@ -0,0 +1,289 @@
+"""
+Off-Peak Pre-Generation of Popular Itineraries
+
+Itineraries are cached on demand for TRIP_CACHE_TTL, so the first request for
+every popular combination waits for a full generation. This module records
+the shape of each plan request and pre-generates (and refreshes before
+expiry) the most requested ones during off-peak hours.
+
+Request shapes:
+- shape = normalized destination x trip length x pace x budget
+- Counted per day in Redis (trip:shapes:<YYYYMMDD>, ZINCRBY, kept for
+  TRIP_SHAPE_LOG_DAYS days); the latest full payload of each shape is kept
+  as its representative request
+- JSONL request logs can be mined as well (see `manage.py warm_trip_cache --log`)
+
+Warm-up pass:
+- The top shapes with at least TRIP_WARMUP_MIN_REQUESTS requests are
+  generated if their cache entry is missing or expires within `refresh_within`
+- Past dates are moved forward to tomorrow, keeping the trip length. Only
+  the near-duplicate cache (SIMILAR_TRIP_CACHE_ENABLED) serves such a plan to
+  real requests, whose dates differ; without it these shapes are skipped
+  (counted as past_dates) instead of spending generations on unused keys
+- At most `max_generations` LLM generations per pass (the spend cap), run
+  `concurrency` at a time, through the usual single-flight and cache path
+- Generated plans are indexed by the near-duplicate cache, which serves
+  them to same-shape requests on other dates when it is enabled
+- Shapes whose representative request is still upcoming warm its exact key
+"""
+
+import json
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from redis.exceptions import RedisError
+
+from .cache_keys import canonical_trip_request, make_trip_cache_key
+from .itinerary_repair import expected_day_count
+from .utils.redis_client import async_redis_client, redis_binary_client, redis_client
+
+SHAPES_PREFIX = "trip:shapes"
+SHAPE_PAYLOADS_KEY = f"{SHAPES_PREFIX}:payloads"
+WARMUP_LOCK_KEY = "trip:warmup:lock"
+WARMUP_STATS_KEY = "trip:warmup:stats"
+
+
+# ─────────────────────────── Request Shapes ─────────────────────────── #
+def request_shape(data: dict) -> str:
+    """Shape of a validated trip request, e.g. "paris, france|4|moderate|mid-range"."""
+    canonical = canonical_trip_request(data)
+    return "|".join([canonical["destination"], str(expected_day_count(data) or 0), canonical.get("pace", ""), canonical.get("budget", "")])
+
+
+def _day_key(day: date) -> str:
+    return f"{SHAPES_PREFIX}:{day.strftime('%Y%m%d')}"
+
+
+def _queue_shape(pipe, data: dict, payload: dict):
+    shape = request_shape(data)
+    day_key = _day_key(timezone.localdate())
+    pipe.zincrby(day_key, 1, shape)
+    pipe.expire(day_key, settings.TRIP_SHAPE_LOG_DAYS * 86400)
+    pipe.hset(SHAPE_PAYLOADS_KEY, shape, json.dumps(payload))
+
+
+def record_request_shape(data: dict, payload: dict):
+    """
+    Count a plan request towards its shape. Never raises.
+
+    Args:
+        data (dict): PlanTripSerializer validated_data
+        payload (dict): The JSON-safe serializer.data, kept as the shape's representative request
+    """
+    if not settings.TRIP_SHAPE_LOG_ENABLED:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        _queue_shape(pipe, data, payload)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+async def record_request_shape_async(data: dict, payload: dict):
+    """Async variant of record_request_shape."""
+    if not settings.TRIP_SHAPE_LOG_ENABLED:
+        return
+    try:
+        pipe = async_redis_client.pipeline(transaction=False)
+        _queue_shape(pipe, data, payload)
+        await pipe.execute()
+    except RedisError:
+        pass
+
+
+def top_shapes(days: int, limit: int, min_requests: int = 1) -> list:
+    """
+    Most requested shapes of the last `days` days with their representative payloads.
+
+    Returns:
+        list[tuple[str, int, dict]]: (shape, requests, payload), most requested first
+    """
+    today = timezone.localdate()
+    pipe = redis_client.pipeline(transaction=False)
+    for offset in range(days):
+        pipe.zrange(_day_key(today - timedelta(days=offset)), 0, -1, withscores=True)
+    counts = {}
+    for day_counts in pipe.execute():
+        for shape, score in day_counts:
+            counts[shape] = counts.get(shape, 0) + int(score)
+    ranked = [(shape, count) for shape, count in sorted(counts.items(), key=lambda item: -item[1]) if count >= min_requests][:limit]
+    if not ranked:
+        return []
+    payloads = redis_client.hmget(SHAPE_PAYLOADS_KEY, [shape for shape, _ in ranked])
+    return [(shape, count, json.loads(raw)) for (shape, count), raw in zip(ranked, payloads) if raw]
+
+
+# ─────────────────────────── Scheduling ─────────────────────────── #
+def parse_window(window: str) -> tuple:
+    """Parse "HH:MM-HH:MM" into two times (the window may wrap past midnight)."""
+    try:
+        start, end = (datetime.strptime(part.strip(), "%H:%M").time() for part in window.split("-"))
+    except ValueError:
+        raise ValueError(f"Invalid off-peak window {window!r}, expected HH:MM-HH:MM")
+    return start, end
+
+
+def in_window(window: str, now: datetime | None = None) -> bool:
+    """True if the local time is inside the off-peak window."""
+    start, end = parse_window(window)
+    current = (now or timezone.localtime()).time()
+    return start <= current < end if start <= end else (current >= start or current < end)
+
+
+def acquire_warmup_lock(ttl: int) -> str | None:
+    """Make sure only one scheduler warms the cache at a time; returns the lock token."""
+    token = uuid.uuid4().hex
+    return token if redis_client.set(WARMUP_LOCK_KEY, token, nx=True, ex=ttl) else None
+
+
+def release_warmup_lock(token: str):
+    if redis_client.get(WARMUP_LOCK_KEY) == token:
+        redis_client.delete(WARMUP_LOCK_KEY)
+
+
+# ─────────────────────────── Warm-Up Pass ─────────────────────────── #
+def has_past_dates(payload: dict, today: date | None = None) -> bool:
+    """True if the trip starts today or earlier (shift_dates would move it)."""
+    start = payload.get("startDate")
+    return bool(start) and date.fromisoformat(start) <= (today or timezone.localdate())
+
+
+def shift_dates(payload: dict, today: date | None = None) -> dict:
+    """Move a past trip to start tomorrow, keeping its length."""
+    today = today or timezone.localdate()
+    if not has_past_dates(payload, today):
+        return payload
+    start, end = payload.get("startDate"), payload.get("endDate")
+    start_date = date.fromisoformat(start)
+    length = (date.fromisoformat(end) - start_date) if end else None
+    new_start = today + timedelta(days=1)
+    shifted = dict(payload, startDate=new_start.isoformat())
+    if length is not None:
+        shifted["endDate"] = (new_start + length).isoformat()
+    return shifted
+
+
+class WarmupPlan:
+    """
+    Decide which shapes a pass generates.
+
+    Args:
+        refresh_within (int): Regenerate cached entries expiring within this many seconds
+        max_generations (int): Spend cap, LLM generations per pass
+    """
+
+    def __init__(self, refresh_within: int, max_generations: int):
+        self.refresh_within = refresh_within
+        self.max_generations = max_generations
+        self.jobs = []
+        self.fresh = 0
+        self.invalid = 0
+        self.over_budget = 0
+        self.past_dates = 0
+
+    def consider(self, shape: str, count: int, payload: dict):
+        from .serializers import PlanTripSerializer
+        from .similar_trip_cache import similar_trip_cache
+
+        try:
+            past = has_past_dates(payload)
+        except (TypeError, ValueError):
+            self.invalid += 1
+            return
+        if past and not similar_trip_cache.enabled:
+            # The shifted exact key would only be hit by a request for exactly those dates.
+            self.past_dates += 1
+            return
+        serializer = PlanTripSerializer(data=shift_dates(payload))
+        if not serializer.is_valid():
+            self.invalid += 1
+            return
+        data = serializer.validated_data
+        key = make_trip_cache_key(data)
+        ttl = redis_binary_client.ttl(key)
+        if ttl == -1 or ttl > self.refresh_within or self._has_fresh_near_duplicate(data, key):
+            self.fresh += 1
+            return
+        if len(self.jobs) >= self.max_generations:
+            self.over_budget += 1
+            return
+        self.jobs.append((shape, count, data, key, "refresh" if ttl > 0 else "new"))
+
+
+    def _has_fresh_near_duplicate(self, data: dict, key: str) -> bool:
+        """Shifted dates change the exact key, so a warm same-shape plan on other dates counts as fresh."""
+        from .similar_trip_cache import similar_trip_cache
+
+        for similar_key, _ in similar_trip_cache.find(data, exclude_key=key):
+            if redis_binary_client.ttl(similar_key) > self.refresh_within:
+                return True
+        return False
+
+
+def run_warmup_pass(shapes: list, generate, concurrency: int, refresh_within: int, max_generations: int,
+                    dry_run: bool = False, log=print) -> dict:
+    """
+    Pre-generate the missing or soon-expiring itineraries of the given shapes.
+
+    Args:
+        shapes (list): (shape, requests, payload) tuples, most requested first
+        generate (callable): generate(data, key), fills the itinerary cache
+        concurrency (int): Generations run in parallel
+        refresh_within (int): Refresh entries expiring within this many seconds
+        max_generations (int): Spend cap for this pass
+        dry_run (bool): Only report what would be generated
+
+    Returns:
+        dict: Counters (shapes, fresh, generated, failed, invalid, over_budget, past_dates)
+    """
+    plan = WarmupPlan(refresh_within, max_generations)
+    for shape, count, payload in shapes:
+        plan.consider(shape, count, payload)
+
+    summary = {
+        "shapes": len(shapes), "fresh": plan.fresh, "planned": len(plan.jobs),
+        "generated": 0, "failed": 0, "invalid": plan.invalid, "over_budget": plan.over_budget,
+        "past_dates": plan.past_dates,
+    }
+    for shape, count, _, _, reason in plan.jobs:
+        log(f"🔥 {'Would warm' if dry_run else 'Warming'} {shape} ({count} requests, {reason})")
+    if dry_run or not plan.jobs:
+        return summary
+
+    def warm(job):
+        shape, _, data, key, _ = job
+        started = time.perf_counter()
+        try:
+            generate(data, key)
+        except Exception as e:
+            log(f"❌ Warm-up failed for {shape}: {e}")
+            return False
+        log(f"✅ Warmed {shape} in {time.perf_counter() - started:.1f}s")
+        return True
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="trip-warmup") as executor:
+        results = list(executor.map(warm, plan.jobs))
+    summary["generated"] = sum(results)
+    summary["failed"] = len(results) - summary["generated"]
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for field in ("generated", "failed", "fresh"):
+            pipe.hincrby(WARMUP_STATS_KEY, field, summary[field])
+        pipe.hset(WARMUP_STATS_KEY, "last_run", int(time.time()))
+        pipe.execute()
+    except RedisError:
+        pass
+    return summary
+
+
+def warmup_stats() -> dict:
+    """Return generated/failed/fresh totals and the last run timestamp."""
+    try:
+        return {field: int(value) for field, value in redis_client.hgetall(WARMUP_STATS_KEY).items()}
+    except RedisError as e:
+        return {"error": str(e)}
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -6,9 +7,14 @@ from rest_framework_simplejwt.views import (
 from .views import (
     RegisterView, 
     get_place_details_view, 
+    get_place_details_batch_view,
     ProfileUpdateView,
     ProfileRetrieveView,
     plan_trip_view, 
+    plan_trip_stream_view,
+    plan_trip_async_view,
+    plan_trip_job_view,
+    plan_trip_job_events_view,
     SaveTripView, 
     MyTripsListView,
     MyTripDetailView,
@@ -19,28 +25,45 @@ from .views import (
     PasswordResetConfirmView,
     GoogleLoginView,
     chat_add_activity,
+    chat_replace_activity_async,
+    chat_add_activity_async,
     save_activity_note,
     get_activity_notes,
     GoogleOAuthCallbackView,
     health_check,
+    metrics_view,
+    llm_usage_view,
 )
 from django.contrib.auth import views as auth_views
+
+# Under ASGI the frontend's LLM endpoints are served by the async views (see ASYNC_LLM_VIEWS).
+ASYNC = settings.ASYNC_LLM_VIEWS
+
 urlpatterns = [
     path('health/', health_check, name='health_check'),
+    path('metrics/', metrics_view, name='metrics'),
+    path('metrics/llm-usage/', llm_usage_view, name='llm_usage'),
     path('csrf/', get_csrf_token, name='csrf'),
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('plantrip/', plan_trip_view, name='plan_trip'),
+    path('plantrip/', plan_trip_async_view if ASYNC else plan_trip_view, name='plan_trip'),
+    path('plantrip/stream/', plan_trip_stream_view, name='plan_trip_stream'),
+    path('plantrip/async/', plan_trip_async_view, name='plan_trip_async'),
+    path('plantrip/jobs/<str:job_id>/', plan_trip_job_view, name='plan_trip_job'),
+    path('plantrip/jobs/<str:job_id>/events/', plan_trip_job_events_view, name='plan_trip_job_events'),
     path('place-details/',get_place_details_view , name='place_details'),
+    path('place-details/batch/', get_place_details_batch_view, name='place_details_batch'),
     path('place-photo/', proxy_place_photo, name='place_photo'),
     path('profile/', ProfileRetrieveView.as_view(), name='profile-retrieve'),
     path('profile/update/', ProfileUpdateView.as_view(), name='profile-update'), 
     path('trips/save/', SaveTripView.as_view(), name='save_trip'),  
     path('my-trips/', MyTripsListView.as_view(), name='my_trips'),
     path('my-trips/<int:pk>/', MyTripDetailView.as_view(), name='my_trip_detail'),
-    path('chat-replace-activity/', chat_replace_activity, name='chat_replace_activity'),
-    path('chat-add-activity/', chat_add_activity, name='chat_add_activity'),
+    path('chat-replace-activity/', chat_replace_activity_async if ASYNC else chat_replace_activity, name='chat_replace_activity'),
+    path('chat-add-activity/', chat_add_activity_async if ASYNC else chat_add_activity, name='chat_add_activity'),
+    path('chat-replace-activity/async/', chat_replace_activity_async, name='chat_replace_activity_async'),
+    path('chat-add-activity/async/', chat_add_activity_async, name='chat_add_activity_async'),
     path('password-reset/request/', PasswordResetRequestView.as_view(), name='password_reset_request_api'),
     path('password-reset/confirm/<uidb64>/<token>/', PasswordResetConfirmView.as_view(), name='password_reset_confirm_api'),
     path('auth/google/', GoogleLoginView.as_view(), name='google_login'),
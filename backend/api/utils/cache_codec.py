@@ -0,0 +1,200 @@
+"""
+Binary codecs for values stored in Redis.
+
+Itineraries are 10-60 KB of JSON text. Storing them compressed cuts Redis
+memory and network transfer, and orjson makes the decode on every cache hit
+several times cheaper than json.loads.
+
+Every encoded value starts with a one-byte format id, so entries written by an
+older codec stay readable after the configured codec changes. Plain JSON text
+written before this module existed starts with "{" and is decoded as-is.
+
+Formats:
+- 0x01: zlib-compressed JSON (stdlib only)
+- 0x02: zstd-compressed JSON (requires the optional `zstandard` package)
+
+orjson is used for (de)serialization when installed, json otherwise.
+
+CompressedRedisSerializer applies the same framing to Django's Redis cache
+backend (settings.CACHES), on top of pickle instead of JSON.
+"""
+
+import json
+import pickle
+import zlib
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+class CacheCodecError(ValueError):
+    """Raised when a cached value cannot be decoded."""
+
+
+def _dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JsonCodec:
+    """Uncompressed JSON, the pre-codec format. Only used for reading."""
+    name = "json"
+    format_id = None
+
+    def encode(self, value) -> bytes:
+        return _dumps(value)
+
+    def decode(self, payload: bytes):
+        return _loads(payload)
+
+
+class ZlibCodec:
+    """zlib-compressed JSON."""
+    name = "zlib"
+    format_id = 0x01
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def encode(self, value) -> bytes:
+        return bytes([self.format_id]) + zlib.compress(_dumps(value), self.level)
+
+    def decode(self, payload: bytes):
+        return _loads(zlib.decompress(payload))
+
+
+class ZstdCodec:
+    """zstd-compressed JSON. Faster than zlib at a better ratio."""
+    name = "zstd"
+    format_id = 0x02
+
+    def __init__(self, level: int = 3):
+        if zstandard is None:
+            raise CacheCodecError("The zstd codec requires the 'zstandard' package.")
+        self.level = level
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, value) -> bytes:
+        return bytes([self.format_id]) + self._compressor.compress(_dumps(value))
+
+    def decode(self, payload: bytes):
+        return _loads(self._decompressor.decompress(payload))
+
+
+CODECS = {
+    "json": JsonCodec,
+    "zlib": ZlibCodec,
+    "zstd": ZstdCodec,
+}
+
+
+def get_codec(name: str = "zstd"):
+    """
+    Return a codec instance by name, falling back to zlib if zstd is unavailable.
+
+    Args:
+        name (str): One of CODECS
+
+    Returns:
+        Codec instance with encode()/decode()
+    """
+    if name not in CODECS:
+        raise CacheCodecError(f"Unknown cache codec '{name}'. Choose from {sorted(CODECS)}.")
+    if name == "zstd" and zstandard is None:
+        print("⚠️ zstandard is not installed; falling back to the zlib cache codec.")
+        name = "zlib"
+    return CODECS[name]()
+
+
+_readers = {}
+
+
+def decode_value(data):
+    """
+    Decode a value written by any codec (or legacy plain JSON text).
+
+    Args:
+        data (bytes | str): Raw value from Redis
+
+    Returns:
+        The decoded object
+
+    Raises:
+        CacheCodecError: If the value is corrupt or its codec is unavailable
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if not data:
+        raise CacheCodecError("Empty cache value.")
+
+    format_id = data[0]
+    try:
+        if format_id == ZlibCodec.format_id:
+            codec = _readers.setdefault("zlib", ZlibCodec())
+            return codec.decode(data[1:])
+        if format_id == ZstdCodec.format_id:
+            if "zstd" not in _readers:
+                _readers["zstd"] = ZstdCodec()
+            return _readers["zstd"].decode(data[1:])
+        # No format byte: plain JSON text from before compression was introduced.
+        return _loads(data)
+    except CacheCodecError:
+        raise
+    except Exception as e:
+        raise CacheCodecError(f"Could not decode cached value (format byte {format_id:#04x}): {e}") from e
+
+
+class CompressedRedisSerializer:
+    """
+    Serializer for django.core.cache.backends.redis.RedisCache.
+
+    Drop-in for Django's RedisSerializer: integers stay raw so incr()/decr()
+    keep working, everything else is pickled and, above `min_size` bytes,
+    compressed behind the same format byte as the itinerary codecs. Pickles
+    start with 0x80, so small uncompressed values are unambiguous.
+
+    Configure with CACHES["default"]["OPTIONS"]["serializer"].
+    """
+
+    def __init__(self, protocol=None, min_size=512):
+        self.protocol = pickle.HIGHEST_PROTOCOL if protocol is None else protocol
+        self.min_size = min_size
+        self._zstd = (zstandard.ZstdCompressor(level=3), zstandard.ZstdDecompressor()) if zstandard else None
+
+    def dumps(self, obj):
+        if type(obj) is int:
+            return obj
+        data = pickle.dumps(obj, self.protocol)
+        if len(data) < self.min_size:
+            return data
+        if self._zstd is not None:
+            return bytes([ZstdCodec.format_id]) + self._zstd[0].compress(data)
+        return bytes([ZlibCodec.format_id]) + zlib.compress(data, 6)
+
+    def loads(self, data):
+        try:
+            return int(data)
+        except ValueError:
+            pass
+        if data[:1] == bytes([ZstdCodec.format_id]):
+            if self._zstd is None:
+                raise CacheCodecError("Cached value is zstd-compressed but 'zstandard' is not installed.")
+            return pickle.loads(self._zstd[1].decompress(data[1:]))
+        if data[:1] == bytes([ZlibCodec.format_id]):
+            return pickle.loads(zlib.decompress(data[1:]))
+        return pickle.loads(data)
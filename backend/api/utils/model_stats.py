@@ -0,0 +1,113 @@
+"""
+Per-model latency and outcome statistics in Redis.
+
+Every Gemini call records its latency and outcome, so model routing defaults
+(latency budgets, hedge delays, fallbacks) can be tuned from real numbers and
+shared across worker processes.
+
+Layout per model:
+- <prefix>:<model>            hash of outcome counters (ok, blocked, truncated, invalid_json, error, ...)
+                              and routing events (hedged, hedge_won, budget_exceeded)
+- <prefix>:<model>:latency    list of the most recent latencies in ms (LPUSH + LTRIM)
+- <prefix>:models             set of model names seen
+
+Recording never raises; a Redis outage only loses samples.
+"""
+
+from redis.exceptions import RedisError
+
+from .redis_client import async_redis_client, redis_client
+
+OK_OUTCOMES = ("ok",)
+# Routing events recorded next to the outcomes; they are not calls of their own.
+EVENT_FIELDS = ("hedged", "hedge_won", "budget_exceeded")
+
+
+def percentile(values: list, pct: float):
+    """Nearest-rank percentile of a list of numbers (None if empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class ModelStats:
+    """
+    Rolling latency samples and outcome counters per model.
+
+    Args:
+        prefix (str): Redis key prefix
+        sample_size (int): Latency samples kept per model
+    """
+
+    def __init__(self, prefix="gemini:stats", sample_size=500, client=None, async_client=None):
+        self.prefix = prefix
+        self.sample_size = sample_size
+        self.client = client or redis_client
+        self.async_client = async_client or async_redis_client
+
+    def _keys(self, model):
+        return f"{self.prefix}:{model}", f"{self.prefix}:{model}:latency", f"{self.prefix}:models"
+
+    def _queue(self, pipe, model, latency, outcome):
+        counters_key, latency_key, models_key = self._keys(model)
+        pipe.sadd(models_key, model)
+        pipe.hincrby(counters_key, outcome, 1)
+        if latency is not None:
+            pipe.lpush(latency_key, int(latency * 1000))
+            pipe.ltrim(latency_key, 0, self.sample_size - 1)
+
+    def record(self, model: str, latency: float | None, outcome: str):
+        """Record one call (latency in seconds), or a routing event with latency None."""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._queue(pipe, model, latency, outcome)
+            pipe.execute()
+        except RedisError:
+            pass
+
+    async def record_async(self, model: str, latency: float | None, outcome: str):
+        """Async variant of record."""
+        try:
+            pipe = self.async_client.pipeline(transaction=False)
+            self._queue(pipe, model, latency, outcome)
+            await pipe.execute()
+        except RedisError:
+            pass
+
+    def stats(self) -> dict:
+        """
+        Return per-model numbers.
+
+        Returns:
+            dict: {model: {"calls", "success_rate", "p50_ms", "p95_ms", "samples", <outcome counters>...}}
+        """
+        try:
+            models = sorted(self.client.smembers(f"{self.prefix}:models"))
+            pipe = self.client.pipeline(transaction=False)
+            for model in models:
+                counters_key, latency_key, _ = self._keys(model)
+                pipe.hgetall(counters_key)
+                pipe.lrange(latency_key, 0, -1)
+            raw = pipe.execute()
+        except RedisError as e:
+            return {"error": str(e)}
+
+        result = {}
+        for index, model in enumerate(models):
+            counters = {field: int(value) for field, value in raw[2 * index].items()}
+            latencies = [int(value) for value in raw[2 * index + 1]]
+            calls = sum(value for field, value in counters.items() if field not in EVENT_FIELDS)
+            successes = sum(counters.get(field, 0) for field in OK_OUTCOMES)
+            result[model] = {
+                "calls": calls,
+                "success_rate": round(successes / calls, 3) if calls else None,
+                "p50_ms": percentile(latencies, 50),
+                "p95_ms": percentile(latencies, 95),
+                "samples": len(latencies),
+                **counters,
+            }
+        return result
+
+
+model_stats = ModelStats()
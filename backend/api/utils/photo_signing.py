@@ -0,0 +1,92 @@
+"""
+Signed URLs for the place photo proxy.
+
+Place details reference photos through our own /api/place-photo/ endpoint
+instead of Google URLs carrying the API key. Each URL carries a short HMAC of
+the photo reference, so the proxy can reject forged URLs without a database
+lookup. The width is not signed: clients pick any maxwidth (e.g. in a srcset)
+and the proxy snaps it to one of its variant widths.
+
+Google photo URLs stored before the proxy existed (older saved trips) are
+rewritten to signed proxy URLs when they are read (proxy_legacy_photo_urls).
+"""
+
+import base64
+import hmac
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from django.conf import settings
+from django.urls import reverse
+from django.utils.crypto import salted_hmac
+
+SIGNATURE_SALT = "api.place-photo"
+SIGNATURE_BYTES = 12  # 16 URL-safe characters
+GOOGLE_PHOTO_URL_PREFIX = "https://maps.googleapis.com/maps/api/place/photo"
+
+
+def _signature(message: str) -> str:
+    digest = salted_hmac(
+        SIGNATURE_SALT,
+        message,
+        secret=settings.PHOTO_URL_SIGNING_KEY,
+        algorithm="sha256",
+    ).digest()
+    return base64.urlsafe_b64encode(digest[:SIGNATURE_BYTES]).decode("ascii")
+
+
+def sign_photo(photo_reference: str) -> str:
+    """Return the URL-safe signature for a photo reference (valid at every width)."""
+    return _signature(photo_reference)
+
+
+def verify_photo_signature(photo_reference: str, signature: str | None) -> bool:
+    """Check a signature in constant time."""
+    if not signature:
+        return False
+    return hmac.compare_digest(sign_photo(photo_reference), signature)
+
+
+def build_photo_proxy_url(photo_reference: str, max_width: int = 800) -> str:
+    """
+    Return the signed proxy URL for a photo.
+
+    The URL is relative (/api/place-photo/?...) unless PHOTO_PROXY_BASE_URL is
+    set, in which case it is prefixed with that origin.
+
+    Args:
+        photo_reference (str): Google Places photo reference
+        max_width (int): Requested width
+
+    Returns:
+        str: e.g. "/api/place-photo/?photoreference=...&maxwidth=800&sig=..."
+    """
+    query = urlencode({
+        "photoreference": photo_reference,
+        "maxwidth": max_width,
+        "sig": sign_photo(photo_reference),
+    })
+    return f"{settings.PHOTO_PROXY_BASE_URL}{reverse('place_photo')}?{query}"
+
+
+def proxy_legacy_photo_urls(value):
+    """
+    Replace Google place-photo URLs (which embed the API key) with signed proxy URLs.
+
+    Walks dicts and lists, e.g. a saved plan or cached place details; returns
+    the value unchanged (same object) when there is nothing to rewrite.
+    """
+    if isinstance(value, str):
+        if not value.startswith(GOOGLE_PHOTO_URL_PREFIX):
+            return value
+        query = parse_qs(urlsplit(value).query)
+        reference = (query.get("photoreference") or query.get("photo_reference") or [None])[0]
+        if not reference:
+            return value
+        return build_photo_proxy_url(reference, int((query.get("maxwidth") or ["800"])[0] or 800))
+    if isinstance(value, list):
+        items = [proxy_legacy_photo_urls(item) for item in value]
+        return value if all(new is old for new, old in zip(items, value)) else items
+    if isinstance(value, dict):
+        items = {key: proxy_legacy_photo_urls(item) for key, item in value.items()}
+        return value if all(items[key] is item for key, item in value.items()) else items
+    return value
@@ -1,5 +1,12 @@
-
 import redis
+import redis.asyncio
 from django.conf import settings
 
 redis_client = redis.StrictRedis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# Used by the async views; each ASGI worker process gets its own connection pool.
+async_redis_client = redis.asyncio.StrictRedis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# Raw-bytes clients for compressed values (see api/utils/cache_codec.py).
+redis_binary_client = redis.StrictRedis.from_url(settings.REDIS_URL, decode_responses=False)
+async_redis_binary_client = redis.asyncio.StrictRedis.from_url(settings.REDIS_URL, decode_responses=False)
@@ -0,0 +1,197 @@
+"""
+Per-stage request timing.
+
+Code on the request path wraps its stages in `timed("stage")`. The durations
+are collected for the current request (a ContextVar set by
+api.middleware.ServerTimingMiddleware), returned to the client as a
+`Server-Timing` header and aggregated per route and stage in Redis.
+
+Key Features:
+- `with timed("gemini"):` is a no-op outside a request apart from the span
+- Repeated stages are summed and counted (desc="3x"); stages run in parallel
+  threads (fan-out days, batch place lookups) can add up to more than `total`
+- Thread pools that should report to the request submit through
+  contextvars.copy_context().run
+- Optional OpenTelemetry spans (REQUEST_TIMING_OTEL_ENABLED, needs
+  opentelemetry-api; exporters are configured by the deployment)
+- Streaming responses only report the stages run before the body started
+
+Layout in Redis:
+- <prefix>:<route>:<stage>   list of recent durations in ms (LPUSH + LTRIM)
+- <prefix>:<route>:counts    hash of requests per stage
+- <prefix>:routes            set of routes seen
+"""
+
+import contextlib
+import contextvars
+import threading
+import time
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from .model_stats import percentile
+from .redis_client import async_redis_client, redis_client
+
+try:
+    from opentelemetry import trace
+except ImportError:  # optional dependency
+    trace = None
+
+_current_timings = contextvars.ContextVar("request_timings", default=None)
+_tracer = None
+
+
+def get_tracer():
+    """OpenTelemetry tracer, or None when tracing is disabled or not installed."""
+    global _tracer
+    if trace is None or not settings.REQUEST_TIMING_OTEL_ENABLED:
+        return None
+    if _tracer is None:
+        _tracer = trace.get_tracer("aitripplanner")
+    return _tracer
+
+
+class RequestTimings:
+    """Stage durations of one request, in the order the stages first ran."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}  # stage -> [seconds, count]
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self.stages.setdefault(stage, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def header(self) -> str:
+        """Server-Timing value, e.g. 'cache_lookup;dur=1.2, gemini;desc="2x";dur=8400.0, total;dur=8410.3'."""
+        with self._lock:
+            stages = list(self.stages.items())
+        parts = []
+        for stage, (seconds, count) in stages:
+            desc = f';desc="{count}x"' if count > 1 else ""
+            parts.append(f"{stage}{desc};dur={seconds * 1000:.1f}")
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+
+def start_request_timings() -> tuple:
+    """Begin collecting for a request; returns (timings, token for end_request_timings)."""
+    timings = RequestTimings()
+    return timings, _current_timings.set(timings)
+
+
+def end_request_timings(token):
+    _current_timings.reset(token)
+
+
+def current_timings() -> RequestTimings | None:
+    return _current_timings.get()
+
+
+@contextlib.contextmanager
+def timed(stage: str, **attributes):
+    """
+    Time a block as one stage of the current request (and an OpenTelemetry span).
+
+    Args:
+        stage (str): Server-Timing metric name (letters, digits and underscores)
+        **attributes: Extra span attributes, e.g. model="gemini-2.0-flash"
+    """
+    tracer = get_tracer()
+    span_cm = tracer.start_as_current_span(stage, attributes=attributes) if tracer else contextlib.nullcontext()
+    started = time.perf_counter()
+    with span_cm:
+        try:
+            yield
+        finally:
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.add(stage, time.perf_counter() - started)
+
+
+class StageStats:
+    """
+    Rolling per-route, per-stage latency samples.
+
+    Args:
+        prefix (str): Redis key prefix
+        sample_size (int): Samples kept per route and stage
+    """
+
+    def __init__(self, prefix="timing:stats", sample_size=500, client=None, async_client=None):
+        self.prefix = prefix
+        self.sample_size = sample_size
+        self.client = client or redis_client
+        self.async_client = async_client or async_redis_client
+
+    def _queue(self, pipe, route: str, timings: RequestTimings):
+        pipe.sadd(f"{self.prefix}:routes", route)
+        with timings._lock:
+            stages = [(stage, seconds) for stage, (seconds, _) in timings.stages.items()]
+        for stage, seconds in stages + [("total", timings.elapsed())]:
+            latency_key = f"{self.prefix}:{route}:{stage}"
+            pipe.hincrby(f"{self.prefix}:{route}:counts", stage, 1)
+            pipe.lpush(latency_key, int(seconds * 1000))
+            pipe.ltrim(latency_key, 0, self.sample_size - 1)
+
+    def record(self, route: str, timings: RequestTimings):
+        """Record one request's stages (one pipeline). Never raises."""
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            self._queue(pipe, route, timings)
+            pipe.execute()
+        except RedisError:
+            pass
+
+    async def record_async(self, route: str, timings: RequestTimings):
+        """Async variant of record."""
+        try:
+            pipe = self.async_client.pipeline(transaction=False)
+            self._queue(pipe, route, timings)
+            await pipe.execute()
+        except RedisError:
+            pass
+
+    def stats(self) -> dict:
+        """
+        Return per-route stage numbers.
+
+        Returns:
+            dict: {route: {stage: {"requests", "p50_ms", "p95_ms", "samples"}}}
+        """
+        try:
+            routes = sorted(self.client.smembers(f"{self.prefix}:routes"))
+            pipe = self.client.pipeline(transaction=False)
+            for route in routes:
+                pipe.hgetall(f"{self.prefix}:{route}:counts")
+            counts = pipe.execute()
+            pipe = self.client.pipeline(transaction=False)
+            for route, route_counts in zip(routes, counts):
+                for stage in route_counts:
+                    pipe.lrange(f"{self.prefix}:{route}:{stage}", 0, -1)
+            samples = iter(pipe.execute())
+        except RedisError as e:
+            return {"error": str(e)}
+
+        result = {}
+        for route, route_counts in zip(routes, counts):
+            result[route] = {}
+            for stage, requests in route_counts.items():
+                latencies = [int(value) for value in next(samples)]
+                result[route][stage] = {
+                    "requests": int(requests),
+                    "p50_ms": percentile(latencies, 50),
+                    "p95_ms": percentile(latencies, 95),
+                    "samples": len(latencies),
+                }
+        return result
+
+
+stage_stats = StageStats()
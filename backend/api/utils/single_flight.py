@@ -0,0 +1,331 @@
+"""
+Redis-backed single-flight for expensive, cacheable computations.
+
+When several requests need the same missing cache entry at the same moment,
+only one of them (the leader) runs the computation. The others (followers)
+wait for the leader to publish the result into the cache and then read it,
+so N identical concurrent requests cost one LLM call instead of N.
+
+Key Features:
+- Lock per key with a token-checked release (redis-py Lock), renewed by the
+  leader while it computes, so lock_ttl only bounds how long a crashed leader
+  blocks others, not how long a computation may take
+- Followers poll the result cache until it appears or the lock goes away
+- Leader failure hands leadership to the next waiter instead of failing everyone,
+  or, with publish_errors, is handed to the waiters as LeaderFailed
+- Per-call wait cap and timeout handler for callers that cannot wait long
+- lead() for leaders whose work is not a single call (e.g. a streamed response)
+- Counters for leaders, deduplicated calls and wait timeouts
+- Degrades to a plain call when Redis is unavailable
+"""
+
+import asyncio
+import contextlib
+import json
+import threading
+import time
+
+from redis.exceptions import LockError, RedisError
+
+
+class LeaderFailed(Exception):
+    """Raised in followers when the leader's computation failed (publish_errors=True)."""
+
+    def __init__(self, payload: dict, status_code: int = 500):
+        super().__init__(payload.get("error"))
+        self.payload = payload
+        self.status_code = status_code
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent computations of the same key.
+
+    Args:
+        client: Sync Redis client (decode_responses=True)
+        async_client: Optional redis.asyncio client for run_async
+        namespace (str): Prefix for lock and stats keys
+        lock_ttl (int): Seconds before a crashed leader's lock expires (renewed every lock_ttl/3)
+        wait_timeout (float): Max seconds a follower waits for a live leader before computing itself
+        poll_interval (float): Seconds between follower cache checks
+        publish_errors (bool): Hand a leader's exception to its followers instead of letting them retry.
+            The exception's `payload` and `status_code` attributes are kept when present.
+        error_ttl (int): Seconds a published error is kept for followers still polling
+    """
+
+    def __init__(self, client, async_client=None, namespace="singleflight",
+                 lock_ttl=180, wait_timeout=150, poll_interval=0.25,
+                 publish_errors=False, error_ttl=30):
+        self.client = client
+        self.async_client = async_client
+        self.namespace = namespace
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.publish_errors = publish_errors
+        self.error_ttl = error_ttl
+        self.stats_key = f"{namespace}:stats"
+
+    def _lock_key(self, key):
+        return f"{self.namespace}:lock:{key}"
+
+    def _error_key(self, key):
+        return f"{self.namespace}:error:{key}"
+
+    def _encode_error(self, error: Exception) -> str:
+        payload = getattr(error, "payload", None)
+        if not isinstance(payload, dict):
+            payload = {"error": "The request failed. Please try again."}
+        return json.dumps({"payload": payload, "status_code": getattr(error, "status_code", 500)}, default=str)
+
+    def publish_error(self, key, error: Exception) -> None:
+        """Hand a leader's failure to its followers (publish_errors only). Never raises."""
+        if not self.publish_errors:
+            return
+        try:
+            self.client.set(self._error_key(key), self._encode_error(error), ex=self.error_ttl)
+        except RedisError:
+            pass
+
+    @staticmethod
+    def _leader_failed(raw: str) -> LeaderFailed:
+        error = json.loads(raw)
+        return LeaderFailed(error["payload"], error["status_code"])
+
+    def _keep_alive(self, lock) -> threading.Event:
+        """Renew the leader's lock in the background until the returned event is set."""
+        stop = threading.Event()
+
+        def renew():
+            while not stop.wait(self.lock_ttl / 3):
+                try:
+                    lock.reacquire()
+                except (LockError, RedisError):
+                    return
+
+        threading.Thread(target=renew, name="singleflight-renew", daemon=True).start()
+        return stop
+
+    async def _keep_alive_async(self, lock):
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                await lock.reacquire()
+            except (LockError, RedisError):
+                return
+
+    def _incr(self, field):
+        try:
+            self.client.hincrby(self.stats_key, field, 1)
+        except RedisError:
+            pass
+
+    def stats(self) -> dict:
+        """Return the counters as ints (leaders, deduplicated, timeouts, fallbacks, leader_errors)."""
+        try:
+            raw = self.client.hgetall(self.stats_key)
+        except RedisError as e:
+            return {"error": str(e)}
+        return {field: int(value) for field, value in raw.items()}
+
+    @contextlib.contextmanager
+    def lead(self, key):
+        """
+        Hold the leadership for `key` while the block runs.
+
+        For work that cannot be wrapped in one compute() call, such as a
+        response streamed while it is generated. The block must write the
+        result to the cache (or call publish_error) before it ends; other
+        callers wait for it with run().
+
+        Yields:
+            bool: True if this caller leads (also when Redis is unavailable),
+            False if another caller already does
+        """
+        try:
+            lock = self.client.lock(self._lock_key(key), timeout=self.lock_ttl, thread_local=False)
+            acquired = lock.acquire(blocking=False)
+        except RedisError as e:
+            print(f"⚠️ Single-flight unavailable ({e}). Computing without coalescing.")
+            self._incr("fallbacks")
+            yield True
+            return
+        if not acquired:
+            yield False
+            return
+
+        self._incr("leaders")
+        if self.publish_errors:
+            try:
+                self.client.delete(self._error_key(key))
+            except RedisError:
+                pass
+        stop_renewing = self._keep_alive(lock)
+        try:
+            yield True
+        except Exception as e:
+            self.publish_error(key, e)
+            raise
+        finally:
+            stop_renewing.set()
+            try:
+                lock.release()
+            except (LockError, RedisError):
+                pass
+
+    def run(self, key, compute, load, wait_timeout=None, on_timeout=None):
+        """
+        Return load() if cached, otherwise compute() exactly once across callers.
+
+        Args:
+            key (str): Cache key being produced
+            compute (callable): Produces the value and writes it to the cache
+            load (callable): Reads the value from the cache, None if absent
+            wait_timeout (float, optional): Cap on this caller's wait (default: self.wait_timeout)
+            on_timeout (callable, optional): Called instead of compute() when the wait runs out
+
+        Returns:
+            The value from load(), compute() or on_timeout(). Exceptions from
+            compute() propagate to the leader only, unless publish_errors is set
+            (followers then raise LeaderFailed).
+        """
+        deadline = time.monotonic() + (self.wait_timeout if wait_timeout is None else wait_timeout)
+        waited = False
+        while True:
+            try:
+                # Not thread-local: the keep-alive thread renews it with the same token.
+                lock = self.client.lock(self._lock_key(key), timeout=self.lock_ttl, thread_local=False)
+                acquired = lock.acquire(blocking=False)
+            except RedisError as e:
+                print(f"⚠️ Single-flight unavailable ({e}). Computing without coalescing.")
+                self._incr("fallbacks")
+                return compute()
+
+            if acquired:
+                try:
+                    # A previous leader may have finished between our cache miss and the lock.
+                    value = load() if waited else None
+                    if value is not None:
+                        self._incr("deduplicated")
+                        return value
+                    self._incr("leaders")
+                    if self.publish_errors:
+                        try:
+                            self.client.delete(self._error_key(key))
+                        except RedisError:
+                            pass
+                    stop_renewing = self._keep_alive(lock)
+                    try:
+                        return compute()
+                    except Exception as e:
+                        # Published before the lock is released, so waiters see it when the lock goes.
+                        self.publish_error(key, e)
+                        raise
+                    finally:
+                        stop_renewing.set()
+                finally:
+                    try:
+                        lock.release()
+                    except (LockError, RedisError):
+                        pass
+
+            waited = True
+            print(f"⏳ Identical request already in flight for {key}, waiting for its result...")
+            while time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                value = load()
+                if value is not None:
+                    self._incr("deduplicated")
+                    return value
+                try:
+                    if not self.client.exists(self._lock_key(key)):
+                        error = self.client.get(self._error_key(key)) if self.publish_errors else None
+                        if error:
+                            self._incr("leader_errors")
+                            raise self._leader_failed(error)
+                        break  # leader failed without a result; try to take over
+                except RedisError:
+                    break
+            else:
+                self._incr("timeouts")
+                return on_timeout() if on_timeout else compute()
+
+    async def run_async(self, key, compute, load, wait_timeout=None, on_timeout=None):
+        """
+        Async variant of run() for the ASGI views.
+
+        Args:
+            key (str): Cache key being produced
+            compute (coroutine function): Produces the value and writes it to the cache
+            load (coroutine function): Reads the value from the cache, None if absent
+            wait_timeout (float, optional): Cap on this caller's wait (default: self.wait_timeout)
+            on_timeout (coroutine function, optional): Awaited instead of compute() when the wait runs out
+        """
+        client = self.async_client
+        deadline = time.monotonic() + (self.wait_timeout if wait_timeout is None else wait_timeout)
+        waited = False
+        while True:
+            try:
+                lock = client.lock(self._lock_key(key), timeout=self.lock_ttl, thread_local=False)
+                acquired = await lock.acquire(blocking=False)
+            except RedisError as e:
+                print(f"⚠️ Single-flight unavailable ({e}). Computing without coalescing.")
+                await self._incr_async("fallbacks")
+                return await compute()
+
+            if acquired:
+                try:
+                    value = await load() if waited else None
+                    if value is not None:
+                        await self._incr_async("deduplicated")
+                        return value
+                    await self._incr_async("leaders")
+                    if self.publish_errors:
+                        try:
+                            await client.delete(self._error_key(key))
+                        except RedisError:
+                            pass
+                    renewer = asyncio.ensure_future(self._keep_alive_async(lock))
+                    try:
+                        return await compute()
+                    except Exception as e:
+                        if self.publish_errors:
+                            try:
+                                await client.set(self._error_key(key), self._encode_error(e), ex=self.error_ttl)
+                            except RedisError:
+                                pass
+                        raise
+                    finally:
+                        renewer.cancel()
+                finally:
+                    try:
+                        await lock.release()
+                    except (LockError, RedisError):
+                        pass
+
+            waited = True
+            print(f"⏳ Identical request already in flight for {key}, waiting for its result...")
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                value = await load()
+                if value is not None:
+                    await self._incr_async("deduplicated")
+                    return value
+                try:
+                    if not await client.exists(self._lock_key(key)):
+                        error = await client.get(self._error_key(key)) if self.publish_errors else None
+                        if error:
+                            await self._incr_async("leader_errors")
+                            raise self._leader_failed(error)
+                        break
+                except RedisError:
+                    break
+            else:
+                await self._incr_async("timeouts")
+                return await on_timeout() if on_timeout else await compute()
+
+    async def _incr_async(self, field):
+        try:
+            await self.async_client.hincrby(self.stats_key, field, 1)
+        except RedisError:
+            pass
@@ -0,0 +1,127 @@
+"""
+Incremental JSON parsing for streamed itineraries.
+
+Gemini streams the itinerary as arbitrary text chunks. This module scans the
+text as it arrives and hands back every element of the top-level ``days``
+array as soon as its closing brace has been received, so days can be pushed
+to the client long before the whole document is complete.
+
+Key Features:
+- Single pass over the buffer (already scanned text is never re-read)
+- String/escape aware bracket tracking
+- Tolerates leading noise such as markdown code fences
+- Days are numbered by their position in the array, so a fragment that fails
+  to parse leaves a gap instead of shifting the days after it
+"""
+
+import json
+
+
+class IncrementalDaysParser:
+    """
+    Collects streamed text and extracts completed day objects.
+
+    Usage:
+        parser = IncrementalDaysParser()
+        for chunk in stream:
+            for index, day in parser.feed_indexed(chunk):
+                ...
+        full_text = parser.text
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._text = ""
+        self._pos = 0
+        self._stack = []          # open containers: '{' or '['
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None     # last string seen directly inside the root object
+        self._days_depth = None   # stack depth of the "days" array once it is open
+        self._day_start = None    # index of the '{' of the day currently being read
+        self.days_seen = 0        # day fragments closed so far, parsable or not
+        self.days_emitted = 0
+
+    @property
+    def text(self):
+        """Return the full text received so far."""
+        if self._buffer:
+            self._text += "".join(self._buffer)
+            self._buffer = []
+        return self._text
+
+    def feed(self, chunk: str) -> list:
+        """
+        Add a chunk of streamed text.
+
+        Args:
+            chunk (str): Next piece of the model response
+
+        Returns:
+            list: Day dicts that were completed by this chunk (possibly empty)
+        """
+        return [day for _, day in self.feed_indexed(chunk)]
+
+    def feed_indexed(self, chunk: str) -> list:
+        """
+        Like feed(), with each day's position in the ``days`` array.
+
+        Returns:
+            list[tuple[int, dict]]: (index, day) for the days completed by this chunk
+        """
+        if not chunk:
+            return []
+        self._buffer.append(chunk)
+        text = self.text
+        completed = []
+
+        for i in range(self._pos, len(text)):
+            char = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._stack[0] == '{':
+                        self._last_key = text[self._string_start + 1:i]
+                continue
+
+            if char == '"':
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = i
+            elif char in '{[':
+                if char == '[' and len(self._stack) == 1 and self._last_key == "days":
+                    self._days_depth = 2
+                elif char == '{' and self._days_depth and len(self._stack) == self._days_depth:
+                    self._day_start = i
+                self._stack.append(char)
+            elif char in '}]':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if char == '}' and self._day_start is not None and len(self._stack) == self._days_depth:
+                    day = self._parse_day(text[self._day_start:i + 1])
+                    self._day_start = None
+                    if day is not None:
+                        completed.append((self.days_seen, day))
+                        self.days_emitted += 1
+                    self.days_seen += 1
+                elif char == ']' and self._days_depth and len(self._stack) == self._days_depth - 1:
+                    self._days_depth = None
+
+        self._pos = len(text)
+        return completed
+
+    @staticmethod
+    def _parse_day(fragment: str):
+        try:
+            day = json.loads(fragment)
+        except json.JSONDecodeError:
+            print(f"⚠️ Streamed day fragment is not valid JSON (length {len(fragment)}).")
+            return None
+        return day if isinstance(day, dict) else None
@@ -32,20 +32,50 @@ from .serializers import (
 )
 from .models import VisitedCountry, UserProfile, SavedTrip, ActivityNote
 from rest_framework_simplejwt.tokens import RefreshToken
-from datetime import date
 import redis
 import json
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
 import requests
 from bs4 import BeautifulSoup
 from django.conf import settings
-from .chat_request import ask_gemini, extract_json_from_response 
+from .chat_request import (
+    CHAT_MODEL,
+    GeminiResult,
+    GeminiStreamError,
+    ask_gemini_stream,
+    generate,
+    generate_async,
+    model_for_search_mode,
+    parse_json_response,
+)
+from .itinerary_repair import (
+    expected_day_count,
+    find_itinerary_gaps,
+    mark_missing_days,
+    repair_itinerary,
+    repair_itinerary_async,
+)
+from .itinerary_schema import ACTIVITIES_RESPONSE_SCHEMA, TRIP_RESPONSE_SCHEMA
+from .llm_usage import set_llm_context, usage_report
+from .utils.request_timing import stage_stats, timed
+from .model_router import generate_routed, generate_routed_async
+from .utils.model_stats import model_stats
+from .trip_fanout import generate_itinerary_fanout, generate_itinerary_fanout_async, wants_fanout
+from .utils.stream_parser import IncrementalDaysParser
 import re
-from api.google_places_service import GooglePlacesService
-from rest_framework.decorators import api_view, permission_classes 
-from rest_framework.permissions import IsAuthenticated 
+from api.google_places_service import get_places_service, place_single_flight
+from rest_framework.decorators import api_view, permission_classes, renderer_classes, throttle_classes
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.throttling import UserRateThrottle
 from rest_framework.views import APIView
-from django.http import JsonResponse
-from django.views.decorators.http import require_GET
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import viewsets
 from django.views.decorators.csrf import ensure_csrf_cookie
 from rest_framework import generics
@@ -332,314 +362,527 @@ class ProfileUpdateView(generics.UpdateAPIView):
 
 # ──────────────────────────────── Redis & Helper ──────────────────────────────── #
 
-redis_client = redis.StrictRedis.from_url(settings.REDIS_URL, decode_responses=True)
+from .cache_keys import make_trip_cache_key
+from .prompts import build_trip_prompt
+from .photo_proxy import parse_max_width, photo_cache_stats, serve_place_photo
+from .utils.photo_signing import verify_photo_signature
+from .place_enrichment import (
+    collect_plan_place_queries,
+    enrich_and_cache_itinerary,
+    get_cached_enriched_itinerary,
+    get_cached_enriched_itinerary_async,
+)
+from .trip_cache import (
+    get_cached_itinerary,
+    get_cached_itinerary_async,
+    refresh_stats,
+    store_itinerary,
+    store_itinerary_async,
+    trip_single_flight,
+)
+from .utils.single_flight import LeaderFailed
+from .chat_cache import (
+    chat_cache_key,
+    chat_cache_stats,
+    get_cached_suggestions,
+    get_cached_suggestions_async,
+    store_suggestions,
+    store_suggestions_async,
+    wants_fresh_suggestions,
+)
+from .similar_trip_cache import get_similar_itinerary, similar_trip_cache
+from .trip_warmup import record_request_shape, record_request_shape_async, warmup_stats
+from .trip_jobs import (
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_QUEUED,
+    TripJobError,
+    enqueue_trip_job,
+    get_job,
+    grant_job_access,
+    has_job_access,
+    iter_job_updates,
+    queue_position,
+)
+from django.urls import reverse
+from urllib.parse import urlencode
+from redis.exceptions import RedisError
 
-def make_key(data):
-    trip_style_str = ','.join(map(str, data.get('tripStyle', [])))
-    interests_str = ','.join(map(str, data.get('interests', [])))
+# ──────────────────────────────── Prompt Generation (for GEMINI) ──────────────────────────────── #
+# The trip prompt itself lives in api/prompts.py (static system instruction + per-request template).
+# searchMode -> model routing and per-model limits live in api/chat_request.py (MODEL_CONFIGS).
 
-    return (
-        f"trip:{data.get('destination', '')}:{data.get('startDate', '')}:{data.get('endDate', '')}:"
-        f"{data.get('pace', '')}:{trip_style_str}:{interests_str}"
-    ).lower().replace(" ", "_")
+# ──────────────────────────────── Plan Trip Helpers (shared by sync/async views) ──────────────────────────────── #
+class PlannerError(Exception):
+    """
+    Error raised by the shared planning helpers.
 
-# ──────────────────────────────── Prompt Generation (for GEMINI) ──────────────────────────────── #
+    Carries the JSON error payload and HTTP status so that DRF views and the
+    async Django views can render the same response.
+    """
+    def __init__(self, payload: dict, status_code: int = 500):
+        super().__init__(payload.get("error"))
+        self.payload = payload
+        self.status_code = status_code
 
-def generate_trip_prompt(form_data: dict) -> str:
-    print("DEBUG: Inside generate_trip_prompt START")
-
-    destination = form_data.get("destination", "a destination")
-    start_date_obj = form_data.get("startDate")
-    end_date_obj = form_data.get("endDate")
-
-    interests_list = form_data.get("interests", [])
-    interests = ', '.join(interests_list) or "general travel interests"
-    trip_style = ', '.join(form_data.get("tripStyle", [])) or "standard"
-    pace = form_data.get("pace", "moderate")
-    budget = form_data.get("budget", "Mid-range")
-    travel_with = ', '.join(form_data.get("travelWith", [])) or "solo traveler"
-    transportation_mode = form_data.get("transportationMode", "Walking & Public Transit")
-
-    # stringify safely
-    start_date_str = start_date_obj.isoformat() if isinstance(start_date_obj, date) else str(start_date_obj or "")
-    end_date_str = end_date_obj.isoformat() if isinstance(end_date_obj, date) else str(end_date_obj or "")
-
-    print(f"DEBUG: Received start_date_str: '{start_date_str}', end_date_str: '{end_date_str}'")
-
-    date_range_str = "an unspecified date range"
-    if start_date_obj and end_date_obj:
-        if isinstance(start_date_obj, date) and isinstance(end_date_obj, date):
-            if start_date_obj != end_date_obj:
-                num_days = (end_date_obj - start_date_obj).days + 1
-                date_range_str = f"from {start_date_str} to {end_date_str} ({num_days} days)"
-            else:
-                date_range_str = f"on {start_date_str} (1 day)"
-        else:
-            print("⚠️ Warning: Dates are not valid date objects")
-
-    elif start_date_obj:
-        date_range_str = f"on {start_date_str} (1 day)"
-        print(f"DEBUG: Calculated single day range: {date_range_str}")
-    prompt = f"""
-You are an expert travel planner and researcher AI assistant. Your task is to create a detailed travel itinerary in JSON format based *only* on the user's preferences provided below. You must perform the necessary research implicitly using your knowledge and capabilities to find relevant places and events.
-
-**User Preferences:**
-- Destination: {destination}
-- Dates: {date_range_str}
-- Traveler Interests: {interests}
-- Trip Style: {trip_style}
-- Pace: {pace}
-- Budget Level: {budget}
-- Primary Transportation Mode: {transportation_mode}
-- Travel Companions: {travel_with}
-
-**Your Combined Task & Output Requirements:**
-
-1.  **Implicit Research:** Based *only* on the preferences above, identify key attractions, activities, relevant food/cafe types/locations, and any specific real-world events (concerts, festivals, markets, etc.) occurring in {destination} during the specified dates ({date_range_str}) that align with the traveler's interests ({interests}), style ({trip_style}), and consider their primary transportation mode ({transportation_mode}). Use your internal knowledge and search capabilities for this. **Do not show the research findings separately.**
-2.  **Activity Suitability for Companions:** Tailor activity suggestions to be highly appropriate for the specified `travel_companions` ({travel_with}). For example, if 'Family with young children', prioritize child-friendly attractions, suitable dining, and a comfortable pace. If 'Couple', suggest romantic spots, activities suitable for two, or experiences that enhance a couple's trip. If 'Solo traveler', ensure activities are safe and enjoyable for an individual. If 'Group of friends', consider activities that are fun in a group setting.
-3.  **Budget-Conscious Activity Selection:** When selecting activities, dining options, and making recommendations, ensure they align with the specified `budget_level` ({budget}). For 'Budget' or 'Mid-range', prioritize free/low-cost attractions, affordable yet good quality dining, and value-for-money options. For 'Luxury', feel free to include higher-end experiences, fine dining, and premium services, but still provide a justification for the cost in the value offered.
-4.  **Directly Create JSON Itinerary:** Use the information gathered (implicitly) to construct a day-by-day travel itinerary.
-5.  **Strict JSON Output Format:** Format the *entire* output **strictly** as a single JSON object adhering precisely to the format specified below. **ABSOLUTELY NO TEXT BEFORE OR AFTER THE JSON OBJECT.** Your entire response must start with `{{` and end with `}}`.
-6.  **Currency Standardization:** For all cost estimates, use USD (US Dollars) as the standard currency, regardless of the destination country. This makes it easier for travelers to compare costs.
-7.  **Activity Object Details:** For each activity within the `activities` array in the JSON, include:
-    *   `time` (string): Approximate start time in HH:MM format (e.g., "09:00", "13:30"). Be logical with timing.
-    *   `description` (string): User-friendly description using specific names of places/events found during your internal research (e.g., "Visit Kinkaku-ji (Golden Pavilion)", "Lunch exploring Nishiki Market", "Evening stroll in Gion district looking for Geiko/Maiko", "Attend the Gion Matsuri parade (specific date if applicable)"). Write the description in an engaging, enticing, and informative tone, suitable for a traveler looking forward to their trip. Make the descriptions vivid and appealing.
-    *   `place_name_for_lookup` (string or null): The specific, **searchable name** of the physical location (e.g., "Kinkaku-ji", "Nishiki Market", "Gion Corner", "Fushimi Inari Shrine", "Arashiyama Bamboo Grove"). Use the most common English name suitable for map lookups. Set to `null` or an empty string (`""`) ONLY for general activities like "Breakfast at Hotel", "Free time", or generic neighborhood explorations without a single point of interest (e.g., "Explore the charming streets of Higashiyama District").
-    *   `place_details` (object or null, optional): If you identify a specific venue for an activity, make an effort to include `place_details` like `name` (official name), `category` (e.g., "restaurant", "attraction", "museum", "cafe"), and `price_level` (1-4, if available).
-    *   `cost_estimate` (object, optional): Include cost estimate for the activity:
-      * `min` (number): Minimum estimated cost in USD
-      * `max` (number): Maximum estimated cost in USD
-      * `currency` (string): Always set to "USD"
-    *   `ticket_url` (string or null, optional): Actively search for and provide a direct URL for booking or purchasing tickets if the activity typically requires or offers online booking (e.g., museums, concerts, specific tours, popular attractions). Prioritize official sources. If, after a diligent search, no suitable, direct, or official link is found, or if booking is genuinely not required/typically done online, set this to `null`.
-8.  **Event Integration:** If your research finds relevant specific events (festivals, concerts, markets) happening during the trip dates, integrate them logically into the schedule as activities. Ensure `description` mentions the event and `place_name_for_lookup` is the venue name (if known and searchable).
-9.  **Pace Adherence:** Ensure the number and density of activities per day reflect the requested pace ('{pace}'). A 'relaxed' pace should have fewer scheduled items than 'moderate' or 'fast-paced'. Include buffer time or 'Free time' entries for relaxed paces.
-10. **Cost Estimates at Day Level:** For each day, include a `day_cost_estimate` object with `min`, `max`, and `currency` properties (always in USD).
-11. **Overall Cost Breakdown:** Include a `total_cost_estimate` object in the root of the JSON with the following structure:
-    * `min` (number): Minimum estimated total cost for the entire trip in USD
-    * `max` (number): Maximum estimated total cost for the entire trip in USD
-    * `currency` (string): Always "USD"
-    * `accommodations` (object): Sub-object with `min` and `max` properties in USD
-    * `food` (object): Sub-object with `min` and `max` properties in USD
-    * `attractions` (object): Sub-object with `min` and `max` properties in USD
-    * `transportation` (object): Sub-object with `min` and `max` properties in USD
-    * `other` (object): Sub-object with `min` and `max` properties in USD
-12. **Destination Information:** Include a `destination_info` object in the root of the JSON with:
-    * `country` (string): Country of the destination
-    * `city` (string/locality name)
-    * `language` (string): Primary language(s) spoken
-    * `currency` (string): Local currency code
-    * `exchange_rate` (number): Exchange rate from local currency to USD (e.g. how many local currency units equal 1 USD)
-    * `budget_tips` (array of strings): List of money-saving tips for the destination
-    * `transportation_options` (array of objects): List of transportation options, each with:
-      * `name` (string): Name of transportation option (e.g., "Metro", "Bus", "Taxi")
-      * `description` (string): Brief description
-      * `cost_range` (string): Text describing typical costs in USD (e.g., "$1-3 per ride")
-      * `app_name` (string, optional): Relevant app for this transportation method
-      * `app_link` (string, optional): URL to download/access the app
-    * `discount_options` (array of objects): List of money-saving passes/discounts:
-      * `name` (string): Name of the discount pass/option
-      * `description` (string): What it includes and why it's valuable
-      * `price` (string): Approximate cost in USD
-      * `link` (string, optional): Where to purchase/learn more
-    * `emergency_info` (object, optional): Emergency contact numbers. Whenever possible and relevant for the destination, include this object with local `police`, `ambulance`, and `tourist_police` (if applicable) numbers.
-13. **Summary Field:** Include a short, engaging `summary` field (1-2 sentences) within the JSON object. Write this summary in an engaging, enticing, and informative tone, suitable for a traveler looking forward to their trip.
-14. **Day Titles:** Provide a meaningful `title` for each day reflecting the main theme or area (e.g., "Day 1: Arrival and Golden Exploration", "Day 2: Temples, Shrines, and Bamboo").
-15. **CRITICAL OUTPUT CONSTRAINT:** Output **ONLY the raw JSON object**. Do not include markdown formatting like ```json ... ```. Do not include any introductory or concluding sentences like "Here is your itinerary:". Your response must be *only* the JSON.
-
-**Required JSON Output Format Example:**
-```json
-{{
-"summary": "An immersive cultural journey through Kyoto's temples, gardens, and traditional districts.",
-"days": [
-    {{
-    "title": "Day 1: Golden Temples & Zen Gardens",
-    "activities": [
-        {{
-        "time": "09:00",
-        "description": "Breakfast near the hotel",
-        "place_name_for_lookup": null,
-        "cost_estimate": {{
-          "min": 10,
-          "max": 20,
-          "currency": "USD"
-        }}
-        }},
-        {{
-        "time": "10:00",
-        "description": "Visit the stunning Kinkaku-ji (Golden Pavilion)",
-        "place_name_for_lookup": "Kinkaku-ji",
-        "place_details": {{
-          "name": "Kinkaku-ji Temple",
-          "category": "attraction",
-          "price_level": 2
-        }},
-        "cost_estimate": {{
-          "min": 5,
-          "max": 10,
-          "currency": "USD"
-        }},
-        "ticket_url": "https://example.com/kinkaku-ji-tickets"
-        }}
-    ],
-    "day_cost_estimate": {{
-      "min": 50,
-      "max": 100,
-      "currency": "USD"
-    }}
-    }}
-],
-"destination_info": {{
-  "country": "Japan",
-  "city": "Kyoto",
-  "language": "Japanese",
-  "currency": "JPY",
-  "exchange_rate": 110.5,
-  "budget_tips": [
-    "Purchase a 1-day bus pass for unlimited travel",
-    "Many temples have free areas you can visit without paying entrance fees"
-  ],
-  "transportation_options": [
-    {{
-      "name": "City Bus",
-      "description": "Extensive network covering most tourist sites",
-      "cost_range": "$2-3 per ride, $5 for day pass",
-      "app_name": "Kyoto Bus Navi",
-      "app_link": "https://www2.city.kyoto.lg.jp/kotsu/webguide/en/"
-    }}
-  ],
-  "discount_options": [
-    {{
-      "name": "Kyoto Sightseeing Pass",
-      "description": "Unlimited bus and subway travel within Kyoto",
-      "price": "$8 for 1-day pass"
-    }}
-  ],
-  "emergency_info": {{
-    "police": "110",
-    "ambulance": "119"
-  }}
-}},
-"total_cost_estimate": {{
-  "min": 800,
-  "max": 1200,
-  "currency": "USD",
-  "accommodations": {{
-    "min": 400,
-    "max": 600
-  }},
-  "food": {{
-    "min": 150,
-    "max": 250
-  }},
-  "attractions": {{
-    "min": 100,
-    "max": 150
-  }},
-  "transportation": {{
-    "min": 50,
-    "max": 100
-  }},
-  "other": {{
-    "min": 100,
-    "max": 100
-  }}
-}}
-}}
-```
-Now, generate ONLY the JSON itinerary based on the user preferences and your research. Remember the strict output constraint and ensure all cost estimates are in USD.
-"""
-    return prompt.strip()
+class GenerationPending(Exception):
+    """Raised when a synchronous request stops waiting for an identical in-flight generation."""
+
+def require_response_text(raw_response: str | None) -> str:
+    """
+    Reject missing or empty model answers.
+
+    Raises:
+        PlannerError: If the response is None (API error/blocked) or empty
+    """
+    if raw_response is None:
+        raise PlannerError({"error": "Failed to get a valid response from the planning assistant (API error or blocked)."})
+    elif raw_response == "":
+        print("⚠️ Assistant returned an empty response.")
+        raise PlannerError({"error": "The planning assistant returned an empty response (possibly due to safety filters)."})
+    return raw_response
+
+def invalid_format_error(raw_response: str, details: str) -> PlannerError:
+    error_msg = f"JSON Decode Error – Gemini response was not valid JSON: {details}"
+    print(f"❌ {error_msg}")
+    print(f"   Problematic response (first 1000 chars): {raw_response[:1000]}")
+    return PlannerError({"error": "The planning assistant returned an invalid format.", "details": error_msg})
+
+def check_itinerary_structure(parsed_result) -> dict:
+    """
+    Make sure a parsed itinerary has the fields every client relies on.
+
+    Raises:
+        PlannerError: If 'days' or 'summary' is missing
+    """
+    if not isinstance(parsed_result, dict) or "days" not in parsed_result or "summary" not in parsed_result:
+        print("❌ Parsed JSON has incorrect structure (missing 'days' or 'summary').")
+        print(f"   Parsed Data: {str(parsed_result)[:500]}...")
+        raise PlannerError({"error": "The planning assistant returned data in an unexpected structure."})
+
+    print("✅ Successfully generated and parsed itinerary!")
+    return parsed_result
+
+def parse_itinerary_response(raw_response: str | None) -> dict:
+    """
+    Turn raw Gemini text for a trip prompt into an itinerary dict (one JSON decode).
+
+    Raises:
+        PlannerError: If the response is missing, empty, not JSON or has the wrong structure
+    """
+    require_response_text(raw_response)
+    print(f"\n📦 Gemini Raw Response (length: {len(raw_response)} chars, first 500):\n", raw_response[:500], "...\n")
+    try:
+        parsed_result = parse_json_response(raw_response)
+    except ValueError as e:
+        raise invalid_format_error(raw_response, str(e))
+    return check_itinerary_structure(parsed_result)
+
+def itinerary_from_result(result: GeminiResult) -> dict:
+    """
+    Turn a JSON-mode GeminiResult into an itinerary dict without parsing it again.
+
+    Raises:
+        PlannerError: If the response is missing, empty, not JSON or has the wrong structure
+    """
+    require_response_text(result.text)
+    print(f"\n📦 Gemini JSON response ({len(result.text)} chars, {result.latency:.1f}s, usage {result.usage})")
+    if result.parse_error:
+        raise invalid_format_error(result.text, result.parse_error)
+    return check_itinerary_structure(result.data)
+
+def needs_repair(result: GeminiResult, expected_days: int | None) -> bool:
+    """True if the answer is incomplete or truncated and repair is enabled."""
+    if not settings.TRIP_REPAIR_ENABLED:
+        return False
+    if isinstance(result.data, dict):
+        return bool(find_itinerary_gaps(result.data, expected_days))
+    return bool(result.text or result.partial_text)
+
+def cache_generated_itinerary(data: dict, key: str, itinerary: dict) -> None:
+    """Cache a new itinerary and index it for similar requests; incomplete ones are only returned."""
+    if itinerary.get("incomplete"):
+        print("⚠️ Itinerary has placeholder days; returning it without caching.")
+        return
+    with timed("cache_write"):
+        store_itinerary(key, itinerary)
+        similar_trip_cache.add(data, key)
+
+async def cache_generated_itinerary_async(data: dict, key: str, itinerary: dict) -> None:
+    """Async variant of cache_generated_itinerary."""
+    if itinerary.get("incomplete"):
+        print("⚠️ Itinerary has placeholder days; returning it without caching.")
+        return
+    with timed("cache_write"):
+        await store_itinerary_async(key, itinerary)
+        await similar_trip_cache.add_async(data, key)
+
+def generate_and_cache_itinerary(data: dict, key: str) -> dict:
+    """
+    Run the Gemini call for a validated PlanTripSerializer payload and cache the result.
+
+    With TRIP_FANOUT_MIN_DAYS set, long trips are generated day by day in parallel (api/trip_fanout.py).
+    Incomplete or truncated answers are repaired by regenerating only the
+    missing days/fields (see api/itinerary_repair.py).
+
+    Raises:
+        PlannerError: If the model output cannot be turned into an itinerary
+    """
+    print("\n🧠 Generating prompt for Gemini...")
+    with timed("prompt_build"):
+        system_instruction, user_prompt = build_trip_prompt(data)
+    print(f"DEBUG: Generated prompt length: {len(user_prompt)} (+{len(system_instruction)} static)")
+    print("🚀 Sending prompt to Gemini...")
+    model_name = model_for_search_mode(data.get("searchMode"))
+    if wants_fanout(data):
+        parsed_result = generate_itinerary_fanout(data, user_prompt, system_instruction, model_name)
+        if parsed_result:
+            with timed("itinerary_check"):
+                parsed_result = check_itinerary_structure(parsed_result)
+            cache_generated_itinerary(data, key, parsed_result)
+            return parsed_result
+        print("⚠️ Parallel generation failed; falling back to a single call.")
+
+    result = generate_routed(
+        user_prompt, data.get("searchMode"), system_instruction=system_instruction, response_schema=TRIP_RESPONSE_SCHEMA
+    )
+
+    expected_days = expected_day_count(data)
+    repaired = None
+    if needs_repair(result, expected_days):
+        with timed("repair"):
+            repaired = repair_itinerary(result, expected_days, user_prompt, system_instruction, result.model)
+    with timed("itinerary_check"):
+        parsed_result = check_itinerary_structure(repaired) if repaired else itinerary_from_result(result)
+        parsed_result = mark_missing_days(parsed_result, expected_days)
+    cache_generated_itinerary(data, key, parsed_result)
+    return parsed_result
+
+async def generate_and_cache_itinerary_async(data: dict, key: str) -> dict:
+    """Async variant of generate_and_cache_itinerary."""
+    with timed("prompt_build"):
+        system_instruction, user_prompt = build_trip_prompt(data)
+    model_name = model_for_search_mode(data.get("searchMode"))
+    if wants_fanout(data):
+        parsed_result = await generate_itinerary_fanout_async(data, user_prompt, system_instruction, model_name)
+        if parsed_result:
+            with timed("itinerary_check"):
+                parsed_result = check_itinerary_structure(parsed_result)
+            await cache_generated_itinerary_async(data, key, parsed_result)
+            return parsed_result
+        print("⚠️ Parallel generation failed; falling back to a single call.")
+
+    result = await generate_routed_async(
+        user_prompt, data.get("searchMode"), system_instruction=system_instruction, response_schema=TRIP_RESPONSE_SCHEMA
+    )
+
+    expected_days = expected_day_count(data)
+    repaired = None
+    if needs_repair(result, expected_days):
+        with timed("repair"):
+            repaired = await repair_itinerary_async(result, expected_days, user_prompt, system_instruction, result.model)
+    with timed("itinerary_check"):
+        parsed_result = check_itinerary_structure(repaired) if repaired else itinerary_from_result(result)
+        parsed_result = mark_missing_days(parsed_result, expected_days)
+    await cache_generated_itinerary_async(data, key, parsed_result)
+    return parsed_result
+
+def refresh_itinerary(data: dict, key: str):
+    """Background refresh of a stale itinerary; a cached enriched variant is rebuilt from the new plan."""
+    set_llm_context("trip_refresh", data.get("searchMode"))
+    parsed_result = generate_and_cache_itinerary(data, key)
+    if get_cached_enriched_itinerary(key) is not None:
+        enrich_and_cache_itinerary(parsed_result, key)
+
+def wants_place_enrichment(request_data) -> bool:
+    """True if the client asked for a place-enriched plan (enrichPlaces), else the server default."""
+    value = request_data.get("enrichPlaces", settings.TRIP_ENRICH_PLACES_DEFAULT)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+def plan_trip_for_request(data: dict, key: str, enrich: bool, wait_timeout: float | None = None) -> dict:
+    """
+    Generate (or wait for) an uncached itinerary and enrich it if requested.
+
+    Shared by plan_trip_view and the background trip worker (api/trip_jobs.py).
+
+    Args:
+        wait_timeout (float, optional): Cap on waiting for an identical in-flight generation
+
+    Raises:
+        PlannerError: If the model output cannot be turned into an itinerary (ours or the in-flight one's)
+        GenerationPending: If wait_timeout ran out before the in-flight generation finished
+    """
+    def stop_waiting():
+        raise GenerationPending(key)
+
+    # Identical concurrent requests wait for one in-flight generation.
+    try:
+        parsed_result = trip_single_flight.run(
+            key,
+            compute=lambda: generate_and_cache_itinerary(data, key),
+            load=lambda: get_cached_itinerary(key),
+            wait_timeout=wait_timeout,
+            on_timeout=stop_waiting if wait_timeout is not None else None,
+        )
+    except LeaderFailed as e:
+        raise PlannerError(e.payload, status_code=e.status_code)
+    if enrich:
+        with timed("enrich"):
+            parsed_result = enrich_and_cache_itinerary(parsed_result, key)
+    return parsed_result
+
+def wants_background_job(headers, body: dict) -> bool:
+    """True if the client asked for a background job (Prefer: respond-async or "background"), else the server default."""
+    if "respond-async" in headers.get("Prefer", "").lower():
+        return True
+    value = body.get("background", settings.TRIP_JOBS_DEFAULT)
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+def job_response_payload(job_id: str, status: str, token: str | None) -> dict:
+    query = f"?{urlencode({'token': token})}" if token else ""
+    return {
+        "job_id": job_id,
+        "status": status,
+        "token": token,
+        "status_url": reverse("plan_trip_job", args=[job_id]) + query,
+        "events_url": reverse("plan_trip_job_events", args=[job_id]) + query,
+    }
+
+def trip_job_response(payload: dict, key: str, enrich: bool, user_id: int | None) -> Response | None:
+    """Queue (or join) a background job for the trip and return its 202 response, or None if Redis is down."""
+    try:
+        job_id, created = enqueue_trip_job(payload, key, enrich, user_id=user_id)
+        token = grant_job_access(job_id)
+        job = get_job(job_id)
+    except RedisError as e:
+        print(f"⚠️ Could not queue trip job: {e}")
+        return None
+    body = job_response_payload(job_id, job["status"] if job else STATUS_QUEUED, token)
+    response = Response(body, status=202)
+    response["Location"] = body["status_url"]
+    return response
 
 # ──────────────────────────────── Plan Trip View (Main Logic) ──────────────────────────────── #
 @api_view(['POST'])
 def plan_trip_view(request):
     serializer = PlanTripSerializer(data=request.data)
-    if serializer.is_valid():
+    with timed("validate"):
+        is_valid = serializer.is_valid()
+    if is_valid:
         data = serializer.validated_data 
         
-        key = make_key(data)       
+        key = make_trip_cache_key(data)       
         print("DEBUG: Serializer is valid")
-        try:
-            ("DEBUG: Checked cache, proceeding...")
-            cached = redis_client.get(key)
-            if cached:
-                print("✔️ Found in Redis cache!")
-                try:
-                    cached_data = json.loads(cached)
-                    if "days" in cached_data and "summary" in cached_data:
-                         print("   Cached data seems valid.")
-                         return Response(cached_data, status=200)
-                    else:
-                         print("⚠️ Cached data has incorrect structure. Re-generating...")
-                         redis_client.delete(key)
-                except json.JSONDecodeError:
-                    print("⚠️ Invalid JSON found in cache. Re-generating...")
-                    redis_client.delete(key)
-        except Exception as e:
-            print(f"⚠️ Redis Error: {e}. Proceeding without cache.")
+        set_llm_context("plan_trip", data.get("searchMode"), request.user)
+        # Request counts per shape drive off-peak pre-generation (manage.py warm_trip_cache).
+        record_request_shape(data, serializer.data)
+        enrich = wants_place_enrichment(request.data)
+        if enrich:
+            with timed("cache_lookup"):
+                enriched_data = get_cached_enriched_itinerary(key, refresh=lambda: refresh_itinerary(data, key))
+            if enriched_data:
+                return Response(enriched_data, status=200)
+
+        # Exact key first (stale entries are served while they refresh in the background),
+        # then a near-duplicate request's itinerary (api/similar_trip_cache.py).
+        with timed("cache_lookup"):
+            cached_data = get_cached_itinerary(key, refresh=lambda: refresh_itinerary(data, key)) or get_similar_itinerary(data, key)
+        if cached_data:
+            if enrich:
+                with timed("enrich"):
+                    cached_data = enrich_and_cache_itinerary(cached_data, key)
+            return Response(cached_data, status=200)
+
+        if wants_background_job(request.headers, request.data):
+            # A trip worker (manage.py run_trip_worker) generates it; the client polls or subscribes.
+            response = trip_job_response(serializer.data, key, enrich, request.user.pk)
+            if response is not None:
+                return response
+            print("⚠️ Could not queue trip job; generating synchronously.")
 
-        print("\n🧠 Generating combined prompt for Gemini...")
-        single_prompt = generate_trip_prompt(data) 
-        print(f"DEBUG: Generated prompt length: {len(single_prompt)}")
-        print("🚀 Sending combined prompt to Gemini...")
-        raw_response = None
         try:
-            if data.get("searchMode") == "normal":
-                raw_response = ask_gemini(single_prompt, 'gemini-2.5-flash-preview-05-20')
-            elif data.get("searchMode") == "quick":
-                raw_response = ask_gemini(single_prompt, 'gemini-2.0-flash')
-            else:
-                raw_response = ask_gemini(single_prompt, 'gemini-2.5-pro-preview-05-06')
+            # Waiting on an identical generation is capped below the worker timeout (GUNICORN_TIMEOUT).
+            parsed_result = plan_trip_for_request(data, key, enrich, wait_timeout=settings.TRIP_SYNC_WAIT_SECONDS)
+        except PlannerError as e:
+            return Response(e.payload, status=e.status_code)
+        except GenerationPending:
+            # A worker job joins the in-flight generation; the client polls it instead of timing out.
+            response = trip_job_response(serializer.data, key, enrich, request.user.pk)
+            if response is not None:
+                return response
+            response = Response({"error": "An identical trip is still being generated. Please retry shortly."}, status=503)
+            response["Retry-After"] = "10"
+            return response
+        except Exception as e:
+            error_msg = f"Unexpected Error during Gemini interaction or processing: {e}"
+            print(f"❌ {error_msg}")
+            import traceback
+            traceback.print_exc()
+            return Response({"error": f"An unexpected error occurred: {e}"}, status=500)
 
+        return Response(parsed_result, status=200)
 
-            if raw_response is None:
-                return Response({"error": "Failed to get a valid response from the planning assistant (API error or blocked)."}, status=500)
-            elif raw_response == "":
-                 print("⚠️ Assistant returned an empty response.")
-                 return Response({"error": "The planning assistant returned an empty response (possibly due to safety filters)."}, status=500)
+    return Response(serializer.errors, status=400)
 
-            print(f"\n📦 Gemini Raw Response (length: {len(raw_response)} chars, first 500):\n", raw_response[:500], "...\n")
+# ──────────────────────────────── Plan Trip Stream (SSE) ──────────────────────────────── #
 
-            print("🧹 Cleaning and parsing the JSON response...")
-            cleaned_json_str = extract_json_from_response(raw_response)
+def sse_event(event: str, payload) -> str:
+    """Format a single Server-Sent Event frame."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
 
-            try: 
-                if not cleaned_json_str:
-                    print("❌ Cleaned JSON string is empty after extraction attempts.")
-                    raise json.JSONDecodeError("Empty string cannot be parsed", "", 0)
+def stream_trip_events(data: dict, key: str, user=None):
+    """
+    Generate SSE frames for a trip plan, one `day` event per completed day.
+
+    Cached plans are replayed from Redis. Otherwise the Gemini response is
+    parsed incrementally while it streams, and the full text collected by the
+    parser is validated and cached once the model finishes. Identical
+    concurrent requests (streamed or not) share one generation: the stream
+    leads it through trip_single_flight, or waits for the one in flight and
+    replays its result.
+
+    The stream uses the searchMode's primary model directly, not the model
+    cascade of generate_routed (api/model_router.py): days reach the client as
+    soon as they are parsed, and a hedged or fallback model would write a
+    different itinerary from the one already sent. A stream cut off by
+    MAX_TOKENS is completed by repair instead.
+
+    Events:
+    - meta: {"cached": bool}
+    - day: {"index": int, "day": {...}}
+    - complete: the full itinerary (same shape as plan_trip_view)
+    - error: {"error": str}
+    """
+    # Set here rather than in the view: the response body is iterated after the view returns.
+    set_llm_context("plan_trip_stream", data.get("searchMode"), user)
+    try:
+        cached_data = get_cached_itinerary(key, refresh=lambda: refresh_itinerary(data, key)) or get_similar_itinerary(data, key)
+        if cached_data:
+            yield sse_event("meta", {"cached": True})
+            yield from replay_trip_events(cached_data)
+            return
+
+        yield sse_event("meta", {"cached": False})
+        with trip_single_flight.lead(key) as leading:
+            if leading:
+                yield from stream_generated_trip(data, key)
+            else:
+                yield from stream_in_flight_trip(data, key)
+    except Exception as e:
+        print(f"❌ Unexpected error while streaming the trip plan: {e}")
+        import traceback
+        traceback.print_exc()
+        yield sse_event("error", {"error": "An unexpected error occurred while planning the trip."})
 
-                parsed_result = json.loads(cleaned_json_str)
+def replay_trip_events(itinerary: dict, sent=()):
+    """`day` events for the days whose index is not in `sent`, then `complete`."""
+    for index, day in enumerate(itinerary["days"]):
+        if index not in sent:
+            yield sse_event("day", {"index": index, "day": day})
+    yield sse_event("complete", itinerary)
 
-                if not isinstance(parsed_result, dict) or "days" not in parsed_result or "summary" not in parsed_result:
-                    print("❌ Parsed JSON has incorrect structure (missing 'days' or 'summary').")
-                    print(f"   Parsed Data: {str(parsed_result)[:500]}...")
-                    return Response({"error": "The planning assistant returned data in an unexpected structure."}, status=500)
+def stream_in_flight_trip(data: dict, key: str, heartbeat: float = 15):
+    """
+    Follower side of stream_trip_events: wait for the identical in-flight generation and replay it.
 
-                try:
-                    # Use the key defined above
-                    redis_client.setex(key, 3600 * 24 * 3, json.dumps(parsed_result))
-                    print("💾 Successfully cached itinerary in Redis!")
-                except Exception as e:
-                    print(f"⚠️ Redis Set Error: {e}. Could not cache result.")
+    The wait runs in a helper thread so keep-alive comments can be sent meanwhile.
+    """
+    pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trip-stream-wait")
+    try:
+        # The context copy keeps the usage-ledger attribution if this caller ends up generating.
+        future = pool.submit(contextvars.copy_context().run, plan_trip_for_request, data, key, False)
+        while True:
+            try:
+                parsed_result = future.result(timeout=heartbeat)
+                break
+            except FuturesTimeoutError:
+                yield ": keep-alive\n\n"
+    except PlannerError as e:
+        yield sse_event("error", e.payload)
+        return
+    finally:
+        pool.shutdown(wait=False)
+    yield from replay_trip_events(parsed_result)
+
+def stream_generated_trip(data: dict, key: str):
+    """Leader side of stream_trip_events: stream the Gemini answer day by day, then repair and cache it."""
+    system_instruction, user_prompt = build_trip_prompt(data)
+    parser = IncrementalDaysParser()
+    sent = set()
+    try:
+        model_name = model_for_search_mode(data.get("searchMode"))
+        chunks = ask_gemini_stream(
+            user_prompt, model_name, system_instruction=system_instruction, response_schema=TRIP_RESPONSE_SCHEMA
+        )
+        for chunk in chunks:
+            for index, day in parser.feed_indexed(chunk):
+                sent.add(index)
+                yield sse_event("day", {"index": index, "day": day})
+    except GeminiStreamError as e:
+        print(f"❌ {e}")
+        if not (e.finish_reason == "MAX_TOKENS" and parser.days_emitted and settings.TRIP_REPAIR_ENABLED):
+            error = PlannerError({"error": "The planning assistant stopped before finishing the itinerary.", "details": str(e)})
+            trip_single_flight.publish_error(key, error)
+            yield sse_event("error", error.payload)
+            return
+        # Truncated: keep the streamed days and regenerate only the rest.
+        result = GeminiResult(None, model_name, finish_reason=e.finish_reason)
+        result.partial_text = parser.text
+    else:
+        result = GeminiResult(parser.text, model_name)
+        try:
+            result.data = parse_json_response(parser.text)
+        except ValueError as e:
+            result.parse_error = str(e)
 
-                print("✅ Successfully generated and parsed itinerary!")
-                return Response(parsed_result, status=200)
+    try:
+        expected_days = expected_day_count(data)
+        repaired = None
+        if needs_repair(result, expected_days):
+            repaired = repair_itinerary(result, expected_days, user_prompt, system_instruction, model_name)
+        parsed_result = check_itinerary_structure(repaired) if repaired else itinerary_from_result(result)
+        parsed_result = mark_missing_days(parsed_result, expected_days)
+    except PlannerError as e:
+        trip_single_flight.publish_error(key, e)
+        yield sse_event("error", e.payload)
+        return
+
+    cache_generated_itinerary(data, key, parsed_result)
+    # Days that were not streamed (unparsable fragments, repaired or placeholder days) follow now.
+    yield from replay_trip_events(parsed_result, sent)
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets clients send `Accept: text/event-stream` without a 406 from content negotiation."""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode(self.charset)
 
-            except json.JSONDecodeError as e:
-                error_msg = f"JSON Decode Error – Gemini response (after cleaning) was not valid JSON: {e}"
-                print(f"❌ {error_msg}")
-                problematic_string_excerpt = cleaned_json_str[:1000] if cleaned_json_str else "None"
-                print(f"   Problematic cleaned string (first 1000 chars): {problematic_string_excerpt}")
-                return Response({"error": "The planning assistant returned an invalid format.", "details": error_msg}, status=500)
+@api_view(['POST'])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def plan_trip_stream_view(request):
+    """
+    Streaming variant of plan_trip_view.
 
-        except Exception as e:
-            error_msg = f"Unexpected Error during Gemini interaction or processing: {e}"
-            print(f"❌ {error_msg}")
-            import traceback
-            traceback.print_exc()
-            return Response({"error": f"An unexpected error occurred: {e}"}, status=500)
+    Accepts the same payload and responds with `text/event-stream`, pushing
+    each day of the itinerary as soon as Gemini has finished writing it.
+    """
+    serializer = PlanTripSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=400)
 
-    return Response(serializer.errors, status=400)
+    data = serializer.validated_data
+    record_request_shape(data, serializer.data)
+    response = StreamingHttpResponse(stream_trip_events(data, make_trip_cache_key(data), request.user), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 # ──────────────────────────────── Image Search ──────────────────────────────── #
 
@@ -654,7 +897,7 @@ def get_place_details_view(request):
     print(f"ℹ️ Processing place details request for query: '{query}'")
 
     try:
-        places_service = GooglePlacesService()
+        places_service = get_places_service()
         place_details = places_service.search_place(query)
 
         if place_details:
@@ -668,38 +911,185 @@ def get_place_details_view(request):
         print(f"❌ Unexpected error processing place details for query '{query}': {e}")
         return JsonResponse({"error": "An internal server error occurred."}, status=500)
 
+class PlaceBatchThrottle(UserRateThrottle):
+    """Per-user rate for the batch endpoint (each request can fan out to many Places calls)."""
+    scope = "place_batch"
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@throttle_classes([PlaceBatchThrottle])
+def get_place_details_batch_view(request):
+    """
+    Resolve many place lookups in one request (signed-in users, throttled per user).
+
+    Body (one of):
+        {"queries": ["Louvre Museum Paris France", ...]}
+        {"plan": {<itinerary>}}   # every activity's place_name_for_lookup
+
+    Returns:
+        {"results": {query: details or null}, "stats": {...}} and, for plans,
+        "activities": [{"day_index", "activity_index", "query"}] to map results back.
+    """
+    plan = request.data.get("plan")
+    queries = request.data.get("queries")
+    activities = None
+
+    if isinstance(plan, dict):
+        lookups = collect_plan_place_queries(plan)
+        activities = [{"day_index": d, "activity_index": a, "query": q} for d, a, q in lookups]
+        queries = [q for _, _, q in lookups]
+    elif not isinstance(queries, list):
+        return Response({"error": "Provide a 'queries' list or a 'plan' object."}, status=status.HTTP_400_BAD_REQUEST)
+
+    queries = [str(q).strip() for q in queries if isinstance(q, str) and q.strip()]
+    unique_queries = list(dict.fromkeys(queries))
+    if len(unique_queries) > settings.PLACE_BATCH_MAX_QUERIES:
+        return Response(
+            {"error": f"Too many queries ({len(unique_queries)}); the limit is {settings.PLACE_BATCH_MAX_QUERIES}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    print(f"ℹ️ Processing batch place details request with {len(unique_queries)} queries")
+    try:
+        results, stats = get_places_service().search_places(unique_queries)
+    except Exception as e:
+        print(f"❌ Unexpected error processing batch place details: {e}")
+        return Response({"error": "An internal server error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    body = {"results": results, "stats": stats}
+    if activities is not None:
+        body["activities"] = activities
+    return Response(body, status=status.HTTP_200_OK)
+
 @require_GET
 def proxy_place_photo(request):
     """
     Proxy endpoint for Google Places photos to avoid CORS issues.
+
+    Streams the image from Google on a cache miss and serves later requests
+    from the Redis photo cache (see api/photo_proxy.py). URLs come from
+    place details and are HMAC-signed (see api/utils/photo_signing.py).
     """
-    photo_reference = request.GET.get('photo_reference')
-    max_width = request.GET.get('maxwidth', 800)
+    photo_reference = request.GET.get('photoreference') or request.GET.get('photo_reference')
+    raw_width = request.GET.get('maxwidth', '800')
+    max_width = parse_max_width(raw_width)
     
     if not photo_reference:
         return JsonResponse({"error": "Missing photo_reference parameter"}, status=400)
+
+    if settings.PHOTO_URL_REQUIRE_SIGNATURE and not verify_photo_signature(photo_reference, request.GET.get('sig')):
+        print("⚠️ Rejected photo request with a missing or invalid signature.")
+        return JsonResponse({"error": "Invalid photo signature"}, status=403)
         
     try:
-        # Build the photo URL
-        google_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth={max_width}&photoreference={photo_reference}&key={settings.GOOGLE_API_KEY}"
-        
-        # Fetch the image from Google
-        import requests
-        response = requests.get(google_url, stream=True)
-        
-        if not response.ok:
-            return JsonResponse({"error": "Failed to fetch image from Google"}, status=response.status_code)
-            
-        # Return the image with appropriate content type
-        from django.http import HttpResponse
-        return HttpResponse(
-            response.content,
-            content_type=response.headers.get('Content-Type', 'image/jpeg')
-        )
+        return serve_place_photo(request, photo_reference, max_width)
     except Exception as e:
         print(f"❌ Error proxying photo: {str(e)}")
         return JsonResponse({"error": "Internal server error"}, status=500)
 
+# ──────────────────────────────── Plan Trip Jobs ──────────────────────────────── #
+def run_trip_job(job: dict):
+    """
+    Job handler for the trip worker: validate the stored request and generate it.
+
+    Raises:
+        TripJobError: With the same error payload/status plan_trip_view would return
+    """
+    serializer = PlanTripSerializer(data=job["payload"])
+    if not serializer.is_valid():
+        raise TripJobError(serializer.errors, status_code=400)
+    set_llm_context("plan_trip_job", serializer.validated_data.get("searchMode"), user_id=job["user_id"])
+    try:
+        plan_trip_for_request(serializer.validated_data, job["key"], job["enrich"])
+    except PlannerError as e:
+        raise TripJobError(e.payload, status_code=e.status_code)
+
+def job_result(job: dict):
+    """The finished job's itinerary, read back from the trip cache."""
+    if job["enrich"]:
+        return get_cached_enriched_itinerary(job["key"]) or get_cached_itinerary(job["key"])
+    return get_cached_itinerary(job["key"])
+
+def job_status_payload(job: dict, token: str | None) -> dict:
+    payload = job_response_payload(job["id"], job["status"], token)
+    if job["status"] == STATUS_QUEUED:
+        payload["position"] = queue_position(job["id"])
+    elif job["status"] == STATUS_DONE:
+        payload["result"] = job_result(job)
+        if payload["result"] is None:
+            payload["status"] = STATUS_FAILED
+            payload["error"] = {"error": "The generated itinerary has expired from the cache. Please submit the trip again."}
+    elif job["status"] == STATUS_FAILED:
+        payload["error"] = job["error"]
+        payload["error_status"] = job["status_code"]
+    return payload
+
+def get_job_for_request(request, job_id: str) -> tuple[dict | None, str | None]:
+    """
+    Return (job, token) if the caller may read the job, else (None, None).
+
+    The job's user may always read it; anyone else needs a token handed out by
+    POST /api/plantrip/ (the `token` query parameter of status_url/events_url,
+    or an X-Job-Token header). Unknown and foreign jobs look the same (404).
+    """
+    token = request.GET.get("token") or request.headers.get("X-Job-Token")
+    job = get_job(job_id)
+    if job is None:
+        return None, None
+    if job["user_id"] is not None and job["user_id"] == request.user.pk:
+        return job, token
+    if has_job_access(job_id, token):
+        return job, token
+    return None, None
+
+@api_view(['GET'])
+def plan_trip_job_view(request, job_id):
+    """Poll a background trip job; `result` holds the itinerary once status is "done"."""
+    job, token = get_job_for_request(request, job_id)
+    if job is None:
+        return Response({"error": "Unknown or expired job."}, status=404)
+    return Response(job_status_payload(job, token), status=200)
+
+def stream_job_events(job_id: str, token: str | None):
+    """
+    SSE frames for a background trip job.
+
+    Events:
+    - status: {"job_id", "status", ...} on every status change
+    - complete: the full itinerary (same shape as plan_trip_view)
+    - error: {"error": str}
+    """
+    try:
+        for job in iter_job_updates(job_id, timeout=settings.TRIP_JOB_EVENTS_TIMEOUT):
+            if job is None:
+                yield ": keep-alive\n\n"
+                continue
+            payload = job_status_payload(job, token)
+            if payload["status"] == STATUS_DONE:
+                yield sse_event("complete", payload["result"])
+                return
+            if payload["status"] == STATUS_FAILED:
+                yield sse_event("error", payload["error"] or {"error": "Trip generation failed."})
+                return
+            yield sse_event("status", payload)
+    except RedisError as e:
+        print(f"❌ Job event stream failed: {e}")
+        yield sse_event("error", {"error": "Job status is temporarily unavailable."})
+        return
+    yield sse_event("error", {"error": "Stopped waiting for the job; poll its status_url instead."})
+
+@api_view(['GET'])
+@renderer_classes([JSONRenderer, EventStreamRenderer])
+def plan_trip_job_events_view(request, job_id):
+    """Subscribe to a background trip job as Server-Sent Events."""
+    job, token = get_job_for_request(request, job_id)
+    if job is None:
+        return Response({"error": "Unknown or expired job."}, status=404)
+    response = StreamingHttpResponse(stream_job_events(job_id, token), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 # ──────────────────────────────── SavedTrip ──────────────────────────────── #
 class SaveTripView(APIView):
     permission_classes = [IsAuthenticated]
@@ -779,328 +1169,570 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 
-@api_view(['POST'])
-def chat_replace_activity(request):
-    try:
-        message = request.data.get('message')
-        day_index = request.data.get('dayIndex')
-        activity_index = request.data.get('activityIndex')
-        plan = request.data.get('plan')
-        # New context fields
-        previous_activity_data = request.data.get('previousActivity') 
-        next_activity_data = request.data.get('nextActivity')
-
-        if not message or day_index is None or activity_index is None or not plan:
-            return Response({"error": "Missing required fields."}, status=400)
-
-        destination_info = plan.get('destination_info', {})
-        destination = destination_info.get('city', 'the destination')
-        country = destination_info.get('country', '')
-        currency = destination_info.get('currency', 'USD') # Default to USD as per general plan spec
-        
-        original_activity = plan['days'][day_index]['activities'][activity_index] if day_index < len(plan['days']) and activity_index < len(plan['days'][day_index]['activities']) else {}
-        
-        # Try to get original request data from the plan structure
-        original_request_data = plan.get('original_request', plan.get('original_request_data', {}))
-
-        budget_level = original_request_data.get('budget', 'Mid-range')
-        pace_from_plan = original_request_data.get('pace', 'Moderate')
-        interests_from_plan = ", ".join(original_request_data.get('interests', [])) if original_request_data.get('interests') else "not specified"
-        trip_style_from_plan = ", ".join(original_request_data.get('tripStyle', [])) if original_request_data.get('tripStyle') else "not specified"
-        # Get transportationMode from original request data
-        transportation_mode_from_plan = original_request_data.get('transportationMode', 'Walking & Public Transit')
-
-        original_time = original_activity.get('time', 'any suitable time')
-
-        # Build context strings for the prompt
-        original_activity_str = json.dumps(original_activity)
-        previous_activity_str = json.dumps(previous_activity_data) if previous_activity_data else "No specific previous activity to consider."
-        next_activity_str = json.dumps(next_activity_data) if next_activity_data else "No specific next activity to consider."
-
-        prompt = (
-            f"You are an expert travel assistant. The user wants to replace an activity in their trip plan for {destination}, {country}.\n"
-            f"User message: '{message}'\n\n"
-            f"Current Itinerary Context:\n"
-            f"- The activity to be replaced (Day {day_index + 1}, Activity Index {activity_index}): {original_activity_str}\n"
-            f"- Activity immediately before (if any): {previous_activity_str}\n"
-            f"- Activity immediately after (if any): {next_activity_str}\n\n"
-            f"Trip Plan Details:\n"
-            f"- Location: {destination}, {country}\n"
-            f"- Local Currency (for AI reference, output must be USD): {currency}\n"
-            f"- Original Trip Budget Level: {budget_level}\n"
-            f"- Original Trip Pace: {pace_from_plan}\n"
-            f"- Original Trip Interests: {interests_from_plan}\n"
-            f"- Original Trip Style: {trip_style_from_plan}\n"
-            f"- Original Trip Primary Transportation: {transportation_mode_from_plan}\n\n"
-            f"Task:\n"
-            f"1. Analyze the user's request: '{message}'.\n"
-            f"2. Consider the original activity's time slot (around {original_time}). Also consider the traveler's original preferences: budget '{budget_level}', pace '{pace_from_plan}', interests '{interests_from_plan}', trip style '{trip_style_from_plan}', and primary transportation '{transportation_mode_from_plan}'.\n"
-            f"3. IMPORTANT: Evaluate travel time/distance, especially concerning the primary transportation mode ('{transportation_mode_from_plan}'). If replacing the activity creates a very long travel segment (e.g., >30-40 mins walk or >20-25 mins transit if they rely on it, or a significant drive if they have a car but the suggestion is far from parking/next point), try to suggest a sequence of 1 to 3 smaller, related activities that can logically fill the time, break up the travel, or provide a better flow. These activities should collectively fit the spirit of the user's request and the overall time window and original preferences.\n"
-            f"4. If a simple direct replacement is best, suggest one activity. Ensure it aligns with the traveler's original preferences.\n"
-            f"5. Ensure all cost estimates are in USD.\n\n"
-            f"Output Format (CRITICAL):\n"
-            f"Return ONLY a JSON object. This object must have a key named 'activities'.\n"
-            f"- If you suggest a SINGLE replacement, 'activities' should be a JSON OBJECT representing that activity.\n"
-            f"- If you suggest a SEQUENCE of replacements, 'activities' should be an ARRAY of JSON OBJECTS, each representing an activity in the sequence.\n"
-            f"Each activity object (whether single or in an array) MUST include these keys:\n"
-            f"  - 'time': (string, HH:MM format, adjusted logically for the sequence if multiple activities)\n"
-            f"  - 'description': (string, detailed description of the new activity)\n"
-            f"  - 'place_name_for_lookup': (string or null, specific, concise, searchable name for map lookup, e.g., 'Eiffel Tower', 'Louvre Museum'. Use null only if truly not applicable, like 'Relax at hotel')\n"
-            f"  - 'place_details': (object or null, with 'name': string (official), 'category': string (e.g., 'restaurant', 'museum'), 'price_level': number (optional, 1-4))\n"
-            f"  - 'cost_estimate': (object, with 'min': number, 'max': number, 'currency': 'USD')\n"
-            f"  - 'ticket_url': (string or null, direct URL for booking if applicable)\n\n"
-            f"Example for single activity:\n"
-            f"{{ \"activities\": {{ \"time\": \"{original_time}\", \"description\": \"Visit the Colosseum\", ...}} }}\n"
-            f"Example for multiple activities:\n"
-            f"{{ \"activities\": [ {{ \"time\": \"14:00\", \"description\": \"Quick coffee at a local cafe near Colosseum\", ... }}, {{ \"time\": \"14:45\", \"description\": \"Explore the Roman Forum\", ... }} ] }}\n"
-            f"Focus on providing relevant, actionable suggestions."
-        )
+# CHAT_MODEL (gemini-1.5-flash) is configured with the other models in api/chat_request.py.
 
-        from .chat_request import ask_gemini, extract_json_from_response
-        model_name = 'gemini-1.5-flash' # Using a capable model
-        raw_response = ask_gemini(prompt, model_name)
+def build_replace_activity_prompt(payload) -> tuple[str, str]:
+    """
+    Build the Gemini prompt for replacing one activity of a plan.
 
-        if not raw_response:
-            return Response({"error": "No response from AI."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    Args:
+        payload: Request data (message, dayIndex, activityIndex, plan, previousActivity, nextActivity)
 
-        cleaned_json_str = extract_json_from_response(raw_response)
-        if not cleaned_json_str:
-            return Response({"error": "AI response was empty after cleaning."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-        try:
-            parsed_data = json.loads(cleaned_json_str)
-            if not isinstance(parsed_data, dict) or 'activities' not in parsed_data:
-                raise ValueError("AI response missing 'activities' key or is not a dictionary.")
-
-            suggested_items = parsed_data['activities']
-
-            # Standardize: Ensure suggested_items is always a list for easier frontend handling.
-            # The frontend will now always expect an array for suggestedActivities.
-            if isinstance(suggested_items, dict):
-                activities_to_return = [suggested_items]
-            elif isinstance(suggested_items, list):
-                activities_to_return = suggested_items
-            else:
-                raise ValueError("'activities' key must be an object or an array of objects.")
-
-            # Validate and provide defaults for each activity in the list
-            final_activities = []
-            for activity_obj in activities_to_return:
-                if not isinstance(activity_obj, dict):
-                    # If any item in a list is not a dict, skip or error
-                    # For simplicity, we can choose to return an error or filter it out.
-                    # Here, let's assume valid activities are dicts.
-                    continue 
-
-                # Ensure required fields and add defaults if missing
-                if "time" not in activity_obj:
-                    activity_obj["time"] = original_time # Fallback to original time
-                if "description" not in activity_obj:
-                    # This is critical, if AI fails to provide it, it's a bad suggestion
-                    return Response({"error": "AI response missing required 'description' field in one of the activities."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                if "place_name_for_lookup" not in activity_obj:
-                    activity_obj["place_name_for_lookup"] = None
-                
-                if "cost_estimate" not in activity_obj:
-                    activity_obj["cost_estimate"] = {"min": 10, "max": 30, "currency": "USD"}
-                elif "currency" not in activity_obj["cost_estimate"]:
-                     activity_obj["cost_estimate"]["currency"] = "USD"
+    Returns:
+        tuple: (prompt, original_time)
 
+    Raises:
+        PlannerError: If required fields are missing (400)
+    """
+    message = payload.get('message')
+    day_index = payload.get('dayIndex')
+    activity_index = payload.get('activityIndex')
+    plan = payload.get('plan')
+    # New context fields
+    previous_activity_data = payload.get('previousActivity') 
+    next_activity_data = payload.get('nextActivity')
+
+    if not message or day_index is None or activity_index is None or not plan:
+        raise PlannerError({"error": "Missing required fields."}, status_code=400)
+
+    destination_info = plan.get('destination_info', {})
+    destination = destination_info.get('city', 'the destination')
+    country = destination_info.get('country', '')
+    currency = destination_info.get('currency', 'USD') # Default to USD as per general plan spec
+
+    original_activity = plan['days'][day_index]['activities'][activity_index] if day_index < len(plan['days']) and activity_index < len(plan['days'][day_index]['activities']) else {}
+
+    # Try to get original request data from the plan structure
+    original_request_data = plan.get('original_request', plan.get('original_request_data', {}))
+
+    budget_level = original_request_data.get('budget', 'Mid-range')
+    pace_from_plan = original_request_data.get('pace', 'Moderate')
+    interests_from_plan = ", ".join(original_request_data.get('interests', [])) if original_request_data.get('interests') else "not specified"
+    trip_style_from_plan = ", ".join(original_request_data.get('tripStyle', [])) if original_request_data.get('tripStyle') else "not specified"
+    # Get transportationMode from original request data
+    transportation_mode_from_plan = original_request_data.get('transportationMode', 'Walking & Public Transit')
+
+    original_time = original_activity.get('time', 'any suitable time')
+
+    # Build context strings for the prompt
+    original_activity_str = json.dumps(original_activity)
+    previous_activity_str = json.dumps(previous_activity_data) if previous_activity_data else "No specific previous activity to consider."
+    next_activity_str = json.dumps(next_activity_data) if next_activity_data else "No specific next activity to consider."
+
+    prompt = (
+        f"You are an expert travel assistant. The user wants to replace an activity in their trip plan for {destination}, {country}.\n"
+        f"User message: '{message}'\n\n"
+        f"Current Itinerary Context:\n"
+        f"- The activity to be replaced (Day {day_index + 1}, Activity Index {activity_index}): {original_activity_str}\n"
+        f"- Activity immediately before (if any): {previous_activity_str}\n"
+        f"- Activity immediately after (if any): {next_activity_str}\n\n"
+        f"Trip Plan Details:\n"
+        f"- Location: {destination}, {country}\n"
+        f"- Local Currency (for AI reference, output must be USD): {currency}\n"
+        f"- Original Trip Budget Level: {budget_level}\n"
+        f"- Original Trip Pace: {pace_from_plan}\n"
+        f"- Original Trip Interests: {interests_from_plan}\n"
+        f"- Original Trip Style: {trip_style_from_plan}\n"
+        f"- Original Trip Primary Transportation: {transportation_mode_from_plan}\n\n"
+        f"Task:\n"
+        f"1. Analyze the user's request: '{message}'.\n"
+        f"2. Consider the original activity's time slot (around {original_time}). Also consider the traveler's original preferences: budget '{budget_level}', pace '{pace_from_plan}', interests '{interests_from_plan}', trip style '{trip_style_from_plan}', and primary transportation '{transportation_mode_from_plan}'.\n"
+        f"3. IMPORTANT: Evaluate travel time/distance, especially concerning the primary transportation mode ('{transportation_mode_from_plan}'). If replacing the activity creates a very long travel segment (e.g., >30-40 mins walk or >20-25 mins transit if they rely on it, or a significant drive if they have a car but the suggestion is far from parking/next point), try to suggest a sequence of 1 to 3 smaller, related activities that can logically fill the time, break up the travel, or provide a better flow. These activities should collectively fit the spirit of the user's request and the overall time window and original preferences.\n"
+        f"4. If a simple direct replacement is best, suggest one activity. Ensure it aligns with the traveler's original preferences.\n"
+        f"5. Ensure all cost estimates are in USD.\n\n"
+        f"Output Format (CRITICAL):\n"
+        f"Return ONLY a JSON object. This object must have a key named 'activities'.\n"
+        f"- If you suggest a SINGLE replacement, 'activities' should be a JSON OBJECT representing that activity.\n"
+        f"- If you suggest a SEQUENCE of replacements, 'activities' should be an ARRAY of JSON OBJECTS, each representing an activity in the sequence.\n"
+        f"Each activity object (whether single or in an array) MUST include these keys:\n"
+        f"  - 'time': (string, HH:MM format, adjusted logically for the sequence if multiple activities)\n"
+        f"  - 'description': (string, detailed description of the new activity)\n"
+        f"  - 'place_name_for_lookup': (string or null, specific, concise, searchable name for map lookup, e.g., 'Eiffel Tower', 'Louvre Museum'. Use null only if truly not applicable, like 'Relax at hotel')\n"
+        f"  - 'place_details': (object or null, with 'name': string (official), 'category': string (e.g., 'restaurant', 'museum'), 'price_level': number (optional, 1-4))\n"
+        f"  - 'cost_estimate': (object, with 'min': number, 'max': number, 'currency': 'USD')\n"
+        f"  - 'ticket_url': (string or null, direct URL for booking if applicable)\n\n"
+        f"Example for single activity:\n"
+        f"{{ \"activities\": {{ \"time\": \"{original_time}\", \"description\": \"Visit the Colosseum\", ...}} }}\n"
+        f"Example for multiple activities:\n"
+        f"{{ \"activities\": [ {{ \"time\": \"14:00\", \"description\": \"Quick coffee at a local cafe near Colosseum\", ... }}, {{ \"time\": \"14:45\", \"description\": \"Explore the Roman Forum\", ... }} ] }}\n"
+        f"Focus on providing relevant, actionable suggestions."
+    )
+    return prompt, original_time
+
+def replace_activity_cache_key(payload) -> str:
+    """Chat cache key over every payload value build_replace_activity_prompt reads (call after it)."""
+    plan = payload['plan']
+    day_index, activity_index = payload['dayIndex'], payload['activityIndex']
+    days = plan.get('days', [])
+    activities = days[day_index].get('activities', []) if day_index < len(days) else []
+    return chat_cache_key("replace", CHAT_MODEL, {
+        "message": payload.get('message'),
+        "dayIndex": day_index,
+        "activityIndex": activity_index,
+        "activity": activities[activity_index] if activity_index < len(activities) else {},
+        "previousActivity": payload.get('previousActivity'),
+        "nextActivity": payload.get('nextActivity'),
+        "destination_info": plan.get('destination_info', {}),
+        "original_request": plan.get('original_request', plan.get('original_request_data', {})),
+    }, message_field="message")
+
+def finalize_replacement_activities(result: GeminiResult, original_time: str) -> list:
+    """
+    Validate the JSON-mode Gemini answer for a replacement and fill in defaults.
 
-                if "place_details" not in activity_obj and activity_obj.get("place_name_for_lookup"):
-                    activity_obj["place_details"] = {
-                        "name": str(activity_obj["place_name_for_lookup"]), # Ensure it's a string
-                        "category": "attraction" # Default category
-                    }
-                elif "place_details" in activity_obj and activity_obj["place_details"] is not None and "name" not in activity_obj["place_details"] and activity_obj.get("place_name_for_lookup"):
-                     activity_obj["place_details"]["name"] = str(activity_obj.get("place_name_for_lookup"))
+    Returns:
+        list: Activity dicts, always a list even for a single suggestion
 
+    Raises:
+        PlannerError: If the response is missing or malformed
+    """
+    if not result.text:
+        raise PlannerError({"error": "No response from AI."})
+    if result.parse_error:
+        raise PlannerError({"error": "Failed to parse AI response as JSON.", "details": result.parse_error, "raw_cleaned_response": result.text[:500]})
 
-                if "ticket_url" not in activity_obj:
-                    activity_obj["ticket_url"] = None
-                
-                final_activities.append(activity_obj)
-            
-            if not final_activities:
-                 return Response({"error": "AI did not return any valid activities."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    try:
+        parsed_data = result.data
+        if not isinstance(parsed_data, dict) or 'activities' not in parsed_data:
+            raise ValueError("AI response missing 'activities' key or is not a dictionary.")
+
+        suggested_items = parsed_data['activities']
+
+        # Standardize: Ensure suggested_items is always a list for easier frontend handling.
+        # The frontend will now always expect an array for suggestedActivities.
+        if isinstance(suggested_items, dict):
+            activities_to_return = [suggested_items]
+        elif isinstance(suggested_items, list):
+            activities_to_return = suggested_items
+        else:
+            raise ValueError("'activities' key must be an object or an array of objects.")
+
+        # Validate and provide defaults for each activity in the list
+        final_activities = []
+        for activity_obj in activities_to_return:
+            if not isinstance(activity_obj, dict):
+                # If any item in a list is not a dict, skip or error
+                # For simplicity, we can choose to return an error or filter it out.
+                # Here, let's assume valid activities are dicts.
+                continue 
+
+            # Ensure required fields and add defaults if missing
+            if "time" not in activity_obj:
+                activity_obj["time"] = original_time # Fallback to original time
+            if "description" not in activity_obj:
+                # This is critical, if AI fails to provide it, it's a bad suggestion
+                raise PlannerError({"error": "AI response missing required 'description' field in one of the activities."})
+            if "place_name_for_lookup" not in activity_obj:
+                activity_obj["place_name_for_lookup"] = None
+
+            if "cost_estimate" not in activity_obj:
+                activity_obj["cost_estimate"] = {"min": 10, "max": 30, "currency": "USD"}
+            elif "currency" not in activity_obj["cost_estimate"]:
+                 activity_obj["cost_estimate"]["currency"] = "USD"
+
+
+            if "place_details" not in activity_obj and activity_obj.get("place_name_for_lookup"):
+                activity_obj["place_details"] = {
+                    "name": str(activity_obj["place_name_for_lookup"]), # Ensure it's a string
+                    "category": "attraction" # Default category
+                }
+            elif "place_details" in activity_obj and activity_obj["place_details"] is not None and "name" not in activity_obj["place_details"] and activity_obj.get("place_name_for_lookup"):
+                 activity_obj["place_details"]["name"] = str(activity_obj.get("place_name_for_lookup"))
 
 
-            # The key here matches the frontend's expected structure from before, but now it's always a list.
-            return Response({"activities": final_activities}, status=status.HTTP_200_OK)
+            if "ticket_url" not in activity_obj:
+                activity_obj["ticket_url"] = None
 
-        except ValueError as ve:
-            return Response({"error": "AI response format error.", "details": str(ve), "raw_cleaned_response": cleaned_json_str[:500]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except json.JSONDecodeError as e:
-            return Response({"error": "Failed to parse AI response as JSON.", "details": str(e), "raw_cleaned_response": cleaned_json_str[:500]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            final_activities.append(activity_obj)
+
+        if not final_activities:
+             raise PlannerError({"error": "AI did not return any valid activities."})
+
+        return final_activities
 
+    except ValueError as ve:
+        raise PlannerError({"error": "AI response format error.", "details": str(ve), "raw_cleaned_response": result.text[:500]})
+
+@api_view(['POST'])
+def chat_replace_activity(request):
+    try:
+        set_llm_context("chat_replace_activity", user=request.user)
+        with timed("prompt_build"):
+            prompt, original_time = build_replace_activity_prompt(request.data)
+        # Repeated edits (retries, undo/redo) are answered from the chat cache unless "regenerate" is set.
+        cache_key = replace_activity_cache_key(request.data)
+        with timed("cache_lookup"):
+            final_activities = get_cached_suggestions(cache_key, fresh=wants_fresh_suggestions(request.data))
+        if final_activities is None:
+            result = generate(prompt, CHAT_MODEL, response_schema=ACTIVITIES_RESPONSE_SCHEMA)
+            with timed("finalize"):
+                final_activities = finalize_replacement_activities(result, original_time)
+            with timed("cache_write"):
+                store_suggestions(cache_key, final_activities)
+        # The key here matches the frontend's expected structure from before, but now it's always a list.
+        return Response({"activities": final_activities}, status=status.HTTP_200_OK)
+    except PlannerError as e:
+        return Response(e.payload, status=e.status_code)
     except Exception as e:
         import traceback
         return Response({"error": "Internal server error.", "details": str(e), "trace": traceback.format_exc()}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 # ──────────────────────────────── Chat Add Activity ───────────────────────────────── #
+def build_add_activity_prompt(payload) -> str:
+    """
+    Build the Gemini prompt for adding activities to a day.
+
+    Args:
+        payload: Request data (user_query, destination, current_day_title, existing_activities_today, ...)
+
+    Returns:
+        str: The prompt
+
+    Raises:
+        PlannerError: If the user query is missing (400)
+    """
+    user_query = payload.get('user_query')
+    destination = payload.get('destination', 'the destination') # e.g., "Paris, France"
+    current_day_title = payload.get('current_day_title', 'the current day')
+    # date_of_day = payload.get('date') # Optional: if needed for very specific date-bound events
+    existing_activities_today = payload.get('existing_activities_today', []) # List of {description, time}
+    insert_after_activity_description = payload.get('insert_after_activity_description') # Description of preceding activity
+    next_activity_description = payload.get('next_activity_description') # Description of subsequent activity
+    original_trip_preferences = payload.get('original_trip_preferences', {}) # {interests, pace, budget, tripStyle, transportationMode}
+
+    # Plan is optional but can provide more context like original_request or destination_info if not passed directly
+    plan = payload.get('plan', {}) 
+    original_request_data = plan.get('original_request', plan.get('original_request_data', {}))
+
+    # Fallback to original_request_data if specific preferences are not in original_trip_preferences
+    budget_level = original_trip_preferences.get('budget') or original_request_data.get('budget', 'Mid-range')
+    pace = original_trip_preferences.get('pace') or original_request_data.get('pace', 'Moderate')
+    interests = ", ".join(original_trip_preferences.get('interests', [])) or ", ".join(original_request_data.get('interests', [])) or "general interests"
+    trip_style = ", ".join(original_trip_preferences.get('tripStyle', [])) or ", ".join(original_request_data.get('tripStyle', [])) or "standard"
+    transportation_mode = original_trip_preferences.get('transportationMode') or original_request_data.get('transportationMode', 'Walking & Public Transit')
+
+    destination_info = plan.get('destination_info', {})
+    # Extract city and country from the destination string if available, or from destination_info
+    city_country_parts = [p.strip() for p in destination.split(',')]
+    city = city_country_parts[0] if len(city_country_parts) > 0 else destination_info.get('city', 'the destination city')
+    country = city_country_parts[1] if len(city_country_parts) > 1 else destination_info.get('country', 'the destination country')
+
+
+    if not user_query:
+        raise PlannerError({"error": "User query is missing."}, status_code=400)
+
+    # Context for the prompt
+    existing_activities_str = json.dumps(existing_activities_today) if existing_activities_today else "This day is currently empty."
+    insertion_point_str = "at the beginning of the day."
+    if insert_after_activity_description and next_activity_description:
+        insertion_point_str = f"between '{insert_after_activity_description}' and '{next_activity_description}'."
+    elif insert_after_activity_description:
+        insertion_point_str = f"after '{insert_after_activity_description}'."
+    elif next_activity_description:
+        insertion_point_str = f"before '{next_activity_description}' (as the first activity)."
+
+    prompt = (
+        f"You are an expert travel assistant. The user wants to add a new activity to their trip plan for {city}, {country} on {current_day_title}.\n"
+        f"User's request: '{user_query}'\n\n"
+        f"Current Itinerary Context for {current_day_title}:\n"
+        f"- Existing activities for this day: {existing_activities_str}\n"
+        f"- The new activity should be added: {insertion_point_str}\n\n"
+        f"Traveler's Original Preferences (use these as primary guidance):\n"
+        f"- Interests: {interests}\n"
+        f"- Pace: {pace}\n"
+        f"- Budget Level: {budget_level}\n"
+        f"- Trip Style: {trip_style}\n"
+        f"- Primary Transportation Mode: {transportation_mode}\n\n"
+        f"Task:\n"
+        f"1. Analyze the user's request: '{user_query}'.\n"
+        f"2. Based on the request and the traveler's preferences, suggest one or more suitable activities. If suggesting multiple, they should be a logical sequence and fit reasonably within a similar time block.\n"
+        f"3. Consider the insertion point. The time for the new activity/activities should make sense given the surrounding activities (if any). For example, if adding after an activity at 14:00 and before one at 18:00, the new activity should fit in between.\n"
+        f"4. Ensure the suggestion is feasible with the primary transportation mode '{transportation_mode}'. Avoid suggesting something very far if the user relies on walking or public transport unless it's a significant part of the request.\n"
+        f"5. All cost estimates MUST be in USD.\n\n"
+        f"Output Format (CRITICAL):\n"
+        f"Return ONLY a JSON object. This object MUST have a key named 'activities'.\n"
+        f"'activities' should be an ARRAY of JSON OBJECTS, each representing a suggested activity. Return an array even if suggesting only one activity.\n"
+        f"Each activity object in the array MUST include these keys:\n"
+        f"  - 'time': (string, HH:MM format, e.g., '10:30'. Be logical about this time based on the insertion context. If the day is empty, suggest a reasonable start time. If between activities, suggest a time that fits.)\n"
+        f"  - 'description': (string, detailed description of the new activity)\n"
+        f"  - 'place_name_for_lookup': (string or null, specific, concise, searchable name for map lookup, e.g., 'Eiffel Tower', 'Louvre Museum'. Use null only if truly not applicable, like 'Relax at hotel')\n"
+        f"  - 'place_details': (object or null, with 'name': string (official), 'category': string (e.g., 'restaurant', 'museum'), 'price_level': number (optional, 1-4))\n"
+        f"  - 'cost_estimate': (object, with 'min': number, 'max': number, 'currency': 'USD')\n"
+        f"  - 'ticket_url': (string or null, direct URL for booking if applicable)\n\n"
+        f"Example for suggesting one activity:\n"
+        f"{{ \"activities\": [ {{ \"time\": \"15:00\", \"description\": \"Visit the local art gallery\", ... }} ] }}\n"
+        f"Example for suggesting a sequence of two related activities:\n"
+        f"{{ \"activities\": [ {{ \"time\": \"15:00\", \"description\": \"Coffee at 'The Cozy Cafe'\", ... }}, {{ \"time\": \"16:00\", \"description\": \"Browse the nearby 'Old Town Bookstore'\", ... }} ] }}\n"
+        f"Focus on providing relevant, actionable suggestions that fit the user's request and the day's existing plan."
+    )
+    return prompt
+
+def add_activity_cache_key(payload) -> str:
+    """Chat cache key over every payload value build_add_activity_prompt reads (call after it)."""
+    plan = payload.get('plan', {})
+    return chat_cache_key("add", CHAT_MODEL, {
+        "user_query": payload.get('user_query'),
+        "destination": payload.get('destination'),
+        "current_day_title": payload.get('current_day_title'),
+        "existing_activities_today": payload.get('existing_activities_today', []),
+        "insert_after_activity_description": payload.get('insert_after_activity_description'),
+        "next_activity_description": payload.get('next_activity_description'),
+        "original_trip_preferences": payload.get('original_trip_preferences', {}),
+        "destination_info": plan.get('destination_info', {}),
+        "original_request": plan.get('original_request', plan.get('original_request_data', {})),
+    }, message_field="user_query")
+
+def finalize_added_activities(result: GeminiResult) -> list:
+    """
+    Validate the JSON-mode Gemini answer for an added activity and fill in defaults.
+
+    Returns:
+        list: Activity dicts
+
+    Raises:
+        PlannerError: If the response is missing or malformed
+    """
+    if not result.text:
+        raise PlannerError({"error": "No response from AI assistant."})
+    if result.parse_error:
+        raise PlannerError({"error": "Failed to parse AI response as JSON.", "details": result.parse_error, "raw_cleaned_response": result.text[:500]})
+
+    try:
+        parsed_data = result.data
+        if not isinstance(parsed_data, dict) or 'activities' not in parsed_data:
+            raise ValueError("AI response missing 'activities' key or is not a dictionary.")
+
+        suggested_activities_list = parsed_data['activities']
+
+        if not isinstance(suggested_activities_list, list):
+            # This should ideally not happen if the prompt is followed, but good to check.
+            raise ValueError("'activities' key must be an array of activity objects.")
+
+        final_activities = []
+        for activity_obj in suggested_activities_list:
+            if not isinstance(activity_obj, dict):
+                continue # Skip non-dict items if any
+
+            # Ensure required fields and add defaults if missing
+            if "time" not in activity_obj or not re.match(r"^\d{2}:\d{2}$", str(activity_obj.get("time", ""))):
+                # Try to infer time based on context if AI fails to provide a valid one
+                # This is a complex inference, for now, let's assign a placeholder or rely on AI.
+                # If insert_after_activity_description and existing_activities_today, find its time.
+                # For simplicity in this step, we can assign a generic time or let frontend handle refinement.
+                # A better AI prompt should enforce time. If still missing, let's default.
+                activity_obj["time"] = "12:00" # Default or placeholder if AI misses it
+
+            if "description" not in activity_obj:
+                # Critical field, if AI misses this, the suggestion is not useful.
+                # Depending on strictness, could error out or skip.
+                # For now, let's assume the AI will be prompted well enough.
+                # If it happens, we should log it and improve the prompt.
+                raise PlannerError({"error": "AI response missing required 'description' field in one of the activities."})
+
+            if "place_name_for_lookup" not in activity_obj:
+                activity_obj["place_name_for_lookup"] = None
+
+            if "cost_estimate" not in activity_obj or not isinstance(activity_obj.get("cost_estimate"), dict):
+                activity_obj["cost_estimate"] = {"min": 0, "max": 0, "currency": "USD"} # Default if missing or wrong type
+            else: # Ensure currency is USD
+                activity_obj["cost_estimate"]["currency"] = "USD"
+                activity_obj["cost_estimate"]["min"] = activity_obj["cost_estimate"].get("min", 0)
+                activity_obj["cost_estimate"]["max"] = activity_obj["cost_estimate"].get("max", 0)
+
+
+            if "place_details" not in activity_obj and activity_obj.get("place_name_for_lookup"):
+                activity_obj["place_details"] = {
+                    "name": str(activity_obj.get("place_name_for_lookup", "")),
+                    "category": "attraction" # Default category
+                }
+            elif isinstance(activity_obj.get("place_details"), dict) and "name" not in activity_obj["place_details"] and activity_obj.get("place_name_for_lookup"):
+                 activity_obj["place_details"]["name"] = str(activity_obj.get("place_name_for_lookup",""))
+            elif activity_obj.get("place_details") is None and activity_obj.get("place_name_for_lookup"): # If place_details is explicitly null but there's a lookup name
+                activity_obj["place_details"] = { "name": str(activity_obj.get("place_name_for_lookup", "")), "category": "attraction" }
+
+
+            if "ticket_url" not in activity_obj:
+                activity_obj["ticket_url"] = None
+
+            final_activities.append(activity_obj)
+
+        if not final_activities: # If all suggested activities were invalid or filtered out
+             raise PlannerError({"error": "AI did not return any valid activities after filtering."})
+
+        return final_activities
+
+    except ValueError as ve:
+        raise PlannerError({"error": "AI response format error or validation issue.", "details": str(ve), "raw_cleaned_response": result.text[:500]})
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated]) # Ensure user is authenticated
 def chat_add_activity(request):
     try:
-        user_query = request.data.get('user_query')
-        destination = request.data.get('destination', 'the destination') # e.g., "Paris, France"
-        current_day_title = request.data.get('current_day_title', 'the current day')
-        # date_of_day = request.data.get('date') # Optional: if needed for very specific date-bound events
-        existing_activities_today = request.data.get('existing_activities_today', []) # List of {description, time}
-        insert_after_activity_description = request.data.get('insert_after_activity_description') # Description of preceding activity
-        next_activity_description = request.data.get('next_activity_description') # Description of subsequent activity
-        original_trip_preferences = request.data.get('original_trip_preferences', {}) # {interests, pace, budget, tripStyle, transportationMode}
-        
-        # Plan is optional but can provide more context like original_request or destination_info if not passed directly
-        plan = request.data.get('plan', {}) 
-        original_request_data = plan.get('original_request', plan.get('original_request_data', {}))
-        
-        # Fallback to original_request_data if specific preferences are not in original_trip_preferences
-        budget_level = original_trip_preferences.get('budget') or original_request_data.get('budget', 'Mid-range')
-        pace = original_trip_preferences.get('pace') or original_request_data.get('pace', 'Moderate')
-        interests = ", ".join(original_trip_preferences.get('interests', [])) or ", ".join(original_request_data.get('interests', [])) or "general interests"
-        trip_style = ", ".join(original_trip_preferences.get('tripStyle', [])) or ", ".join(original_request_data.get('tripStyle', [])) or "standard"
-        transportation_mode = original_trip_preferences.get('transportationMode') or original_request_data.get('transportationMode', 'Walking & Public Transit')
-
-        destination_info = plan.get('destination_info', {})
-        # Extract city and country from the destination string if available, or from destination_info
-        city_country_parts = [p.strip() for p in destination.split(',')]
-        city = city_country_parts[0] if len(city_country_parts) > 0 else destination_info.get('city', 'the destination city')
-        country = city_country_parts[1] if len(city_country_parts) > 1 else destination_info.get('country', 'the destination country')
-
-
-        if not user_query:
-            return Response({"error": "User query is missing."}, status=status.HTTP_400_BAD_REQUEST)
-
-        # Context for the prompt
-        existing_activities_str = json.dumps(existing_activities_today) if existing_activities_today else "This day is currently empty."
-        insertion_point_str = "at the beginning of the day."
-        if insert_after_activity_description and next_activity_description:
-            insertion_point_str = f"between '{insert_after_activity_description}' and '{next_activity_description}'."
-        elif insert_after_activity_description:
-            insertion_point_str = f"after '{insert_after_activity_description}'."
-        elif next_activity_description:
-            insertion_point_str = f"before '{next_activity_description}' (as the first activity)."
-        
-        prompt = (
-            f"You are an expert travel assistant. The user wants to add a new activity to their trip plan for {city}, {country} on {current_day_title}.\n"
-            f"User's request: '{user_query}'\n\n"
-            f"Current Itinerary Context for {current_day_title}:\n"
-            f"- Existing activities for this day: {existing_activities_str}\n"
-            f"- The new activity should be added: {insertion_point_str}\n\n"
-            f"Traveler's Original Preferences (use these as primary guidance):\n"
-            f"- Interests: {interests}\n"
-            f"- Pace: {pace}\n"
-            f"- Budget Level: {budget_level}\n"
-            f"- Trip Style: {trip_style}\n"
-            f"- Primary Transportation Mode: {transportation_mode}\n\n"
-            f"Task:\n"
-            f"1. Analyze the user's request: '{user_query}'.\n"
-            f"2. Based on the request and the traveler's preferences, suggest one or more suitable activities. If suggesting multiple, they should be a logical sequence and fit reasonably within a similar time block.\n"
-            f"3. Consider the insertion point. The time for the new activity/activities should make sense given the surrounding activities (if any). For example, if adding after an activity at 14:00 and before one at 18:00, the new activity should fit in between.\n"
-            f"4. Ensure the suggestion is feasible with the primary transportation mode '{transportation_mode}'. Avoid suggesting something very far if the user relies on walking or public transport unless it's a significant part of the request.\n"
-            f"5. All cost estimates MUST be in USD.\n\n"
-            f"Output Format (CRITICAL):\n"
-            f"Return ONLY a JSON object. This object MUST have a key named 'activities'.\n"
-            f"'activities' should be an ARRAY of JSON OBJECTS, each representing a suggested activity. Return an array even if suggesting only one activity.\n"
-            f"Each activity object in the array MUST include these keys:\n"
-            f"  - 'time': (string, HH:MM format, e.g., '10:30'. Be logical about this time based on the insertion context. If the day is empty, suggest a reasonable start time. If between activities, suggest a time that fits.)\n"
-            f"  - 'description': (string, detailed description of the new activity)\n"
-            f"  - 'place_name_for_lookup': (string or null, specific, concise, searchable name for map lookup, e.g., 'Eiffel Tower', 'Louvre Museum'. Use null only if truly not applicable, like 'Relax at hotel')\n"
-            f"  - 'place_details': (object or null, with 'name': string (official), 'category': string (e.g., 'restaurant', 'museum'), 'price_level': number (optional, 1-4))\n"
-            f"  - 'cost_estimate': (object, with 'min': number, 'max': number, 'currency': 'USD')\n"
-            f"  - 'ticket_url': (string or null, direct URL for booking if applicable)\n\n"
-            f"Example for suggesting one activity:\n"
-            f"{{ \"activities\": [ {{ \"time\": \"15:00\", \"description\": \"Visit the local art gallery\", ... }} ] }}\n"
-            f"Example for suggesting a sequence of two related activities:\n"
-            f"{{ \"activities\": [ {{ \"time\": \"15:00\", \"description\": \"Coffee at 'The Cozy Cafe'\", ... }}, {{ \"time\": \"16:00\", \"description\": \"Browse the nearby 'Old Town Bookstore'\", ... }} ] }}\n"
-            f"Focus on providing relevant, actionable suggestions that fit the user's request and the day's existing plan."
-        )
-        
-        from .chat_request import ask_gemini, extract_json_from_response
-        # Choose a model. gemini-1.5-flash is generally good for chat-like interactions and structured JSON.
-        model_name = 'gemini-1.5-flash' 
-        raw_response = ask_gemini(prompt, model_name)
-
-        if not raw_response:
-            return Response({"error": "No response from AI assistant."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        set_llm_context("chat_add_activity", user=request.user)
+        with timed("prompt_build"):
+            prompt = build_add_activity_prompt(request.data)
+        cache_key = add_activity_cache_key(request.data)
+        with timed("cache_lookup"):
+            final_activities = get_cached_suggestions(cache_key, fresh=wants_fresh_suggestions(request.data))
+        if final_activities is None:
+            result = generate(prompt, CHAT_MODEL, response_schema=ACTIVITIES_RESPONSE_SCHEMA)
+            with timed("finalize"):
+                final_activities = finalize_added_activities(result)
+            with timed("cache_write"):
+                store_suggestions(cache_key, final_activities)
+        return Response({"activities": final_activities}, status=status.HTTP_200_OK)
+    except PlannerError as e:
+        return Response(e.payload, status=e.status_code)
+    except Exception as e:
+        import traceback
+        return Response({"error": "Internal server error in chat_add_activity.", "details": str(e), "trace": traceback.format_exc()}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        cleaned_json_str = extract_json_from_response(raw_response)
-        if not cleaned_json_str:
-            return Response({"error": "AI assistant response was empty after cleaning."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
-        try:
-            parsed_data = json.loads(cleaned_json_str)
-            if not isinstance(parsed_data, dict) or 'activities' not in parsed_data:
-                raise ValueError("AI response missing 'activities' key or is not a dictionary.")
-
-            suggested_activities_list = parsed_data['activities']
-
-            if not isinstance(suggested_activities_list, list):
-                # This should ideally not happen if the prompt is followed, but good to check.
-                raise ValueError("'activities' key must be an array of activity objects.")
-
-            final_activities = []
-            for activity_obj in suggested_activities_list:
-                if not isinstance(activity_obj, dict):
-                    continue # Skip non-dict items if any
-
-                # Ensure required fields and add defaults if missing
-                if "time" not in activity_obj or not re.match(r"^\d{2}:\d{2}$", str(activity_obj.get("time", ""))):
-                    # Try to infer time based on context if AI fails to provide a valid one
-                    # This is a complex inference, for now, let's assign a placeholder or rely on AI.
-                    # If insert_after_activity_description and existing_activities_today, find its time.
-                    # For simplicity in this step, we can assign a generic time or let frontend handle refinement.
-                    # A better AI prompt should enforce time. If still missing, let's default.
-                    activity_obj["time"] = "12:00" # Default or placeholder if AI misses it
-                
-                if "description" not in activity_obj:
-                    # Critical field, if AI misses this, the suggestion is not useful.
-                    # Depending on strictness, could error out or skip.
-                    # For now, let's assume the AI will be prompted well enough.
-                    # If it happens, we should log it and improve the prompt.
-                    return Response({"error": "AI response missing required 'description' field in one of the activities."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-                if "place_name_for_lookup" not in activity_obj:
-                    activity_obj["place_name_for_lookup"] = None
-                
-                if "cost_estimate" not in activity_obj or not isinstance(activity_obj.get("cost_estimate"), dict):
-                    activity_obj["cost_estimate"] = {"min": 0, "max": 0, "currency": "USD"} # Default if missing or wrong type
-                else: # Ensure currency is USD
-                    activity_obj["cost_estimate"]["currency"] = "USD"
-                    activity_obj["cost_estimate"]["min"] = activity_obj["cost_estimate"].get("min", 0)
-                    activity_obj["cost_estimate"]["max"] = activity_obj["cost_estimate"].get("max", 0)
-
-
-                if "place_details" not in activity_obj and activity_obj.get("place_name_for_lookup"):
-                    activity_obj["place_details"] = {
-                        "name": str(activity_obj.get("place_name_for_lookup", "")),
-                        "category": "attraction" # Default category
-                    }
-                elif isinstance(activity_obj.get("place_details"), dict) and "name" not in activity_obj["place_details"] and activity_obj.get("place_name_for_lookup"):
-                     activity_obj["place_details"]["name"] = str(activity_obj.get("place_name_for_lookup",""))
-                elif activity_obj.get("place_details") is None and activity_obj.get("place_name_for_lookup"): # If place_details is explicitly null but there's a lookup name
-                    activity_obj["place_details"] = { "name": str(activity_obj.get("place_name_for_lookup", "")), "category": "attraction" }
-
-
-                if "ticket_url" not in activity_obj:
-                    activity_obj["ticket_url"] = None
-                
-                final_activities.append(activity_obj)
-            
-            if not final_activities: # If all suggested activities were invalid or filtered out
-                 return Response({"error": "AI did not return any valid activities after filtering."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+# ──────────────────────────────── Async LLM Views (ASGI) ───────────────────────────────── #
+# Async counterparts of plan_trip_view, chat_replace_activity and chat_add_activity.
+# Under uvicorn workers the Gemini call is awaited instead of holding a worker
+# thread, so slow generations no longer starve /health/ or the CRUD endpoints.
+# They share prompt building and response validation with the sync views above.
+# With ASYNC_LLM_VIEWS (on under SERVER_MODE=asgi) they also serve the
+# frontend's /api/plantrip/ and /api/chat-*-activity/ routes (see api/urls.py).
 
-            return Response({"activities": final_activities}, status=status.HTTP_200_OK)
+def _json_body(request) -> dict:
+    """Decode a JSON request body for the plain (non-DRF) async views."""
+    try:
+        body = json.loads(request.body or b"{}")
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise PlannerError({"error": "Request body must be valid JSON."}, status_code=400)
+    if not isinstance(body, dict):
+        raise PlannerError({"error": "Request body must be a JSON object."}, status_code=400)
+    return body
+
+def _optional_jwt_user(request):
+    """Resolve the JWT user like DRF's AllowAny views: None without a token, 401 for an invalid one."""
+    try:
+        result = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed as e:
+        raise PlannerError(e.detail if isinstance(e.detail, dict) else {"detail": e.detail}, status_code=401)
+    return result[0] if result else None
+
+def _authenticate_jwt(request):
+    """Resolve the JWT user the same way DRF's IsAuthenticated views do."""
+    user = _optional_jwt_user(request)
+    if user is None:
+        raise PlannerError({"detail": "Authentication credentials were not provided."}, status_code=401)
+    return user
+
+@csrf_exempt
+@require_POST
+async def plan_trip_async_view(request):
+    try:
+        body = _json_body(request)
+        serializer = PlanTripSerializer(data=body)
+        with timed("validate"):
+            is_valid = serializer.is_valid()
+        if not is_valid:
+            return JsonResponse(serializer.errors, status=400)
+        data = serializer.validated_data
+        key = make_trip_cache_key(data)
+        user = await sync_to_async(_optional_jwt_user)(request)
+        set_llm_context("plan_trip_async", data.get("searchMode"), user)
+        await record_request_shape_async(data, serializer.data)
+        enrich = wants_place_enrichment(body)
+        if enrich:
+            with timed("cache_lookup"):
+                enriched_data = await get_cached_enriched_itinerary_async(key, refresh=lambda: refresh_itinerary(data, key))
+            if enriched_data:
+                return JsonResponse(enriched_data, status=200)
+
+        with timed("cache_lookup"):
+            parsed_result = await get_cached_itinerary_async(key, refresh=lambda: refresh_itinerary(data, key))
+            if not parsed_result and similar_trip_cache.enabled:
+                parsed_result = await sync_to_async(get_similar_itinerary)(data, key)
+        if not parsed_result and wants_background_job(request.headers, body):
+            try:
+                job_id, created = await sync_to_async(enqueue_trip_job)(serializer.data, key, enrich, user_id=getattr(user, "pk", None))
+                token = await sync_to_async(grant_job_access)(job_id)
+                job = await sync_to_async(get_job)(job_id)
+            except RedisError as e:
+                print(f"⚠️ Could not queue trip job ({e}); generating synchronously.")
+            else:
+                payload = job_response_payload(job_id, job["status"] if job else STATUS_QUEUED, token)
+                response = JsonResponse(payload, status=202)
+                response["Location"] = payload["status_url"]
+                return response
+        if not parsed_result:
+            try:
+                parsed_result = await trip_single_flight.run_async(
+                    key,
+                    compute=lambda: generate_and_cache_itinerary_async(data, key),
+                    load=lambda: get_cached_itinerary_async(key),
+                )
+            except LeaderFailed as e:
+                raise PlannerError(e.payload, status_code=e.status_code)
+        if enrich:
+            # Places lookups use the sync googlemaps client and its thread pool.
+            with timed("enrich"):
+                parsed_result = await sync_to_async(enrich_and_cache_itinerary)(parsed_result, key)
+        return JsonResponse(parsed_result, status=200)
+    except PlannerError as e:
+        return JsonResponse(e.payload, status=e.status_code)
+    except Exception as e:
+        print(f"❌ Unexpected Error during async Gemini interaction or processing: {e}")
+        import traceback
+        traceback.print_exc()
+        return JsonResponse({"error": f"An unexpected error occurred: {e}"}, status=500)
 
-        except ValueError as ve:
-            return Response({"error": "AI response format error or validation issue.", "details": str(ve), "raw_cleaned_response": cleaned_json_str[:500]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        except json.JSONDecodeError as e:
-            return Response({"error": "Failed to parse AI response as JSON.", "details": str(e), "raw_cleaned_response": cleaned_json_str[:500]}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+@csrf_exempt
+@require_POST
+async def chat_replace_activity_async(request):
+    try:
+        payload = _json_body(request)
+        user = await sync_to_async(_optional_jwt_user)(request)
+        set_llm_context("chat_replace_activity_async", user=user)
+        with timed("prompt_build"):
+            prompt, original_time = build_replace_activity_prompt(payload)
+        cache_key = replace_activity_cache_key(payload)
+        with timed("cache_lookup"):
+            final_activities = await get_cached_suggestions_async(cache_key, fresh=wants_fresh_suggestions(payload))
+        if final_activities is None:
+            result = await generate_async(prompt, CHAT_MODEL, response_schema=ACTIVITIES_RESPONSE_SCHEMA)
+            with timed("finalize"):
+                final_activities = finalize_replacement_activities(result, original_time)
+            with timed("cache_write"):
+                await store_suggestions_async(cache_key, final_activities)
+        return JsonResponse({"activities": final_activities}, status=200)
+    except PlannerError as e:
+        return JsonResponse(e.payload, status=e.status_code)
+    except Exception as e:
+        print(f"❌ Unexpected error in chat_replace_activity_async: {e}")
+        import traceback
+        traceback.print_exc()  # server log only; clients get a generic error
+        return JsonResponse({"error": "Internal server error."}, status=500)
 
+@csrf_exempt
+@require_POST
+async def chat_add_activity_async(request):
+    try:
+        user = await sync_to_async(_authenticate_jwt)(request)
+        set_llm_context("chat_add_activity_async", user=user)
+        payload = _json_body(request)
+        with timed("prompt_build"):
+            prompt = build_add_activity_prompt(payload)
+        cache_key = add_activity_cache_key(payload)
+        with timed("cache_lookup"):
+            final_activities = await get_cached_suggestions_async(cache_key, fresh=wants_fresh_suggestions(payload))
+        if final_activities is None:
+            result = await generate_async(prompt, CHAT_MODEL, response_schema=ACTIVITIES_RESPONSE_SCHEMA)
+            with timed("finalize"):
+                final_activities = finalize_added_activities(result)
+            with timed("cache_write"):
+                await store_suggestions_async(cache_key, final_activities)
+        return JsonResponse({"activities": final_activities}, status=200)
+    except PlannerError as e:
+        return JsonResponse(e.payload, status=e.status_code)
     except Exception as e:
+        print(f"❌ Unexpected error in chat_add_activity_async: {e}")
         import traceback
-        return Response({"error": "Internal server error in chat_add_activity.", "details": str(e), "trace": traceback.format_exc()}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        traceback.print_exc()  # server log only; clients get a generic error
+        return JsonResponse({"error": "Internal server error in chat_add_activity."}, status=500)
 
 # ──────────────────────────────── Chat Add Activity Note ───────────────────────────────── #
 @api_view(['POST'])
@@ -1226,4 +1858,53 @@ def health_check(request):
     except Exception as e:
         return JsonResponse({"status": "error", "database": str(e)}, status=500)
 
+# ──────────────────────────────── Metrics ──────────────────────────────── #
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def metrics_view(request):
+    """
+    Operational counters for staff users.
+
+    Sections:
+    - single_flight: leaders (LLM calls made), deduplicated (calls saved), timeouts, fallbacks
+    - place_single_flight: the same counters for Google Places lookups
+    - photo_cache: hits, misses, not_modified (304s) and cached_bytes for the photo proxy
+    - models: per Gemini model calls, success_rate, p50_ms/p95_ms and outcome/routing counters
+    - similar_trips: near-duplicate cache hits/misses/stale, indexed entries and threshold
+    - chat_cache: chat suggestion cache hits/misses/bypassed (regenerate)
+    - warmup: itineraries pre-generated/failed/already fresh by warm_trip_cache, last_run
+    - stale_refresh: stale itineraries served, background refreshes done/failed
+    - stages: per route and request stage (validate, cache_lookup, gemini, ...) requests and p50_ms/p95_ms
+    """
+    return Response({
+        "single_flight": trip_single_flight.stats(),
+        "place_single_flight": place_single_flight.stats(),
+        "photo_cache": photo_cache_stats(),
+        "models": model_stats.stats(),
+        "similar_trips": similar_trip_cache.stats(),
+        "chat_cache": chat_cache_stats(),
+        "warmup": warmup_stats(),
+        "stale_refresh": refresh_stats(),
+        "stages": stage_stats.stats(),
+    })
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def llm_usage_view(request):
+    """
+    LLM calls of the last `hours` hours (default 24) from the usage ledger.
+
+    Query params:
+    - hours: look-back window
+    - by: model (default), searchMode or endpoint
+
+    Each row: calls, not_ok, p50_ms/p95_ms latency, prompt/output/cached tokens, cost_usd, cost_per_call_usd
+    """
+    group_by = request.query_params.get("by", "model")
+    if group_by not in ("model", "searchMode", "endpoint"):
+        return Response({"error": "by must be one of model, searchMode, endpoint."}, status=400)
+    try:
+        hours = float(request.query_params.get("hours", 24))
+    except ValueError:
+        return Response({"error": "hours must be a number."}, status=400)
+    return Response({"hours": hours, "by": group_by, "rows": usage_report(hours, group_by)})
@@ -127,6 +127,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',   
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -156,6 +157,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Under ASGI (start.sh SERVER_MODE=asgi) sync views run on a single thread per process,
+# so /api/plantrip/ and /api/chat-*-activity/ are served by their async views instead.
+SERVER_MODE = os.getenv('SERVER_MODE', 'wsgi').lower()
+ASYNC_LLM_VIEWS = os.getenv('ASYNC_LLM_VIEWS', str(SERVER_MODE == 'asgi')).lower() == 'true'
+
 # Database configuration
 DATABASES = {
     'default': {
@@ -169,14 +175,139 @@ DATABASES = {
     }
 }
 
+# Gemini context caching of the static trip prompt (falls back to an inline system instruction)
+GEMINI_CONTEXT_CACHE_ENABLED = os.getenv('GEMINI_CONTEXT_CACHE_ENABLED', 'True').lower() == 'true'
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv('GEMINI_CONTEXT_CACHE_TTL', '3600'))
+
+# Structured output: Gemini answers with bare JSON following api/itinerary_schema.py
+GEMINI_JSON_MODE_ENABLED = os.getenv('GEMINI_JSON_MODE_ENABLED', 'True').lower() == 'true'
+
+# searchMode model cascade: hedging, fallback and latency budgets (api/model_router.py)
+MODEL_ROUTER_ENABLED = os.getenv('MODEL_ROUTER_ENABLED', 'True').lower() == 'true'
+MODEL_ROUTER_MAX_WORKERS = int(os.getenv('MODEL_ROUTER_MAX_WORKERS', '16'))
+
+# Incomplete/truncated itineraries: regenerate only the missing days/fields (api/itinerary_repair.py)
+TRIP_REPAIR_ENABLED = os.getenv('TRIP_REPAIR_ENABLED', 'True').lower() == 'true'
+TRIP_REPAIR_MAX_ROUNDS = int(os.getenv('TRIP_REPAIR_MAX_ROUNDS', '2'))
+
+# Trips of at least this many days are generated as skeleton + parallel days (0, the default, disables it)
+TRIP_FANOUT_MIN_DAYS = int(os.getenv('TRIP_FANOUT_MIN_DAYS', '0'))
+TRIP_FANOUT_MAX_WORKERS = int(os.getenv('TRIP_FANOUT_MAX_WORKERS', '6'))
+
+# Per-call LLM usage ledger (api/llm_usage.py): buffered in-process, bulk-written to api_llmcallrecord.
+# Report with `manage.py llm_usage_report` or GET /api/metrics/llm-usage/.
+LLM_LEDGER_ENABLED = os.getenv('LLM_LEDGER_ENABLED', 'True').lower() == 'true'
+LLM_LEDGER_BATCH_SIZE = int(os.getenv('LLM_LEDGER_BATCH_SIZE', '50'))
+LLM_LEDGER_FLUSH_INTERVAL = float(os.getenv('LLM_LEDGER_FLUSH_INTERVAL', '10'))
+
+# Per-stage request timing (api/utils/request_timing.py): Server-Timing headers and per-route
+# stage latency in the staff metrics. OpenTelemetry spans need opentelemetry-api plus an exporter.
+REQUEST_TIMING_ENABLED = os.getenv('REQUEST_TIMING_ENABLED', 'True').lower() == 'true'
+REQUEST_TIMING_OTEL_ENABLED = os.getenv('REQUEST_TIMING_OTEL_ENABLED', 'False').lower() == 'true'
+
+# Near-duplicate itinerary cache (api/similar_trip_cache.py, requires numpy).
+# Tune the threshold with `manage.py evaluate_similar_cache <request log>`.
+SIMILAR_TRIP_CACHE_ENABLED = os.getenv('SIMILAR_TRIP_CACHE_ENABLED', 'False').lower() == 'true'
+SIMILAR_TRIP_CACHE_THRESHOLD = float(os.getenv('SIMILAR_TRIP_CACHE_THRESHOLD', '0.9'))
+
+# Chat activity suggestions cache (api/chat_cache.py); clients send "regenerate": true to skip it
+CHAT_CACHE_ENABLED = os.getenv('CHAT_CACHE_ENABLED', 'True').lower() == 'true'
+CHAT_CACHE_TTL = int(os.getenv('CHAT_CACHE_TTL', '900'))
+
+# Request-shape counts and off-peak pre-generation (api/trip_warmup.py, `manage.py warm_trip_cache`).
+# Shapes whose requests are in the past are only warmed with SIMILAR_TRIP_CACHE_ENABLED.
+TRIP_SHAPE_LOG_ENABLED = os.getenv('TRIP_SHAPE_LOG_ENABLED', 'True').lower() == 'true'
+TRIP_SHAPE_LOG_DAYS = int(os.getenv('TRIP_SHAPE_LOG_DAYS', '7'))
+TRIP_WARMUP_WINDOW = os.getenv('TRIP_WARMUP_WINDOW', '01:00-06:00')
+TRIP_WARMUP_TOP = int(os.getenv('TRIP_WARMUP_TOP', '100'))
+TRIP_WARMUP_MIN_REQUESTS = int(os.getenv('TRIP_WARMUP_MIN_REQUESTS', '3'))
+TRIP_WARMUP_MAX_GENERATIONS = int(os.getenv('TRIP_WARMUP_MAX_GENERATIONS', '50'))
+TRIP_WARMUP_CONCURRENCY = int(os.getenv('TRIP_WARMUP_CONCURRENCY', '2'))
+TRIP_WARMUP_REFRESH_WITHIN = int(os.getenv('TRIP_WARMUP_REFRESH_WITHIN', str(60 * 60 * 12)))
+
+# Background trip jobs (api/trip_jobs.py, `manage.py run_trip_worker`).
+# Clients opt in per request (Prefer: respond-async / "background": true); TRIP_JOBS_DEFAULT makes it the default.
+TRIP_JOBS_DEFAULT = os.getenv('TRIP_JOBS_DEFAULT', 'False').lower() == 'true'
+TRIP_JOB_TTL = int(os.getenv('TRIP_JOB_TTL', str(60 * 60 * 24)))
+# 0 derives the stale timeout from the slowest possible generation (api.trip_jobs.stale_after_seconds).
+TRIP_JOB_STALE_AFTER = int(os.getenv('TRIP_JOB_STALE_AFTER', '0'))
+TRIP_JOB_MAX_ATTEMPTS = int(os.getenv('TRIP_JOB_MAX_ATTEMPTS', '3'))
+TRIP_JOB_EVENTS_TIMEOUT = int(os.getenv('TRIP_JOB_EVENTS_TIMEOUT', '300'))
+TRIP_WORKER_CONCURRENCY = int(os.getenv('TRIP_WORKER_CONCURRENCY', '4'))
+# Sync requests stop waiting for an identical in-flight generation before gunicorn kills them and answer 202 with a job.
+TRIP_SYNC_WAIT_SECONDS = int(os.getenv('TRIP_SYNC_WAIT_SECONDS', str(max(int(os.getenv('GUNICORN_TIMEOUT', '60')) - 10, 5))))
+
 # Redis configuration
 REDIS_URL = os.getenv('REDIS_URL')
 
+# Codec for cached itineraries: 'zstd' (needs zstandard, falls back to zlib), 'zlib' or 'json'
+TRIP_CACHE_CODEC = os.getenv('TRIP_CACHE_CODEC', 'zstd')
+
+# Stale-while-revalidate: itineraries older than the soft TTL are served while one
+# background refresh regenerates them; the hard TTL (3 days) still evicts them.
+TRIP_CACHE_SOFT_TTL = int(os.getenv('TRIP_CACHE_SOFT_TTL', str(60 * 60 * 36)))
+TRIP_CACHE_REFRESH_WORKERS = int(os.getenv('TRIP_CACHE_REFRESH_WORKERS', '2'))
+
+# Shared Django cache (place details etc.) on the same Redis, so every worker
+# and node sees one warm cache. Falls back to per-process memory without Redis.
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'tripplanner'),
+            'TIMEOUT': 60 * 60 * 72,
+            'OPTIONS': {
+                'serializer': 'api.utils.cache_codec.CompressedRedisSerializer',
+                'socket_connect_timeout': 2,
+                'socket_timeout': 2,
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Google Places HTTP client (one pooled client per process)
+GOOGLE_PLACES_POOL_SIZE = int(os.getenv('GOOGLE_PLACES_POOL_SIZE', '10'))
+GOOGLE_PLACES_CONNECT_TIMEOUT = float(os.getenv('GOOGLE_PLACES_CONNECT_TIMEOUT', '3'))
+GOOGLE_PLACES_READ_TIMEOUT = float(os.getenv('GOOGLE_PLACES_READ_TIMEOUT', '10'))
+GOOGLE_PLACES_MAX_RETRIES = int(os.getenv('GOOGLE_PLACES_MAX_RETRIES', '2'))
+GOOGLE_PLACES_RETRY_TIMEOUT = int(os.getenv('GOOGLE_PLACES_RETRY_TIMEOUT', '15'))
+# Client-side rate limit, now shared by every request in the process
+GOOGLE_PLACES_QPS = int(os.getenv('GOOGLE_PLACES_QPS', '100'))
+# POST /api/place-details/batch/ (signed-in users): max queries per request, requests per user
+# (DRF throttle rate) and concurrent fetches per process
+PLACE_BATCH_MAX_QUERIES = int(os.getenv('PLACE_BATCH_MAX_QUERIES', '25'))
+PLACE_BATCH_RATE = os.getenv('PLACE_BATCH_RATE', '30/min')
+PLACE_BATCH_MAX_WORKERS = int(os.getenv('PLACE_BATCH_MAX_WORKERS', '8'))
+# Photo proxy byte cache in Redis: TTL since last use, largest cacheable photo, total budget (LRU-evicted)
+PHOTO_CACHE_TTL = int(os.getenv('PHOTO_CACHE_TTL', str(60 * 60 * 24 * 7)))
+PHOTO_CACHE_MAX_BYTES = int(os.getenv('PHOTO_CACHE_MAX_BYTES', str(2 * 1024 * 1024)))
+PHOTO_CACHE_MAX_TOTAL_BYTES = int(os.getenv('PHOTO_CACHE_MAX_TOTAL_BYTES', str(256 * 1024 * 1024)))
+# Signed photo proxy URLs in place details (key defaults to SECRET_KEY; base URL empty = relative)
+PHOTO_URL_SIGNING_KEY = os.getenv('PHOTO_URL_SIGNING_KEY', SECRET_KEY)
+PHOTO_URL_REQUIRE_SIGNATURE = os.getenv('PHOTO_URL_REQUIRE_SIGNATURE', 'True').lower() == 'true'
+# Absolute origin for photo URLs (e.g. a CDN); the frontend must get the same value as NEXT_PUBLIC_PHOTO_PROXY_BASE_URL.
+PHOTO_PROXY_BASE_URL = os.getenv('PHOTO_PROXY_BASE_URL', '').rstrip('/')
+# Resized WebP/AVIF photo variants (needs Pillow); masters above the size limit are proxied as-is
+PHOTO_TRANSCODE_ENABLED = os.getenv('PHOTO_TRANSCODE_ENABLED', 'True').lower() == 'true'
+PHOTO_TRANSCODE_WORKERS = int(os.getenv('PHOTO_TRANSCODE_WORKERS', '2'))
+PHOTO_MASTER_MAX_BYTES = int(os.getenv('PHOTO_MASTER_MAX_BYTES', str(8 * 1024 * 1024)))
+# Attach Google place data to generated plans unless the request sets enrichPlaces
+TRIP_ENRICH_PLACES_DEFAULT = os.getenv('TRIP_ENRICH_PLACES_DEFAULT', 'False').lower() == 'true'
+
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'place_batch': PLACE_BATCH_RATE,
+    },
 }
 
 # Password validation
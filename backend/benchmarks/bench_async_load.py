@@ -0,0 +1,181 @@
+"""
+Load benchmark: sync WSGI views vs async ASGI views for LLM-backed endpoints.
+
+Gemini is replaced with a fixed-latency stand-in so the numbers only reflect
+how the server handles concurrency. Two scenarios are measured with the same
+burst of /plantrip/ requests plus a stream of /health/ probes:
+
+- before: the WSGI app behind a pool of `workers * threads` slots, mirroring
+  `gunicorn --workers 3 --threads 2`. Each slot is held for the full LLM call.
+- after:  one ASGI process (backend.asgi) serving /api/plantrip/async/, where
+  the LLM call is awaited on the event loop.
+
+Requires the usual backend environment (.env with REDIS_URL etc.); every
+request uses a unique destination so the itinerary cache never hits.
+
+Usage (from backend/):
+    python benchmarks/bench_async_load.py --requests 200 --llm-latency 2.0
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+
+django.setup()
+
+import httpx
+from django.core.asgi import get_asgi_application
+from django.test import Client
+
+from api import views
+from api.chat_request import GeminiResult
+
+# Complete plan, so the repair stage (api/itinerary_repair.py) never makes a real call.
+FAKE_PLAN = json.dumps({
+    "summary": "Benchmark itinerary",
+    "days": [
+        {"title": f"Day {i + 1}", "activities": [{"time": "09:00", "description": "Benchmark activity"}]}
+        for i in range(3)
+    ],
+    "destination_info": {"country": "Benchland", "city": "Bench City", "currency": "USD"},
+    "total_cost_estimate": {"min": 100, "max": 200, "currency": "USD"},
+})
+
+
+def fake_result(search_mode):
+    result = GeminiResult(FAKE_PLAN, search_mode)
+    result.data = json.loads(FAKE_PLAN)
+    return result
+
+
+def install_fake_gemini(latency: float):
+    def generate_routed(prompt, search_mode, system_instruction=None, **kwargs):
+        time.sleep(latency)
+        return fake_result(search_mode)
+
+    async def generate_routed_async(prompt, search_mode, system_instruction=None, **kwargs):
+        await asyncio.sleep(latency)
+        return fake_result(search_mode)
+
+    views.generate_routed = generate_routed
+    views.generate_routed_async = generate_routed_async
+
+
+def plan_payload():
+    return {"destination": f"Bench City {uuid.uuid4().hex}", "searchMode": "quick"}
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def report(label, elapsed, plan_latencies, health_latencies):
+    print(f"\n{label}")
+    print(f"  plan requests:   {len(plan_latencies)} in {elapsed:.2f}s -> {len(plan_latencies) / elapsed:.1f} req/s")
+    print(f"  plan latency:    p50 {percentile(plan_latencies, 50):.2f}s  p95 {percentile(plan_latencies, 95):.2f}s")
+    print(f"  /health/ probes: {len(health_latencies)}  p50 {percentile(health_latencies, 50) * 1000:.0f}ms  "
+          f"p95 {percentile(health_latencies, 95) * 1000:.0f}ms  max {max(health_latencies or [0]) * 1000:.0f}ms")
+
+
+def run_wsgi(n_requests, slots, probe_interval):
+    plan_latencies, health_latencies = [], []
+    done = threading.Event()
+
+    def call(path, payload=None):
+        client = Client(HTTP_HOST='localhost')
+        if payload is None:
+            client.get(path)
+        else:
+            client.post(path, data=json.dumps(payload), content_type='application/json')
+        return time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=slots) as pool:
+        # Latency is measured from submission, so time spent waiting for a free
+        # slot (the queue in front of gunicorn) is included.
+        started = time.perf_counter()
+        futures = [pool.submit(call, '/api/plantrip/', plan_payload()) for _ in range(n_requests)]
+
+        def probe():
+            while not done.is_set():
+                submitted = time.perf_counter()
+                health_latencies.append(pool.submit(call, '/health/').result() - submitted)
+                time.sleep(probe_interval)
+
+        prober = threading.Thread(target=probe)
+        prober.start()
+        for future in futures:
+            plan_latencies.append(future.result() - started)
+        elapsed = time.perf_counter() - started
+        done.set()
+        prober.join()
+    return elapsed, plan_latencies, health_latencies
+
+
+async def run_asgi(n_requests, probe_interval):
+    plan_latencies, health_latencies = [], []
+    transport = httpx.ASGITransport(app=get_asgi_application())
+    async with httpx.AsyncClient(transport=transport, base_url='http://localhost', timeout=None) as client:
+        async def timed_plan():
+            started = time.perf_counter()
+            await client.post('/api/plantrip/async/', json=plan_payload())
+            plan_latencies.append(time.perf_counter() - started)
+
+        async def probe(stop):
+            while not stop.is_set():
+                started = time.perf_counter()
+                await client.get('/health/')
+                health_latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(probe_interval)
+
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe(stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(timed_plan() for _ in range(n_requests)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await prober
+    return elapsed, plan_latencies, health_latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='concurrent /plantrip/ requests per scenario')
+    parser.add_argument('--llm-latency', type=float, default=2.0, help='seconds each fake Gemini call takes')
+    parser.add_argument('--workers', type=int, default=3, help='gunicorn workers in the WSGI scenario')
+    parser.add_argument('--threads', type=int, default=2, help='gunicorn threads per worker in the WSGI scenario')
+    parser.add_argument('--probe-interval', type=float, default=0.2, help='seconds between /health/ probes')
+    args = parser.parse_args()
+
+    install_fake_gemini(args.llm_latency)
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    print(f"{args.requests} plan requests, fake LLM latency {args.llm_latency}s")
+
+    # The views log every step with print(); keep the report readable.
+    with contextlib.redirect_stdout(io.StringIO()):
+        wsgi_results = run_wsgi(args.requests, args.workers * args.threads, args.probe_interval)
+        asgi_results = asyncio.run(run_asgi(args.requests, args.probe_interval))
+
+    report(f"before: WSGI, {args.workers} workers x {args.threads} threads", *wsgi_results)
+    report("after: ASGI, 1 process", *asgi_results)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Cache codec benchmark: stored size and encode/decode time per itinerary.
+
+Compares the old format (`json.dumps` text read back with `json.loads`)
+against the codecs in api/utils/cache_codec.py. Payloads are synthetic
+itineraries that follow the planning prompt's output
+schema (activities with place_details and cost estimates, destination_info,
+total_cost_estimate) at several trip lengths. The sample trip_output.json in
+the repo root is not valid JSON (unescaped quotes), so it cannot be used as-is.
+
+No Django settings or Redis are needed.
+
+Usage (from backend/):
+    python benchmarks/bench_cache_codec.py --days 3 7 14 --iterations 500
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.utils import cache_codec
+from api.utils.cache_codec import decode_value, get_codec
+
+CATEGORIES = ["attraction", "restaurant", "museum", "park", "shopping", "cafe"]
+WORDS = ("historic quarter market walk sunset view local cuisine gallery riverside "
+         "garden temple tasting tour harbour old town rooftop bakery square").split()
+
+
+def sentence(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def make_activity(rng, hour):
+    name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}"
+    activity = {
+        "time": f"{hour:02d}:{rng.choice(['00', '30'])}",
+        "description": sentence(rng, rng.randint(8, 20)),
+        "place_name_for_lookup": name,
+        "cost_estimate": {"min": rng.randint(0, 30), "max": rng.randint(30, 80), "currency": "USD"},
+    }
+    if rng.random() < 0.8:
+        activity["place_details"] = {
+            "name": name,
+            "category": rng.choice(CATEGORIES),
+            "price_level": rng.randint(1, 4),
+            "address": f"{rng.randint(1, 200)} {rng.choice(WORDS).title()} Street",
+            "rating": round(rng.uniform(3.5, 5.0), 1),
+            "photos": [f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photoreference="
+                       f"{rng.getrandbits(256):064x}" for _ in range(rng.randint(1, 3))],
+        }
+    if rng.random() < 0.3:
+        activity["ticket_url"] = f"https://example.com/tickets/{rng.getrandbits(32):08x}"
+    return activity
+
+
+def make_itinerary(n_days, seed=0):
+    rng = random.Random(seed)
+    days = []
+    for day in range(n_days):
+        hours = sorted(rng.sample(range(8, 22), rng.randint(5, 8)))
+        days.append({
+            "title": f"Day {day + 1}: {sentence(rng, 4)}",
+            "activities": [make_activity(rng, hour) for hour in hours],
+            "day_cost_estimate": {"min": rng.randint(50, 150), "max": rng.randint(150, 300), "currency": "USD"},
+        })
+    return {
+        "summary": sentence(rng, 25),
+        "days": days,
+        "destination_info": {
+            "country": "Japan", "city": "Kyoto", "language": "Japanese", "currency": "JPY",
+            "exchange_rate": 110.5,
+            "budget_tips": [sentence(rng, 12) for _ in range(4)],
+            "transportation_options": [
+                {"name": rng.choice(WORDS).title(), "description": sentence(rng, 10),
+                 "cost_range": "$2-3 per ride", "app_name": "Transit", "app_link": "https://example.com/app"}
+                for _ in range(3)
+            ],
+            "discount_options": [{"name": "City Pass", "description": sentence(rng, 10), "price": "$8"}],
+            "emergency_info": {"police": "110", "ambulance": "119"},
+        },
+        "total_cost_estimate": {
+            "min": 800, "max": 1200, "currency": "USD",
+            "accommodations": {"min": 400, "max": 600}, "food": {"min": 150, "max": 250},
+            "attractions": {"min": 100, "max": 150}, "transportation": {"min": 50, "max": 100},
+        },
+    }
+
+
+def timed(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def bench(itinerary, iterations):
+    rows = []
+
+    # Before: what plan_trip_view stored (json.dumps) and read back (json.loads).
+    legacy = json.dumps(itinerary).encode("utf-8")
+    rows.append(("json.dumps (before)", len(legacy),
+                 timed(lambda: json.dumps(itinerary).encode("utf-8"), iterations),
+                 timed(lambda: json.loads(legacy), iterations)))
+
+    for name in ("json", "zlib", "zstd"):
+        if name == "zstd" and cache_codec.zstandard is None:
+            continue
+        codec = get_codec(name)
+        encoded = codec.encode(itinerary)
+        assert decode_value(encoded) == itinerary
+        rows.append((name, len(encoded),
+                     timed(lambda: codec.encode(itinerary), iterations),
+                     timed(lambda: decode_value(encoded), iterations)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, nargs='+', default=[3, 7, 14], help='trip lengths to benchmark')
+    parser.add_argument('--iterations', type=int, default=300, help='encode/decode repetitions per codec')
+    args = parser.parse_args()
+
+    print(f"serializer: {'orjson' if cache_codec.orjson is not None else 'json'}, "
+          f"zstandard: {'yes' if cache_codec.zstandard is not None else 'no'}")
+    for n_days in args.days:
+        rows = bench(make_itinerary(n_days), args.iterations)
+        baseline = rows[0][1]
+        print(f"\n{n_days}-day itinerary")
+        print(f"  {'codec':<24}{'bytes':>9}{'ratio':>8}{'encode µs':>12}{'decode µs':>12}")
+        for name, size, encode_us, decode_us in rows:
+            print(f"  {name:<24}{size:>9}{size / baseline:>8.2f}{encode_us:>12.1f}{decode_us:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
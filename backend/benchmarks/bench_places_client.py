@@ -0,0 +1,115 @@
+"""
+Places client benchmark: a new googlemaps Client per request vs one pooled client.
+
+Each "request" performs what GooglePlacesService._fetch_place does on a cache
+miss: a text search followed by a details call. The Places API is replaced by a
+local keep-alive HTTP server that charges `--handshake-ms` once per new
+connection, standing in for the TCP + TLS handshake to maps.googleapis.com
+(typically 2-3 round trips, 30-150 ms from a cloud region).
+
+- before: GooglePlacesService() per request, as get_place_details_view did, so
+  every request opens fresh connections.
+- after:  get_places_service(), whose pooled session reuses warm connections.
+
+Requires the usual backend environment (.env with REDIS_URL etc.) because the
+service module is imported through Django. No Google API calls are made.
+
+Usage (from backend/):
+    python benchmarks/bench_places_client.py --requests 200 --handshake-ms 60
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+
+django.setup()
+
+from api import google_places_service
+from api.google_places_service import GooglePlacesService, build_places_client
+
+SEARCH_RESPONSE = json.dumps({"status": "OK", "results": [{"place_id": "bench-place"}]}).encode()
+DETAILS_RESPONSE = json.dumps({"status": "OK", "result": {"name": "Bench Place", "formatted_address": "1 Bench St"}}).encode()
+
+
+def make_handler(handshake_s, api_latency_s):
+    class FakePlacesHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive
+
+        def setup(self):
+            super().setup()
+            # Headers and body are written separately; avoid Nagle/delayed-ACK stalls.
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            time.sleep(handshake_s)  # once per connection
+
+        def do_GET(self):
+            time.sleep(api_latency_s)
+            body = DETAILS_RESPONSE if "/details/" in self.path else SEARCH_RESPONSE
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return FakePlacesHandler
+
+
+def lookup(service):
+    started = time.perf_counter()
+    result = service.client.places("bench query")
+    service.client.place(result["results"][0]["place_id"], fields=["name", "formatted_address"])
+    return time.perf_counter() - started
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run(label, get_service, n_requests):
+    get_service()  # warm-up (the pooled client keeps this connection)
+    latencies = [lookup(get_service()) for _ in range(n_requests)]
+    print(f"{label:<38} p50 {percentile(latencies, 50) * 1000:6.1f}ms  "
+          f"p95 {percentile(latencies, 95) * 1000:6.1f}ms  total {sum(latencies):.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='place lookups per scenario')
+    parser.add_argument('--handshake-ms', type=float, default=60, help='simulated cost of opening a connection')
+    parser.add_argument('--api-latency-ms', type=float, default=20, help='simulated Places API processing time')
+    args = parser.parse_args()
+    logging.getLogger('googlemaps.client').setLevel(logging.WARNING)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.handshake_ms / 1000, args.api_latency_ms / 1000))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    def fresh_service():
+        return GooglePlacesService(client=build_places_client(base_url=base_url))
+
+    google_places_service._places_service = fresh_service()
+
+    print(f"{args.requests} lookups (search + details), handshake {args.handshake_ms:.0f}ms, "
+          f"API latency {args.api_latency_ms:.0f}ms")
+    run("before: new client per request", fresh_service, args.requests)
+    run("after: shared pooled client", google_places_service.get_places_service, args.requests)
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Prompt benchmark: input tokens per trip request, before and after the static/dynamic split.
+
+- before: the whole prompt (instructions + schema + preferences) is sent as one
+  user message on every request, billed at the full input rate.
+- after:  only the rendered preferences are sent per request; the static system
+  instruction lives in a Gemini context cache and is billed at the cached-token
+  rate (`--cached-rate`, a fraction of the normal input price).
+
+Token counts come from the Gemini count_tokens API with `--live` (needs a real
+GOOGLE_AI_API_KEY); otherwise they are estimated at 4 characters per token.
+Render time for the per-request part is measured locally either way.
+
+Usage (from backend/):
+    python benchmarks/bench_prompt_tokens.py
+    python benchmarks/bench_prompt_tokens.py --live --cached-rate 0.25
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+
+django.setup()
+
+import google.generativeai as genai
+
+from api.prompts import TRIP_SYSTEM_INSTRUCTION, build_trip_prompt, render_trip_request
+from api.chat_request import model_for_search_mode
+
+SEARCH_MODES = ("quick", "normal", "pro")
+
+SAMPLE_REQUEST = {
+    "destination": "Kyoto, Japan",
+    "startDate": date(2025, 10, 3),
+    "endDate": date(2025, 10, 3) + timedelta(days=6),
+    "tripStyle": ["Cultural", "Foodie"],
+    "interests": ["Temples", "Gardens", "Street food", "Photography"],
+    "pace": "moderate",
+    "budget": "Mid-range",
+    "transportationMode": "Walking & Public Transit",
+    "travelWith": ["Couple"],
+    "mustSeeAttractions": "",
+}
+
+
+def count_tokens(model_name, text, live):
+    if not live:
+        return round(len(text) / 4)
+    return genai.GenerativeModel(model_name).count_tokens(text).total_tokens
+
+
+def render_time_us(fn, iterations=2000):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--live', action='store_true', help='count tokens with the Gemini API instead of estimating')
+    parser.add_argument('--cached-rate', type=float, default=0.25, help='price of a cached input token relative to a normal one')
+    args = parser.parse_args()
+
+    system_instruction, user_prompt = build_trip_prompt(SAMPLE_REQUEST)
+    combined = f"{system_instruction}\n\n{user_prompt}"
+
+    print(f"token counts: {'Gemini count_tokens' if args.live else 'estimated (chars / 4)'}, "
+          f"cached tokens billed at {args.cached_rate:.0%}")
+    print(f"static part {len(TRIP_SYSTEM_INSTRUCTION)} chars, per-request part {len(user_prompt)} chars\n")
+    print(f"  {'searchMode':<10} {'model':<32}{'before':>9}{'after':>9}{'cached':>9}{'billed':>9}{'saving':>9}")
+    for mode in SEARCH_MODES:
+        model_name = model_for_search_mode(mode)
+        before = count_tokens(model_name, combined, args.live)
+        after = count_tokens(model_name, user_prompt, args.live)
+        cached = max(before - after, 0)
+        billed = after + cached * args.cached_rate
+        print(f"  {mode:<10} {model_name:<32}{before:>9}{after:>9}{cached:>9}{billed:>9.0f}{1 - billed / before:>9.0%}")
+
+    # The old builder re-created the full ~10 KB f-string per request.
+    old_render = render_time_us(lambda: f"{TRIP_SYSTEM_INSTRUCTION}\n\n{render_trip_request(SAMPLE_REQUEST)}".strip())
+    new_render = render_time_us(lambda: render_trip_request(SAMPLE_REQUEST))
+    print(f"\nrender time per request: before {old_render:.1f}µs, after {new_render:.1f}µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Fan-out benchmark: one call for the whole trip vs skeleton + parallel day calls.
+
+Gemini is replaced with a stand-in whose latency follows the usual decoding
+model: `--first-token-ms` per call plus `--token-ms` per output token. Output
+sizes are `--day-tokens` per day and `--overhead-tokens` for the trip-level
+fields (summary, destination info, costs). Sleeps are divided by `--speedup`
+so the run is quick, and reported latencies are scaled back.
+
+- before: a single call writes every day (latency grows with trip length).
+- after:  a short skeleton call, then one call per day in a pool of
+  TRIP_FANOUT_MAX_WORKERS (api/trip_fanout.py).
+
+No Google API calls or Redis access are made (context caching is switched off).
+
+Usage (from backend/):
+    python benchmarks/bench_trip_fanout.py --days 3 7 14 --workers 6
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+import django
+
+django.setup()
+
+from django.conf import settings
+
+from api import chat_request, trip_fanout
+from api.itinerary_schema import TRIP_RESPONSE_SCHEMA
+from api.prompts import build_trip_prompt
+
+MODEL = 'gemini-2.0-flash'
+
+
+def fake_day(number):
+    return {
+        "title": f"Day {number}: Bench",
+        "activities": [{"time": "09:00", "description": "Bench activity", "place_name_for_lookup": "Bench Place"}],
+        "day_cost_estimate": {"min": 50, "max": 100, "currency": "USD"},
+    }
+
+
+def fake_trip_fields():
+    return {
+        "summary": "Benchmark trip",
+        "destination_info": {"country": "Benchland", "city": "Bench City", "currency": "USD"},
+        "total_cost_estimate": {"min": 500, "max": 900, "currency": "USD"},
+    }
+
+
+def install_fake_gemini(args):
+    def respond(text, output_tokens):
+        time.sleep((args.first_token_ms + output_tokens * args.token_ms) / 1000 / args.speedup)
+        return SimpleNamespace(
+            prompt_feedback=None,
+            candidates=[SimpleNamespace(content=SimpleNamespace(parts=[SimpleNamespace(text=text)]), finish_reason=1)],
+            usage_metadata=None,
+        )
+
+    class FakeModel:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def generate_content(self, prompt, **kwargs):
+            if "**Skeleton Task:**" in prompt:
+                count = int(re.search(r"exactly (\d+) entries", prompt).group(1))
+                days = [{"title": f"Day {n}: Bench", "theme": "Bench", "area": "Center"} for n in range(1, count + 1)]
+                return respond(json.dumps({**fake_trip_fields(), "days": days}), args.overhead_tokens + count * 30)
+            if "**Day Task:**" in prompt:
+                number = int(re.search(r"Write ONLY day (\d+)", prompt).group(1))
+                return respond(json.dumps(fake_day(number)), args.day_tokens)
+            count = int(re.search(r"\((\d+) days?\)", prompt).group(1))
+            plan = {**fake_trip_fields(), "days": [fake_day(n) for n in range(1, count + 1)]}
+            return respond(json.dumps(plan), args.overhead_tokens + count * args.day_tokens)
+
+    chat_request.genai.GenerativeModel = FakeModel
+
+
+def trip_data(days):
+    start = date(2025, 10, 1)
+    return {"destination": "Bench City", "startDate": start, "endDate": start + timedelta(days=days - 1), "searchMode": "quick"}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, nargs='+', default=[3, 7, 14], help='trip lengths to measure')
+    parser.add_argument('--workers', type=int, default=settings.TRIP_FANOUT_MAX_WORKERS, help='parallel day calls')
+    parser.add_argument('--first-token-ms', type=float, default=800, help='simulated time to first token per call')
+    parser.add_argument('--token-ms', type=float, default=5, help='simulated decoding time per output token')
+    parser.add_argument('--day-tokens', type=int, default=900, help='output tokens per day')
+    parser.add_argument('--overhead-tokens', type=int, default=700, help='output tokens for trip-level fields')
+    parser.add_argument('--max-output-tokens', type=int, default=8192, help='model output limit (flagged, not enforced)')
+    parser.add_argument('--speedup', type=float, default=20, help='divide simulated sleeps by this factor')
+    args = parser.parse_args()
+
+    settings.GEMINI_CONTEXT_CACHE_ENABLED = False
+    settings.TRIP_FANOUT_MAX_WORKERS = args.workers
+    install_fake_gemini(args)
+
+    print(f"first token {args.first_token_ms:.0f}ms, {args.token_ms}ms/token, {args.day_tokens} tokens/day, "
+          f"{args.workers} workers (latencies scaled back from a {args.speedup:g}x faster run)\n")
+    print(f"  {'days':>4} {'single call':>12} {'fan-out':>10} {'speedup':>8}  note")
+    for days in args.days:
+        data = trip_data(days)
+        system_instruction, user_prompt = build_trip_prompt(data)
+
+        started = time.perf_counter()
+        result = chat_request.generate(user_prompt, MODEL, system_instruction=system_instruction, response_schema=TRIP_RESPONSE_SCHEMA)
+        single = (time.perf_counter() - started) * args.speedup
+        assert len(result.data["days"]) == days
+
+        started = time.perf_counter()
+        plan = trip_fanout.generate_itinerary_fanout(data, user_prompt, system_instruction, MODEL)
+        fanout = (time.perf_counter() - started) * args.speedup
+        assert plan and len(plan["days"]) == days
+
+        single_tokens = args.overhead_tokens + days * args.day_tokens
+        note = f"single call needs {single_tokens} output tokens (> {args.max_output_tokens}: truncated)" \
+            if single_tokens > args.max_output_tokens else ""
+        print(f"  {days:>4} {single:>11.1f}s {fanout:>9.1f}s {single / fanout:>7.1f}x  {note}")
+
+
+if __name__ == '__main__':
+    main()
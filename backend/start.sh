@@ -9,6 +9,19 @@ echo "--- Defaulted PORT for Gunicorn: [${PORT:-8000}] ---"
 echo "--- Running Django migrations ---"
 python manage.py migrate --noinput
 
+# SERVER_MODE=worker runs the background trip generation worker instead of a
+# web server, so generation capacity scales separately from the web tier.
+if [ "$SERVER_MODE" = "worker" ]; then
+    echo "--- Starting trip worker ---"
+    exec python manage.py run_trip_worker --concurrency "${TRIP_WORKER_CONCURRENCY:-4}"
+fi
+
+# SERVER_MODE=warmer pre-generates popular itineraries during the off-peak window.
+if [ "$SERVER_MODE" = "warmer" ]; then
+    echo "--- Starting trip cache warm-up scheduler ---"
+    exec python manage.py warm_trip_cache --schedule
+fi
+
 echo "--- Collecting static files ---"
 python manage.py collectstatic --noinput --clear
 
@@ -16,6 +29,21 @@ echo "--- Starting Gunicorn ---"
 GUNICORN_WORKERS=${GUNICORN_WORKERS:-3}
 GUNICORN_THREADS=${GUNICORN_THREADS:-2}
 GUNICORN_TIMEOUT=${GUNICORN_TIMEOUT:-60}
+export SERVER_MODE=${SERVER_MODE:-wsgi}
+
+# SERVER_MODE=asgi runs backend.asgi under uvicorn workers. The LLM endpoints
+# (/api/plantrip/, /api/chat-*-activity/ and their /async/ aliases) are then
+# served by async views that await Gemini on the event loop; the remaining sync
+# views share one thread per worker, so they must stay short (CRUD, health).
+if [ "$SERVER_MODE" = "asgi" ]; then
+    echo "Gunicorn command to be executed: exec gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker --bind \"0.0.0.0:${PORT:-8000}\" --workers \"$GUNICORN_WORKERS\" --timeout \"$GUNICORN_TIMEOUT\""
+
+    exec gunicorn backend.asgi:application \
+        -k uvicorn.workers.UvicornWorker \
+        --bind "0.0.0.0:8000" \
+        --workers "$GUNICORN_WORKERS" \
+        --timeout "$GUNICORN_TIMEOUT"
+fi
 
 echo "Gunicorn command to be executed: exec gunicorn backend.wsgi:application --bind \"0.0.0.0:${PORT:-8000}\" --workers \"$GUNICORN_WORKERS\" --threads \"$GUNICORN_THREADS\" --timeout \"$GUNICORN_TIMEOUT\""
 
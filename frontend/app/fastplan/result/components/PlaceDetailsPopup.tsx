@@ -21,6 +21,9 @@ import { Dialog } from '@headlessui/react';
 import { X, ChevronLeft, ChevronRight, ImageIcon, MapPin, Phone, Globe, Clock, Star, MessageSquare } from 'lucide-react';
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL;
+// Origin the backend prefixes photo URLs with when PHOTO_PROXY_BASE_URL is set (e.g. a CDN).
+const PHOTO_PROXY_BASE = process.env.NEXT_PUBLIC_PHOTO_PROXY_BASE_URL?.replace(/\/+$/, '');
+const PHOTO_PROXY_PATH = '/api/place-photo/';
 
 /**
  * Props interface for PlaceDetailsPopup component
@@ -73,30 +76,20 @@ const PlaceDetailsPopup: React.FC<PlaceDetailsPopupProps> = ({ details, onClose,
     const [failedImages, setFailedImages] = useState<Set<string>>(new Set());
     const router = useRouter();
     
-    /**
-     * Extracts photo reference from Google Maps URL
-     * @param url - Google Maps photo URL
-     * @returns Photo reference string or null
-     */
-    const getPhotoReference = (url: string): string | null => {
-        if (!url) return null;
-        try {
-            const urlObj = new URL(url);
-            return urlObj.searchParams.get('photoreference');
-        } catch (e) {
-            return null;
-        }
-    };
-    
     /**
      * Creates a proxied URL for the photo to avoid CORS issues
-     * @param googlePhotoUrl - Original Google Maps photo URL
+     * @param photoUrl - Signed proxy path from the backend
      * @returns Proxied photo URL or loading image
      */
-    const getProxiedPhotoUrl = (googlePhotoUrl: string): string => {
-        const photoRef = getPhotoReference(googlePhotoUrl);
-        if (!photoRef) return '/images/loading.gif';
-        return `${API_BASE}/api/place-photo/?photo_reference=${photoRef}&maxwidth=800`;
+    const getProxiedPhotoUrl = (photoUrl: string): string => {
+        if (!photoUrl) return '/images/loading.gif';
+        // Backend already returns signed proxy URLs: relative to the API, or absolute
+        // on the API or PHOTO_PROXY_BASE_URL origin.
+        if (photoUrl.startsWith(PHOTO_PROXY_PATH)) return `${API_BASE}${photoUrl}`;
+        if ([API_BASE, PHOTO_PROXY_BASE].some(base => base && photoUrl.startsWith(`${base}${PHOTO_PROXY_PATH}`))) return photoUrl;
+        // Anything else (e.g. a Google URL carrying the API key) is never loaded directly;
+        // the backend rewrites legacy URLs to proxy paths when it reads cached data.
+        return '/images/loading.gif';
     };
     
     /**
@@ -26,6 +26,20 @@ import { useRouter } from 'next/navigation';
 import { useAuth } from '@/app/(auth)/context/AuthContext';
 
 const API_BASE = process.env.NEXT_PUBLIC_API_URL;
+// Origin the backend prefixes photo URLs with when PHOTO_PROXY_BASE_URL is set (e.g. a CDN).
+const PHOTO_PROXY_BASE = process.env.NEXT_PUBLIC_PHOTO_PROXY_BASE_URL?.replace(/\/+$/, '');
+const PHOTO_PROXY_PATH = '/api/place-photo/';
+
+/**
+ * Returns a loadable URL for a signed photo proxy URL from the backend, or undefined
+ * for anything else (e.g. a Google URL carrying the API key, never loaded directly).
+ * @param url - Relative proxy path, or absolute on the API or photo proxy origin
+ */
+const toPhotoProxyUrl = (url?: string): string | undefined => {
+    if (!url) return undefined;
+    if (url.startsWith(PHOTO_PROXY_PATH)) return `${API_BASE}${url}`;
+    return [API_BASE, PHOTO_PROXY_BASE].some(base => base && url.startsWith(`${base}${PHOTO_PROXY_PATH}`)) ? url : undefined;
+};
 const GOOGLE_MAPS_API_KEY = process.env.NEXT_PUBLIC_GOOGLE_MAPS_API_KEY; 
 
 /**
@@ -175,7 +189,8 @@ const PlaceDetailsPopup: React.FC<PlaceDetailsPopupProps> = ({ details, onClose,
 
     // Extract place details
     const { name, address, rating, total_ratings, phone, website, photos, opening_hours, reviews, location } = details;
-    const currentPhotoUrl = photos?.[currentPhotoIndex];
+    const rawPhotoUrl = photos?.[currentPhotoIndex];
+    const currentPhotoUrl = toPhotoProxyUrl(rawPhotoUrl);
     const mapLink = location
         ? `https://www.google.com/maps/search/?api=1&query=${location.lat},${location.lng}`
         : `https://www.google.com/maps/search/?api=1&query=${encodeURIComponent(address || name)}`;